@@ -8,6 +8,8 @@ from livekit.plugins import (
     noise_cancellation,
 )
 
+from worker_load import load_options
+
 load_dotenv(".env.local")
 
 
@@ -51,4 +53,4 @@ async def entrypoint(ctx: agents.JobContext):
 
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, **load_options("agent")))
\ No newline at end of file
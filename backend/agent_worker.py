@@ -2,7 +2,8 @@ import asyncio
 import logging
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional
+from livekit.agents.job import get_job_context
 from livekit.agents.llm import function_tool
 
 logger = logging.getLogger(__name__)
@@ -17,15 +18,26 @@ from livekit.agents import (
     RoomOutputOptions,
     RunContext,
 )
-from livekit.plugins import (
-    hedra,
-    openai,
-)
-try:
-    from livekit.plugins import noise_cancellation
-except ImportError:
-    # Fallback: noise cancellation not available in this version
-    noise_cancellation = None
+from lazy_imports import lazy_import, prewarm
+# Plugins load in the job processes when LAZY_IMPORTS=1 (None if noise cancellation isn't
+# installed, in which case audio_frontend's NumPy front end takes its place)
+hedra = lazy_import("livekit.plugins.hedra")
+noise_cancellation = lazy_import("livekit.plugins.noise_cancellation", optional=True)
+
+from audio_frontend import noise_cancellation_for
+from audio_ingest import SHARED_AUDIO_INGEST, SharedAudioIngest
+from avatar_compositor import AVATAR_COMPOSITOR, AvatarCompositor
+from avatar_idle import RoomSubscriptions
+from checkpoints import RESUME_INSTRUCTIONS, open_checkpoint
+from conversation_memory import ConversationMemory, memory_chat_ctx
+from handoff import HANDOFF_TRIGGER, TurnEndHandoff
+from line_cache import speak_line
+from recording import open_room_log
+from resources import avatar_close, shutdown_when_empty, tracker
+from persona_models import PersonaKey, connect_realtime_model
+from startup import StartupStep, TokenBucket, run_startup
+from tracing import get_tracer, trace_model_metrics, traced
+from worker_load import load_options
 
 # Conditional dotenv loading - works locally and on Railway
 try:
@@ -39,15 +51,33 @@ except ImportError:
     # dotenv not available (e.g., in Railway) - use system environment variables
     logger.info("🚀 Using Railway/system environment variables (dotenv not available)")
 
+# Hedra rejects bursts of session starts, so avatar starts share a token bucket
+# (shared by every room this process serves) instead of sleeping a fixed 2s.
+hedra_start_bucket = TokenBucket(
+    rate=float(os.getenv("HEDRA_START_RATE", "0.5")),
+    capacity=float(os.getenv("HEDRA_START_BURST", "2")),
+)
+AVATAR_START_ATTEMPTS = int(os.getenv("HEDRA_START_ATTEMPTS", "3"))
+
+SNOOP_KEY = PersonaKey("snoop", voice="ash", avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194")
+MARTHA_KEY = PersonaKey("martha", voice="shimmer", avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e")
+
+# The hosts take turns on their own once a turn has played out; the switch tools only
+# override that (HANDOFF_TRIGGER=tool makes them the only way to switch again)
+TURN_END_HANDOFFS = HANDOFF_TRIGGER == "turn-end"
+
 @dataclass
 class ConversationData:
     current_speaker: Optional[str] = None
     conversation_started: bool = False
-    snoop_avatar: Optional[hedra.AvatarSession] = None
-    martha_avatar: Optional[hedra.AvatarSession] = None
+    snoop_avatar: Optional["hedra.AvatarSession"] = None
+    martha_avatar: Optional["hedra.AvatarSession"] = None
+    audio_ingest: Optional[SharedAudioIngest] = None  # shared by both sessions in the room
+    compositor: Optional[AvatarCompositor] = None
+    handoff: Optional[TurnEndHandoff] = None
 
 class SnoopAgent(Agent):
-    def __init__(self) -> None:
+    def __init__(self, *, chat_ctx: Optional[ChatContext] = None) -> None:
         super().__init__(
             instructions=(
                 "You are Snoop Dogg, the legendary rapper and cultural icon. "
@@ -56,8 +86,13 @@ class SnoopAgent(Agent):
                 "slang like 'fo shizzle', 'neffew', and ending sentences with 'ya dig?' or 'fo sho'. "
                 "You're known for your love of cooking with Martha, cannabis culture, and your smooth personality. "
                 "Keep your responses concise and engaging, always ending with a question for Martha. "
-                "After speaking, always call the switch_to_martha function to let her respond."
-            )
+                + (
+                    "Martha responds automatically when you finish speaking."
+                    if TURN_END_HANDOFFS
+                    else "After speaking, always call the switch_to_martha function to let her respond."
+                )
+            ),
+            chat_ctx=chat_ctx,
         )
 
     async def on_enter(self):
@@ -65,19 +100,30 @@ class SnoopAgent(Agent):
             self.session.userdata.conversation_started = True
             self.session.userdata.current_speaker = "snoop"
             logger.info("🎤 Starting conversation with Snoop Dogg")
-            self.session.generate_reply(
-                instructions="Introduce yourself to Martha and ask her about what you two should cook together today."
+            speak_line(
+                self.session,
+                "snoop",
+                SNOOP_KEY.voice,
+                "Introduce yourself to Martha and ask her about what you two should cook together today.",
             )
 
     @function_tool
     async def switch_to_martha(self, context: RunContext[ConversationData]):
         """Called when Snoop is done speaking and it's Martha's turn."""
         logger.info("🎤 Switching turn to Martha Stewart")
-        context.userdata.current_speaker = "martha"
-        return MarthaAgent()
+        if context.userdata.handoff:
+            context.userdata.handoff.request("snoop", "martha")
+            return None
+        with get_tracer().span("switch_to_martha", get_job_context().room.name):
+            context.userdata.current_speaker = "martha"
+            if context.userdata.audio_ingest:
+                context.userdata.audio_ingest.set_floor("martha")
+            if context.userdata.compositor:
+                context.userdata.compositor.set_active("martha")
+            return MarthaAgent()
 
 class MarthaAgent(Agent):
-    def __init__(self) -> None:
+    def __init__(self, *, chat_ctx: Optional[ChatContext] = None) -> None:
         super().__init__(
             instructions=(
                 "You are Martha Stewart, the lifestyle and cooking expert. "
@@ -87,16 +133,29 @@ class MarthaAgent(Agent):
                 "home decoration, and entertaining, but also for your unexpected friendship with Snoop. "
                 "Use phrases like 'It's a good thing' and maintain your sophisticated yet approachable demeanor. "
                 "Keep your responses concise and engaging, always ending with a question for Snoop. "
-                "After speaking, always call the switch_to_snoop function to let him respond."
-            )
+                + (
+                    "Snoop responds automatically when you finish speaking."
+                    if TURN_END_HANDOFFS
+                    else "After speaking, always call the switch_to_snoop function to let him respond."
+                )
+            ),
+            chat_ctx=chat_ctx,
         )
 
     @function_tool
     async def switch_to_snoop(self, context: RunContext[ConversationData]):
         """Called when Martha is done speaking and it's Snoop's turn."""
         logger.info("🎤 Switching turn to Snoop Dogg")
-        context.userdata.current_speaker = "snoop"
-        return SnoopAgent()
+        if context.userdata.handoff:
+            context.userdata.handoff.request("martha", "snoop")
+            return None
+        with get_tracer().span("switch_to_snoop", get_job_context().room.name):
+            context.userdata.current_speaker = "snoop"
+            if context.userdata.audio_ingest:
+                context.userdata.audio_ingest.set_floor("snoop")
+            if context.userdata.compositor:
+                context.userdata.compositor.set_active("snoop")
+            return SnoopAgent()
         
 
 async def entrypoint(ctx: agents.JobContext):
@@ -113,63 +172,259 @@ async def entrypoint(ctx: agents.JobContext):
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
     
     logger.info("Starting agent worker with all required environment variables")
+    tracer = get_tracer()
+    # Everything the room opens is closed with it, when the job ends or the room empties
+    resources = tracker.open(ctx.room.name)
+    ctx.add_shutdown_callback(resources.aclose)
+    shutdown_when_empty(ctx)
+    # With EVENT_LOG set, the room's timeline is recorded for replays
+    recorder = open_room_log(ctx.room.name)
+    if recorder:
+        resources.add("event_log", ctx.room.name, recorder.aclose)
+        recorder.watch_room(ctx.room)
+    # With CHECKPOINTS on, every turn is saved, and a restarted job picks the show back up
+    checkpoint = open_checkpoint(ctx.room.name)
+    resumed = checkpoint.resumed if checkpoint else None
+    if checkpoint:
+        ctx.add_shutdown_callback(checkpoint.aclose)
+        checkpoint.watch_room(ctx.room)
     
     try:
-        # Create two sessions with different voices
+        # Subscribe to (and denoise) the user's microphone once for both sessions
+        audio_ingest = None
+        if SHARED_AUDIO_INGEST:
+            audio_ingest = SharedAudioIngest(
+                ctx.room,
+                noise_cancellation=noise_cancellation_for(noise_cancellation),
+            )
+            resources.add("audio_ingest", ctx.room.name, audio_ingest.aclose)
+
+        # Create two sessions with different voices, each model connecting while its avatar starts
+        snoop_llm, martha_llm = await asyncio.gather(
+            connect_realtime_model(SNOOP_KEY),
+            connect_realtime_model(MARTHA_KEY),
+        )
+        resources.add("model", "snoop", snoop_llm.discard)
+        resources.add("model", "martha", martha_llm.discard)
+        # Both avatars in one published track, instead of one subscription each per viewer
+        compositor = None
+        if AVATAR_COMPOSITOR:
+            compositor = AvatarCompositor({"snoop": "snoop", "martha": "martha"}, active="snoop")
+
+        # Each session only hears the user, so the host taking over is told what the other
+        # one just said
+        sessions = {}
+        last_lines = {}
+
+        def hand_to(from_persona: str, to_persona: str, topic: Optional[str]):
+            logger.info(f"🎤 {from_persona} finished, {to_persona} takes over")
+            with tracer.span("hand_off", ctx.room.name, from_persona=from_persona, to_persona=to_persona):
+                for session in sessions.values():
+                    session.userdata.current_speaker = to_persona
+                if checkpoint:
+                    checkpoint.save()
+                if audio_ingest:
+                    audio_ingest.set_floor(to_persona)
+                if compositor:
+                    compositor.set_active(to_persona)
+                line = last_lines.get(from_persona)
+                sessions[to_persona].generate_reply(
+                    user_input=f"{from_persona.title()} said: {line}" if line else None
+                )
+
+        # The hosts keep talking to each other, as they did when every turn ended in a tool call
+        handoff = TurnEndHandoff(["snoop", "martha"], hand_to, max_chain=0) if TURN_END_HANDOFFS else None
+
         snoop_session = AgentSession(
-            llm=openai.realtime.RealtimeModel(voice="ash"),
-            userdata=ConversationData()
+            llm=snoop_llm,
+            userdata=ConversationData(audio_ingest=audio_ingest, compositor=compositor, handoff=handoff)
         )
         
         martha_session = AgentSession(
-            llm=openai.realtime.RealtimeModel(voice="shimmer"),
-            userdata=ConversationData()
+            llm=martha_llm,
+            userdata=ConversationData(audio_ingest=audio_ingest, compositor=compositor, handoff=handoff)
         )
+        sessions.update(snoop=snoop_session, martha=martha_session)
+        # Snoop opens the conversation, unless a restarted job picks it up from a checkpoint
+        holder = "snoop"
+        memory = ConversationMemory()
+        if resumed:
+            resumed.restore(snoop_session.userdata, memory)
+            resumed.restore(martha_session.userdata)
+            holder = resumed.fields.get("current_speaker") or holder
+            if compositor:
+                compositor.set_active(holder)
+        if checkpoint:
+
+            def current_speaker() -> Optional[str]:
+                return handoff.holder if handoff else snoop_session.userdata.current_speaker
+
+            checkpoint.track(
+                memory,
+                lambda: {
+                    "current_speaker": current_speaker(),
+                    "conversation_started": snoop_session.userdata.conversation_started,
+                },
+            )
+            for persona, session in sessions.items():
+
+                def on_turn(ev, persona: str = persona) -> None:
+                    item = ev.item
+                    if item.type != "message" or not item.text_content:
+                        return
+                    if item.role == "assistant":
+                        memory.add(persona, item.text_content)
+                    # Both sessions hear the user (or only the floor holder, with the shared
+                    # ingest), so each utterance is saved once
+                    elif item.role == "user" and persona == (current_speaker() if audio_ingest else "snoop"):
+                        memory.add("user", item.text_content)
+
+                session.on("conversation_item_added", on_turn)
+        if recorder:
+            for persona, session in sessions.items():
+                recorder.watch(persona, session, user=persona == "snoop")  # both hear the same user
+
+        # A host's turn runs from the user's words (or the handoff) to the end of its reply.
+        # The realtime model can start answering before the user's transcript comes in
+        turn_state: Dict[str, str] = {}  # persona -> "committed" or "replying"
+        for persona, session in sessions.items():
+
+            def on_transcribed(ev, persona: str = persona) -> None:
+                if ev.is_final and turn_state.get(persona) != "replying":
+                    tracer.start_turn(ctx.room.name, persona)
+                    turn_state[persona] = "committed"
+
+            def on_speech_created(ev, persona: str = persona) -> None:
+                if turn_state.get(persona) == "committed":
+                    tracer.mark(ctx.room.name, persona, "reply_requested")
+                else:
+                    tracer.start_turn(ctx.room.name, persona, stage="reply_requested")
+                turn_state[persona] = "replying"
+
+            def on_state_changed(ev, persona: str = persona) -> None:
+                if ev.new_state == "speaking":
+                    tracer.mark(ctx.room.name, persona, "audio_first_chunk")
+
+            def on_reply_added(ev, persona: str = persona) -> None:
+                if ev.item.role == "assistant" and turn_state.pop(persona, None) == "replying":
+                    tracer.end_turn(ctx.room.name, persona, interrupted=ev.item.interrupted)
+
+            session.on("user_input_transcribed", on_transcribed)
+            session.on("speech_created", on_speech_created)
+            session.on("agent_state_changed", on_state_changed)
+            session.on("conversation_item_added", on_reply_added)
+            trace_model_metrics(tracer, ctx.room.name, persona, session)
+
+        if handoff:
+            handoff.set_holder(holder)
+            for persona, session in sessions.items():
+                handoff.watch(persona, session)
+
+                def on_item_added(ev, persona: str = persona) -> None:
+                    if ev.item.role == "assistant" and ev.item.text_content:
+                        last_lines[persona] = ev.item.text_content
+
+                session.on("conversation_item_added", on_item_added)
+
+        if audio_ingest:
+            snoop_session.input.audio = audio_ingest.add_consumer("snoop")
+            martha_session.input.audio = audio_ingest.add_consumer("martha")
+            audio_ingest.set_floor(holder)
+            audio_ingest.start()
 
         # Create avatar sessions
         snoop_avatar = hedra.AvatarSession(
-            avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194",
+            avatar_id=SNOOP_KEY.avatar_id,
             avatar_participant_identity="snoop",
             avatar_participant_name="Snoop Dogg",
         )
 
         martha_avatar = hedra.AvatarSession(
-            avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e",
+            avatar_id=MARTHA_KEY.avatar_id,
             avatar_participant_identity="martha",
             avatar_participant_name="Martha Stewart",
         )
 
-        # Start avatars with their respective sessions
-        logger.info("Starting Snoop avatar...")
-        await snoop_avatar.start(snoop_session, room=ctx.room)
-        await asyncio.sleep(2)  # Add delay to prevent rate limiting
-        
-        logger.info("Starting Martha avatar...")
-        await martha_avatar.start(martha_session, room=ctx.room)
-
-        # Start with Snoop
-        logger.info("Starting Snoop session...")
-        await snoop_session.start(
-            room=ctx.room,
-            agent=SnoopAgent(),
-            room_output_options=RoomOutputOptions(audio_enabled=False),
-            room_input_options=RoomInputOptions(
-                noise_cancellation=noise_cancellation.BVC() if noise_cancellation else None,
-            ),
-        )
+        resources.add("session", "snoop", snoop_session.aclose)
+        resources.add("session", "martha", martha_session.aclose)
 
-        # Start Martha's session
-        logger.info("Starting Martha session...")
-        await martha_session.start(
-            room=ctx.room,
-            agent=MarthaAgent(),
-            room_output_options=RoomOutputOptions(audio_enabled=False),
-            room_input_options=RoomInputOptions(
-                noise_cancellation=noise_cancellation.BVC() if noise_cancellation else None,
-            ),
+        def _room_input_options() -> RoomInputOptions:
+            if audio_ingest:
+                return RoomInputOptions(audio_enabled=False)
+            return RoomInputOptions(
+                noise_cancellation=noise_cancellation_for(noise_cancellation),
+            )
+
+        async def _start_session(persona: str, agent: Agent) -> None:
+            session = sessions[persona]
+            if recorder:
+                # The avatar has set the session's output by now; record what goes into it
+                session.output.audio = recorder.audio_output(persona, session.output.audio)
+            await session.start(
+                room=ctx.room,
+                agent=agent,
+                room_output_options=RoomOutputOptions(audio_enabled=False),
+                room_input_options=_room_input_options(),
+            )
+            if resumed and persona == holder:
+                # The show had started, so Snoop doesn't open it again. Picked up as soon as
+                # the holder is up, as a fresh show's opening line is, not after both hosts
+                session.generate_reply(instructions=RESUME_INSTRUCTIONS)
+
+        # A resumed host starts out knowing the show so far
+        chat_ctxs = {persona: memory_chat_ctx(memory, persona) for persona in sessions} if resumed else {}
+
+        # Bring both personas up concurrently. Each session starts right after its own
+        # avatar (the avatar swaps in the session's audio output), and the Hedra calls are
+        # paced by the token bucket instead of a fixed sleep.
+        await run_startup(
+            [
+                StartupStep(
+                    "snoop_avatar",
+                    traced(
+                        tracer,
+                        "avatar_start",
+                        lambda: snoop_avatar.start(snoop_session, room=ctx.room),
+                        ctx.room.name,
+                        persona="snoop",
+                    ),
+                    rate_limited=True,
+                    attempts=AVATAR_START_ATTEMPTS,
+                ),
+                StartupStep(
+                    "martha_avatar",
+                    traced(
+                        tracer,
+                        "avatar_start",
+                        lambda: martha_avatar.start(martha_session, room=ctx.room),
+                        ctx.room.name,
+                        persona="martha",
+                    ),
+                    rate_limited=True,
+                    attempts=AVATAR_START_ATTEMPTS,
+                ),
+                StartupStep(
+                    "snoop_session",
+                    lambda: _start_session("snoop", SnoopAgent(chat_ctx=chat_ctxs.get("snoop"))),
+                    after=("snoop_avatar",),
+                ),
+                StartupStep(
+                    "martha_session",
+                    lambda: _start_session("martha", MarthaAgent(chat_ctx=chat_ctxs.get("martha"))),
+                    after=("martha_avatar",),
+                ),
+            ],
+            bucket=hedra_start_bucket,
         )
+        for persona in ("snoop", "martha"):
+            resources.add("avatar", persona, avatar_close(ctx.api, ctx.room.name, persona))
+
+        if compositor:
+            await compositor.start(ctx.room, RoomSubscriptions(ctx.api, ctx.room.name))
+            resources.add("compositor", ctx.room.name, compositor.aclose)
     except Exception as e:
         logger.error(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    room_type = "agent_worker+compositor" if AVATAR_COMPOSITOR else "agent_worker"
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, **load_options(room_type)))
\ No newline at end of file
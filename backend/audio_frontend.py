@@ -0,0 +1,189 @@
+"""NumPy audio front end for when LiveKit's noise cancellation plugin isn't installed.
+
+``AudioFrontEnd`` is an ``rtc.FrameProcessor``, so it goes into ``RoomInputOptions``
+(or ``SharedAudioIngest``) where ``noise_cancellation.BVC()`` would. Every incoming
+frame is split into 10ms analysis frames and processed as one batch:
+
+- VAD: a subframe counts as speech when its energy is ``AUDIO_FRONTEND_MARGIN_DB`` above
+  the noise floor (a low percentile of the last few seconds) and its spectrum is not
+  flat like noise.
+- Noise gate: audio outside speech (plus a hangover) is attenuated by ``AUDIO_FRONTEND_GATE_DB``.
+- Silence suppression: once the user has been quiet for ``AUDIO_FRONTEND_SUPPRESS_AFTER_MS``,
+  frames are tagged ``userdata["suppress"]`` and the shared ingest stops forwarding
+  them. The delay is longer than the realtime model's own end-of-turn silence, so the
+  model still sees the turn end.
+
+``AUDIO_FRONTEND`` picks what runs: ``auto`` uses BVC when it's installed and this front
+end otherwise, ``on`` always uses this front end, ``off`` forwards raw audio.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from livekit import rtc
+
+AUDIO_FRONTEND = os.getenv("AUDIO_FRONTEND", "auto")
+AUDIO_FRONTEND_MARGIN_DB = float(os.getenv("AUDIO_FRONTEND_MARGIN_DB", "6"))
+AUDIO_FRONTEND_GATE_DB = float(os.getenv("AUDIO_FRONTEND_GATE_DB", "-40"))
+AUDIO_FRONTEND_HANGOVER_MS = int(os.getenv("AUDIO_FRONTEND_HANGOVER_MS", "300"))
+AUDIO_FRONTEND_SUPPRESS_AFTER_MS = int(os.getenv("AUDIO_FRONTEND_SUPPRESS_AFTER_MS", "1500"))
+
+SUBFRAME_MS = 10
+NOISE_WINDOW_MS = 5000  # the noise floor is a low percentile of this much recent energy
+NOISE_PERCENTILE = 5
+NOISE_UPDATE_MS = 100  # how often the floor is recomputed
+MAX_FLATNESS = 0.35  # white noise sits around 0.56, voiced speech well below 0.3
+MIN_SPEECH_DBFS = -65.0
+
+
+@dataclass
+class FrontEndStats:
+    frames: int = 0
+    voiced: int = 0  # frames with speech (or its hangover) in them
+    suppressed: int = 0
+
+    @property
+    def suppressed_ratio(self) -> float:
+        return self.suppressed / self.frames if self.frames else 0.0
+
+
+@lru_cache(maxsize=8)
+def _analysis_window(size: int, sample_rate: int) -> Tuple[np.ndarray, slice]:
+    # Only the band speech lives in; hum and hiss outside it shouldn't decide flatness
+    freqs = np.fft.rfftfreq(size, 1 / sample_rate)
+    in_band = np.flatnonzero((freqs >= 100) & (freqs <= 4000))
+    return np.hanning(size).astype(np.float32), slice(in_band[0], in_band[-1] + 1)
+
+
+def subframe_features(subframes: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Energy (dBFS) and spectral flatness of each row of ``subframes`` (float32, -1..1)."""
+    window, band = _analysis_window(subframes.shape[1], sample_rate)
+    energy_db = 10 * np.log10(np.einsum("ij,ij->i", subframes, subframes) / subframes.shape[1] + 1e-10)
+    spectrum = np.fft.rfft(subframes * window, axis=1)[:, band]
+    power = spectrum.real**2 + spectrum.imag**2 + 1e-12
+    flatness = np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+    return energy_db, flatness
+
+
+class AudioFrontEnd(rtc.FrameProcessor[rtc.AudioFrame]):
+    """VAD, noise gate and silence suppression for one audio stream (it keeps per-stream state)."""
+
+    def __init__(
+        self,
+        *,
+        margin_db: float = AUDIO_FRONTEND_MARGIN_DB,
+        gate_db: float = AUDIO_FRONTEND_GATE_DB,
+        hangover_ms: int = AUDIO_FRONTEND_HANGOVER_MS,
+        suppress_after_ms: int = AUDIO_FRONTEND_SUPPRESS_AFTER_MS,
+    ):
+        self.margin_db = margin_db
+        self.gate_gain = 10 ** (gate_db / 20)
+        self.hangover = hangover_ms // SUBFRAME_MS
+        self.suppress_after = suppress_after_ms // SUBFRAME_MS
+        self.stats = FrontEndStats()
+        self._enabled = True
+        self._energies = np.empty(NOISE_WINDOW_MS // SUBFRAME_MS, dtype=np.float32)
+        self._energy_count = 0
+        self._noise_floor_db = MIN_SPEECH_DBFS
+        self._subframe = 0  # index of the next subframe in the stream
+        # Start as if the last speech was long ago, so leading silence is suppressed
+        self._last_speech = -(self.suppress_after + 1)
+        self._gain = self.gate_gain
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value: bool) -> None:
+        self._enabled = value
+
+    @property
+    def noise_floor_db(self) -> float:
+        return self._noise_floor_db
+
+    def _process(self, frame: rtc.AudioFrame) -> rtc.AudioFrame:
+        return self.process(frame)
+
+    def _close(self) -> None:
+        pass
+
+    def process(self, frame: rtc.AudioFrame) -> rtc.AudioFrame:
+        """Gate ``frame`` and tag it with ``userdata["voiced"]`` / ``userdata["suppress"]``."""
+        channels = frame.num_channels
+        pcm = np.frombuffer(frame.data, dtype=np.int16).reshape(-1, channels)
+        mono = (pcm[:, 0] if channels == 1 else pcm.mean(axis=1)).astype(np.float32) / 32768
+
+        size = frame.sample_rate * SUBFRAME_MS // 1000
+        count = max(1, math.ceil(len(mono) / size))
+        subframes = np.zeros(count * size, dtype=np.float32)
+        subframes[: len(mono)] = mono
+        subframes = subframes.reshape(count, size)
+
+        energy_db, flatness = subframe_features(subframes, frame.sample_rate)
+        threshold = max(self.noise_floor_db + self.margin_db, MIN_SPEECH_DBFS)
+        speech = (energy_db > threshold) & (flatness < MAX_FLATNESS)
+        self._track_noise(energy_db)
+
+        # Subframes since the last speech, carrying the state over from the previous frame
+        index = self._subframe + np.arange(count)
+        last = np.maximum.accumulate(np.where(speech, index, self._last_speech))
+        since = index - last
+        self._last_speech = int(last[-1])
+        self._subframe += count
+
+        open_ = since <= self.hangover
+        voiced = bool(open_.any())
+        suppress = bool(since.min() > self.suppress_after)
+
+        self.stats.frames += 1
+        self.stats.voiced += voiced
+        self.stats.suppressed += suppress
+        frame.userdata.update(voiced=voiced, suppress=suppress)
+
+        gains = np.where(open_, 1.0, self.gate_gain).astype(np.float32)
+        previous_gain, self._gain = self._gain, float(gains[-1])
+        if previous_gain == 1.0 and open_.all():
+            return frame  # inside speech the frame passes through untouched
+
+        # Ramp from the previous frame's gain so the gate doesn't click
+        ramp = np.interp(
+            np.arange(len(mono)),
+            np.concatenate(([0], np.arange(count) * size + size - 1)),
+            np.concatenate(([previous_gain], gains)),
+        ).astype(np.float32)
+        out = (pcm * ramp[:, None]).astype(np.int16)
+        return rtc.AudioFrame(
+            out.tobytes(), frame.sample_rate, channels, frame.samples_per_channel, userdata=frame.userdata
+        )
+
+    def _track_noise(self, energy_db: np.ndarray) -> None:
+        # Every subframe goes in: pauses between words keep the low percentile at the
+        # noise level, and a floor that could only learn from non-speech would never
+        # recover from noise that the VAD mistakes for speech
+        window = len(self._energies)
+        for energy in energy_db[-window:]:
+            self._energies[self._energy_count % window] = energy
+            self._energy_count += 1
+            if self._energy_count % (NOISE_UPDATE_MS // SUBFRAME_MS) == 0:
+                filled = self._energies[: min(self._energy_count, window)]
+                k = len(filled) * NOISE_PERCENTILE // 100
+                self._noise_floor_db = float(np.partition(filled, k)[k])
+
+
+def noise_cancellation_for(plugin: Optional[Any], mode: str = AUDIO_FRONTEND) -> Optional[Any]:
+    """What goes in ``RoomInputOptions(noise_cancellation=...)`` for this deployment.
+
+    ``plugin`` is ``livekit.plugins.noise_cancellation``, or None if it isn't installed.
+    Call it once per stream: the front end keeps per-stream state.
+    """
+    if mode == "off":
+        return None
+    if mode == "on" or plugin is None:
+        return AudioFrontEnd()
+    return plugin.BVC()
@@ -0,0 +1,232 @@
+"""One subscription to the user's microphone, shared by every persona session in a room.
+
+Without it each AgentSession's RoomIO subscribes to the same track, runs noise
+cancellation on it and uploads it to its own realtime connection. ``SharedAudioIngest``
+subscribes once, denoises once and hands the same frame objects to one
+``FanoutAudioInput`` per session. Consumers only read the frames and must not modify
+them. The persona holding the floor gets every frame. What the others get is set by
+``IDLE_AUDIO``:
+
+- ``none``: nothing (the default)
+- ``gated``: only the frames marked as speech
+
+Frames that went through ``audio_frontend.AudioFrontEnd`` carry its VAD decision. Other
+frames are checked with a plain energy gate. Frames the front end tags for silence
+suppression reach no consumer at all.
+"""
+
+import asyncio
+import logging
+import os
+from typing import AsyncIterable, Callable, Dict, Optional, Union
+
+import numpy as np
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+logger = logging.getLogger("audio-ingest")
+
+SHARED_AUDIO_INGEST = os.getenv("SHARED_AUDIO_INGEST", "1") == "1"
+IDLE_AUDIO = os.getenv("IDLE_AUDIO", "none")
+INGEST_QUEUE_FRAMES = int(os.getenv("INGEST_QUEUE_FRAMES", "100"))  # 5s of 50ms frames
+
+# The same sample rate and frame size RoomIO uses for realtime models
+SAMPLE_RATE = 24000
+NUM_CHANNELS = 1
+FRAME_SIZE_MS = 50
+
+_USER_KINDS = (
+    rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD,
+    rtc.ParticipantKind.PARTICIPANT_KIND_SIP,
+)
+
+
+class EnergyGate:
+    """Marks frames as speech when their level is above ``threshold_dbfs``.
+
+    The gate stays open for ``hangover`` frames after the last loud one, so the quiet
+    ends of words aren't cut off.
+    """
+
+    def __init__(self, threshold_dbfs: float = -45.0, hangover: int = 6):
+        self.threshold_dbfs = threshold_dbfs
+        self.hangover = hangover
+        self._open_for = 0
+
+    def __call__(self, frame: rtc.AudioFrame) -> bool:
+        samples = np.frombuffer(frame.data, dtype=np.int16)
+        if samples.size:
+            rms = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+            if 20 * np.log10(max(rms, 1.0) / 32768) >= self.threshold_dbfs:
+                self._open_for = self.hangover + 1
+        if self._open_for > 0:
+            self._open_for -= 1
+            return True
+        return False
+
+
+class FanoutAudioInput(io.AudioInput):
+    """One session's view of the shared microphone stream.
+
+    Frames wait in a bounded queue. If the session falls behind, the oldest frames are
+    dropped, so it never holds up the other sessions.
+    """
+
+    def __init__(self, name: str, *, max_frames: int = INGEST_QUEUE_FRAMES):
+        self.name = name
+        self._queue: "asyncio.Queue[Optional[rtc.AudioFrame]]" = asyncio.Queue(maxsize=max_frames)
+        self._attached = True
+        self.delivered = 0
+        self.dropped = 0
+
+    def offer(self, frame: Optional[rtc.AudioFrame]) -> None:
+        """Queue ``frame`` without waiting; None ends the stream."""
+        if frame is not None and not self._attached:
+            return
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(frame)
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        frame = await self._queue.get()
+        if frame is None:
+            raise StopAsyncIteration
+        self.delivered += 1
+        return frame
+
+    def on_attached(self) -> None:
+        self._attached = True
+
+    def on_detached(self) -> None:
+        self._attached = False
+
+
+class SharedAudioIngest:
+    def __init__(
+        self,
+        room: Optional[rtc.Room] = None,
+        *,
+        noise_cancellation: Optional[Union[rtc.NoiseCancellationOptions, rtc.FrameProcessor[rtc.AudioFrame]]] = None,
+        idle_audio: str = IDLE_AUDIO,
+        gate: Optional[Callable[[rtc.AudioFrame], bool]] = None,
+    ):
+        if idle_audio not in ("none", "gated"):
+            raise ValueError(f"IDLE_AUDIO must be 'none' or 'gated', got {idle_audio!r}")
+        self._room = room
+        self._noise_cancellation = noise_cancellation
+        self._idle_audio = idle_audio
+        self._gate = gate or EnergyGate()
+        self._consumers: Dict[str, FanoutAudioInput] = {}
+        self._floor: Optional[str] = None
+        self._stream: Optional[rtc.AudioStream] = None
+        self._track_sid: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self.frames_in = 0
+        self.frames_suppressed = 0
+
+    @property
+    def floor(self) -> Optional[str]:
+        return self._floor
+
+    def add_consumer(self, name: str) -> FanoutAudioInput:
+        """The input to assign to a session's ``input.audio`` before it starts."""
+        if name in self._consumers:
+            raise ValueError(f"consumer {name!r} already added")
+        consumer = self._consumers[name] = FanoutAudioInput(name)
+        return consumer
+
+    def set_floor(self, name: Optional[str]) -> None:
+        """Send the full stream to ``name`` from the next frame on."""
+        if name is not None and name not in self._consumers:
+            raise ValueError(f"unknown consumer: {name}")
+        if name != self._floor:
+            logger.info(f"🎙️ User audio now goes to {name or 'nobody'}")
+        self._floor = name
+
+    def start(self) -> None:
+        """Subscribe to the first user microphone published in the room, now or later."""
+        assert self._room is not None, "start() needs a room, use feed() for other sources"
+        self._room.on("track_subscribed", self._on_track_subscribed)
+        self._room.on("track_unsubscribed", self._on_track_unsubscribed)
+        for participant in self._room.remote_participants.values():
+            for publication in participant.track_publications.values():
+                if publication.track is not None and publication.subscribed:
+                    self._on_track_subscribed(publication.track, publication, participant)
+
+    async def aclose(self) -> None:
+        if self._room is not None:
+            self._room.off("track_subscribed", self._on_track_subscribed)
+            self._room.off("track_unsubscribed", self._on_track_unsubscribed)
+        await self._stop_stream()
+        for consumer in self._consumers.values():
+            consumer.offer(None)
+
+    async def feed(self, frames: AsyncIterable[rtc.AudioFrame]) -> None:
+        """Fan out every frame of ``frames`` until it ends."""
+        async for frame in frames:
+            self.push(frame)
+
+    def push(self, frame: rtc.AudioFrame) -> None:
+        self.frames_in += 1
+        if frame.userdata.get("suppress"):
+            self.frames_suppressed += 1
+            return
+        voiced: Optional[bool] = frame.userdata.get("voiced")
+        for name, consumer in self._consumers.items():
+            if name == self._floor:
+                consumer.offer(frame)
+            elif self._idle_audio == "gated":
+                if voiced is None:
+                    voiced = self._gate(frame)  # evaluated once per frame, not per consumer
+                if voiced:
+                    consumer.offer(frame)
+
+    def _on_track_subscribed(
+        self,
+        track: rtc.Track,
+        publication: rtc.RemoteTrackPublication,
+        participant: rtc.RemoteParticipant,
+    ) -> None:
+        if (
+            self._track_sid is not None
+            or publication.source != rtc.TrackSource.SOURCE_MICROPHONE
+            or participant.kind not in _USER_KINDS
+        ):
+            return
+        logger.info(f"🎧 Sharing {participant.identity}'s microphone with {len(self._consumers)} sessions")
+        self._track_sid = publication.sid
+        self._stream = rtc.AudioStream.from_track(
+            track=track,
+            sample_rate=SAMPLE_RATE,
+            num_channels=NUM_CHANNELS,
+            frame_size_ms=FRAME_SIZE_MS,
+            noise_cancellation=self._noise_cancellation,
+        )
+        self._task = asyncio.create_task(self._read(self._stream), name="shared_audio_ingest")
+
+    def _on_track_unsubscribed(
+        self,
+        track: rtc.Track,
+        publication: rtc.RemoteTrackPublication,
+        participant: rtc.RemoteParticipant,
+    ) -> None:
+        if publication.sid == self._track_sid:
+            asyncio.create_task(self._stop_stream())
+
+    async def _read(self, stream: rtc.AudioStream) -> None:
+        async for event in stream:
+            self.push(event.frame)
+
+    async def _stop_stream(self) -> None:
+        task, stream = self._task, self._stream
+        self._task = self._stream = self._track_sid = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if stream is not None:
+            await stream.aclose()
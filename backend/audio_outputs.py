@@ -0,0 +1,305 @@
+"""AudioOutput wrappers that sit between an AgentSession and its avatar's audio output."""
+
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from livekit import rtc
+from livekit.agents import AgentSession
+from livekit.agents.voice import io
+from livekit.agents.voice.avatar import DataStreamAudioOutput
+from livekit.agents.voice.avatar._datastream_io import RPC_PLAYBACK_FINISHED
+
+if TYPE_CHECKING:
+    from playout import PlayoutScheduler
+
+logger = logging.getLogger("audio-outputs")
+
+# Rough OpenAI realtime audio-output token rate, used to account for discarded audio
+AUDIO_TOKENS_PER_SECOND = 20.0
+
+# Seconds between silent keep-alive frames to avatars that aren't speaking (0 = off)
+AVATAR_KEEPALIVE_S = float(os.getenv("AVATAR_KEEPALIVE_S", "0"))
+
+
+class HeldAudioOutput(io.AudioOutput):
+    """Passes frames through to the avatar, or holds them back while ``held``.
+
+    Held frames are kept until ``release`` (they play back to back, with no generation gap)
+    or ``discard`` (they are dropped and the segment is reported as interrupted).
+    """
+
+    def __init__(self, next_in_chain: io.AudioOutput) -> None:
+        super().__init__(next_in_chain=next_in_chain, sample_rate=next_in_chain.sample_rate)
+        self._held = False
+        self._buffer: List[rtc.AudioFrame] = []
+        self._flush_pending = False
+        self._segment_open = False
+        self.held_duration = 0.0
+
+    @property
+    def held(self) -> bool:
+        return self._held
+
+    def hold(self) -> None:
+        self._held = True
+
+    async def release(self) -> None:
+        self._held = False
+        buffer, self._buffer = self._buffer, []
+        self.held_duration = 0.0
+        for frame in buffer:
+            await self._forward(frame)
+        if self._flush_pending:
+            self._flush_pending = False
+            self._forward_flush()
+
+    def discard(self, *, keep_holding: bool = True) -> float:
+        """Drop held audio; returns how many seconds were thrown away.
+
+        The output keeps holding by default, so frames still in flight from a cancelled
+        generation don't leak through to the avatar.
+        """
+        discarded = self.held_duration
+        self._held = keep_holding
+        self._buffer = []
+        self.held_duration = 0.0
+        self._flush_pending = False
+        if self._segment_open:
+            # The avatar never saw this segment, so report its end ourselves
+            self._segment_open = False
+            self.on_playback_finished(playback_position=0.0, interrupted=True)
+        return discarded
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if self._held:
+            self._segment_open = True
+            self._buffer.append(frame)
+            self.held_duration += frame.duration
+            return
+        await self._forward(frame)
+
+    def flush(self) -> None:
+        super().flush()
+        if self._held:
+            self._flush_pending = True
+            return
+        self._forward_flush()
+
+    def clear_buffer(self) -> None:
+        if self._held:
+            self.discard()
+            return
+        self._next_in_chain.clear_buffer()
+
+    def on_playback_finished(self, **kwargs) -> None:
+        self._segment_open = False
+        super().on_playback_finished(**kwargs)
+
+    async def _forward(self, frame: rtc.AudioFrame) -> None:
+        await self._next_in_chain.capture_frame(frame)
+
+    def _forward_flush(self) -> None:
+        self._next_in_chain.flush()
+
+
+class SessionDraft:
+    """A ``generate_reply`` on one persona's session whose audio can be held back."""
+
+    def __init__(
+        self,
+        session: AgentSession,
+        output: HeldAudioOutput,
+        instructions: str,
+        *,
+        held: bool,
+        user_input: Optional[str] = None,
+        scheduler: Optional["PlayoutScheduler"] = None,
+        persona: Optional[str] = None,
+    ):
+        """With a ``scheduler``, ``play`` waits for ``persona``'s turn on it instead of
+        releasing the held audio straight away."""
+        self._output = output
+        self._scheduler = scheduler
+        self._persona = persona
+        if held:
+            output.hold()
+        elif output.held:
+            output.discard(keep_holding=False)
+        if user_input is None:
+            self._handle = session.generate_reply(instructions=instructions)
+        else:
+            self._handle = session.generate_reply(user_input=user_input, instructions=instructions)
+
+    async def play(self) -> None:
+        if self._scheduler is not None:
+            await self._scheduler.play(self._persona)
+            try:
+                await self._handle.wait_for_playout()
+            finally:
+                # A reply without audio never flushes a segment the next host could follow
+                self._scheduler.finished(self._persona)
+            return
+        if self._output.held:
+            await self._output.release()
+        await self._handle.wait_for_playout()
+
+    def cancel(self) -> float:
+        wasted = self._output.discard()
+        if not self._handle.done():
+            self._handle.interrupt()
+        return wasted * AUDIO_TOKENS_PER_SECOND
+
+
+class FirstFrameAudioOutput(io.AudioOutput):
+    """Pass-through that calls ``on_first_frame`` once per playback segment."""
+
+    def __init__(self, next_in_chain: io.AudioOutput, on_first_frame: Callable[[], None]) -> None:
+        super().__init__(next_in_chain=next_in_chain, sample_rate=next_in_chain.sample_rate)
+        self._on_first_frame = on_first_frame
+        self._seen_frame = False
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if not self._seen_frame:
+            self._seen_frame = True
+            self._on_first_frame()
+        await self._next_in_chain.capture_frame(frame)
+
+    def flush(self) -> None:
+        super().flush()
+        self._seen_frame = False
+        self._next_in_chain.flush()
+
+    def clear_buffer(self) -> None:
+        self._seen_frame = False
+        self._next_in_chain.clear_buffer()
+
+
+class ActiveSpeakerAudioOutput(io.AudioOutput):
+    """Routes one session's audio to the avatar of the persona that owns the turn.
+
+    Frames are handed on as they are, never copied. ``route`` takes effect at the next
+    segment boundary, so every frame of a line lands on exactly one avatar. With
+    ``keepalive_interval`` set, idle avatars get one short silent segment every interval.
+    All of them share one preallocated frame.
+    """
+
+    def __init__(
+        self,
+        outputs: Dict[str, io.AudioOutput],
+        *,
+        active: str,
+        keepalive_interval: float = AVATAR_KEEPALIVE_S,
+    ) -> None:
+        if active not in outputs:
+            raise ValueError(f"unknown persona: {active}")
+        first = next(iter(outputs.values()))
+        super().__init__(next_in_chain=None, sample_rate=first.sample_rate)
+        self._outputs = outputs
+        self._owner = self._next_owner = active
+        self._in_segment = False
+        self._keepalive_interval = keepalive_interval
+        self._keepalive_task: Optional[asyncio.Task] = None
+        rate = first.sample_rate or 24000  # avatar outputs take the realtime model's rate
+        self._silence = rtc.AudioFrame.create(rate, 1, rate // 100)  # 10ms
+        # Per output: keep-alive segments whose playback_finished must not reach the session,
+        # and real segments that haven't finished playing
+        self._keepalives_pending = {name: 0 for name in outputs}
+        self._segments_pending = {name: 0 for name in outputs}
+        self.frames_routed = {name: 0 for name in outputs}
+        for name, output in outputs.items():
+            output.on("playback_finished", lambda ev, name=name: self._on_output_finished(name, ev))
+
+    @property
+    def owner(self) -> str:
+        """The persona whose avatar gets the current (or next) segment."""
+        return self._owner
+
+    def route(self, persona: str) -> None:
+        if persona not in self._outputs:
+            raise ValueError(f"unknown persona: {persona}")
+        self._next_owner = persona
+        if not self._in_segment:
+            self._owner = persona
+
+    async def start(self, room: Optional[rtc.Room] = None) -> None:
+        """Wait for every avatar to join and start the keep-alive loop.
+
+        All DataStream outputs register the same playback-finished RPC on the local
+        participant, so only the last one would ever hear back. After they've started,
+        one handler takes over and dispatches by the calling avatar's identity.
+        """
+        streams = {
+            output._destination_identity: output
+            for output in self._outputs.values()
+            if isinstance(output, DataStreamAudioOutput)
+        }
+        await asyncio.gather(*(output.start() for output in streams.values()))
+        if room is not None and len(streams) > 1:
+            room.local_participant.register_rpc_method(
+                RPC_PLAYBACK_FINISHED,
+                lambda data: streams[data.caller_identity]._handle_playback_finished(data)
+                if data.caller_identity in streams
+                else "reject",
+            )
+        if self._keepalive_interval > 0 and self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive(), name="avatar_keepalive")
+
+    async def aclose(self) -> None:
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if not self._in_segment:
+            self._in_segment = True
+            self._owner = self._next_owner
+            self._segments_pending[self._owner] += 1
+        self.frames_routed[self._owner] += 1
+        await self._outputs[self._owner].capture_frame(frame)
+
+    def flush(self) -> None:
+        super().flush()
+        if not self._in_segment:
+            return
+        self._outputs[self._owner].flush()
+        self._in_segment = False
+        self._owner = self._next_owner
+
+    def clear_buffer(self) -> None:
+        self._outputs[self._owner].clear_buffer()
+
+    def on_attached(self) -> None:
+        for output in self._outputs.values():
+            output.on_attached()
+
+    def on_detached(self) -> None:
+        for output in self._outputs.values():
+            output.on_detached()
+
+    def _on_output_finished(self, name: str, ev: io.PlaybackFinishedEvent) -> None:
+        if self._keepalives_pending[name]:
+            self._keepalives_pending[name] -= 1
+            return
+        self._segments_pending[name] = max(0, self._segments_pending[name] - 1)
+        self.on_playback_finished(
+            playback_position=ev.playback_position,
+            interrupted=ev.interrupted,
+            synchronized_transcript=ev.synchronized_transcript,
+        )
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self._keepalive_interval)
+            for name, output in self._outputs.items():
+                # Only avatars with nothing queued, so keep-alive segments never interleave
+                # with a real one and playback_finished events stay in order
+                if name in (self._owner, self._next_owner) or self._segments_pending[name]:
+                    continue
+                self._keepalives_pending[name] += 1
+                await output.capture_frame(self._silence)
+                output.flush()
@@ -0,0 +1,289 @@
+"""One video track for both avatars, composited in the worker.
+
+Without it every viewer subscribes to both Hedra avatars' video, which means two
+downlinks and two decoders per viewer. ``AvatarCompositor`` subscribes to the avatar
+tracks once (LiveKit's ``VideoStream`` decodes them), scales each avatar into its tile
+of a single RGBA canvas and publishes that canvas as the ``avatars`` track. Viewers are
+then unsubscribed from the individual avatar tracks through the room service.
+
+Two layouts (``COMPOSITOR_LAYOUT``):
+
+- ``side-by-side``: each avatar fills half the canvas
+- ``speaker``: the persona holding the floor fills the middle, the other one is a
+  thumbnail in the corner
+
+Scaling is a nearest-neighbour gather with precomputed indices. The canvas, the
+published frame and each tile's scratch buffer are allocated once, so composing a frame
+allocates no pixel buffers. Tiles whose avatar sent nothing new are not redrawn, unless a
+tile under them was: the speaker is drawn first and the thumbnail over it.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from livekit import rtc
+
+from avatar_idle import RoomSubscriptions
+
+logger = logging.getLogger("avatar-compositor")
+
+AVATAR_COMPOSITOR = os.getenv("AVATAR_COMPOSITOR", "0") == "1"
+COMPOSITOR_LAYOUT = os.getenv("COMPOSITOR_LAYOUT", "side-by-side")
+COMPOSITOR_WIDTH = int(os.getenv("COMPOSITOR_WIDTH", "1280"))
+COMPOSITOR_HEIGHT = int(os.getenv("COMPOSITOR_HEIGHT", "720"))
+COMPOSITOR_FPS = float(os.getenv("COMPOSITOR_FPS", "25"))
+
+LAYOUTS = ("side-by-side", "speaker")
+THUMBNAIL_SCALE = 1 / 3  # of the canvas height, in the speaker layout
+THUMBNAIL_MARGIN = 24
+
+_VIEWER_KINDS = (
+    rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD,
+    rtc.ParticipantKind.PARTICIPANT_KIND_SIP,
+)
+
+Rect = Tuple[int, int, int, int]  # x, y, width, height
+
+
+def layout_tiles(layout: str, personas: List[str], active: str, size: Tuple[int, int]) -> Dict[str, Rect]:
+    """The area of the canvas each persona's avatar may use."""
+    width, height = size
+    if layout == "side-by-side":
+        tile = width // len(personas)
+        return {persona: (i * tile, 0, tile, height) for i, persona in enumerate(personas)}
+    if layout == "speaker":
+        thumb = int(height * THUMBNAIL_SCALE)
+        tiles = {active: (0, 0, width, height)}
+        others = [persona for persona in personas if persona != active]
+        for i, persona in enumerate(others):
+            x = width - (i + 1) * (thumb + THUMBNAIL_MARGIN)
+            tiles[persona] = (x, height - thumb - THUMBNAIL_MARGIN, thumb, thumb)
+        return tiles
+    raise ValueError(f"COMPOSITOR_LAYOUT must be one of {LAYOUTS}, got {layout!r}")
+
+
+def fit(src_size: Tuple[int, int], area: Rect) -> Rect:
+    """The largest rect with the source's aspect ratio, centred in ``area``."""
+    src_w, src_h = src_size
+    x, y, w, h = area
+    scale = min(w / src_w, h / src_h)
+    fit_w, fit_h = max(1, int(src_w * scale)), max(1, int(src_h * scale))
+    return x + (w - fit_w) // 2, y + (h - fit_h) // 2, fit_w, fit_h
+
+
+def _overlaps(a: Rect, b: Rect) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+@lru_cache(maxsize=32)
+def _gather_index(src_w: int, src_h: int, dst_w: int, dst_h: int) -> np.ndarray:
+    # Flat source pixel for every destination pixel (nearest neighbour, pixel centres)
+    rows = ((np.arange(dst_h) + 0.5) * src_h / dst_h).astype(np.intp)
+    cols = ((np.arange(dst_w) + 0.5) * src_w / dst_w).astype(np.intp)
+    return rows[:, None] * src_w + cols[None, :]
+
+
+@dataclass
+class _Tile:
+    rect: Rect
+    src_size: Tuple[int, int]
+    index: np.ndarray
+    scratch: np.ndarray  # np.take can only gather into a contiguous array without a temporary
+
+
+@dataclass
+class CompositorStats:
+    frames: int = 0  # canvases published
+    tiles_drawn: int = 0
+    tiles_skipped: int = 0  # the avatar sent no new frame since the last draw
+
+
+class AvatarCompositor:
+    """Composites the latest frame of each persona's avatar into one canvas.
+
+    ``avatars`` maps persona to the avatar's participant identity in the room.
+    """
+
+    def __init__(
+        self,
+        avatars: Dict[str, str],
+        *,
+        active: str,
+        layout: str = COMPOSITOR_LAYOUT,
+        size: Tuple[int, int] = (COMPOSITOR_WIDTH, COMPOSITOR_HEIGHT),
+        fps: float = COMPOSITOR_FPS,
+    ):
+        if layout not in LAYOUTS:
+            raise ValueError(f"COMPOSITOR_LAYOUT must be one of {LAYOUTS}, got {layout!r}")
+        self._avatars = avatars
+        self._personas = list(avatars)
+        self._layout = layout
+        self._size = size
+        self._interval = 1 / fps
+        self._active = active
+        self._areas = layout_tiles(layout, self._personas, active, size)
+        self._tiles: Dict[str, _Tile] = {}
+        self._latest: Dict[str, Optional[rtc.VideoFrame]] = {persona: None for persona in avatars}
+        self._drawn: Dict[str, Optional[rtc.VideoFrame]] = {persona: None for persona in avatars}
+        self._dirty = True
+        self.stats = CompositorStats()
+
+        width, height = size
+        # The published frame wraps the canvas' own buffer, so nothing is copied to publish it
+        buffer = bytearray(width * height * 4)
+        self._canvas = np.frombuffer(buffer, dtype=np.uint32).reshape(height, width)
+        self.frame = rtc.VideoFrame(width, height, rtc.VideoBufferType.RGBA, buffer)
+
+        self._room: Optional[rtc.Room] = None
+        self._subscriptions: Optional[RoomSubscriptions] = None
+        self._source: Optional[rtc.VideoSource] = None
+        self._avatar_sids: Dict[str, str] = {}  # video track sid -> persona
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def active(self) -> str:
+        return self._active
+
+    def set_active(self, persona: str) -> None:
+        if persona not in self._avatars:
+            raise ValueError(f"unknown persona: {persona}")
+        if persona == self._active:
+            return
+        self._active = persona
+        if self._layout == "speaker":
+            self._areas = layout_tiles(self._layout, self._personas, persona, self._size)
+            self._tiles.clear()
+            self._dirty = True
+
+    def update(self, persona: str, frame: rtc.VideoFrame) -> None:
+        """Latest RGBA frame from ``persona``'s avatar; only the newest one is drawn."""
+        self._latest[persona] = frame
+
+    def compose(self) -> bool:
+        """Draw what changed into ``frame``; False if nothing did."""
+        if self._dirty:
+            self._canvas.fill(0)
+            self._drawn = {persona: None for persona in self._avatars}
+            self._dirty = False
+        changed = False
+        redrawn: List[Rect] = []
+        # The active persona first, so the speaker layout's thumbnails end up on top of it
+        for persona in sorted(self._personas, key=lambda p: p != self._active):
+            frame = self._latest[persona]
+            tile = self._tiles.get(persona)
+            covered = tile is not None and any(_overlaps(tile.rect, rect) for rect in redrawn)
+            if frame is None or (frame is self._drawn[persona] and not covered):
+                self.stats.tiles_skipped += 1
+                continue
+            self._draw(persona, frame)
+            redrawn.append(self._tiles[persona].rect)
+            self._drawn[persona] = frame
+            self.stats.tiles_drawn += 1
+            changed = True
+        if changed:
+            self.stats.frames += 1
+        return changed
+
+    async def start(self, room: rtc.Room, subscriptions: Optional[RoomSubscriptions] = None) -> None:
+        """Publish the composite track and take viewers off the individual avatar tracks."""
+        self._room = room
+        self._subscriptions = subscriptions
+        width, height = self._size
+        self._source = rtc.VideoSource(width, height)
+        track = rtc.LocalVideoTrack.create_video_track("avatars", self._source)
+        await room.local_participant.publish_track(
+            track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_CAMERA)
+        )
+        room.on("track_subscribed", self._on_track_subscribed)
+        room.on("participant_connected", self._on_participant_connected)
+        for participant in room.remote_participants.values():
+            for publication in participant.track_publications.values():
+                if publication.track is not None and publication.subscribed:
+                    self._on_track_subscribed(publication.track, publication, participant)
+        self._tasks.append(asyncio.create_task(self._publish_loop(), name="avatar_compositor"))
+        logger.info(f"🎬 Compositing {', '.join(self._personas)} into one {width}x{height} track ({self._layout})")
+
+    async def aclose(self) -> None:
+        if self._room is not None:
+            self._room.off("track_subscribed", self._on_track_subscribed)
+            self._room.off("participant_connected", self._on_participant_connected)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._source is not None:
+            await self._source.aclose()
+
+    def _draw(self, persona: str, frame: rtc.VideoFrame) -> None:
+        src_size = (frame.width, frame.height)
+        tile = self._tiles.get(persona)
+        if tile is None or tile.src_size != src_size:
+            rect = fit(src_size, self._areas[persona])
+            if tile is not None:
+                self._clear(tile.rect)
+            tile = self._tiles[persona] = _Tile(
+                rect=rect,
+                src_size=src_size,
+                index=_gather_index(frame.width, frame.height, rect[2], rect[3]),
+                scratch=np.empty((rect[3], rect[2]), dtype=np.uint32),
+            )
+        pixels = np.frombuffer(frame.data, dtype=np.uint32)
+        np.take(pixels, tile.index, out=tile.scratch, mode="clip")
+        x, y, w, h = tile.rect
+        self._canvas[y : y + h, x : x + w] = tile.scratch
+
+    def _clear(self, rect: Rect) -> None:
+        x, y, w, h = rect
+        self._canvas[y : y + h, x : x + w] = 0
+
+    async def _publish_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_at = loop.time()
+        while True:
+            if self.compose():
+                self._source.capture_frame(self.frame)
+            next_at += self._interval
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+    async def _read(self, persona: str, track: rtc.Track) -> None:
+        stream = rtc.VideoStream(track, format=rtc.VideoBufferType.RGBA)
+        try:
+            async for event in stream:
+                self.update(persona, event.frame)
+        finally:
+            await stream.aclose()
+
+    def _on_track_subscribed(
+        self,
+        track: rtc.Track,
+        publication: rtc.RemoteTrackPublication,
+        participant: rtc.RemoteParticipant,
+    ) -> None:
+        persona = next((p for p, identity in self._avatars.items() if identity == participant.identity), None)
+        if persona is None or publication.kind != rtc.TrackKind.KIND_VIDEO:
+            return
+        self._avatar_sids[publication.sid] = persona
+        self._tasks.append(asyncio.create_task(self._read(persona, track), name=f"compositor_{persona}"))
+        for viewer in self._viewers():
+            self._unsubscribe(viewer, [publication.sid])
+
+    def _on_participant_connected(self, participant: rtc.RemoteParticipant) -> None:
+        if participant.identity in self._viewers() and self._avatar_sids:
+            self._unsubscribe(participant.identity, list(self._avatar_sids))
+
+    def _viewers(self) -> List[str]:
+        return [
+            p.identity
+            for p in self._room.remote_participants.values()
+            if p.kind in _VIEWER_KINDS and p.identity not in self._avatars.values()
+        ]
+
+    def _unsubscribe(self, viewer: str, track_sids: List[str]) -> None:
+        if self._subscriptions is not None:
+            asyncio.create_task(self._subscriptions.set_subscribed(viewer, track_sids, False))
@@ -0,0 +1,300 @@
+"""Idle mode for the host that isn't speaking: saves viewers' bandwidth, not rendering.
+
+Hedra renders every avatar remotely for as long as its session is open, and bills for
+it. The Hedra plugin has no way to pause a session, and restarting one takes seconds.
+So suspension happens on our side of the room: viewers are unsubscribed from the idle
+avatar's video through the room service, while Hedra keeps rendering it. Resuming
+re-subscribes the viewers. The budget for that is ``RESUME_BUDGET_MS``, and each resume
+is recorded as an ``avatar_resume`` span.
+
+With ``stills``, a cached frame from ``backend/assets`` is published at a low frame rate
+while its avatar is unsubscribed. It goes out as the agent's own ``<persona>_idle``
+camera track, so viewers see it as a tile of its own, not in the avatar's tile.
+
+Per room and per avatar, the suspender counts the seconds viewers were subscribed to
+and unsubscribed from the avatar's video. They are logged as one JSON line when the
+room closes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+from livekit import api, rtc
+
+from tracing import Tracer, get_tracer
+
+logger = logging.getLogger("avatar-idle")
+
+IDLE_AVATARS = os.getenv("IDLE_AVATARS", "0") == "1"
+# Hold off suspending for a moment, so quick back-and-forth doesn't flap subscriptions
+IDLE_AVATAR_DELAY_S = float(os.getenv("IDLE_AVATAR_DELAY_S", "1.5"))
+IDLE_AVATAR_FPS = float(os.getenv("IDLE_AVATAR_FPS", "2"))
+RESUME_BUDGET_MS = 200.0
+
+_VIEWER_KINDS = (
+    rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD,
+    rtc.ParticipantKind.PARTICIPANT_KIND_SIP,
+)
+
+
+@lru_cache(maxsize=8)
+def load_still(path: str, size: Tuple[int, int] = (512, 512)) -> rtc.VideoFrame:
+    """Decode and scale an image once; every idle frame after that is the same object."""
+    from PIL import Image  # only needed when idle avatars are enabled
+
+    with Image.open(path) as image:
+        rgba = image.convert("RGBA").resize(size)
+        return rtc.VideoFrame(size[0], size[1], rtc.VideoBufferType.RGBA, rgba.tobytes())
+
+
+class StillVideo:
+    """A local video track that loops one cached frame while ``playing``, muted otherwise."""
+
+    def __init__(self, name: str, frame: rtc.VideoFrame, *, fps: float = IDLE_AVATAR_FPS):
+        self._frame = frame
+        self._interval = 1 / fps
+        self._source = rtc.VideoSource(frame.width, frame.height)
+        self.track = rtc.LocalVideoTrack.create_video_track(name, self._source)
+        self.track.mute()
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, room: rtc.Room) -> None:
+        await room.local_participant.publish_track(
+            self.track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_CAMERA)
+        )
+
+    @property
+    def playing(self) -> bool:
+        return self._task is not None
+
+    def play(self) -> None:
+        if self._task is None:
+            self.track.unmute()
+            self._task = asyncio.create_task(self._loop(), name=f"still_{self.track.name}")
+
+    def pause(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self.track.mute()
+
+    async def _loop(self) -> None:
+        while True:
+            self._source.capture_frame(self._frame)
+            await asyncio.sleep(self._interval)
+
+
+class SubscriptionControl(Protocol):
+    async def set_subscribed(self, viewer: str, track_sids: List[str], subscribed: bool) -> None: ...
+
+
+class RoomSubscriptions:
+    """Server-side subscription changes through the LiveKit room service."""
+
+    def __init__(self, lkapi: api.LiveKitAPI, room_name: str):
+        self._api = lkapi
+        self._room_name = room_name
+
+    async def set_subscribed(self, viewer: str, track_sids: List[str], subscribed: bool) -> None:
+        await self._api.room.update_subscriptions(
+            api.UpdateSubscriptionsRequest(
+                room=self._room_name, identity=viewer, track_sids=track_sids, subscribe=subscribed
+            )
+        )
+
+
+@dataclass
+class AvatarUsage:
+    subscribed_s: float = 0.0
+    unsubscribed_s: float = 0.0
+    resumes: int = 0
+    resume_ms: List[float] = field(default_factory=list)
+    over_budget: int = 0  # resumes slower than RESUME_BUDGET_MS
+
+
+class AvatarSuspender:
+    """Suspends every avatar except the speaker's, ``delay`` seconds after the floor moves.
+
+    ``avatars`` maps persona to the avatar's participant identity in ``room``.
+    """
+
+    def __init__(
+        self,
+        room: Any,
+        avatars: Dict[str, str],
+        subscriptions: SubscriptionControl,
+        *,
+        stills: Optional[Dict[str, StillVideo]] = None,
+        delay: float = IDLE_AVATAR_DELAY_S,
+        tracer: Optional[Tracer] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._room = room
+        self._avatars = avatars
+        self._subscriptions = subscriptions
+        self._stills = stills or {}
+        self._delay = delay
+        self._tracer = tracer or get_tracer()
+        self._clock = clock
+        self._suspended = {persona: False for persona in avatars}
+        self._since = {persona: clock() for persona in avatars}
+        self._usage = {persona: AvatarUsage() for persona in avatars}
+        self._speaker: Optional[str] = None
+        self._pending: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def suspended(self, persona: str) -> bool:
+        return self._suspended[persona]
+
+    async def start(self) -> None:
+        """Publish the idle stills (muted until used) and watch for viewers joining."""
+        await asyncio.gather(*(still.publish(self._room) for still in self._stills.values()))
+
+        def on_participant_connected(participant: rtc.RemoteParticipant) -> None:
+            if participant.kind in _VIEWER_KINDS and participant.identity not in self._avatars.values():
+                asyncio.create_task(self.viewer_joined(participant.identity))
+
+        def on_track_published(publication: rtc.RemoteTrackPublication, participant: rtc.RemoteParticipant) -> None:
+            # An avatar that (re)publishes while suspended would otherwise reach every viewer
+            persona = self._persona_of(participant.identity)
+            if persona and self._suspended[persona] and publication.kind == rtc.TrackKind.KIND_VIDEO:
+                asyncio.create_task(self._set_video(persona, subscribed=False))
+
+        self._room.on("participant_connected", on_participant_connected)
+        self._room.on("track_published", on_track_published)
+
+    async def set_speaker(self, persona: str) -> None:
+        """Resume ``persona`` now and schedule the others' suspension."""
+        self._speaker = persona
+        if self._pending is not None:
+            self._pending.cancel()
+        await self.resume(persona)
+        self._pending = asyncio.create_task(self._suspend_others_later(persona))
+
+    def speaker_hint(self, persona: str) -> None:
+        """Non-blocking ``set_speaker``, for event callbacks (e.g. audio reaching an avatar)."""
+        if persona != self._speaker or self._suspended[persona]:
+            asyncio.create_task(self.set_speaker(persona))
+
+    async def resume(self, persona: str) -> None:
+        async with self._lock:
+            if not self._suspended[persona]:
+                return
+            started = self._clock()
+            with self._tracer.span("avatar_resume", getattr(self._room, "name", ""), persona=persona):
+                await self._set_video(persona, subscribed=True)
+            elapsed_ms = (self._clock() - started) * 1000
+            self._mark(persona, suspended=False)
+            usage = self._usage[persona]
+            usage.resumes += 1
+            usage.resume_ms.append(elapsed_ms)
+            if elapsed_ms > RESUME_BUDGET_MS:
+                usage.over_budget += 1
+                logger.warning(f"Resuming {persona}'s avatar took {elapsed_ms:.0f}ms (budget {RESUME_BUDGET_MS:.0f}ms)")
+
+    async def suspend(self, persona: str) -> None:
+        async with self._lock:
+            if self._suspended[persona]:
+                return
+            await self._set_video(persona, subscribed=False)
+            self._mark(persona, suspended=True)
+            logger.info(f"😴 {persona}'s avatar suspended")
+
+    async def viewer_joined(self, viewer: str) -> None:
+        """New viewers auto-subscribe to everything; take the suspended avatars back off."""
+        for persona, suspended in self._suspended.items():
+            if suspended:
+                sids = self._video_sids(persona)
+                if sids:
+                    await self._subscriptions.set_subscribed(viewer, sids, False)
+
+    def usage(self) -> Dict[str, AvatarUsage]:
+        """Usage so far, including the state each avatar is in right now."""
+        now = self._clock()
+        for persona in self._avatars:
+            self._account(persona, now)
+        return self._usage
+
+    def summary(self) -> Dict[str, Any]:
+        usage = self.usage()
+        subscribed = sum(u.subscribed_s for u in usage.values())
+        unsubscribed = sum(u.unsubscribed_s for u in usage.values())
+        resume_ms = sorted(ms for u in usage.values() for ms in u.resume_ms)
+        return {
+            "subscribed_s": subscribed,
+            "unsubscribed_s": unsubscribed,
+            "unsubscribed_ratio": unsubscribed / (subscribed + unsubscribed) if subscribed + unsubscribed else 0.0,
+            "resumes": len(resume_ms),
+            "resume_max_ms": resume_ms[-1] if resume_ms else 0.0,
+            "over_budget": sum(u.over_budget for u in usage.values()),
+        }
+
+    async def aclose(self) -> None:
+        if self._pending is not None:
+            self._pending.cancel()
+        for still in self._stills.values():
+            still.pause()
+        logger.info(
+            json.dumps(
+                {
+                    "event": "avatar_subscriptions",
+                    "room": getattr(self._room, "name", ""),
+                    **self.summary(),
+                    "avatars": {persona: asdict(u) for persona, u in self._usage.items()},
+                }
+            )
+        )
+
+    async def _suspend_others_later(self, speaker: str) -> None:
+        await asyncio.sleep(self._delay)
+        for persona in self._avatars:
+            if persona != speaker:
+                await self.suspend(persona)
+
+    async def _set_video(self, persona: str, *, subscribed: bool) -> None:
+        sids = self._video_sids(persona)
+        viewers = [
+            p.identity
+            for p in self._room.remote_participants.values()
+            if p.kind in _VIEWER_KINDS and p.identity not in self._avatars.values()
+        ]
+        if sids and viewers:
+            await asyncio.gather(*(self._subscriptions.set_subscribed(v, sids, subscribed) for v in viewers))
+        still = self._stills.get(persona)
+        if still is None:
+            return
+        if subscribed:
+            still.pause()
+        else:
+            still.play()
+
+    def _persona_of(self, identity: str) -> Optional[str]:
+        return next((persona for persona, avatar in self._avatars.items() if avatar == identity), None)
+
+    def _video_sids(self, persona: str) -> List[str]:
+        avatar = self._room.remote_participants.get(self._avatars[persona])
+        if avatar is None:
+            return []
+        return [
+            sid
+            for sid, publication in avatar.track_publications.items()
+            if publication.kind == rtc.TrackKind.KIND_VIDEO
+        ]
+
+    def _account(self, persona: str, now: float) -> None:
+        elapsed = now - self._since[persona]
+        if self._suspended[persona]:
+            self._usage[persona].unsubscribed_s += elapsed
+        else:
+            self._usage[persona].subscribed_s += elapsed
+        self._since[persona] = now
+
+    def _mark(self, persona: str, *, suspended: bool) -> None:
+        self._account(persona, self._clock())
+        self._suspended[persona] = suspended
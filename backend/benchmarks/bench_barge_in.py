@@ -0,0 +1,126 @@
+"""Interrupt-to-silence when the viewer talks over the hosts, with and without the controller.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_barge_in --rooms 3 --check
+
+Both layouts run in ``benchmarks.sim``: two sessions with an avatar each
+(``dual_agent_worker``, with speculative replies on) and one session routed to two
+avatars (``dual_avatar_simple``). The viewer says one line, then keeps cutting in
+``--barge-after`` seconds after finishing the previous one, while the answer is playing.
+
+Each session hears the viewer after its own server-side VAD delay and stops its own
+speech then. Interrupt-to-silence runs from the first session hearing the viewer to the
+last audible sample of anything started before the viewer finished. That includes a
+host still talking because its session hasn't heard yet, and a reply that was queued
+behind the interrupted one. Audio ends when the avatar is told to drop it (the sink
+doesn't model the clear RPC's round trip). Barge-ins while every host was already quiet
+don't count.
+Each layout runs with ``BARGE_IN`` off, then on. ``--check`` fails unless p95 is under
+``--budget-ms`` with it on, in both layouts.
+"""
+
+import os
+
+os.environ.setdefault("SPECULATIVE_REPLIES", "1")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import importlib  # noqa: E402
+import logging  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+from typing import Dict, List  # noqa: E402
+
+from benchmarks.bench_entrypoints import ENTRY_POINTS, _audible, run_room  # noqa: E402
+from benchmarks.common import report, summarize  # noqa: E402
+from benchmarks.sim import ScriptedUser, SimJobContext, SimProfile, SimRoom, patch_module  # noqa: E402
+
+LAYOUTS = {
+    "two sessions": "dual_agent_worker",
+    "one session": "dual_avatar_simple",
+}
+
+
+def _interrupt_to_silence(room: SimRoom, user: ScriptedUser) -> List[float]:
+    """Seconds from each barge-in being heard to the last stale audible sample."""
+    segments = _audible(room)
+    results = []
+    # The first line starts the conversation; every later one cuts into an answer
+    for start, end in list(zip(user.utterance_starts, user.utterance_ends))[1:]:
+        heard = [at for at in room.speech_detected if start <= at <= end]
+        if not heard:
+            continue
+        signal = min(heard)
+        stale = [seg_end for seg_start, seg_end, _ in segments if seg_start < end and seg_end > signal]
+        if stale:
+            results.append(max(stale) - signal)
+    return results
+
+
+async def _room(module_name: str, index: int, profile: SimProfile, args: argparse.Namespace) -> List[float]:
+    rng = random.Random(args.seed + index)
+    ctx = SimJobContext(SimRoom(f"barge-{module_name}-{index}"), profile, rng, metadata=ENTRY_POINTS[module_name])
+    lines = [(args.pause, "what are we cooking today", 1.0)]
+    lines += [(args.barge_after, f"wait, one more thing {i}", 1.0) for i in range(args.barge_ins)]
+    user = ScriptedUser(lines=lines)
+    await run_room(sys.modules[module_name], ctx, user, startup_timeout=args.startup_timeout, settle=args.settle)
+    return _interrupt_to_silence(ctx.room, user)
+
+
+async def _run(module_name: str, barge_in: bool, args: argparse.Namespace) -> List[float]:
+    module = sys.modules[module_name]
+    module.BARGE_IN = barge_in
+    profile = SimProfile()
+    rooms = await asyncio.gather(*(_room(module_name, i, profile, args) for i in range(args.rooms)))
+    return [value for room in rooms for value in room]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=3, help="rooms per layout and setting")
+    parser.add_argument("--barge-ins", type=int, default=6, help="times the viewer cuts in per room")
+    parser.add_argument("--barge-after", type=float, default=1.2, help="seconds after the previous line")
+    parser.add_argument("--pause", type=float, default=5.0, help="seconds before the first line")
+    parser.add_argument("--settle", type=float, default=3.0)
+    parser.add_argument("--startup-timeout", type=float, default=10.0)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if p95 is over budget with BARGE_IN on")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    for module_name in LAYOUTS.values():
+        patch_module(importlib.import_module(module_name), SimProfile(), random.Random(args.seed))
+    # Some entry modules configure INFO logging when imported, and log every turn
+    logging.disable(logging.INFO)
+
+    runs: Dict[str, Dict[str, List[float]]] = {}
+    for layout, module_name in LAYOUTS.items():
+        runs[layout] = {
+            setting: asyncio.run(_run(module_name, setting == "on", args)) for setting in ("off", "on")
+        }
+
+    results = {
+        f"{layout} ({module_name}), BARGE_IN={setting}": summarize([value * 1000 for value in runs[layout][setting]])
+        for layout, module_name in LAYOUTS.items()
+        for setting in ("off", "on")
+    }
+    report("interrupt to silence (ms)", results, as_json=args.json)
+
+    if args.check:
+        failures = []
+        for layout in LAYOUTS:
+            summary = summarize([value * 1000 for value in runs[layout]["on"]])
+            if not summary["n"]:
+                failures.append(f"{layout}: the viewer never cut in on a host")
+            elif summary["p95"] >= args.budget_ms:
+                failures.append(f"{layout}: p95 {summary['p95']:.1f}ms >= {args.budget_ms}ms")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
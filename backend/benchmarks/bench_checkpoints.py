@@ -0,0 +1,214 @@
+"""Checkpoint write cost per turn, and how fast a restarted job picks its show back up.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_checkpoints --turns 2000 --check
+
+Write cost: a ``ConversationMemory`` with the default window and summary budget takes
+``--turns`` turns of ``--turn-chars`` characters each, once on its own and once tracked
+by a ``RoomCheckpoint``. Each ``add`` is timed, compactions included. The file size is
+read after every turn; compaction should keep it bounded however long the show runs.
+
+Cold resume: reading a checkpoint (``open_checkpoint``) left by shows of several lengths.
+Then ``agent_worker`` and ``dual_agent_orchestrated`` run a show in ``benchmarks.sim``
+for ``--lines`` viewer lines, the job stops the way a worker restart stops it, and a new
+job starts in a room of the same name. Its time to first audible speech is reported next
+to the fresh room's, with the same latency draws for both jobs. ``--check`` fails if a
+checkpointed turn's p95 is over ``--budget-us``, the file outgrows ``--max-kb``, a
+restarted room opens with anything other than the resume or starts its turns over, or its
+first audio's p50 comes more than ``--resume-slack`` later than the fresh room's.
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.bench_entrypoints import ENTRY_POINTS, run_room
+from benchmarks.common import report, summarize
+from benchmarks.sim import ScriptedUser, SimJobContext, SimProfile, SimRoom, patch_module
+from checkpoints import RESUME_INSTRUCTIONS, RoomCheckpoint, checkpoint_path, open_checkpoint, read_checkpoint
+from conversation_memory import ConversationMemory
+
+RESUMED_ENTRY_POINTS = ("agent_worker", "dual_agent_orchestrated")
+SHOW_LENGTHS = (10, 100, 1000)
+
+
+def _line(rng: random.Random, chars: int) -> str:
+    words = ["fo", "shizzle", "garnish", "the", "basil", "neffew", "it's", "a", "good", "thing"]
+    text = ""
+    while len(text) < chars:
+        text += rng.choice(words) + (". " if rng.random() < 0.1 else " ")
+    return text[:chars]
+
+
+def _write_cost(args: argparse.Namespace, directory: str) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    speakers = ["martha", "user", "snoop", "user"]
+    lines = [(speakers[i % len(speakers)], _line(rng, args.turn_chars)) for i in range(args.turns)]
+
+    def run(checkpointed: bool) -> Dict[str, Any]:
+        memory = ConversationMemory()
+        checkpoint = None
+        if checkpointed:
+            checkpoint = RoomCheckpoint(os.path.join(directory, "write-cost.ckpt"), fsync=args.fsync)
+            checkpoint.track(memory, lambda: {"current_speaker": speaker, "turn_count": memory.turn_count})
+        costs: List[float] = []
+        sizes: List[int] = []
+        for speaker, text in lines:
+            started = time.perf_counter()
+            memory.add(speaker, text)
+            costs.append((time.perf_counter() - started) * 1e6)
+            if checkpoint is not None:
+                sizes.append(os.path.getsize(checkpoint.path))
+        result: Dict[str, Any] = {"costs": costs}
+        if checkpoint is not None:
+            result.update(
+                sizes=sizes,
+                bytes_per_turn=checkpoint.bytes_written / len(lines),
+                compactions=checkpoint.compactions,
+            )
+        return result
+
+    return {"plain": run(False), "checkpointed": run(True)}
+
+
+def _read_cost(args: argparse.Namespace, directory: str) -> Dict[int, List[float]]:
+    """Milliseconds to open a checkpoint left by a show of each length."""
+    rng = random.Random(args.seed)
+    results = {}
+    for length in SHOW_LENGTHS:
+        timings = []
+        for i in range(args.reads):
+            room = f"show-{length}-{i}"
+            memory = ConversationMemory()
+            checkpoint = RoomCheckpoint(checkpoint_path(room, directory))
+            checkpoint.track(memory, lambda: {"current_speaker": "snoop", "conversation_started": True})
+            for turn in range(length):
+                memory.add(("snoop", "user", "martha")[turn % 3], _line(rng, args.turn_chars))
+            asyncio.run(checkpoint.aclose("worker restart"))
+            started = time.perf_counter()
+            resumed = open_checkpoint(room, directory)
+            timings.append((time.perf_counter() - started) * 1000)
+            if resumed is None or resumed.resumed is None or resumed.resumed.next_index != length:
+                raise RuntimeError(f"a {length}-turn show didn't resume from its checkpoint")
+        results[length] = timings
+    return results
+
+
+async def _restart(name: str, index: int, profile: SimProfile, args: argparse.Namespace) -> Dict[str, Any]:
+    module = sys.modules[name]
+    room_name = f"restart-{name}-{index}"
+    runs = []
+    for job in range(2):
+        # The same latency draws for both jobs, so fresh and resumed differ only in what they do
+        rng = random.Random(args.seed + index)
+        patch_module(module, profile, random.Random(args.seed + index))
+        ctx = SimJobContext(SimRoom(room_name), profile, rng, metadata=ENTRY_POINTS[name])
+        lines = [(args.pause, f"line {i} for the hosts", 1.0) for i in range(args.lines if job == 0 else 1)]
+        result = await run_room(module, ctx, ScriptedUser(lines=lines), startup_timeout=args.startup_timeout, settle=args.settle)
+        state = read_checkpoint(checkpoint_path(room_name, os.environ["CHECKPOINT_DIR"]))
+        requested = [instructions for instructions in ctx.room.reply_instructions if instructions]
+        runs.append(
+            {
+                "startup": result["startup"],
+                "first_instructions": requested[0] if requested else None,
+                "next_index": state.next_index if state else 0,
+            }
+        )
+    fresh, resumed = runs
+    return {
+        "fresh": fresh["startup"],
+        "resumed": resumed["startup"],
+        "opened_with_resume": resumed["first_instructions"] == RESUME_INSTRUCTIONS,
+        "turns_continued": resumed["next_index"] > fresh["next_index"] > 0,
+    }
+
+
+async def _cold_resume(args: argparse.Namespace) -> Dict[str, List[Dict[str, Any]]]:
+    profile = SimProfile()
+    for name in RESUMED_ENTRY_POINTS:
+        importlib.import_module(name)
+    # Some entry modules configure INFO logging when imported, and log every turn
+    logging.disable(logging.INFO)
+    # One room at a time: each job re-patches its module's models and avatars with the seed
+    # its fresh run had, which concurrent rooms would draw from in between
+    runs: Dict[str, List[Dict[str, Any]]] = {}
+    for name in RESUMED_ENTRY_POINTS:
+        runs[name] = [await _restart(name, i, profile, args) for i in range(args.rooms)]
+    return runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000, help="turns in the write-cost show")
+    parser.add_argument("--turn-chars", type=int, default=240, help="characters per turn")
+    parser.add_argument("--reads", type=int, default=20, help="checkpoints opened per show length")
+    parser.add_argument("--rooms", type=int, default=2, help="restarted rooms per entry point")
+    parser.add_argument("--lines", type=int, default=3, help="viewer lines before the restart")
+    parser.add_argument("--pause", type=float, default=5.0)
+    parser.add_argument("--settle", type=float, default=3.0)
+    parser.add_argument("--startup-timeout", type=float, default=10.0)
+    parser.add_argument("--fsync", action="store_true", help="sync every record to disk (CHECKPOINT_FSYNC=1)")
+    parser.add_argument("--budget-us", type=float, default=200.0)
+    parser.add_argument("--max-kb", type=float, default=64.0)
+    parser.add_argument("--resume-slack", type=float, default=0.1, help="seconds a resume may take over a fresh start")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if writes are over budget or a room doesn't resume")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="bench-checkpoints-") as directory:
+        writes = _write_cost(args, directory)
+        reads = _read_cost(args, directory)
+    restarts = asyncio.run(_cold_resume(args))
+
+    checkpointed = writes["checkpointed"]
+    results: Dict[str, Any] = {
+        "turn, no checkpoint (us)": summarize(writes["plain"]["costs"]),
+        "turn, checkpointed (us)": summarize(checkpointed["costs"]),
+        "bytes written per turn": round(checkpointed["bytes_per_turn"], 1),
+        "compactions": checkpointed["compactions"],
+        "file size (KB)": summarize([size / 1024 for size in checkpointed["sizes"]]),
+    }
+    for length, timings in reads.items():
+        results[f"open after {length} turns (ms)"] = summarize(timings)
+    for name, rooms in restarts.items():
+        results[f"{name} fresh, first audio (s)"] = summarize([value for room in rooms for value in room["fresh"]])
+        results[f"{name} resumed, first audio (s)"] = summarize([value for room in rooms for value in room["resumed"]])
+    report(f"room checkpoints over a {args.turns}-turn show", results, as_json=args.json)
+
+    if args.check:
+        failures = []
+        p95 = summarize(checkpointed["costs"])["p95"]
+        if p95 > args.budget_us:
+            failures.append(f"checkpointed turn p95 {p95:.1f}us > {args.budget_us}us")
+        largest = max(checkpointed["sizes"]) / 1024
+        if largest > args.max_kb:
+            failures.append(f"checkpoint grew to {largest:.1f}KB > {args.max_kb}KB")
+        for name, rooms in restarts.items():
+            if not all(room["opened_with_resume"] for room in rooms):
+                failures.append(f"{name}: a restarted room didn't open with the resume")
+            if not all(room["turns_continued"] for room in rooms):
+                failures.append(f"{name}: a restarted room started its turns over")
+            if not all(room["resumed"] for room in rooms):
+                failures.append(f"{name}: a restarted room stayed silent")
+                continue
+            fresh = results[f"{name} fresh, first audio (s)"]["p50"]
+            resumed = results[f"{name} resumed, first audio (s)"]["p50"]
+            if resumed > fresh + args.resume_slack:
+                failures.append(f"{name}: resumed first audio p50 {resumed:.2f}s > fresh {fresh:.2f}s")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Throughput of the avatar compositor at 720p, in composited frames per second per core.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_compositor --frames 500
+    python -m benchmarks.bench_compositor --source 1280x720 --check
+
+Each avatar cycles through a few synthetic RGBA frames of ``--source`` size (Hedra's
+avatars are square), so every tile is redrawn on every composite, which is the worst
+case. The cost is CPU time on one core. ``naive`` is the same gather written the
+obvious way (fancy indexing into a fresh canvas for every frame) for comparison.
+``alloc_peak_bytes`` is the peak of traced Python/NumPy allocations over 50 composites
+after warm-up. Any per-frame pixel buffer would show up there. The YUV/RGBA conversions
+LiveKit does natively when decoding and publishing aren't included.
+
+``visible_pct`` is how much of each avatar's uncovered tile still shows it after the
+speaker has sent a run of new frames on its own, for ``--source`` and for 16:9 avatars,
+whose speaker tile spans the whole canvas under the thumbnail.
+
+``--check`` exits non-zero if any layout composes fewer than four rooms' worth of
+frames (4 x ``COMPOSITOR_FPS``) per core, allocates a pixel buffer per frame, or leaves
+any avatar less than fully visible.
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from livekit import rtc
+
+from avatar_compositor import COMPOSITOR_FPS, LAYOUTS, AvatarCompositor, fit, layout_tiles
+from benchmarks.common import report
+
+PERSONAS = ("martha", "snoop")
+SIZE = (1280, 720)
+CHECK_MIN_FPS = 4 * COMPOSITOR_FPS
+CHECK_MAX_ALLOC_BYTES = 16 * 1024  # far below one tile (a 240x240 thumbnail is 225KB)
+WIDE_SOURCE = (640, 360)
+
+
+def _frames(size: Tuple[int, int], count: int, rng: np.random.Generator) -> List[rtc.VideoFrame]:
+    width, height = size
+    return [
+        rtc.VideoFrame(width, height, rtc.VideoBufferType.RGBA, bytearray(rng.bytes(width * height * 4)))
+        for _ in range(count)
+    ]
+
+
+def compositor(layout: str, frames: Dict[str, List[rtc.VideoFrame]], count: int) -> Dict[str, float]:
+    comp = AvatarCompositor({persona: persona for persona in PERSONAS}, active=PERSONAS[0], layout=layout, size=SIZE)
+
+    def run(n: int, offset: int = 0) -> None:
+        for i in range(offset, offset + n):
+            for persona in PERSONAS:
+                comp.update(persona, frames[persona][i % len(frames[persona])])
+            comp.compose()
+
+    run(10)  # tiles and gather indices are built on the first frames
+    tracemalloc.start()
+    run(50, offset=10)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.process_time()
+    run(count)
+    cpu = time.process_time() - started
+    return {
+        "fps_per_core": count / cpu,
+        "ms_per_frame": cpu / count * 1000,
+        "alloc_peak_bytes": peak,
+        "tiles_drawn": comp.stats.tiles_drawn,
+    }
+
+
+def visibility(layout: str, source: Tuple[int, int]) -> Dict[str, float]:
+    """Percent of each persona's tile showing its own avatar, after speaker-only frames."""
+    width, height = source
+    colors = {persona: i + 1 for i, persona in enumerate(PERSONAS)}
+
+    def solid(persona: str) -> rtc.VideoFrame:
+        pixels = np.full(width * height, colors[persona], dtype=np.uint32)
+        return rtc.VideoFrame(width, height, rtc.VideoBufferType.RGBA, bytearray(pixels.tobytes()))
+
+    comp = AvatarCompositor({persona: persona for persona in PERSONAS}, active=PERSONAS[0], layout=layout, size=SIZE)
+    for persona in PERSONAS:
+        comp.update(persona, solid(persona))
+    comp.compose()
+    for _ in range(5):
+        comp.update(PERSONAS[0], solid(PERSONAS[0]))
+        comp.compose()
+    canvas = np.frombuffer(comp.frame.data, dtype=np.uint32).reshape(SIZE[1], SIZE[0])
+    areas = layout_tiles(layout, list(PERSONAS), PERSONAS[0], SIZE)
+    visible = {}
+    for persona in PERSONAS:
+        # Where the persona should show: its tile, less the tiles drawn over it
+        mask = np.zeros(canvas.shape, dtype=bool)
+        x, y, w, h = fit(source, areas[persona])
+        mask[y : y + h, x : x + w] = True
+        for other in PERSONAS[PERSONAS.index(persona) + 1 :]:
+            x, y, w, h = fit(source, areas[other])
+            mask[y : y + h, x : x + w] = False
+        visible[persona] = float((canvas[mask] == colors[persona]).mean() * 100)
+    return visible
+
+
+def naive(layout: str, frames: Dict[str, List[rtc.VideoFrame]], count: int) -> Dict[str, float]:
+    areas = layout_tiles(layout, list(PERSONAS), PERSONAS[0], SIZE)
+    started = time.process_time()
+    for i in range(count):
+        canvas = np.zeros((SIZE[1], SIZE[0]), dtype=np.uint32)
+        for persona in PERSONAS:
+            frame = frames[persona][i % len(frames[persona])]
+            x, y, w, h = fit((frame.width, frame.height), areas[persona])
+            pixels = np.frombuffer(frame.data, dtype=np.uint32).reshape(frame.height, frame.width)
+            rows = (np.arange(h) * frame.height // h)[:, None]
+            cols = np.arange(w) * frame.width // w
+            canvas[y : y + h, x : x + w] = pixels[rows, cols]
+        bytes(canvas.data)  # what publishing a fresh canvas would copy
+    cpu = time.process_time() - started
+    return {"fps_per_core": count / cpu, "ms_per_frame": cpu / count * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--source", default="512x512", help="avatar frame size, WxH")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if throughput or allocation is out of bounds")
+    args = parser.parse_args()
+
+    source = tuple(int(v) for v in args.source.split("x"))
+    rng = np.random.default_rng(args.seed)
+    frames = {persona: _frames(source, 4, rng) for persona in PERSONAS}
+
+    results: Dict[str, Dict[str, float]] = {}
+    failures = []
+    for layout in LAYOUTS:
+        result = results[f"{layout}, compositor"] = compositor(layout, frames, args.frames)
+        results[f"{layout}, naive"] = naive(layout, frames, args.frames)
+        if result["fps_per_core"] < CHECK_MIN_FPS or result["alloc_peak_bytes"] > CHECK_MAX_ALLOC_BYTES:
+            failures.append(layout)
+        for size in dict.fromkeys((source, WIDE_SOURCE)):
+            visible = results[f"{layout}, {size[0]}x{size[1]} visible_pct"] = visibility(layout, size)
+            if min(visible.values()) < 100:
+                failures.append(f"{layout} at {size[0]}x{size[1]}: an avatar is hidden")
+    report(
+        f"avatar compositor, {SIZE[0]}x{SIZE[1]} canvas, {args.source} avatars, {args.frames} frames",
+        results,
+        as_json=args.json,
+    )
+
+    if args.check and failures:
+        print(f"out of bounds: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
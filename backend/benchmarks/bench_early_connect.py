@@ -0,0 +1,72 @@
+"""Time until a host's session is ready, connecting its realtime model early vs. on start.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_early_connect --joins 200
+
+Each join starts two hosts. A host is ready once its Hedra avatar has started and its
+realtime websocket is connected. ``AgentSession.start`` runs after the avatar start, so a
+plain ``RealtimeModel`` only begins connecting then. ``persona_models`` connects the model
+as soon as the job creates it, alongside the avatar start. ``--check`` fails if connecting
+early isn't faster at the p50.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from benchmarks.common import report, summarize
+from benchmarks.fakes import Latency
+
+CONNECT_LATENCY = Latency(median=0.8, spread=0.3)
+AVATAR_LATENCY = Latency(median=1.6, spread=0.3)
+PERSONAS = ("martha", "snoop")
+
+
+async def _host_ready(early: bool, rng: random.Random, scale: float) -> None:
+    connect_s, avatar_s = CONNECT_LATENCY.sample(rng) * scale, AVATAR_LATENCY.sample(rng) * scale
+    if early:
+        connected = asyncio.ensure_future(asyncio.sleep(connect_s))
+        await asyncio.sleep(avatar_s)
+        await connected  # the session takes over the websocket that is already connecting
+    else:
+        await asyncio.sleep(avatar_s)
+        await asyncio.sleep(connect_s)  # the session opens its websocket on start
+
+
+async def _run(early: bool, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    samples = []
+    for _ in range(args.joins):
+        started = time.perf_counter()
+        await asyncio.gather(*(_host_ready(early, rng, args.time_scale) for _ in PERSONAS))
+        samples.append((time.perf_counter() - started) / args.time_scale)
+    return summarize(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--joins", type=int, default=200)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if connecting early isn't faster")
+    args = parser.parse_args()
+
+    results = {
+        "connect on session start (before)": asyncio.run(_run(False, args)),
+        "connect early": asyncio.run(_run(True, args)),
+    }
+    report("join until both hosts are ready (s)", results, as_json=args.json)
+
+    if args.check:
+        before, early = results["connect on session start (before)"]["p50"], results["connect early"]["p50"]
+        if early >= before:
+            print(f"out of bounds: connecting early p50 {early:.2f}s >= {before:.2f}s")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
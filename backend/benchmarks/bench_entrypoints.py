@@ -0,0 +1,177 @@
+"""Startup time, turn latency and handoff gap of every entry point, run offline.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_entrypoints --rooms 2 --json > before.json
+
+Each entry point's real ``entrypoint(ctx)`` runs against ``benchmarks.sim``: a simulated
+room and job, realtime models with latency distributions, and avatars that timestamp
+when each segment becomes audible. Per room, a viewer joins, says ``--lines`` things
+``--pause`` seconds apart, and the job is shut down ``--settle`` seconds later.
+
+- startup: entry point called to the first audible sample on any avatar
+- turn latency: the viewer finishing a line to the next avatar audio that starts
+- handoff gap: one avatar's last sample to another's first, with no viewer line between
+
+Everything runs in real time and the rooms run concurrently, so a run takes about as long
+as one room's script. ``--json`` output is meant to be diffed between commits. ``--check``
+fails unless every entry point spoke in every room and nothing outlived its room.
+
+Shared audio ingest, the avatar compositor, idle avatars and the line cache are off in
+the simulation (they need real tracks); the agent-swap orchestrated mode isn't covered.
+"""
+
+import os
+
+for _name, _value in {
+    "SHARED_AUDIO_INGEST": "0",
+    "AVATAR_COMPOSITOR": "0",
+    "IDLE_AVATARS": "0",
+    "LINE_CACHE": "0",
+    "HANDOFF_MODE": "persistent",
+    "OPENAI_API_KEY": "sim",
+    "HEDRA_API_KEY": "sim",
+    "LIVEKIT_URL": "ws://sim",
+    "LIVEKIT_API_KEY": "sim",
+    "LIVEKIT_API_SECRET": "sim",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import importlib  # noqa: E402
+import logging  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+from types import ModuleType  # noqa: E402
+from typing import Dict, List, Tuple  # noqa: E402
+
+from benchmarks.common import report, summarize  # noqa: E402
+from benchmarks.sim import ScriptedUser, SimJobContext, SimProfile, SimRoom, patch_module, run_in_job  # noqa: E402
+from resources import tracker  # noqa: E402
+
+ENTRY_POINTS = {
+    "agent_worker": "",
+    "dual_agent_worker": "",
+    "dual_agent_orchestrated": "",
+    "dual_avatar_simple": "",
+    "dual_agent_dispatch": '{"persona": "snoop"}',
+}
+MIN_SEGMENT_S = 0.1  # shorter segments are keep-alive silence, not speech
+
+
+def _audible(room: SimRoom) -> List[Tuple[float, float, str]]:
+    """Every spoken segment in the room as (start, end, avatar), in order."""
+    segments = [
+        (start, end, sink.identity)
+        for sink in room.avatar_sinks
+        for (start, end), audio in zip(sink.segments, sink.audio_seconds)
+        if audio >= MIN_SEGMENT_S
+    ]
+    return sorted(segments)
+
+
+async def run_room(
+    module: ModuleType, ctx: SimJobContext, user: ScriptedUser, *, startup_timeout: float, settle: float
+) -> Dict[str, list]:
+    """Run ``module``'s entry point in ``ctx``'s room with ``user`` in it; loop-clock results."""
+    room = ctx.room
+    loop = asyncio.get_running_loop()
+    user.join(room)
+    started = loop.time()
+    entry = asyncio.ensure_future(run_in_job(ctx, module.entrypoint(ctx)))
+    try:
+        await asyncio.wait_for(asyncio.shield(entry), startup_timeout)
+    except asyncio.TimeoutError:
+        pass
+    await user.speak(room)
+    if user.wait_for_quiet:
+        await room.quiet(user.wait_for_quiet)
+    await asyncio.sleep(settle)
+    ctx.shutdown("script done")
+    entry.cancel()
+    await run_in_job(ctx, ctx.run_shutdown_callbacks())
+
+    segments = _audible(room)
+    ends = user.utterance_ends
+    turns = []
+    for said in ends:
+        after = [start for start, _, _ in segments if start >= said]
+        if after:
+            turns.append(after[0] - said)
+    gaps = []
+    for (start, end, avatar), (next_start, _, next_avatar) in zip(segments, segments[1:]):
+        if avatar != next_avatar and not any(start < said < next_start for said in ends):
+            gaps.append(next_start - end)
+    return {
+        "startup": [segments[0][0] - started] if segments else [],
+        "turns": turns,
+        "gaps": gaps,
+        "segments": [len(segments)],
+    }
+
+
+async def _room(name: str, index: int, profile: SimProfile, args: argparse.Namespace) -> Dict[str, list]:
+    rng = random.Random(args.seed + index)
+    ctx = SimJobContext(SimRoom(f"sim-{name}-{index}"), profile, rng, metadata=ENTRY_POINTS[name])
+    user = ScriptedUser(lines=[(args.pause, f"line {i} for the hosts", 1.0) for i in range(args.lines)])
+    return await run_room(sys.modules[name], ctx, user, startup_timeout=args.startup_timeout, settle=args.settle)
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Dict[str, list]]:
+    names = args.entry_points or list(ENTRY_POINTS)
+    profile = SimProfile()
+    for name in names:
+        patch_module(importlib.import_module(name), profile, random.Random(args.seed))
+    # Some entry modules configure INFO logging when imported
+    logging.getLogger().setLevel(logging.WARNING)
+    runs = await asyncio.gather(*(_room(name, i, profile, args) for name in names for i in range(args.rooms)))
+    results: Dict[str, Dict[str, list]] = {}
+    for i, name in enumerate(names):
+        rooms = runs[i * args.rooms:(i + 1) * args.rooms]
+        results[name] = {key: [value for room in rooms for value in room[key]] for key in rooms[0]}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entry_points", nargs="*", help=f"default: all of {', '.join(ENTRY_POINTS)}")
+    parser.add_argument("--rooms", type=int, default=2, help="rooms per entry point")
+    parser.add_argument("--lines", type=int, default=3, help="lines the viewer says per room")
+    parser.add_argument("--pause", type=float, default=5.0, help="seconds before each line")
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds after the last line")
+    parser.add_argument("--startup-timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero unless every entry point spoke")
+    args = parser.parse_args()
+    unknown = set(args.entry_points) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f"unknown entry points: {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=logging.WARNING)
+
+    runs = asyncio.run(_run(args))
+    results = {}
+    for name, run in runs.items():
+        results[f"{name} startup"] = summarize(run["startup"])
+        results[f"{name} turn latency"] = summarize(run["turns"])
+        results[f"{name} handoff gap"] = summarize(run["gaps"])
+    report("entry points in the simulated room (s)", results, as_json=args.json)
+
+    if args.check:
+        failures = []
+        for name, run in runs.items():
+            if len(run["startup"]) < args.rooms:
+                failures.append(f"{name} stayed silent in {args.rooms - len(run['startup'])} rooms")
+            if len(run["turns"]) < args.rooms * args.lines:
+                failures.append(f"{name} answered {len(run['turns'])} of {args.rooms * args.lines} lines")
+        leaks = tracker.leaks()
+        if leaks:
+            failures.append(f"{len(leaks)} resources outlived their room")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Cost and accuracy of the NumPy audio front end (VAD, noise gate, silence suppression).
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_frontend --seconds 120
+    python -m benchmarks.bench_frontend --snr 20 10 5 0
+
+Cost: CPU time to process one second of audio, fed as 10ms and as 50ms frames on one
+core. Accuracy: synthetic conversation audio, made of harmonic "syllables" grouped into
+utterances with pauses between them, mixed with white noise, pink noise, or mains hum
+plus hiss at each SNR. The VAD runs without hangover here and is scored per 10ms
+against the syllable labels. ``suppressed`` is the share of frames the shared ingest
+would not upload with the default settings.
+
+``--check`` turns the run into an accuracy test: it exits non-zero if, at 10dB SNR or
+better, accuracy drops below 0.8 or more than 5% of non-speech is taken for speech,
+or if 10ms frames cost more than 5% of real time.
+"""
+
+import argparse
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from livekit import rtc
+
+from audio_frontend import AudioFrontEnd
+from benchmarks.common import report
+
+SAMPLE_RATE = 24000
+SPEECH_DBFS = -20.0
+CHECK_MIN_SNR = 10.0
+CHECK_MIN_ACCURACY = 0.8
+CHECK_MAX_FALSE_POS = 0.05
+CHECK_MAX_CPU_PCT = 5.0
+
+
+def synthetic_speech(seconds: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """Speech-like float audio and a per-sample speech label."""
+    n = int(seconds * SAMPLE_RATE)
+    audio = np.zeros(n, dtype=np.float64)
+    labels = np.zeros(n, dtype=bool)
+    pos = int(rng.uniform(0.5, 2.0) * SAMPLE_RATE)
+    while pos < n:
+        utterance_end = pos + int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+        while pos < min(utterance_end, n):
+            length = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+            t = np.arange(length) / SAMPLE_RATE
+            f0 = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+            phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+            syllable = sum(np.sin(k * phase) / k for k in range(1, 16))
+            envelope = np.hanning(length)
+            end = min(pos + length, n)
+            audio[pos:end] = (syllable * envelope)[: end - pos]
+            labels[pos:end] = True
+            pos = end + int(rng.uniform(0.03, 0.12) * SAMPLE_RATE)
+        pos += int(rng.uniform(0.5, 3.0) * SAMPLE_RATE)
+    voiced_rms = np.sqrt(np.mean(audio[labels] ** 2)) if labels.any() else 1.0
+    return audio * (10 ** (SPEECH_DBFS / 20) / voiced_rms), labels
+
+
+def noise(kind: str, n: int, rng: np.random.Generator) -> np.ndarray:
+    white = rng.normal(0, 1, n)
+    if kind == "white":
+        return white
+    if kind == "pink":
+        spectrum = np.fft.rfft(white)
+        spectrum /= np.sqrt(np.maximum(np.fft.rfftfreq(n, 1 / SAMPLE_RATE), 20.0))
+        pink = np.fft.irfft(spectrum, n=n)
+        return pink / pink.std()
+    if kind == "hum":
+        t = np.arange(n) / SAMPLE_RATE
+        hum = sum(np.sin(2 * np.pi * 60 * k * t) / k for k in (1, 2, 3))
+        return (hum / hum.std() + 0.2 * white) / np.sqrt(1.04)
+    raise ValueError(kind)
+
+
+def to_frames(audio: np.ndarray, frame_ms: int) -> List[rtc.AudioFrame]:
+    pcm = np.clip(audio * 32768, -32768, 32767).astype(np.int16)
+    size = SAMPLE_RATE * frame_ms // 1000
+    return [
+        rtc.AudioFrame(pcm[i : i + size].tobytes(), SAMPLE_RATE, 1, size)
+        for i in range(0, len(pcm) - size + 1, size)
+    ]
+
+
+def cost(audio: np.ndarray, frame_ms: int) -> Dict[str, float]:
+    frames = to_frames(audio, frame_ms)
+    frontend = AudioFrontEnd()
+    started = time.process_time()
+    for frame in frames:
+        frontend.process(frame)
+    cpu = time.process_time() - started
+    audio_seconds = len(frames) * frame_ms / 1000
+    return {"us_per_frame": cpu / len(frames) * 1e6, "cpu_pct_of_realtime": cpu / audio_seconds * 100}
+
+
+def accuracy(
+    speech: np.ndarray, labels: np.ndarray, kind: str, snr_db: float, rng: np.random.Generator
+) -> Dict[str, float]:
+    noise_rms = 10 ** ((SPEECH_DBFS - snr_db) / 20)
+    mixed = speech + noise(kind, len(speech), rng) * noise_rms
+    frames = to_frames(mixed, 10)
+    truth = labels[: len(frames) * 240].reshape(len(frames), 240).mean(axis=1) > 0.5
+
+    vad = AudioFrontEnd(hangover_ms=0)
+    predicted = np.array([vad.process(frame).userdata["voiced"] for frame in frames])
+    suppressor = AudioFrontEnd()
+    suppressed = np.mean([suppressor.process(frame).userdata["suppress"] for frame in frames])
+
+    tp = np.sum(predicted & truth)
+    return {
+        "accuracy": float(np.mean(predicted == truth)),
+        "recall": float(tp / max(truth.sum(), 1)),
+        "false_pos": float(np.sum(predicted & ~truth) / max((~truth).sum(), 1)),
+        "suppressed": float(suppressed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--snr", type=float, nargs="+", default=[20.0, 10.0, 5.0])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if accuracy or cost is out of bounds")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    speech, labels = synthetic_speech(args.seconds, rng)
+    noisy = speech + noise("white", len(speech), rng) * 10 ** ((SPEECH_DBFS - 10) / 20)
+
+    results: Dict[str, Dict[str, float]] = {}
+    failures = []
+    for frame_ms in (10, 50):
+        results[f"cost, {frame_ms}ms frames"] = cost(noisy, frame_ms)
+    if results["cost, 10ms frames"]["cpu_pct_of_realtime"] > CHECK_MAX_CPU_PCT:
+        failures.append("cost, 10ms frames")
+    for kind in ("white", "pink", "hum"):
+        for snr in args.snr:
+            label = f"{kind} noise, {snr:.0f}dB SNR"
+            result = results[label] = accuracy(speech, labels, kind, snr, rng)
+            if snr >= CHECK_MIN_SNR and (
+                result["accuracy"] < CHECK_MIN_ACCURACY or result["false_pos"] > CHECK_MAX_FALSE_POS
+            ):
+                failures.append(label)
+    report(f"audio front end, {args.seconds:.0f}s of audio", results, as_json=args.json)
+
+    if args.check and failures:
+        print(f"out of bounds: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
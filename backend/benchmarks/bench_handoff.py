@@ -0,0 +1,119 @@
+"""Handoff latency in dual_agent_orchestrated: agent swap vs. persistent sessions.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_handoff --turns 200
+
+"agent-swap" models the original handoff: a new RealtimeModel connection, a new Hedra avatar
+start and a replay of the whole chat context on every turn. "persistent" drives
+``floor.FloorController`` over two long-lived fake sessions. Both report the time until the
+incoming host's reply has been requested (the handoff itself) and until it starts speaking.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import report, summarize
+from benchmarks.fakes import Latency
+from floor import FloorController
+
+CONNECT_LATENCY = Latency(median=0.8, spread=0.3)
+AVATAR_LATENCY = Latency(median=1.6, spread=0.3)
+FIRST_AUDIO_LATENCY = Latency(median=0.35, spread=0.2)
+REPLAY_PER_ITEM = 0.003  # seconds to push one chat item onto a fresh realtime session
+TARGET = 0.3
+
+
+class FakeHostSession:
+    """Long-lived persona session: generate_reply starts speaking after the model's first audio."""
+
+    def __init__(self, persona: str, floor: FloorController, rng: random.Random, scale: float):
+        self.persona = persona
+        self.listening = True
+        self._floor = floor
+        self._rng = rng
+        self._scale = scale
+        self.spoke = asyncio.Event()
+
+    def generate_reply(self) -> None:
+        async def _speak() -> None:
+            await asyncio.sleep(FIRST_AUDIO_LATENCY.sample(self._rng) * self._scale)
+            self._floor.mark_speaking(self.persona)
+            self.spoke.set()
+
+        self.spoke.clear()
+        asyncio.get_running_loop().create_task(_speak())
+
+
+async def _persistent(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    scale = args.time_scale
+    floor = FloorController(history=args.turns, clock=lambda: time.perf_counter() / scale)
+    sessions = {}
+    for persona in ("martha", "snoop"):
+        session = FakeHostSession(persona, floor, rng, scale)
+        sessions[persona] = session
+
+        def grant(note, scripted=False, s=session) -> None:
+            s.listening = True
+            s.generate_reply()
+
+        def release(s=session) -> None:
+            s.listening = False
+
+        floor.register(persona, grant=grant, release=release)
+
+    for turn in range(args.turns):
+        persona = ("martha", "snoop")[turn % 2]
+        await floor.hand_to(persona)
+        await sessions[persona].spoke.wait()
+
+    records = list(floor.records)
+    return {
+        "handoff": summarize([r.dispatch_latency for r in records]),
+        "to_speech": summarize([r.speaking_latency for r in records]),
+    }
+
+
+async def _agent_swap(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    scale = args.time_scale
+    handoff, to_speech = [], []
+    for turn in range(args.turns):
+        t0 = time.perf_counter()
+        # New agent: model reconnect and avatar start, then the whole history is replayed
+        await asyncio.gather(
+            asyncio.sleep(CONNECT_LATENCY.sample(rng) * scale),
+            asyncio.sleep(AVATAR_LATENCY.sample(rng) * scale),
+        )
+        await asyncio.sleep(REPLAY_PER_ITEM * 2 * (turn + 1) * scale)
+        handoff.append((time.perf_counter() - t0) / scale)
+        await asyncio.sleep(FIRST_AUDIO_LATENCY.sample(rng) * scale)
+        to_speech.append((time.perf_counter() - t0) / scale)
+    return {"handoff": summarize(handoff), "to_speech": summarize(to_speech)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    swap = asyncio.run(_agent_swap(args))
+    persistent = asyncio.run(_persistent(args))
+    results = {
+        "agent-swap handoff": swap["handoff"],
+        "agent-swap to speech": swap["to_speech"],
+        "persistent handoff": persistent["handoff"],
+        "persistent to speech": persistent["to_speech"],
+        "persistent p95 < 300ms": persistent["handoff"]["p95"] < TARGET,
+    }
+    report("handoff latency (s)", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
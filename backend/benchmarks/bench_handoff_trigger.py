@@ -0,0 +1,189 @@
+"""Gap between hosts in a simulated room: tool-call handoffs vs. turn-end handoffs.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_handoff_trigger --turns 200
+
+Two fake host sessions take turns on a shared floor. Every turn is one speech: the first
+audio arrives after the model's latency, then the speech plays out in (scaled) real time.
+
+- "tool": the floor moves when the model's handoff tool call has arrived and the speech
+  has played out, like ``FloorAgent.hand_off`` without a controller. The call comes after
+  the model has generated the whole answer. When the model forgets it (``--miss-rate``),
+  the show stalls until the user speaks up.
+- "turn-end": ``handoff.TurnEndHandoff`` moves the floor as soon as the speech has played out.
+
+The gap is the silence between one host's last audio and the next host's first.
+``--check`` fails unless turn-end handoffs never stall and cut the p95 gap.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from benchmarks.common import report, summarize
+from benchmarks.fakes import Latency
+from handoff import TurnEndHandoff
+
+FIRST_AUDIO_LATENCY = Latency(median=0.35, spread=0.2)
+SPEECH_DURATION = Latency(median=5.0, spread=0.4)
+GENERATION_SPEED = 1.6  # seconds of audio the model generates per second
+TOOL_CALL_LATENCY = Latency(median=0.7, spread=0.35)  # function call after the last audio chunk
+USER_NUDGE = Latency(median=6.0, spread=0.4)  # until the user speaks into a stalled show
+PERSONAS = ["martha", "snoop"]
+
+
+class FakeSpeechHandle:
+    def __init__(self) -> None:
+        self.interrupted = False
+        self._done = False
+        self._callbacks: List[Callable] = []
+
+    def done(self) -> bool:
+        return self._done
+
+    def add_done_callback(self, callback: Callable) -> None:
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _finish(self) -> None:
+        self._done = True
+        for callback in self._callbacks:
+            callback(self)
+
+
+class FakeHostSession:
+    """Emits the session events ``TurnEndHandoff`` watches, on a scaled clock."""
+
+    def __init__(self, persona: str, rng: random.Random, scale: float, timeline: Dict[str, List[float]]):
+        self.persona = persona
+        self._rng = rng
+        self._scale = scale
+        self._timeline = timeline
+        self._handlers: Dict[str, List[Callable]] = {}
+        self.on_tool_call: Callable[[FakeSpeechHandle], None] = lambda handle: None
+
+    def on(self, event: str, callback: Callable) -> None:
+        self._handlers.setdefault(event, []).append(callback)
+
+    def emit(self, event: str, ev) -> None:
+        for callback in self._handlers.get(event, []):
+            callback(ev)
+
+    def generate_reply(self) -> None:
+        asyncio.get_running_loop().create_task(self._speak())
+
+    async def _speak(self) -> None:
+        loop = asyncio.get_running_loop()
+        handle = FakeSpeechHandle()
+        self.emit("speech_created", SimpleNamespace(speech_handle=handle))
+        await asyncio.sleep(FIRST_AUDIO_LATENCY.sample(self._rng) * self._scale)
+        self._timeline["start"].append(loop.time() / self._scale)
+        self.emit("agent_state_changed", SimpleNamespace(new_state="speaking"))
+        duration = SPEECH_DURATION.sample(self._rng)
+        tool_call_at = duration / GENERATION_SPEED + TOOL_CALL_LATENCY.sample(self._rng)
+        loop.call_later(tool_call_at * self._scale, self.on_tool_call, handle)
+        await asyncio.sleep(duration * self._scale)
+        self._timeline["end"].append(loop.time() / self._scale)
+        self.emit("agent_state_changed", SimpleNamespace(new_state="listening"))
+        handle._finish()
+
+
+def _gaps(timeline: Dict[str, List[float]]) -> List[float]:
+    return [start - end for end, start in zip(timeline["end"], timeline["start"][1:])]
+
+
+async def _run(trigger: str, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    scale = args.time_scale
+    timeline: Dict[str, List[float]] = {"start": [], "end": []}
+    sessions = {persona: FakeHostSession(persona, rng, scale, timeline) for persona in PERSONAS}
+    finished = asyncio.Event()
+    stalls = 0
+    turns = 0
+
+    def hand_to(from_persona: str, to_persona: str, topic=None) -> None:
+        nonlocal turns
+        turns += 1
+        if turns >= args.turns:
+            finished.set()
+            return
+        sessions[to_persona].generate_reply()
+
+    handoff = None
+    if trigger == "turn-end":
+        handoff = TurnEndHandoff(PERSONAS, hand_to, max_chain=0)
+        for persona, session in sessions.items():
+            handoff.watch(persona, session)
+        handoff.set_holder(PERSONAS[0])
+    else:
+        for persona, session in sessions.items():
+
+            def on_tool_call(handle: FakeSpeechHandle, persona: str = persona) -> None:
+                nonlocal stalls
+                next_persona = PERSONAS[(PERSONAS.index(persona) + 1) % len(PERSONAS)]
+                if rng.random() < args.miss_rate:
+                    # No tool call: nobody speaks until the user does, then the co-host answers
+                    stalls += 1
+                    delay = USER_NUDGE.sample(rng)
+                    handle.add_done_callback(
+                        lambda _: asyncio.get_running_loop().call_later(
+                            delay * scale, hand_to, persona, next_persona
+                        )
+                    )
+                    return
+                handle.add_done_callback(lambda _: hand_to(persona, next_persona))
+
+            session.on_tool_call = on_tool_call
+
+    sessions[PERSONAS[0]].generate_reply()
+    await finished.wait()
+    gaps = _gaps(timeline)
+    return {
+        "gap": summarize(gaps),
+        "stalls": stalls,
+        "handoffs": handoff.handoffs if handoff else turns,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="share of turns the model forgets the tool call")
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero unless turn-end handoffs win")
+    args = parser.parse_args()
+
+    tool = asyncio.run(_run("tool", args))
+    turn_end = asyncio.run(_run("turn-end", args))
+    results = {
+        "tool gap": tool["gap"],
+        "tool stalls": tool["stalls"],
+        "turn-end gap": turn_end["gap"],
+        "turn-end stalls": turn_end["stalls"],
+        "turn-end handoffs": turn_end["handoffs"],
+    }
+    report("inter-host gap (s)", results, as_json=args.json)
+
+    if args.check:
+        failures = []
+        if turn_end["stalls"]:
+            failures.append(f"turn-end handoffs stalled {turn_end['stalls']} times")
+        if turn_end["handoffs"] != args.turns:
+            failures.append(f"turn-end handoffs: {turn_end['handoffs']} of {args.turns} turns")
+        if turn_end["gap"]["p95"] >= tool["gap"]["p95"]:
+            failures.append(f"turn-end p95 gap {turn_end['gap']['p95']:.3f}s >= tool {tool['gap']['p95']:.3f}s")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
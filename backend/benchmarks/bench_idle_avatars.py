@@ -0,0 +1,154 @@
+"""Avatar video with idle suspension: how much of the show viewers are subscribed to each avatar.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_idle_avatars --turns 60 --rooms 3
+    python -m benchmarks.bench_idle_avatars --check
+
+Each room plays a scripted show, with the hosts alternating and the user talking between
+lines. ``AvatarSuspender`` runs against a fake room holding both avatars and a few
+viewers. The room service's subscription updates are faked with log-normal latency
+(median 40ms). Time is compressed by ``--time-scale``, and the suspender's clock is scaled
+back, so every figure is in show time. Event-loop overhead is scaled up with it, which
+makes the resume figures pessimistic. Suspension delay is the default ``IDLE_AVATAR_DELAY_S``.
+
+Bandwidth is an estimate: ``AVATAR_VIDEO_KBPS`` per viewer while an avatar is streamed,
+``STILL_VIDEO_KBPS`` while its still is shown. Hedra renders both avatars the whole time
+either way, so this is viewer bandwidth only. ``--check`` exits non-zero if p95 resume
+latency is over ``RESUME_BUDGET_MS`` or viewers are unsubscribed for less than a third of
+avatar time.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from livekit import rtc
+
+from avatar_idle import IDLE_AVATAR_DELAY_S, RESUME_BUDGET_MS, AvatarSuspender
+from benchmarks.common import report, summarize
+from benchmarks.fakes import FakeRoom, Latency
+from tracing import Tracer
+
+PERSONAS = ("martha", "snoop")
+AVATAR_VIDEO_KBPS = 1500.0  # a 512x512 talking head at 25fps
+STILL_VIDEO_KBPS = 30.0  # the same frame repeated at 2fps
+CHECK_MIN_UNSUBSCRIBED_RATIO = 1 / 3
+
+
+class FakeSubscriptions:
+    """Room-service subscription updates, each one API round trip."""
+
+    def __init__(self, latency: Latency, rng: random.Random, time_scale: float):
+        self._latency = latency
+        self._rng = rng
+        self._time_scale = time_scale
+        self.calls = 0
+
+    async def set_subscribed(self, viewer: str, track_sids: List[str], subscribed: bool) -> None:
+        self.calls += 1
+        await asyncio.sleep(self._latency.sample(self._rng) * self._time_scale)
+
+
+def _participant(identity: str, *, video: bool) -> Any:
+    publications = {}
+    if video:
+        publications[f"TR_{identity}"] = SimpleNamespace(kind=rtc.TrackKind.KIND_VIDEO)
+    return SimpleNamespace(
+        identity=identity,
+        kind=rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD,
+        track_publications=publications,
+    )
+
+
+async def _room(index: int, args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed + index)
+    room = FakeRoom(f"room-{index}")
+    for persona in PERSONAS:
+        room.remote_participants[persona] = _participant(persona, video=True)
+    for viewer in range(args.viewers):
+        room.remote_participants[f"viewer-{viewer}"] = _participant(f"viewer-{viewer}", video=False)
+
+    started = time.monotonic()
+    suspender = AvatarSuspender(
+        room,
+        {persona: persona for persona in PERSONAS},
+        FakeSubscriptions(Latency(0.040, 0.4), rng, args.time_scale),
+        delay=IDLE_AVATAR_DELAY_S * args.time_scale,
+        tracer=Tracer(),
+        clock=lambda: started + (time.monotonic() - started) / args.time_scale,
+    )
+
+    speaker = PERSONAS[0]
+    for _ in range(args.turns):
+        await suspender.set_speaker(speaker)
+        await asyncio.sleep(rng.uniform(3.0, 12.0) * args.time_scale)  # the host's line
+        await asyncio.sleep(rng.uniform(1.0, 5.0) * args.time_scale)  # the user answers
+        speaker = rng.choice(PERSONAS) if rng.random() < 0.3 else PERSONAS[1 - PERSONAS.index(speaker)]
+
+    summary = suspender.summary()
+    resume_ms = [ms for usage in suspender.usage().values() for ms in usage.resume_ms]
+    await suspender.aclose()
+    return {"summary": summary, "resume_ms": resume_ms}
+
+
+def _video_mbps(subscribed_s: float, unsubscribed_s: float, viewers: int) -> Dict[str, float]:
+    show_s = (subscribed_s + unsubscribed_s) / len(PERSONAS)
+    always_on = len(PERSONAS) * AVATAR_VIDEO_KBPS * viewers / 1000
+    suspended = (subscribed_s * AVATAR_VIDEO_KBPS + unsubscribed_s * STILL_VIDEO_KBPS) * viewers / show_s / 1000
+    return {"always_on_mbps": always_on, "idle_suspended_mbps": suspended}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rooms = await asyncio.gather(*(_room(i, args) for i in range(args.rooms)))
+    results: Dict[str, Any] = {}
+    for index, room in enumerate(rooms):
+        summary = room["summary"]
+        results[f"room-{index}"] = {
+            "subscribed_s": summary["subscribed_s"],
+            "unsubscribed_s": summary["unsubscribed_s"],
+            "unsubscribed_ratio": summary["unsubscribed_ratio"],
+            **_video_mbps(summary["subscribed_s"], summary["unsubscribed_s"], args.viewers),
+        }
+    resume_ms = [ms for room in rooms for ms in room["resume_ms"]]
+    results["resume ms"] = {**summarize(resume_ms), "budget": RESUME_BUDGET_MS}
+    results["resumes over budget"] = sum(room["summary"]["over_budget"] for room in rooms)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--viewers", type=int, default=2)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="real seconds per show second")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if resumes are slow or viewers are rarely unsubscribed")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report(
+        f"idle avatar suspension, {args.rooms} rooms x {args.turns} turns, {args.viewers} viewers",
+        results,
+        as_json=args.json,
+    )
+
+    if args.check:
+        failures = []
+        if results["resume ms"]["p95"] > RESUME_BUDGET_MS:
+            failures.append(f"p95 resume {results['resume ms']['p95']:.0f}ms")
+        for label, room in results.items():
+            if label.startswith("room-") and room["unsubscribed_ratio"] < CHECK_MIN_UNSUBSCRIBED_RATIO:
+                failures.append(f"{label} unsubscribed {room['unsubscribed_ratio']:.0%}")
+        if failures:
+            print(f"out of bounds: {', '.join(failures)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
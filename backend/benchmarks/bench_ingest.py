@@ -0,0 +1,125 @@
+"""CPU and upstream bandwidth per room: one microphone subscription per session vs. a shared ingest.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_ingest --rooms 10 --seconds 60
+
+Every room has two persona sessions listening to one user. The ``per-session`` layout is
+how ``agent_worker`` worked before: each session subscribes, denoises and uploads the
+microphone itself. The ``shared`` layouts subscribe and denoise once and upload only to
+the persona with the floor. With ``gated``, the idle persona also gets the frames the
+energy gate marks as speech.
+
+The audio runs as fast as the CPU allows, so CPU % is CPU time per second of audio.
+Noise cancellation (an FFT spectral gate) and the realtime upload (base64 PCM in a JSON
+``input_audio_buffer.append`` event) are local stand-ins for the real work.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from livekit import rtc
+
+from audio_ingest import FRAME_SIZE_MS, SAMPLE_RATE, FanoutAudioInput, SharedAudioIngest
+from benchmarks.common import report
+
+PERSONAS = ("snoop", "martha")
+SAMPLES_PER_FRAME = SAMPLE_RATE * FRAME_SIZE_MS // 1000
+
+
+def _mic_frames(seconds: float, rng: np.random.Generator) -> List[rtc.AudioFrame]:
+    """Speech-like bursts (about a third of the time) over a quiet noise floor."""
+    frames = []
+    speaking = False
+    t = np.arange(SAMPLES_PER_FRAME) / SAMPLE_RATE
+    for i in range(int(seconds * 1000 / FRAME_SIZE_MS)):
+        if rng.random() < (0.05 if speaking else 0.025):
+            speaking = not speaking
+        noise = rng.normal(0, 30, SAMPLES_PER_FRAME)
+        if speaking:
+            pitch = 120 + 80 * rng.random()
+            noise += 3000 * np.sin(2 * np.pi * pitch * (t + i * FRAME_SIZE_MS / 1000))
+        pcm = np.clip(noise, -32768, 32767).astype(np.int16)
+        frames.append(rtc.AudioFrame(pcm.tobytes(), SAMPLE_RATE, 1, SAMPLES_PER_FRAME))
+    return frames
+
+
+def _subscribe_and_denoise(frame: rtc.AudioFrame) -> rtc.AudioFrame:
+    """What one subscription costs per frame: its own decoded copy, then noise suppression."""
+    samples = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32)
+    spectrum = np.fft.rfft(samples)
+    magnitude = np.abs(spectrum)
+    floor = np.median(magnitude) * 1.5
+    spectrum *= np.maximum(magnitude - floor, 0) / np.maximum(magnitude, 1e-9)
+    cleaned = np.clip(np.fft.irfft(spectrum, n=samples.size), -32768, 32767).astype(np.int16)
+    return rtc.AudioFrame(cleaned.tobytes(), SAMPLE_RATE, 1, SAMPLES_PER_FRAME)
+
+
+async def _upload(consumer: FanoutAudioInput, sent: List[int]) -> None:
+    async for frame in consumer:
+        event = {"type": "input_audio_buffer.append", "audio": base64.b64encode(bytes(frame.data)).decode()}
+        sent[0] += len(json.dumps(event))
+
+
+async def _room(layout: str, frames: List[rtc.AudioFrame], rng: random.Random, sent: List[int]) -> None:
+    if layout == "per-session":
+        subscriptions = [SharedAudioIngest() for _ in PERSONAS]
+        consumers = [ingest.add_consumer(persona) for ingest, persona in zip(subscriptions, PERSONAS)]
+        for ingest, persona in zip(subscriptions, PERSONAS):
+            ingest.set_floor(persona)  # each session hears everything
+    else:
+        shared = SharedAudioIngest(idle_audio="gated" if layout == "shared, gated" else "none")
+        subscriptions = [shared]
+        consumers = [shared.add_consumer(persona) for persona in PERSONAS]
+        shared.set_floor(PERSONAS[0])
+
+    uploads = [asyncio.create_task(_upload(consumer, sent)) for consumer in consumers]
+    for i, frame in enumerate(frames):
+        if layout != "per-session" and rng.random() < 0.01:
+            subscriptions[0].set_floor(rng.choice(PERSONAS))  # a handoff
+        for ingest in subscriptions:
+            ingest.push(_subscribe_and_denoise(frame))
+        if i % 4 == 3:
+            await asyncio.sleep(0)  # let the uploads drain, as the 50ms frame pacing would
+    for ingest in subscriptions:
+        await ingest.aclose()
+    await asyncio.gather(*uploads)
+
+
+async def _run(layout: str, rooms: int, frames: List[rtc.AudioFrame], seed: int) -> dict:
+    sent = [0]
+    cpu_started = time.process_time()
+    await asyncio.gather(*(_room(layout, frames, random.Random(seed + i), sent) for i in range(rooms)))
+    cpu = time.process_time() - cpu_started
+    audio_seconds = len(frames) * FRAME_SIZE_MS / 1000
+    return {
+        "cpu_pct_per_room": cpu / (audio_seconds * rooms) * 100,
+        "upstream_kbps_per_room": sent[0] * 8 / 1000 / (audio_seconds * rooms),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=60.0, help="seconds of microphone audio per room")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    frames = _mic_frames(args.seconds, np.random.default_rng(args.seed))
+    results = {
+        layout: asyncio.run(_run(layout, args.rooms, frames, args.seed))
+        for layout in ("per-session", "shared", "shared, gated")
+    }
+    report(f"user audio ingest, {args.rooms} rooms x {args.seconds:.0f}s", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""First-greeting latency and realtime tokens per room, live generation vs. the line cache.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_line_cache --rooms 100
+    python -m benchmarks.bench_line_cache --check
+
+Rooms join one after another and each one opens with the same greeting. ``live`` is the
+old path: every room generates the greeting on the realtime model. Time to first audio
+is drawn from a log-normal with a 900ms median. ``cached`` goes through ``LineCache`` in
+a temporary directory, with the same latency for its background renders. Time to first
+audio on a hit is measured for real: the time to map the file and slice the first
+frame. Tokens are audio-output tokens at ``AUDIO_TOKENS_PER_SECOND``.
+
+``--check`` exits non-zero on any of these:
+- the p95 hit latency is over 5ms
+- fewer than two renditions get played
+- the cache goes over its size limit
+- more than one render per three rooms
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from audio_outputs import AUDIO_TOKENS_PER_SECOND
+from benchmarks.common import report, summarize
+from benchmarks.fakes import Latency
+from line_cache import LineCache
+
+SAMPLE_RATE = 24000
+GREETING = "Greet the audience warmly and introduce yourself and Snoop as co-hosts."
+FIRST_AUDIO = Latency(0.9, 0.3)
+CHECK_MAX_HIT_MS = 5.0
+CHECK_MAX_RENDERS_PER_ROOM = 1 / 3
+
+
+def _live(rooms: int, rng: random.Random) -> Dict[str, Any]:
+    first_audio_ms = [FIRST_AUDIO.sample(rng) * 1000 for _ in range(rooms)]
+    seconds = [rng.uniform(4.0, 8.0) for _ in range(rooms)]
+    return {**summarize(first_audio_ms), "tokens_per_room": sum(seconds) * AUDIO_TOKENS_PER_SECOND / rooms}
+
+
+async def _cached(args: argparse.Namespace, rng: random.Random, directory: str) -> Tuple[Dict[str, Any], List[float]]:
+    rendered_seconds: List[float] = []
+
+    async def renderer(voice: str, agent_instructions: str, instructions: str) -> Tuple[bytes, int, int, str]:
+        await asyncio.sleep(FIRST_AUDIO.sample(rng) * args.time_scale)
+        seconds = rng.uniform(4.0, 8.0)
+        rendered_seconds.append(seconds)
+        return rng.randbytes(int(seconds * SAMPLE_RATE) * 2), SAMPLE_RATE, 1, "Hello, darlings."
+
+    # Room for a few renditions, so eviction runs during the benchmark
+    cache = LineCache(directory, max_bytes=args.max_kb * 1024, renderer=renderer)
+    first_audio_ms, hit_ms, live_seconds, played, max_size = [], [], [], set(), 0
+    for _ in range(args.rooms):
+        line = cache.lookup("martha", "ash", GREETING)
+        cache.refresh("martha", "ash", GREETING)
+        if line is None:
+            first_audio_ms.append(FIRST_AUDIO.sample(rng) * 1000)
+            live_seconds.append(rng.uniform(4.0, 8.0))
+        else:
+            started = time.perf_counter()
+            frames = cache.frames(line)
+            await frames.__anext__()
+            hit_ms.append((time.perf_counter() - started) * 1000)
+            first_audio_ms.append(hit_ms[-1])
+            await frames.aclose()
+            played.add(line.variant)
+        # The next room joins after the greeting, by which time a background render is done
+        await asyncio.sleep(args.time_scale * 10)
+        max_size = max(max_size, cache.size)
+    await cache.aclose()
+
+    tokens = (sum(live_seconds) + sum(rendered_seconds)) * AUDIO_TOKENS_PER_SECOND
+    result = {
+        **summarize(first_audio_ms),
+        "tokens_per_room": tokens / args.rooms,
+        "hit_rate": cache.hits / args.rooms,
+        "renders": len(rendered_seconds),
+        "renditions_played": len(played),
+        "max_cache_kb": max_size / 1024,
+    }
+    return result, hit_ms
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="bench-line-cache-")
+    try:
+        cached, hit_ms = await _cached(args, rng, directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {
+        "live": _live(args.rooms, random.Random(args.seed)),
+        "cached": cached,
+        "cache hits, first audio ms": summarize(hit_ms) if hit_ms else {},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--max-kb", type=int, default=1500, help="cache size limit")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="real seconds per simulated second")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if hits are slow or the cache misbehaves")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report(f"greeting line cache, {args.rooms} rooms", results, as_json=args.json)
+
+    if args.check:
+        cached, hits = results["cached"], results["cache hits, first audio ms"]
+        failures = []
+        if not hits or hits["p95"] > CHECK_MAX_HIT_MS:
+            failures.append("hit latency")
+        if cached["renditions_played"] < 2:
+            failures.append("renditions played")
+        if cached["max_cache_kb"] > args.max_kb:
+            failures.append("cache size")
+        if cached["renders"] / args.rooms > CHECK_MAX_RENDERS_PER_ROOM:
+            failures.append("renders per room")
+        if failures:
+            print(f"out of bounds: {', '.join(failures)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Handoff payload size and build time as a show gets longer.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_memory --turns 10 100 1000
+
+Replays a synthetic transcript (user, Martha, Snoop taking turns) and, at every host
+handoff, measures what gets sent to the incoming host: the whole chat context (the original
+``SnoopAgent(chat_ctx=...)`` copy) vs. ``ConversationMemory.handoff_payload``.
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.common import report
+from conversation_memory import ConversationMemory, HandoffPayload, Turn, estimate_tokens
+
+WORDS = (
+    "hollandaise butter lemon yolks whisk brunch asparagus arugula paprika smoked spicy elegant "
+    "nephew fresh garnish crispy bacon waffles syrup chili sauce herbs plating simmer"
+).split()
+
+
+def _utterance(rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(1, 4)):
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize())
+    return ". ".join(sentences) + "."
+
+
+def _replay(turns: int, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    memory = ConversationMemory(keep_recent=args.keep_recent, summary_budget=args.summary_budget)
+    history = []
+    speakers = ("user", "martha", "snoop")
+
+    full_tokens, delta_tokens, full_times, delta_times = [], [], [], []
+    for i in range(turns):
+        speaker = speakers[i % 3]
+        text = _utterance(rng)
+        history.append(Turn(i, speaker, text))
+        memory.add(speaker, text)
+        if speaker == "user":
+            continue
+
+        co_host = "snoop" if speaker == "martha" else "martha"
+
+        t0 = time.perf_counter()
+        full = HandoffPayload(None, list(history))
+        full_tokens.append(full.tokens)
+        full_times.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        payload = memory.handoff_payload(co_host)
+        delta_tokens.append(payload.tokens)
+        delta_times.append(time.perf_counter() - t0)
+
+    tail = max(1, len(full_tokens) // 10)  # the last 10% of handoffs, where growth shows
+    return {
+        "full tokens": sum(full_tokens[-tail:]) / tail,
+        "delta tokens": sum(delta_tokens[-tail:]) / tail,
+        "full us": sum(full_times[-tail:]) / tail * 1e6,
+        "delta us": sum(delta_times[-tail:]) / tail * 1e6,
+        "summary tokens": estimate_tokens(memory.summary),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--keep-recent", type=int, default=8)
+    parser.add_argument("--summary-budget", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {f"{n} turns": _replay(n, args) for n in args.turns}
+    report("handoff payload (last 10% of handoffs)", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
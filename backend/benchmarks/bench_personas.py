@@ -0,0 +1,80 @@
+"""RSS and cold-start time: one process per persona vs. the single dispatch worker.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_personas --runs 5
+
+"one process per persona" is the old ``martha_agent.py`` + ``snoop_agent.py`` layout. Each
+process paid for an interpreter plus the livekit / openai / hedra import graph. "single
+dispatch worker" is ``dual_agent_dispatch.py`` serving every persona in ``personas.json``.
+Cold start is the time from spawning a process until its worker module is imported and
+ready. The processes of a layout start in parallel, as ``start-dual-agents`` did.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+import psutil
+
+from benchmarks.common import report, summarize
+from personas import get_persona_registry
+
+# What each standalone persona process imported before building its worker
+PER_PERSONA_IMPORTS = "import livekit.agents, livekit.plugins.hedra, persona_models"
+DISPATCH_IMPORTS = "import dual_agent_dispatch"
+
+CHILD = "import sys; {imports}; print('ready', flush=True); sys.stdin.read()"
+
+
+def _start_layout(imports: str, processes: int) -> dict:
+    started = time.perf_counter()
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-c", CHILD.format(imports=imports)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(processes)
+    ]
+    try:
+        for child in children:
+            if child.stdout.readline().strip() != "ready":
+                raise RuntimeError(f"worker process failed to start: {imports}")
+        ready = time.perf_counter() - started
+        rss = sum(psutil.Process(child.pid).memory_info().rss for child in children)
+    finally:
+        for child in children:
+            child.stdin.close()
+            child.wait()
+    return {"cold_start": ready, "rss_mb": rss / 2**20}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    personas = len(get_persona_registry())
+    layouts = {
+        f"one process per persona ({personas})": (PER_PERSONA_IMPORTS, personas),
+        "single dispatch worker": (DISPATCH_IMPORTS, 1),
+    }
+
+    results = {}
+    for label, (imports, processes) in layouts.items():
+        runs = [_start_layout(imports, processes) for _ in range(args.runs)]
+        cold = summarize([run["cold_start"] for run in runs])
+        results[label] = {
+            "cold_start_p50_s": cold["p50"],
+            "cold_start_max_s": cold["max"],
+            "rss_mb": summarize([run["rss_mb"] for run in runs])["p50"],
+        }
+    report("persona worker layout", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
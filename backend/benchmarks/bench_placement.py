@@ -0,0 +1,296 @@
+"""Room placement on a simulated cluster, LiveKit's default load reporting vs. ``worker_load``.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_placement --hours 2 --check
+
+Each node runs one worker per room type (``agent_worker`` and ``agent`` by default). The
+nodes come in two shapes: CPU-bound, and memory-bound with more cores than memory.
+Rooms arrive at random, plus a burst at the top of every ``--burst-every`` minutes
+(a show starting), and last ``--room-minutes`` on average. A room really uses its
+``ROOM_COSTS`` entry, off by a random factor, and twice the CPU for its first 10s.
+The dispatcher sends each room to the worker of its type with the lowest reported load,
+among those below their threshold.
+
+- default: the node's CPU averaged over 2.5s, a threshold of 0.75 and no
+  ``request_fnc``, as LiveKit does in production
+- cost: ``worker_load.CostLoad``, with the node's workers sharing one in-memory ledger
+
+As in LiveKit, load is recomputed every 0.5s and reported every 2.5s. A node is
+overloaded while its rooms want more than all of its cores, or more memory than it has.
+Overload events count a node going into that state; rooms hit counts the rooms on a node
+while it's overloaded. ``--check`` fails if cost-based reporting overloads any node, or
+never fills a node to ``--min-fill`` of its cores or memory.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from benchmarks.common import report
+from benchmarks.fakes import FakeJobRequest
+from rooms import MAX_CPU_PERCENT, MIN_AVAILABLE_MB
+from worker_load import ROOM_COSTS, CostLoad, NodeCapacity, RoomCost
+
+STEP_S = 0.5  # LiveKit recomputes load this often
+REPORT_S = 2.5  # and sends it to the dispatcher this often
+DEFAULT_THRESHOLD = 0.75  # LiveKit's production load_threshold
+CPU_WINDOW = 5  # LiveKit's default load averages this many 0.5s CPU samples
+STARTUP_S = 10.0
+STARTUP_CPU = 2.0
+OS_CPU_PERCENT = 5.0
+OS_MEMORY_MB = 400.0
+NODE_SHAPES = {
+    "cpu-bound": (4, 8192.0),  # cores, memory MB
+    "memory-bound": (8, 4096.0),
+}
+
+
+@dataclass
+class PlacedRoom:
+    room_type: str
+    started: float
+    ends: float
+    cost: RoomCost  # what it really uses, once started
+
+    def cpu_percent(self, now: float) -> float:
+        return self.cost.cpu_percent * (STARTUP_CPU if now - self.started < STARTUP_S else 1.0)
+
+
+@dataclass
+class SimWorker:
+    node: "SimNode"
+    room_type: str
+    active_jobs: List[PlacedRoom] = field(default_factory=list)
+    load: Optional[CostLoad] = None
+    reported: float = 0.0
+    current: float = 0.0
+
+    @property
+    def threshold(self) -> float:
+        return self.load.threshold if self.load is not None else DEFAULT_THRESHOLD
+
+    def compute(self) -> None:
+        self.current = self.load.load(self) if self.load is not None else self.node.cpu_average() / 100
+
+
+class NodeLedger:
+    """In-memory stand-in for ``worker_load.NodeLedger``: the node's workers and their rooms."""
+
+    def __init__(self, node: "SimNode", room_type: str):
+        self._node = node
+        self._room_type = room_type
+
+    def publish(self, room_type: str, rooms: int) -> None:
+        pass  # the node sees every worker's active_jobs directly
+
+    def others(self) -> Dict[str, int]:
+        return {
+            room_type: len(worker.active_jobs)
+            for room_type, worker in self._node.workers.items()
+            if room_type != self._room_type
+        }
+
+
+class SimNode:
+    def __init__(self, name: str, cores: int, memory_mb: float):
+        self.name = name
+        self.cores = cores
+        self.memory_mb = memory_mb
+        self.workers: Dict[str, SimWorker] = {}
+        self._cpu_samples: Deque[float] = deque(maxlen=CPU_WINDOW)
+        self.overloaded = False
+        self.overload_events = 0
+        self.overloaded_s = 0.0
+        self.rooms_hit: set = set()
+        self.peak_fill = 0.0
+
+    @property
+    def rooms(self) -> List[PlacedRoom]:
+        return [room for worker in self.workers.values() for room in worker.active_jobs]
+
+    @property
+    def capacity(self) -> NodeCapacity:
+        return NodeCapacity(
+            cpu_percent=self.cores * MAX_CPU_PERCENT,
+            memory_mb=self.memory_mb - MIN_AVAILABLE_MB,
+            connections=200,
+            avatars=0,
+        )
+
+    def demand(self, now: float) -> Tuple[float, float]:
+        """CPU percent (of one core) and memory MB the node's rooms want."""
+        rooms = self.rooms
+        cpu = OS_CPU_PERCENT + sum(room.cpu_percent(now) for room in rooms)
+        memory = OS_MEMORY_MB + sum(room.cost.memory_mb for room in rooms)
+        return cpu, memory
+
+    def measured(self, capacity: NodeCapacity) -> float:
+        """What ``worker_load.measure_usage`` would read on this node."""
+        _, memory = self._last_demand
+        cpu = self.cpu_average() * self.cores
+        return max(cpu / capacity.cpu_percent, min(memory, self.memory_mb) / capacity.memory_mb)
+
+    def cpu_average(self) -> float:
+        """System CPU percent, averaged like LiveKit's default load."""
+        return sum(self._cpu_samples) / len(self._cpu_samples) if self._cpu_samples else 0.0
+
+    def tick(self, now: float) -> None:
+        self._last_demand = cpu, memory = self.demand(now)
+        self._cpu_samples.append(min(100.0, cpu / self.cores))
+        fill = max(cpu / (self.cores * 100), memory / self.memory_mb)
+        self.peak_fill = max(self.peak_fill, fill)
+        overloaded = fill > 1.0
+        if overloaded:
+            self.overloaded_s += STEP_S
+            self.rooms_hit.update(id(room) for room in self.rooms)
+            if not self.overloaded:
+                self.overload_events += 1
+        self.overloaded = overloaded
+
+
+def _arrivals(args: argparse.Namespace, rng: random.Random, mix: Dict[str, float], rate: float) -> List[Tuple[float, str]]:
+    """(time, room type) for every room asking to start, in order."""
+    duration = args.hours * 3600
+    arrivals = []
+    at = 0.0
+    types, weights = list(mix), list(mix.values())
+    while True:
+        at += rng.expovariate(rate)
+        if at >= duration:
+            break
+        arrivals.append((at, rng.choices(types, weights)[0]))
+    burst_every = args.burst_every * 60
+    show = burst_every
+    while show < duration:
+        for _ in range(args.burst):
+            arrivals.append((show + rng.uniform(0, 10), rng.choices(types, weights)[0]))
+        show += burst_every
+    return sorted(arrivals)
+
+
+async def _simulate(mode: str, args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    nodes = []
+    for i in range(args.nodes):
+        shape = list(NODE_SHAPES)[i % len(NODE_SHAPES)]
+        cores, memory_mb = NODE_SHAPES[shape]
+        nodes.append(SimNode(f"{shape}-{i}", cores, memory_mb))
+    clock = [0.0]
+    for node in nodes:
+        for room_type in mix:
+            worker = node.workers[room_type] = SimWorker(node, room_type)
+            if mode == "cost":
+                worker.load = CostLoad(
+                    room_type,
+                    costs=ROOM_COSTS,
+                    capacity=node.capacity,
+                    ledger=NodeLedger(node, room_type),
+                    measure=node.measured,
+                    clock=lambda: clock[0],
+                )
+
+    # Enough rooms to keep the cluster somewhat over its capacity
+    mean_cost = sum(nodes[0].capacity.share(ROOM_COSTS[room_type]) * weight for room_type, weight in mix.items())
+    capacity_rooms = len(nodes) / mean_cost
+    rate = args.offered * capacity_rooms / (args.room_minutes * 60)
+    arrivals = deque(_arrivals(args, random.Random(args.seed + 1), mix, rate))
+
+    offered = placed = unplaced = 0
+    steps = int(args.hours * 3600 / STEP_S)
+    report_every = int(REPORT_S / STEP_S)
+    for step in range(steps):
+        now = clock[0] = step * STEP_S
+        for node in nodes:
+            for worker in node.workers.values():
+                worker.active_jobs = [room for room in worker.active_jobs if room.ends > now]
+            node.tick(now)
+        for node in nodes:
+            for worker in node.workers.values():
+                worker.compute()
+                if step % report_every == 0:
+                    worker.reported = worker.current
+
+        while arrivals and arrivals[0][0] <= now:
+            _, room_type = arrivals.popleft()
+            offered += 1
+            candidates = sorted(
+                (node.workers[room_type] for node in nodes if node.workers[room_type].reported < node.workers[room_type].threshold),
+                key=lambda worker: worker.reported,
+            )
+            for worker in candidates:
+                if worker.load is not None:
+                    request = FakeJobRequest(f"room-{offered}")
+                    await worker.load.request_fnc(request)
+                    if not request.accepted:
+                        continue
+                factor = rng.lognormvariate(0.0, args.cost_error)
+                base = ROOM_COSTS[room_type]
+                cost = RoomCost(base.cpu_percent * factor, base.memory_mb * factor, base.connections, base.avatars)
+                worker.active_jobs.append(
+                    PlacedRoom(room_type, now, now + rng.expovariate(1 / (args.room_minutes * 60)), cost)
+                )
+                placed += 1
+                break
+            else:
+                unplaced += 1
+
+    return {
+        "rooms offered": offered,
+        "rooms placed": placed,
+        "rooms turned away": unplaced,
+        "overload events": sum(node.overload_events for node in nodes),
+        "overloaded node-minutes": round(sum(node.overloaded_s for node in nodes) / 60, 1),
+        "rooms hit by overload": sum(len(node.rooms_hit) for node in nodes),
+        "peak fill per node": {node.name: round(node.peak_fill, 2) for node in nodes},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--room-minutes", type=float, default=20.0, help="mean room length")
+    parser.add_argument("--offered", type=float, default=1.2, help="rooms asked for, as a share of cluster capacity")
+    parser.add_argument("--burst", type=int, default=20, help="rooms asking to start together at each show start")
+    parser.add_argument("--burst-every", type=float, default=30.0, help="minutes between show starts")
+    parser.add_argument("--cost-error", type=float, default=0.15, help="spread of real room costs around ROOM_COSTS")
+    parser.add_argument("--mix", default="agent_worker=0.7,agent=0.3", help="room types and their share of arrivals")
+    parser.add_argument("--min-fill", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if cost-based reporting overloads a node")
+    args = parser.parse_args()
+
+    mix = {}
+    for item in args.mix.split(","):
+        room_type, _, weight = item.partition("=")
+        if room_type not in ROOM_COSTS:
+            parser.error(f"no cost for room type {room_type!r}")
+        mix[room_type] = float(weight or 1)
+
+    # Every rejection is logged
+    logging.disable(logging.WARNING)
+    runs = {mode: asyncio.run(_simulate(mode, args, mix)) for mode in ("default", "cost")}
+    report(f"room placement on {args.nodes} nodes over {args.hours}h", runs, as_json=args.json)
+
+    if args.check:
+        failures = []
+        cost = runs["cost"]
+        if cost["overload events"]:
+            failures.append(f"{cost['overload events']} overload events with cost-based reporting")
+        low = {name: fill for name, fill in cost["peak fill per node"].items() if fill < args.min_fill}
+        if low:
+            failures.append(f"nodes filled below {args.min_fill}: {low}")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
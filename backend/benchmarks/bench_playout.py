@@ -0,0 +1,223 @@
+"""Silence between hosts at the avatars, with and without the gapless playout scheduler.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_playout --rooms 20 --turns 4
+
+Every room runs ``speculation.SpeculativeReplies`` over two fake sessions whose drafts are
+real ``audio_outputs.SessionDraft`` objects. The fake model streams 20ms frames faster than
+real time, with jittery chunk arrivals. Each fake avatar plays a frame ``--avatar-lead``
+seconds after receiving it (or once the frames before it have played) and reports playback
+finished ``--rpc`` seconds after its last sample.
+
+- "after playout": ``HeldAudioOutput``; the follow-up is released once the first avatar
+  has reported playback finished.
+- "gapless": ``playout.ScheduledAudioOutput`` and ``PlayoutScheduler``; the follow-up is
+  released to start where the first reply's last sample ends.
+
+The gap is measured at the avatars, from one host's last audible sample to the next's
+first. Runs in real time; the rooms run concurrently. ``--check`` fails unless the gapless
+p95 gap is within ``--budget`` and below the "after playout" p50.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+from audio_outputs import HeldAudioOutput, SessionDraft
+from benchmarks.common import report, summarize
+from benchmarks.fakes import Latency
+from playout import PLAYOUT_LEAD_S, PlayoutScheduler, ScheduledAudioOutput
+from speculation import SpeculativeReplies
+
+SAMPLE_RATE = 24000
+FRAME_S = 0.02
+CHUNK_FRAMES = 5  # the model delivers audio in 100ms chunks
+GENERATION_SPEEDUP = 3.0
+TTFB = Latency(median=0.5, spread=0.3)
+PERSONAS = ["martha", "snoop"]
+
+
+class FakeAvatarOutput(io.AudioOutput):
+    """Plays frames ``lead`` seconds after they arrive, back to back; records what was audible."""
+
+    def __init__(self, lead: float, rpc: Latency, rng: random.Random):
+        super().__init__(next_in_chain=None, sample_rate=SAMPLE_RATE)
+        self._lead = lead
+        self._rpc = rpc
+        self._rng = rng
+        self._play_end: Optional[float] = None
+        self.audible: List[Tuple[float, float]] = []  # (first sample, last sample) per segment
+        self.underruns = 0
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        now = asyncio.get_running_loop().time()
+        if self._play_end is None:
+            self._play_end = now + self._lead
+            self.audible.append((self._play_end, self._play_end))
+        elif self._play_end < now + self._lead:
+            self.underruns += 1
+            self._play_end = now + self._lead
+        self._play_end += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        if self._play_end is None:
+            return
+        loop = asyncio.get_running_loop()
+        end, self._play_end = self._play_end, None
+        self.audible[-1] = (self.audible[-1][0], end)
+        loop.call_at(
+            end + self._rpc.sample(self._rng),
+            lambda: self.on_playback_finished(playback_position=0.0, interrupted=False),
+        )
+
+    def clear_buffer(self) -> None:
+        if self._play_end is not None:
+            self._play_end = None
+            self.on_playback_finished(playback_position=0.0, interrupted=True)
+
+
+class FakeSpeechHandle:
+    def __init__(self, generation: asyncio.Task, output: io.AudioOutput):
+        self._generation = generation
+        self._output = output
+
+    def done(self) -> bool:
+        return self._generation.done()
+
+    def interrupt(self) -> None:
+        self._generation.cancel()
+
+    async def wait_for_playout(self) -> None:
+        try:
+            await self._generation
+        except asyncio.CancelledError:
+            return
+        await self._output.wait_for_playout()
+
+
+class FakeSession:
+    """``generate_reply`` streams a reply of random length into the session's audio output."""
+
+    def __init__(self, rng: random.Random):
+        self._rng = rng
+        self.audio: Optional[io.AudioOutput] = None
+
+    def generate_reply(self, **kwargs) -> FakeSpeechHandle:
+        duration = self._rng.uniform(1.0, 3.0)
+        ttfb = TTFB.sample(self._rng)
+        gaps = [self._rng.expovariate(1.0) for _ in range(int(duration / FRAME_S / CHUNK_FRAMES) + 1)]
+        task = asyncio.ensure_future(self._generate(duration, ttfb, gaps))
+        return FakeSpeechHandle(task, self.audio)
+
+    async def _generate(self, duration: float, ttfb: float, gaps: List[float]) -> None:
+        await asyncio.sleep(ttfb)
+        frames = int(duration / FRAME_S)
+        chunk_s = CHUNK_FRAMES * FRAME_S / GENERATION_SPEEDUP
+        for i in range(frames):
+            if i % CHUNK_FRAMES == 0 and i:
+                await asyncio.sleep(chunk_s * gaps[i // CHUNK_FRAMES])
+            await self.audio.capture_frame(
+                rtc.AudioFrame.create(SAMPLE_RATE, 1, int(SAMPLE_RATE * FRAME_S))
+            )
+        self.audio.flush()
+
+
+async def _room(gapless: bool, seed: int, args: argparse.Namespace) -> Dict[str, list]:
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    rpc = Latency(median=args.rpc, spread=0.4)
+    avatars = {persona: FakeAvatarOutput(args.avatar_lead, rpc, rng) for persona in PERSONAS}
+    sessions = {persona: FakeSession(rng) for persona in PERSONAS}
+    outputs: Dict[str, HeldAudioOutput] = {}
+    for persona in PERSONAS:
+        if gapless:
+            outputs[persona] = ScheduledAudioOutput(avatars[persona], persona, clock=loop.time)
+        else:
+            outputs[persona] = HeldAudioOutput(avatars[persona])
+        sessions[persona].audio = outputs[persona]
+    scheduler = PlayoutScheduler(outputs, clock=loop.time) if gapless else None
+
+    speculation = SpeculativeReplies(
+        PERSONAS,
+        lambda persona, text, held: SessionDraft(
+            sessions[persona],
+            outputs[persona],
+            "",
+            held=held,
+            user_input=text,
+            scheduler=scheduler,
+            persona=persona,
+        ),
+        pipelined=gapless,
+    )
+
+    gaps = []
+    for turn in range(args.turns):
+        chosen = PERSONAS[turn % 2]
+        before = {persona: len(avatar.audible) for persona, avatar in avatars.items()}
+        follower = await speculation.reply(chosen, f"turn {turn}")
+        if follower is None:
+            continue
+        first = avatars[chosen].audible[before[chosen]:]
+        second = avatars[follower].audible[before[follower]:]
+        if first and second:
+            gaps.append(second[0][0] - first[-1][1])
+        await asyncio.sleep(0.2)  # the user takes a moment before speaking again
+
+    return {
+        "gaps": gaps,
+        "underruns": [sum(avatar.underruns for avatar in avatars.values())],
+        "planned": [s.gap for s in scheduler.segments if s.gap is not None] if scheduler else [],
+    }
+
+
+async def _run(gapless: bool, args: argparse.Namespace) -> Dict[str, list]:
+    rooms = await asyncio.gather(*(_room(gapless, args.seed + i, args) for i in range(args.rooms)))
+    return {key: [value for room in rooms for value in room[key]] for key in rooms[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--avatar-lead", type=float, default=PLAYOUT_LEAD_S, help="seconds from audio in to audible")
+    parser.add_argument("--rpc", type=float, default=0.08, help="median playback-finished RPC delay")
+    parser.add_argument("--budget", type=float, default=0.05, help="gapless p95 gap budget, seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if the gapless gap is out of bounds")
+    args = parser.parse_args()
+
+    after_playout = asyncio.run(_run(False, args))
+    gapless = asyncio.run(_run(True, args))
+    results = {
+        "after playout gap": summarize(after_playout["gaps"]),
+        "gapless gap": summarize(gapless["gaps"]),
+        "gapless planned gap": summarize(gapless["planned"]),
+        "after playout underruns": sum(after_playout["underruns"]),
+        "gapless underruns": sum(gapless["underruns"]),
+    }
+    report("gap between hosts at the avatars (s)", results, as_json=args.json)
+
+    if args.check:
+        failures = []
+        p95 = results["gapless gap"]["p95"]
+        if not p95 <= args.budget:
+            failures.append(f"gapless p95 gap {p95:.3f}s > {args.budget:.3f}s")
+        if not p95 < results["after playout gap"]["p50"]:
+            failures.append("gapless p95 gap not below the after-playout p50")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Provider prompt-cache hits per turn, user text in the instructions vs. ``PromptLayout``.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_prompt_cache --turns 40
+    python -m benchmarks.bench_prompt_cache --check
+
+A fake realtime model caches the way OpenAI's does. A prompt is the instructions
+followed by the conversation. Its cached input tokens are the prefix it shares with the
+previous prompt of the same session, counted once at least 1024 tokens match, in steps
+of 128 (4 bytes to a token). Usage goes back through ``metrics_collected``, as the
+plugin reports it, into ``PromptCacheUsage``.
+
+Both layouts are run:
+- per persona: one session per host, like ``dual_agent_worker``
+- shared: one session for both hosts, like ``dual_avatar_simple``
+
+``inline`` is the old way, with the user's words in the reply instructions.
+
+``--check`` is the test for the layout. It exits non-zero unless every reply of a
+persona sent byte-identical instructions, none of them contained the user's words, the
+model's conversation holds each user turn exactly once (the committed audio, or in a
+shared session the text item that replaced it), ``PromptCacheUsage`` agreed with the
+model's totals, and at least half the input was served from the cache.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from livekit.agents.llm import ChatContext, ChatMessage
+
+from benchmarks.common import report
+from prompts import PromptCacheUsage, PromptLayout
+
+PERSONAS = ("martha", "snoop")
+BYTES_PER_TOKEN = 4
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+AGENT_INSTRUCTIONS = "You are managing a dual avatar conversation between Martha and Snoop."
+STYLES = {
+    "martha": "You are Martha Stewart. Respond to the user's last message. Stay elegant and culinary-focused.",
+    "snoop": "You are Snoop Dogg. Respond to the user's last message. Stay laid-back and cool, nephew.",
+}
+INLINE = {
+    "martha": "You are Martha Stewart. Respond to: '{text}'. Stay elegant and culinary-focused.",
+    "snoop": "You are Snoop Dogg. Respond to: '{text}'. Stay laid-back and cool, nephew.",
+}
+WORDS = "hollandaise brunch spicy eggs toast whisk butter lemon pepper asparagus arugula".split()
+
+
+class FakeAgent:
+    """The agent's side of the conversation: its ``chat_ctx``, and pushing it to the model."""
+
+    def __init__(self, session: "FakeRealtimeSession"):
+        self.instructions = AGENT_INSTRUCTIONS
+        self._chat_ctx = ChatContext.empty()
+        self._session = session
+
+    @property
+    def chat_ctx(self) -> ChatContext:
+        return self._chat_ctx
+
+    async def update_chat_ctx(self, chat_ctx: ChatContext) -> None:
+        self._chat_ctx = chat_ctx.copy()
+        self._session.sync_items(chat_ctx)
+
+
+class FakeRealtimeSession:
+    """Just enough of ``AgentSession`` for ``PromptLayout`` and ``PromptCacheUsage``."""
+
+    def __init__(self, rng: random.Random):
+        self.current_agent = FakeAgent(self)
+        self.sent_instructions: List[bytes] = []
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.turns_heard = 0
+        self._rng = rng
+        self._items: List[Tuple[str, str, bytes]] = []  # the model's conversation: id, role, bytes
+        self._previous = np.zeros(0, dtype=np.uint8)
+        self._listeners: List[Callable[[Any], None]] = []
+
+    @property
+    def user_items(self) -> int:
+        return sum(role == "user" for _, role, _ in self._items)
+
+    def on(self, event: str, callback: Callable[[Any], None]) -> None:
+        assert event == "metrics_collected"
+        self._listeners.append(callback)
+
+    def user_audio(self, text: str, seconds: float) -> None:
+        """The user's speech, committed to the conversation by server-side turn detection.
+
+        Its transcript goes into the agent's context under the same item id, as the session
+        does with a realtime model.
+        """
+        message = ChatMessage(role="user", content=[text])
+        self._append(message.id, "user", self._padded("user_audio", int(seconds * 10)))
+        self.current_agent.chat_ctx.items.append(message)
+        self.turns_heard += 1
+
+    def sync_items(self, chat_ctx: ChatContext) -> None:
+        """Delete and create items until the model's conversation matches ``chat_ctx``."""
+        wanted = {item.id for item in chat_ctx.items}
+        self._items = [entry for entry in self._items if entry[0] in wanted]
+        known = {entry[0] for entry in self._items}
+        previous = None
+        for item in chat_ctx.items:
+            if item.id not in known:
+                at = next(i for i, entry in enumerate(self._items) if entry[0] == previous) + 1 if previous else 0
+                self._items.insert(at, (item.id, item.role, f"<{item.role}>{item.text_content}</{item.role}>".encode()))
+            previous = item.id
+
+    def generate_reply(self, *, instructions: str, user_input: str = "") -> "asyncio.Future[None]":
+        if user_input:
+            message = ChatMessage(role="user", content=[user_input])
+            self._append(message.id, "user", f"<user>{user_input}</user>".encode())
+            self.current_agent.chat_ctx.items.append(message)
+        self.sent_instructions.append(instructions.encode())
+        prompt = np.frombuffer(instructions.encode() + b"".join(entry[2] for entry in self._items), dtype=np.uint8)
+
+        shared = min(len(prompt), len(self._previous))
+        differs = np.flatnonzero(prompt[:shared] != self._previous[:shared])
+        matched = (differs[0] if len(differs) else shared) // BYTES_PER_TOKEN
+        cached = matched // CACHE_STEP_TOKENS * CACHE_STEP_TOKENS if matched >= CACHE_MIN_TOKENS else 0
+        tokens = len(prompt) // BYTES_PER_TOKEN
+        self._previous = prompt
+        self.input_tokens += tokens
+        self.cached_tokens += cached
+
+        reply = ChatMessage(role="assistant", content=["..."])
+        self._append(reply.id, "assistant", self._padded("assistant_audio", int(self._rng.uniform(5.0, 15.0) * 20)))
+        self.current_agent.chat_ctx.items.append(reply)
+        metrics = SimpleNamespace(
+            type="realtime_model_metrics",
+            input_tokens=tokens,
+            input_token_details=SimpleNamespace(cached_tokens=cached),
+        )
+        for listener in self._listeners:
+            listener(SimpleNamespace(metrics=metrics))
+        played = asyncio.get_running_loop().create_future()
+        played.set_result(None)
+        return played
+
+    def _append(self, item_id: str, role: str, data: bytes) -> None:
+        self._items.append((item_id, role, data))
+
+    def _padded(self, kind: str, tokens: int) -> bytes:
+        return f"<{kind} {len(self._items)}>".encode().ljust(tokens * BYTES_PER_TOKEN, b".")
+
+
+async def run(layout: str, shared: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    sessions = {persona: FakeRealtimeSession(rng) for persona in PERSONAS}
+    if shared:
+        sessions = {persona: sessions[PERSONAS[0]] for persona in PERSONAS}
+    prompts = PromptLayout(STYLES, shared_session=shared)
+    usage = PromptCacheUsage()
+    for persona in PERSONAS:
+        if not shared or persona == PERSONAS[0]:
+            usage.watch(sessions[persona], persona)
+
+    texts = []
+    for turn in range(args.turns):
+        persona = PERSONAS[turn % 2]
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))
+        texts.append(text)
+        seconds = rng.uniform(2.0, 8.0)
+        # Every session hears the user
+        for session in {id(s): s for s in sessions.values()}.values():
+            session.user_audio(text, seconds)
+        session = sessions[persona]
+        if layout == "inline":
+            session.generate_reply(instructions=INLINE[persona].format(text=text))
+        else:
+            await prompts.reply(session, persona, text)
+
+    unique = list({id(s): s for s in sessions.values()}.values())
+    summary = usage.summary()
+    return {
+        "hit_ratio": summary["hit_ratio"],
+        "uncached_per_turn": (summary["input_tokens"] - summary["cached_tokens"]) / args.turns,
+        "distinct_instructions": sum(len(set(s.sent_instructions)) for s in unique),
+        "text_in_instructions": any(
+            text.encode() in instructions for s in unique for instructions in s.sent_instructions for text in texts
+        ),
+        "usage_matches_model": summary["cached_tokens"] == sum(s.cached_tokens for s in unique)
+        and summary["input_tokens"] == sum(s.input_tokens for s in unique),
+        "user_items_per_turn": sum(s.user_items for s in unique) / sum(s.turns_heard for s in unique),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail unless the layout keeps a byte-stable prefix")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    failures = []
+    for shared in (False, True):
+        for layout in ("inline", "layout"):
+            label = f"{'shared' if shared else 'per persona'}, {layout}"
+            result = results[label] = asyncio.run(run(layout, shared, args))
+            if layout == "layout" and (
+                result["distinct_instructions"] != (1 if shared else len(PERSONAS))
+                or result["text_in_instructions"]
+                or not result["usage_matches_model"]
+                or result["user_items_per_turn"] != 1.0
+                or result["hit_ratio"] < 0.5
+            ):
+                failures.append(label)
+    report(f"prompt cache, {args.turns} turns", results, as_json=args.json)
+
+    if args.check and failures:
+        print(f"out of bounds: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Hot-path cost of the room event log, as a share of the turn it records, and its size.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_recording --frames 50000 --check
+
+With ``EVENT_LOG`` set, every audio frame on its way to an avatar passes a
+``RecordingAudioOutput`` and every session event adds a record. Both are timed here
+against an unrecorded chain, and the per-turn cost is compared with the length of a
+turn; the budget is 1% of turn time, as for tracing. Bytes are what the log grows by
+per turn. ``--check`` also reads the log back and fails if any event is lost.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+from benchmarks.bench_tracing import NullAudioOutput
+from benchmarks.common import report
+from recording import EventKind, EventLog, RecordingAudioOutput, read_events
+
+BUDGET_PCT = 1.0
+# Session events in a turn besides the audio: user state twice, the utterance, the reply,
+# agent states (thinking, speaking, listening), the transcript and playback finished
+EVENTS_PER_TURN = 9
+
+
+def _event_cost_us(log: EventLog, events: int) -> float:
+    """Mean microseconds per ``record`` call, mixed kinds and two personas."""
+    started = time.perf_counter()
+    for i in range(events):
+        persona = "martha" if i % 2 else "snoop"
+        if i % 8 == 0:
+            log.record_text(EventKind.AGENT_STATE, persona, "speaking")
+        else:
+            log.record(EventKind.REPLY_STARTED, persona)
+    return (time.perf_counter() - started) / events * 1e6
+
+
+async def _frame_cost_us(log: EventLog, frames: int, frame_ms: int, recorded: bool) -> float:
+    """Mean microseconds per frame pushed through the audio output chain."""
+    sample_rate = 24000
+    samples_per_channel = sample_rate * frame_ms // 1000
+    frame = rtc.AudioFrame(b"\0\0" * samples_per_channel, sample_rate, 1, samples_per_channel)
+    output: io.AudioOutput = NullAudioOutput(sample_rate)
+    if recorded:
+        output = RecordingAudioOutput(output, log, "martha")
+
+    segment = max(1, 3000 // frame_ms)  # flush every ~3s of audio, like one reply
+    started = time.perf_counter()
+    for i in range(frames):
+        await output.capture_frame(frame)
+        if i % segment == segment - 1:
+            output.flush()
+    return (time.perf_counter() - started) / frames * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--frames", type=int, default=50000)
+    parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--turn-seconds", type=float, default=3.0, help="length of a typical reply")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if over budget or the log loses events")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.lkev")
+        log = EventLog(path)
+        event_us = _event_cost_us(log, args.events)
+        baseline_us = asyncio.run(_frame_cost_us(log, args.frames, args.frame_ms, recorded=False))
+        recorded_us = asyncio.run(_frame_cost_us(log, args.frames, args.frame_ms, recorded=True))
+        log.close()
+        size = os.path.getsize(path)
+        written = log.records
+        read = sum(1 for _ in read_events(path))
+
+    frame_us = max(0.0, recorded_us - baseline_us)
+    frames_per_turn = args.turn_seconds * 1000 / args.frame_ms
+    per_turn_us = EVENTS_PER_TURN * event_us + frame_us * frames_per_turn
+    overhead_pct = per_turn_us / (args.turn_seconds * 1e6) * 100
+    # Flushes are one record per segment, strings are a handful per room
+    bytes_per_turn = size / written * (EVENTS_PER_TURN + frames_per_turn + 1)
+
+    report(
+        "event log overhead on the hot path",
+        {
+            "record call (us)": round(event_us, 3),
+            "audio chain per frame (us)": {"unrecorded": baseline_us, "recorded": recorded_us, "recording": frame_us},
+            "per turn": {
+                "turn_s": args.turn_seconds,
+                "frames": int(frames_per_turn),
+                "overhead_us": per_turn_us,
+                "overhead_pct": overhead_pct,
+                "budget_pct": BUDGET_PCT,
+                "log_bytes": round(bytes_per_turn),
+            },
+            "events written / read back": f"{written} / {read}",
+        },
+        as_json=args.json,
+    )
+
+    if args.check:
+        failures = []
+        if overhead_pct >= BUDGET_PCT:
+            failures.append(f"{overhead_pct:.3f}% of turn time >= {BUDGET_PCT}%")
+        if read != written:
+            failures.append(f"wrote {written} records, read back {read} events")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Load test for one worker process hosting many rooms on a single event loop.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_rooms --rooms 1 10 50 --duration 5
+
+Every simulated room goes through ``rooms.AdmissionController`` and lives in a
+``rooms.RoomRegistry``. Its state holds two fake hosts (avatar + agent session), a turn
+scheduler, conversation memory and an input audio ring buffer. While running, each room
+processes 20 ms input frames in real time and answers a user turn every few seconds. Each
+room count runs in a fresh process, so memory per room is the RSS growth divided by the
+number of rooms. Loop lag is how late a 10 ms timer fires.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+
+import numpy as np
+import psutil
+
+from benchmarks.common import report, summarize
+from benchmarks.fakes import FakeAgentSession, FakeAvatarSession, FakeJobRequest, Latency
+from conversation_memory import ConversationMemory
+from rooms import AdmissionController, RoomRegistry
+from turn_scheduler import TurnScheduler
+
+SAMPLE_RATE = 24_000
+FRAME_SECONDS = 0.02
+PERSONAS = ("martha", "snoop")
+
+
+class SimulatedRoom:
+    def __init__(self, name: str, rng: random.Random, time_scale: float):
+        self.name = name
+        self.scheduler = TurnScheduler(list(PERSONAS))
+        self.memory = ConversationMemory()
+        self.avatars = {
+            p: FakeAvatarSession(avatar_id=p, latency=Latency(1.2), rng=rng, time_scale=time_scale)
+            for p in PERSONAS
+        }
+        self.sessions = {p: FakeAgentSession(latency=Latency(0.8), rng=rng, time_scale=time_scale) for p in PERSONAS}
+        # One second of input audio, as a VAD / ingest stage would keep
+        self.ring = np.zeros(SAMPLE_RATE, dtype=np.int16)
+        self.ring_pos = 0
+        self.frames = 0
+        self.turns = 0
+
+
+async def _run_room(room: SimulatedRoom, rng: random.Random, args: argparse.Namespace, stop_at: float) -> None:
+    await asyncio.gather(
+        *(room.avatars[p].start(room.sessions[p], room=room.name) for p in PERSONAS),
+        *(room.sessions[p].start(room=room.name) for p in PERSONAS),
+    )
+    samples = int(SAMPLE_RATE * FRAME_SECONDS)
+    frame = (np.sin(np.arange(samples) / 7.0) * 3000).astype(np.int16)
+
+    async def audio() -> None:
+        next_at = time.perf_counter()
+        while time.perf_counter() < stop_at:
+            # The per-frame work an ingest stage does: copy into the ring, measure the level
+            end = room.ring_pos + samples
+            room.ring[room.ring_pos:end] = frame
+            room.ring_pos = end % len(room.ring)
+            float(np.sqrt(np.mean(frame.astype(np.float32) ** 2)))
+            room.frames += 1
+            next_at += FRAME_SECONDS
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+    async def turns() -> None:
+        while True:
+            due = time.perf_counter() + rng.uniform(0.5, 1.5) * args.turn_interval
+            if due >= stop_at:
+                return
+            await asyncio.sleep(due - time.perf_counter())
+            request = room.scheduler.submit(f"user turn {room.turns} in {room.name}")
+            room.memory.add("user", f"user turn {room.turns}")
+            while request is not None:
+                await asyncio.sleep(rng.uniform(0.2, 0.6))
+                room.memory.add(request.persona, f"reply to {request.text}")
+                room.turns += 1
+                request = room.scheduler.complete(request.persona)
+
+    await asyncio.gather(audio(), turns())
+
+
+async def _load_test(n: int, args: argparse.Namespace) -> dict:
+    process = psutil.Process()
+    rng = random.Random(args.seed)
+    registry: RoomRegistry[SimulatedRoom] = RoomRegistry(lambda name: SimulatedRoom(name, rng, args.time_scale))
+    admission = AdmissionController(registry, max_rooms=args.max_rooms)
+    rss_before = process.memory_info().rss
+
+    lags = []
+    stop_at = time.perf_counter() + args.duration
+
+    async def probe() -> None:
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append((time.perf_counter() - start - 0.01) * 1000)
+
+    tasks = [asyncio.create_task(probe())]
+    for i in range(n):
+        request = FakeJobRequest(f"room-{i}")
+        await admission.request_fnc(request)
+        if request.accepted:
+            room = registry.open(request.room.name)
+            tasks.append(asyncio.create_task(_run_room(room, rng, args, stop_at)))
+
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration / 2)
+    rss_peak = process.memory_info().rss
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    hosted = [registry.get(name) for name in registry.names()]
+    lag = summarize(lags)
+    return {
+        "admitted": len(hosted),
+        "rejected": admission.rejected,
+        "mb_per_room": (rss_peak - rss_before) / 2**20 / max(1, len(hosted)),
+        "lag_p50_ms": lag["p50"],
+        "lag_p95_ms": lag["p95"],
+        "lag_max_ms": lag["max"],
+        "frames_per_s": sum(r.frames for r in hosted) / elapsed,
+        "turns_per_s": sum(r.turns for r in hosted) / elapsed,
+    }
+
+
+def _run_in_process(n: int, args: argparse.Namespace) -> dict:
+    return asyncio.run(_load_test(n, args))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of traffic per room count")
+    parser.add_argument("--turn-interval", type=float, default=2.0, help="mean seconds between user turns")
+    parser.add_argument("--max-rooms", type=int, default=50, help="admission limit on open rooms")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="scales fake startup latencies")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    # A fresh process per room count keeps the RSS measurements independent
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for n in args.rooms:
+        with context.Pool(1) as pool:
+            results[f"{n} rooms"] = pool.apply(_run_in_process, (n, args))
+    report("rooms per worker process", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Avatar-side audio with one shared session: every avatar gets every frame vs. active-speaker routing.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_router --turns 200
+    python -m benchmarks.bench_router --keepalive 5 --check
+
+A scripted show alternates between the hosts, like ``dual_avatar_simple``. The next
+speaker is sometimes picked while the current line is still being generated. Fake
+avatar sinks count the frames they receive. ``broadcast`` is the old layout, where both
+avatars got every frame. ``routed`` goes through ``ActiveSpeakerAudioOutput``. The
+routed run also checks that every frame was delivered exactly once, as the same
+object (no copy), and that no line was split across avatars. ``--check`` exits non-zero
+if any of that fails.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from livekit import rtc
+
+from audio_outputs import ActiveSpeakerAudioOutput
+from benchmarks.common import report
+from benchmarks.fakes import FakeAudioSink
+
+PERSONAS = ("martha", "snoop")
+SAMPLE_RATE = 24000
+FRAME_MS = 20
+
+
+def _script(turns: int, rng: random.Random) -> List[Tuple[str, int, bool]]:
+    """(speaker, frames in the line, whether the next speaker is picked mid-line)."""
+    speaker = PERSONAS[0]
+    script = []
+    for _ in range(turns):
+        script.append((speaker, rng.randint(50, 400), rng.random() < 0.3))
+        speaker = rng.choice(PERSONAS) if rng.random() < 0.3 else PERSONAS[1 - PERSONAS.index(speaker)]
+    return script
+
+
+def _frame() -> rtc.AudioFrame:
+    samples = SAMPLE_RATE * FRAME_MS // 1000
+    return rtc.AudioFrame.create(SAMPLE_RATE, 1, samples)
+
+
+async def _broadcast(script, time_scale: float) -> Dict[str, int]:
+    sinks = {persona: FakeAudioSink(persona, time_scale=time_scale) for persona in PERSONAS}
+    for _, frames, _ in script:
+        for _ in range(frames):
+            frame = _frame()
+            for sink in sinks.values():
+                await sink.capture_frame(frame)
+        for sink in sinks.values():
+            sink.flush()
+    return {persona: len(sink.frames) for persona, sink in sinks.items()}
+
+
+async def _routed(script, time_scale: float, keepalive: float) -> Dict[str, float]:
+    sinks = {persona: FakeAudioSink(persona, time_scale=time_scale) for persona in PERSONAS}
+    router = ActiveSpeakerAudioOutput(dict(sinks), active=script[0][0], keepalive_interval=keepalive * time_scale)
+    await router.start()
+
+    sent: List[rtc.AudioFrame] = []
+    expected_owner: List[str] = []
+    route_us = 0.0
+    for i, (speaker, frames, pick_early) in enumerate(script):
+        router.route(speaker)
+        expected_owner.append(speaker)
+        next_speaker = script[i + 1][0] if i + 1 < len(script) else speaker
+        for n in range(frames):
+            if pick_early and n == frames // 2:
+                router.route(next_speaker)  # must not move the rest of this line
+            frame = _frame()
+            sent.append(frame)
+            started = time.perf_counter()
+            await router.capture_frame(frame)
+            route_us += (time.perf_counter() - started) * 1e6
+        router.flush()
+        await router.wait_for_playout()
+    await router.aclose()
+
+    sent_ids = {id(frame) for frame in sent}
+    received = [frame for sink in sinks.values() for frame in sink.frames if id(frame) in sent_ids]
+    delivered_once = len(received) == len(sent) and len({id(frame) for frame in received}) == len(sent)
+    keepalive_bytes = sum(sink.bytes_received for sink in sinks.values()) - sum(len(f.data) * 2 for f in received)
+
+    # Which avatar each frame landed on; a line must have landed on exactly one
+    avatar_of = {id(frame): persona for persona, sink in sinks.items() for frame in sink.frames}
+    owners: List[str] = []
+    split = 0
+    start = 0
+    for _, frames, _ in script:
+        holders = {avatar_of.get(id(frame)) for frame in sent[start : start + frames]}
+        start += frames
+        split += len(holders) > 1
+        owners.append(next(iter(holders)))
+
+    result: Dict[str, float] = {persona: len(sinks[persona].frames) for persona in PERSONAS}
+    result.update(
+        route_us_per_frame=route_us / len(sent),
+        keepalive_pct=keepalive_bytes / sum(sink.bytes_received for sink in sinks.values()) * 100,
+        delivered_once=delivered_once,
+        split_lines=split,
+        wrong_avatar=sum(owner != expected for owner, expected in zip(owners, expected_owner)),
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--keepalive", type=float, default=0.0, help="seconds between idle keep-alives (0 = off)")
+    parser.add_argument("--time-scale", type=float, default=0.001, help="scale on playout time")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--check", action="store_true", help="fail unless routing was exact")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    script = _script(args.turns, random.Random(args.seed))
+    results = {
+        "broadcast": asyncio.run(_broadcast(script, args.time_scale)),
+        "routed": asyncio.run(_routed(script, args.time_scale, args.keepalive)),
+    }
+    report(f"avatar audio frames over {args.turns} lines", results, as_json=args.json)
+
+    routed = results["routed"]
+    if args.check and not (routed["delivered_once"] and routed["split_lines"] == 0 and routed["wrong_avatar"] == 0):
+        print("routing was not exact", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Soak test: memory and open connections over 1,000 agent-swap handoffs.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_soak --handoffs 1000 --check
+
+Every handoff does what ``dual_agent_orchestrated``'s agent swap does: a new host with its
+own fake avatar and model connection, started in ``on_enter``, plus a background task.
+Each avatar holds a frame buffer, so a leaked one shows up in memory.
+
+- "unowned": the previous hosts are simply dropped, as before ``resources.RoomResources``.
+- "owned": each host's avatar and model go in a ``RoomResources`` slot, so the previous
+  host's are closed when the new one is up. The room is closed at the end.
+
+Memory is the traced Python heap (tracemalloc), sampled every ``--sample-every``
+handoffs. ``--check`` fails if the owned run's memory or open connections grow after the
+first sample, or if anything outlives the room.
+"""
+
+import argparse
+import asyncio
+import gc
+import sys
+import tracemalloc
+from typing import Dict, List, Optional
+
+from benchmarks.common import report
+from resources import RoomResources, tracker
+
+AVATAR_BUFFER_BYTES = 64 * 1024
+MEMORY_SLACK_BYTES = 64 * 1024  # allocator noise allowed between the first and last sample
+
+
+class Connections:
+    """Open fake connections by kind."""
+
+    def __init__(self) -> None:
+        self.open: Dict[str, int] = {"avatar": 0, "model": 0}
+
+    def peak(self) -> int:
+        return sum(self.open.values())
+
+
+class FakeConnection:
+    def __init__(self, kind: str, connections: Connections, payload: int = 0):
+        self._kind = kind
+        self._connections = connections
+        self._payload = bytearray(payload)
+        self.closed = False
+        connections.open[kind] += 1
+
+    async def aclose(self) -> None:
+        await asyncio.sleep(0)
+        if not self.closed:
+            self.closed = True
+            self._payload = bytearray()
+            self._connections.open[self._kind] -= 1
+
+
+class FakeHost:
+    """An agent-swap host: its own avatar and model, started when it enters."""
+
+    def __init__(self, persona: str, connections: Connections, keep: List["FakeHost"]):
+        self.persona = persona
+        self._connections = connections
+        self.avatar = None
+        self.model = None
+        keep.append(self)  # like the session and avatar callbacks that keep old hosts reachable
+
+    async def on_enter(self, resources: Optional[RoomResources] = None) -> None:
+        self.model = FakeConnection("model", self._connections)
+        self.avatar = FakeConnection("avatar", self._connections, AVATAR_BUFFER_BYTES)
+        if resources is not None:
+            resources.add("model", self.persona, self.model.aclose, slot="model")
+            resources.add("avatar", self.persona, self.avatar.aclose, slot="avatar")
+
+
+async def _run(owned: bool, args: argparse.Namespace) -> dict:
+    connections = Connections()
+    resources = tracker.open(f"soak-{'owned' if owned else 'unowned'}") if owned else None
+    keep: List[FakeHost] = []
+    samples: List[int] = []
+    open_samples: List[int] = []
+    tracemalloc.start()
+    for handoff in range(args.handoffs):
+        persona = ("martha", "snoop")[handoff % 2]
+        host = FakeHost(persona, connections, keep)
+        await host.on_enter(resources)
+        if owned:
+            resources.task(asyncio.sleep(0), "hand_off")
+        else:
+            asyncio.ensure_future(asyncio.sleep(0))
+        await asyncio.sleep(0)
+        if owned:
+            # Drop what the registry has closed, as the session would once the swap is done
+            keep[:] = [host for host in keep if not host.avatar.closed]
+        if (handoff + 1) % args.sample_every == 0:
+            for _ in range(3):
+                await asyncio.sleep(0)
+            gc.collect()
+            samples.append(tracemalloc.get_traced_memory()[0])
+            open_samples.append(connections.peak())
+    if owned:
+        await resources.aclose()
+    tracemalloc.stop()
+    return {
+        "memory_kb": [round(sample / 1024, 1) for sample in samples],
+        "open_connections": open_samples,
+        "open_after_close": connections.peak(),
+        "superseded": resources.superseded if owned else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--handoffs", type=int, default=1000)
+    parser.add_argument("--sample-every", type=int, default=100)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit non-zero unless memory and connections stay flat")
+    args = parser.parse_args()
+
+    unowned = asyncio.run(_run(False, args))
+    owned = asyncio.run(_run(True, args))
+    leaks = tracker.leaks()
+    results = {
+        "unowned memory (KB)": unowned["memory_kb"][-1],
+        "unowned open connections": unowned["open_connections"][-1],
+        "owned memory (KB)": owned["memory_kb"][-1],
+        "owned memory growth (KB)": round(owned["memory_kb"][-1] - owned["memory_kb"][0], 1),
+        "owned open connections": max(owned["open_connections"]),
+        "owned open after room close": owned["open_after_close"],
+        "owned superseded": owned["superseded"],
+        "leaks": len(leaks),
+    }
+    report("soak over agent-swap handoffs", results, as_json=args.json)
+
+    if args.check:
+        failures = []
+        growth = (owned["memory_kb"][-1] - owned["memory_kb"][0]) * 1024
+        if growth > MEMORY_SLACK_BYTES:
+            failures.append(f"memory grew {growth / 1024:.0f}KB over {args.handoffs} handoffs")
+        if len(set(owned["open_connections"])) != 1:
+            failures.append(f"open connections not flat: {owned['open_connections']}")
+        if owned["open_after_close"]:
+            failures.append(f"{owned['open_after_close']} connections open after the room closed")
+        if leaks:
+            failures.append(f"{len(leaks)} resources outlived their room")
+        if failures:
+            print("out of bounds: " + "; ".join(failures))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
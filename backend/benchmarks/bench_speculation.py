@@ -0,0 +1,111 @@
+"""Gap between hosts with and without speculative reply drafting.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_speculation --turns 100 --ttfb 0.6
+
+Each user turn gets a reply from the chosen host, then a follow-up from the co-host. The
+fake realtime model takes ``--ttfb`` seconds to its first audio and generates audio faster
+than real time. Sequentially, the co-host only starts generating when the first host is
+done; with ``speculation.SpeculativeReplies`` its draft was generated in parallel and held.
+With probability ``--interrupt`` the user speaks again mid-reply, cancelling the follow-up.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import report, summarize
+from benchmarks.fakes import Latency
+from speculation import SpeculativeReplies
+
+TOKENS_PER_SECOND = 20.0
+GENERATION_SPEEDUP = 4.0  # audio is generated this many times faster than real time
+
+
+class FakeDraft:
+    """Draft on a fake realtime model; playback appends (start, end) to ``timeline``."""
+
+    def __init__(self, timeline: list, ttfb: float, duration: float, scale: float):
+        self._timeline = timeline
+        self._scale = scale
+        self._duration = duration
+        self._ready = time.perf_counter() + ttfb * scale
+
+    def _generated_seconds(self) -> float:
+        elapsed = (time.perf_counter() - self._ready) / self._scale
+        return max(0.0, min(self._duration, elapsed * GENERATION_SPEEDUP))
+
+    async def play(self) -> None:
+        wait = self._ready - time.perf_counter()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        start = time.perf_counter()
+        await asyncio.sleep(self._duration * self._scale)
+        self._timeline.append((start, time.perf_counter()))
+
+    def cancel(self) -> float:
+        return self._generated_seconds() * TOKENS_PER_SECOND
+
+
+async def _run(speculative: bool, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    scale = args.time_scale
+    ttfb = Latency(median=args.ttfb, spread=0.3)
+    timeline: list = []
+
+    def start_draft(persona: str, text: str, held: bool) -> FakeDraft:
+        return FakeDraft(timeline, ttfb.sample(rng), rng.uniform(3.0, 8.0), scale)
+
+    speculation = SpeculativeReplies(
+        ["martha", "snoop"], start_draft, max_wasted_tokens=args.max_wasted_tokens
+    )
+
+    gaps = []
+    for turn in range(args.turns):
+        chosen, co_host = ("martha", "snoop") if turn % 2 == 0 else ("snoop", "martha")
+        interrupted = rng.random() < args.interrupt
+        before = len(timeline)
+
+        if speculative:
+            if interrupted:
+                # The user speaks while the first reply plays: the warm draft goes stale
+                asyncio.get_running_loop().call_later(scale, speculation.cancel_warm)
+            await speculation.reply(chosen, f"turn {turn}")
+        else:
+            await start_draft(chosen, f"turn {turn}", False).play()
+            if not interrupted:
+                await start_draft(co_host, f"turn {turn}", False).play()
+
+        played = timeline[before:]
+        if len(played) == 2:
+            gaps.append((played[1][0] - played[0][1]) / scale)
+
+    result = {**summarize(gaps), "follow_ups": len(gaps)}
+    if speculative:
+        stats = speculation.stats
+        result.update(hit_rate=stats.hit_rate, wasted_tokens=stats.wasted_tokens)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--ttfb", type=float, default=0.6, help="median seconds to first audio")
+    parser.add_argument("--interrupt", type=float, default=0.2)
+    parser.add_argument("--max-wasted-tokens", type=float, default=20_000)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {
+        "sequential (before)": asyncio.run(_run(False, args)),
+        "speculative": asyncio.run(_run(True, args)),
+    }
+    report("gap between hosts (s)", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Room start-up latency: the old serial bring-up vs. ``startup.run_startup``.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_startup --trials 50
+
+Latencies are simulated in scaled time (``--time-scale``) and reported in real seconds.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import report, summarize
+from benchmarks.fakes import FakeAgentSession, FakeAvatarSession, FakeRoom, Latency
+from startup import StartupStep, TokenBucket, run_startup
+
+AVATAR_LATENCY = Latency(median=1.6, spread=0.3)
+SESSION_LATENCY = Latency(median=0.9, spread=0.3)
+
+
+def _make_room(rng: random.Random, time_scale: float, failure_rate: float):
+    avatars = [
+        FakeAvatarSession(
+            avatar_id=name,
+            latency=AVATAR_LATENCY,
+            rng=rng,
+            failure_rate=failure_rate,
+            time_scale=time_scale,
+        )
+        for name in ("snoop", "martha")
+    ]
+    sessions = [FakeAgentSession(latency=SESSION_LATENCY, rng=rng, time_scale=time_scale) for _ in avatars]
+    return FakeRoom(), avatars, sessions
+
+
+async def serial_startup(room, avatars, sessions, time_scale: float) -> None:
+    """The previous agent_worker.entrypoint sequence."""
+    await avatars[0].start(sessions[0], room=room)
+    await asyncio.sleep(2 * time_scale)
+    await avatars[1].start(sessions[1], room=room)
+    await sessions[0].start(room=room)
+    await sessions[1].start(room=room)
+
+
+async def pipelined_startup(room, avatars, sessions, time_scale: float) -> None:
+    # A fresh bucket per trial: each trial models one room on an idle worker
+    bucket = TokenBucket(rate=0.5 / time_scale, capacity=2)
+    steps = []
+    for name, avatar, session in zip(("snoop", "martha"), avatars, sessions):
+        steps.append(
+            StartupStep(
+                f"{name}_avatar",
+                lambda a=avatar, s=session: a.start(s, room=room),
+                rate_limited=True,
+                attempts=3,
+            )
+        )
+        steps.append(
+            StartupStep(f"{name}_session", lambda s=session: s.start(room=room), after=(f"{name}_avatar",))
+        )
+    await run_startup(steps, bucket=bucket, base_delay=0.5 * time_scale)
+
+
+async def _bench(layout, trials: int, time_scale: float, failure_rate: float, seed: int) -> list:
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(trials):
+        room, avatars, sessions = _make_room(rng, time_scale, failure_rate)
+        t0 = time.perf_counter()
+        try:
+            await layout(room, avatars, sessions, time_scale)
+        except ConnectionError:
+            # The serial layout has no retry; count the room as failed, not as a sample
+            continue
+        samples.append((time.perf_counter() - t0) / time_scale)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=30)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for label, layout in (("serial (before)", serial_startup), ("pipelined", pipelined_startup)):
+        samples = asyncio.run(_bench(layout, args.trials, args.time_scale, args.failure_rate, args.seed))
+        results[label] = {**summarize(samples), "failed": args.trials - len(samples)}
+    report("startup latency (s)", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Hot-path cost of per-turn tracing, as a share of the turn it traces.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_tracing --turns 20000
+    python -m benchmarks.bench_tracing --turn-seconds 1.5 --frame-ms 10
+
+Two costs land on the event loop during a turn: the tracer calls themselves (start, one
+mark per stage, end) and the first-frame taps that every audio frame passes through on
+its way to the avatar. Both are timed here against an untraced baseline and compared with
+the length of a turn. The budget is 1% of turn time.
+"""
+
+import argparse
+import asyncio
+import time
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+from audio_outputs import FirstFrameAudioOutput
+from benchmarks.common import report, summarize
+from tracing import STAGES, Tracer
+
+BUDGET_PCT = 1.0
+# Taps per reply in dual_agent_worker: audio_first_chunk and avatar_first_frame
+TAPS_PER_TRACK = 2
+
+
+class NullAudioOutput(io.AudioOutput):
+    """Sink at the end of the chain: accepts frames and drops them."""
+
+    def __init__(self, sample_rate: int) -> None:
+        super().__init__(next_in_chain=None, sample_rate=sample_rate)
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+
+    def flush(self) -> None:
+        super().flush()
+
+    def clear_buffer(self) -> None:
+        pass
+
+
+def _tracer_cost_us(turns: int, rooms: int) -> list:
+    """Microseconds of tracer calls per turn, with the ring buffer already full."""
+    tracer = Tracer(ring_size=1024)
+    clock = time.perf_counter
+    samples = []
+    for i in range(turns):
+        room = f"room-{i % rooms}"
+        track = "martha" if i % 2 else "snoop"
+        started = clock()
+        tracer.start_turn(room, track, utterances=1)
+        for stage in STAGES[1:-1]:
+            tracer.mark(room, track, stage)
+        tracer.end_turn(room, track)
+        samples.append((clock() - started) * 1e6)
+        if i % 256 == 0:
+            tracer.drain()  # what the export thread does
+    return samples
+
+
+async def _frame_cost_us(frames: int, frame_ms: int, traced: bool) -> float:
+    """Mean microseconds per frame pushed through the audio output chain."""
+    sample_rate = 24000
+    samples_per_channel = sample_rate * frame_ms // 1000
+    frame = rtc.AudioFrame(b"\0\0" * samples_per_channel, sample_rate, 1, samples_per_channel)
+    output: io.AudioOutput = NullAudioOutput(sample_rate)
+    if traced:
+        for _ in range(TAPS_PER_TRACK):
+            output = FirstFrameAudioOutput(output, lambda: None)
+
+    segment = max(1, 3000 // frame_ms)  # flush every ~3s of audio, like one reply
+    started = time.perf_counter()
+    for i in range(frames):
+        await output.capture_frame(frame)
+        if i % segment == segment - 1:
+            output.flush()
+    return (time.perf_counter() - started) / frames * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=50000)
+    parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--turn-seconds", type=float, default=3.0, help="length of a typical reply")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    tracer_us = summarize(_tracer_cost_us(args.turns, args.rooms))
+    baseline_us = asyncio.run(_frame_cost_us(args.frames, args.frame_ms, traced=False))
+    tapped_us = asyncio.run(_frame_cost_us(args.frames, args.frame_ms, traced=True))
+    tap_us = max(0.0, tapped_us - baseline_us)
+
+    frames_per_turn = args.turn_seconds * 1000 / args.frame_ms
+    per_turn_us = tracer_us["p95"] + tap_us * frames_per_turn
+    overhead_pct = per_turn_us / (args.turn_seconds * 1e6) * 100
+
+    report(
+        "tracing overhead on the hot path",
+        {
+            "tracer calls per turn (us)": tracer_us,
+            "audio chain per frame (us)": {"untraced": baseline_us, "traced": tapped_us, "taps": tap_us},
+            "per turn": {
+                "turn_s": args.turn_seconds,
+                "frames": int(frames_per_turn),
+                "overhead_us": per_turn_us,
+                "overhead_pct": overhead_pct,
+                "budget_pct": BUDGET_PCT,
+                "within_budget": overhead_pct < BUDGET_PCT,
+            },
+        },
+        as_json=args.json,
+    )
+
+
+if __name__ == "__main__":
+    main()
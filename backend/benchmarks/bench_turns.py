@@ -0,0 +1,114 @@
+"""Deterministic simulation of reply latency under bursts of user speech.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_turns --personas 2 4
+
+A discrete-event simulation (no sleeping, fully reproducible for a seed): the user talks in
+bursts, some utterances address a host by name, and every reply takes a few seconds to play.
+Latency is measured from an utterance to the start of the reply that answers it. "legacy" is
+the original ``count % 2`` alternation with one queued reply per utterance.
+"""
+
+import argparse
+import heapq
+import random
+
+from benchmarks.common import report, summarize
+from turn_scheduler import TurnScheduler, build_policies
+
+NAMES = ["martha", "snoop", "ina", "guy", "gordon", "julia"]
+
+CONFIGS = {
+    "legacy (modulo, queue)": dict(policies="round-robin", on_busy="queue", max_pending_age=float("inf")),
+    "round-robin + coalesce": dict(policies="round-robin", on_busy="coalesce"),
+    "addressed + coalesce": dict(policies="addressed,round-robin", on_busy="coalesce"),
+    "least-recent + coalesce": dict(policies="addressed,least-recent", on_busy="coalesce"),
+    "lowest-queue + coalesce": dict(policies="addressed,lowest-queue", on_busy="coalesce"),
+    "addressed + drop": dict(policies="addressed,round-robin", on_busy="drop"),
+}
+
+
+def _workload(rng: random.Random, personas: list, args: argparse.Namespace) -> list:
+    """(time, utterance id, text) for bursts of user speech."""
+    events, t, uid = [], 0.0, 0
+    for _ in range(args.bursts):
+        t += rng.expovariate(1 / args.burst_gap)
+        for _ in range(rng.randint(1, args.burst_size)):
+            t += rng.uniform(0.4, 1.5)
+            text = f"u{uid}"
+            if rng.random() < args.addressed:
+                text += f" {rng.choice(personas)}, what do you think?"
+            events.append((t, uid, text))
+            uid += 1
+    return events
+
+
+def _simulate(config: dict, personas: list, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    workload = _workload(rng, personas, args)
+    reply_rng = random.Random(args.seed + 1)
+
+    now = 0.0
+    scheduler = TurnScheduler(
+        personas,
+        policies=build_policies(config["policies"]),
+        on_busy=config["on_busy"],
+        max_pending_age=config.get("max_pending_age", args.max_pending_age),
+        exclusive=args.exclusive,
+        clock=lambda: now,
+    )
+
+    arrivals = {uid: t for t, uid, _ in workload}
+    latencies = []
+    queue = [(t, 0, "utterance", text) for t, _, text in workload]
+    heapq.heapify(queue)
+    seq = len(queue)
+
+    def start(request) -> None:
+        nonlocal seq
+        for word in request.text.split():
+            if word.startswith("u") and word[1:].isdigit():
+                latencies.append(now - arrivals[int(word[1:])])
+        seq += 1
+        heapq.heappush(queue, (now + reply_rng.uniform(2.5, 6.0), seq, "done", request.persona))
+
+    while queue:
+        now, _, kind, payload = heapq.heappop(queue)
+        if kind == "utterance":
+            request = scheduler.submit(payload)
+        else:
+            request = scheduler.complete(payload)
+        if request is not None:
+            start(request)
+
+    stats = scheduler.stats
+    return {
+        **summarize(latencies),
+        "replies": stats.dispatched,
+        "coalesced": stats.coalesced,
+        "dropped": stats.dropped,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--personas", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--bursts", type=int, default=500)
+    parser.add_argument("--burst-size", type=int, default=4)
+    parser.add_argument("--burst-gap", type=float, default=20.0)
+    parser.add_argument("--addressed", type=float, default=0.3, help="share of utterances naming a host")
+    parser.add_argument("--max-pending-age", type=float, default=8.0)
+    parser.add_argument("--exclusive", action="store_true", help="one shared floor (single-session layout)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    for n in args.personas:
+        personas = NAMES[:n]
+        results = {label: _simulate(config, personas, args) for label, config in CONFIGS.items()}
+        report(f"reply latency (s), {n} personas", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
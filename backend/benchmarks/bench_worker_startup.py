@@ -0,0 +1,92 @@
+"""Time from launching a worker entry point until it asks LiveKit to register it.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_worker_startup --runs 5
+    python -m benchmarks.bench_worker_startup --entrypoints agent_worker dual_agent_dispatch
+
+Each run starts ``python <entrypoint>.py start`` against a local websocket endpoint that
+stands in for the LiveKit server. The clock stops when the worker's register request
+arrives, which is the start-up cost a deploy pays before the worker can take jobs. Every
+entry point is measured with eager imports and with ``LAZY_IMPORTS=1``.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from aiohttp import web
+
+from benchmarks.common import report, summarize
+
+ENTRYPOINTS = ["agent_worker", "dual_agent_worker", "dual_agent_dispatch"]
+
+
+async def _time_to_register(entrypoint: str, lazy: bool, timeout: float) -> float:
+    registered: "asyncio.Future[float]" = asyncio.get_running_loop().create_future()
+
+    async def agent_ws(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.receive()  # the RegisterWorkerRequest
+        if not registered.done():
+            registered.set_result(time.perf_counter())
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/agent", agent_ws)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    env = dict(
+        os.environ,
+        LIVEKIT_URL=f"ws://127.0.0.1:{port}",
+        LIVEKIT_API_KEY="bench",
+        LIVEKIT_API_SECRET="bench-secret-" + "x" * 32,
+        LAZY_IMPORTS="1" if lazy else "0",
+    )
+    started = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, f"{entrypoint}.py", "start"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        return await asyncio.wait_for(registered, timeout) - started
+    finally:
+        worker.terminate()
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entrypoints", nargs="+", default=ENTRYPOINTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for entrypoint in args.entrypoints:
+        for lazy in (False, True):
+            samples = [
+                asyncio.run(_time_to_register(entrypoint, lazy, args.timeout)) for _ in range(args.runs)
+            ]
+            results[f"{entrypoint} ({'lazy' if lazy else 'eager'})"] = summarize(samples)
+    report("time to worker registration (s)", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
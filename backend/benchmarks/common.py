@@ -0,0 +1,40 @@
+import json
+import math
+import sys
+from typing import Any, Dict, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile, ``pct`` in [0, 100]."""
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    return {
+        "n": len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "max": max(samples) if samples else float("nan"),
+    }
+
+
+def report(name: str, results: Dict[str, Any], *, as_json: bool = False) -> None:
+    """Print benchmark results either as a readable table or as one JSON line."""
+    if as_json:
+        json.dump({"benchmark": name, "results": results}, sys.stdout)
+        sys.stdout.write("\n")
+        return
+
+    print(f"== {name}")
+    for label, value in results.items():
+        if isinstance(value, dict):
+            cells = "  ".join(
+                f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in value.items()
+            )
+            print(f"  {label:<28} {cells}")
+        else:
+            print(f"  {label:<28} {value}")
@@ -0,0 +1,127 @@
+"""Local stand-ins for the LiveKit / OpenAI / Hedra objects the workers talk to.
+
+They only model what the benchmarks measure (latency and failures), with latencies drawn
+from a seeded RNG so runs are repeatable.
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+
+@dataclass
+class Latency:
+    """Log-normal latency in seconds, parameterised by its median and spread."""
+
+    median: float
+    spread: float = 0.25
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.lognormvariate(0, self.spread) * self.median
+
+
+class FakeRoom:
+    def __init__(self, name: str = "bench-room"):
+        self.name = name
+        self.remote_participants: dict = {}
+
+
+class FakeAvatarSession:
+    """Stand-in for ``hedra.AvatarSession``: ``start`` costs one API round trip."""
+
+    def __init__(
+        self,
+        *,
+        avatar_id: str,
+        latency: Latency,
+        rng: random.Random,
+        failure_rate: float = 0.0,
+        time_scale: float = 1.0,
+    ):
+        self.avatar_id = avatar_id
+        self._latency = latency
+        self._rng = rng
+        self._failure_rate = failure_rate
+        self._time_scale = time_scale
+        self.started = False
+        self.start_calls = 0
+
+    async def start(self, agent_session: Any, room: Any) -> None:
+        self.start_calls += 1
+        await asyncio.sleep(self._latency.sample(self._rng) * self._time_scale)
+        if self._rng.random() < self._failure_rate:
+            raise ConnectionError(f"avatar {self.avatar_id} start rejected (429)")
+        self.started = True
+
+
+class FakeAgentSession:
+    """Stand-in for ``AgentSession``: ``start`` costs a realtime-model connect."""
+
+    def __init__(self, *, latency: Latency, rng: random.Random, time_scale: float = 1.0):
+        self._latency = latency
+        self._rng = rng
+        self._time_scale = time_scale
+        self.started = False
+        self.userdata: Optional[Any] = None
+
+    async def start(self, *, room: Any, agent: Any = None, **kwargs: Any) -> None:
+        await asyncio.sleep(self._latency.sample(self._rng) * self._time_scale)
+        self.started = True
+
+
+class FakeJobRequest:
+    """Stand-in for ``JobRequest``: records whether the worker accepted the room."""
+
+    def __init__(self, room_name: str):
+        self.room = FakeRoom(room_name)
+        self.accepted: Optional[bool] = None
+
+    async def accept(self, **kwargs: Any) -> None:
+        self.accepted = True
+
+    async def reject(self) -> None:
+        self.accepted = False
+
+
+class FakeAudioSink(io.AudioOutput):
+    """Stand-in for an avatar's audio output: records what it receives, plays it out in
+    (scaled) real time and reports ``playback_finished`` like the avatar would."""
+
+    def __init__(self, name: str, *, sample_rate: int = 24000, time_scale: float = 1.0):
+        super().__init__(next_in_chain=None, sample_rate=sample_rate)
+        self.name = name
+        self._time_scale = time_scale
+        self.frames: List[rtc.AudioFrame] = []
+        self.segments: List[List[rtc.AudioFrame]] = []
+        self._segment: Optional[List[rtc.AudioFrame]] = None
+        self._playout: Optional[asyncio.TimerHandle] = None
+        self.bytes_received = 0
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if self._segment is None:
+            self._segment = []
+            self.segments.append(self._segment)
+        self._segment.append(frame)
+        self.frames.append(frame)
+        self.bytes_received += len(frame.data) * frame.data.itemsize
+
+    def flush(self) -> None:
+        super().flush()
+        if self._segment is None:
+            return
+        duration = sum(frame.duration for frame in self._segment)
+        self._segment = None
+        self._playout = asyncio.get_running_loop().call_later(
+            duration * self._time_scale,
+            lambda: self.on_playback_finished(playback_position=duration, interrupted=False),
+        )
+
+    def clear_buffer(self) -> None:
+        if self._playout is not None and not self._playout.cancelled():
+            self._playout.cancel()
+            self.on_playback_finished(playback_position=0.0, interrupted=True)
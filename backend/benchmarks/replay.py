@@ -0,0 +1,182 @@
+"""Replay a recorded room (``EVENT_LOG``) against an entry point in the simulated room.
+
+Run from ``backend/``:
+
+    python -m benchmarks.replay /var/log/shows/demo.lkev dual_agent_worker
+    python -m benchmarks.replay /var/log/shows/demo.lkev dual_agent_worker --speed max
+
+The log's timeline drives ``benchmarks.sim`` instead of the synthetic distributions:
+
+- the viewer says the recorded lines, for as long as the user spoke, after the recorded pauses
+- each reply's first audio comes after the recorded delay from reply start to first chunk
+- replies are as long as the recorded ones, and their frames arrive with the recorded gaps
+- avatars join after the recorded delays and report playback finished as late as they did
+
+The entry point's own code (turn scheduling, handoffs, playout) runs as it is now, so a
+show recorded before a change can be replayed after it. ``--speed 2`` plays it twice as
+fast; ``--speed max`` drops every simulated delay (the worker's own timers still run in
+real time). Results are in show time: measured times are divided by the speed. At
+``max`` only counts are meaningful.
+
+A recording made in the simulation works too, e.g. ``EVENT_LOG=/tmp/shows/{room}.lkev
+python -m benchmarks.bench_entrypoints dual_agent_worker --rooms 1``.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.bench_entrypoints import ENTRY_POINTS, run_room
+from benchmarks.common import report, summarize
+from benchmarks.sim import Recorded, ScriptedUser, SimJobContext, SimProfile, SimRoom, patch_module
+from livekit import rtc
+from recording import Event, EventKind, read_events
+
+QUIET_WAIT_S = 10.0  # at max speed, how long a line waits for the hosts to finish
+STARTUP_WAIT_S = 10.0
+
+
+class Timeline:
+    """What the stand-ins need from a recorded room, in show seconds."""
+
+    def __init__(self, events: List[Event], *, lead: float):
+        self.lines: List[Tuple[float, str, float]] = []  # (pause, text, duration), as ScriptedUser takes them
+        self.first_audio: List[float] = []
+        self.speech: List[float] = []
+        self.frame_gaps: List[float] = []
+        self.avatar_starts: List[float] = []
+        self.playback_rpc: List[float] = []
+        self.turn_latency: List[float] = []  # user done to the next chunk plus the avatar lead
+        self.duration = events[-1].at if events else 0.0
+        self._read(events, lead)
+
+    def _read(self, events: List[Event], lead: float) -> None:
+        speaking_since: Optional[float] = None
+        last_end = 0.0
+        user_done: Optional[float] = None
+        requested: Dict[str, float] = {}
+        segment: Dict[str, List[float]] = {}  # track: [first chunk at, last chunk at, seconds, flushed at]
+        played: Dict[str, List[Tuple[float, float]]] = {}  # track: [(audible end estimate, ...)]
+        for event in events:
+            track = event.track
+            if event.kind == EventKind.USER_STATE:
+                if event.arg:
+                    speaking_since = event.at
+                else:
+                    user_done = event.at
+            elif event.kind == EventKind.USER_SPEECH:
+                if speaking_since is None:
+                    # Not spoken: a worker passing text in with generate_reply(user_input=...)
+                    continue
+                start = speaking_since
+                end = user_done if user_done is not None and user_done >= start else event.at
+                self.lines.append((max(0.0, start - last_end), event.text or "", max(0.0, end - start)))
+                last_end = end
+                speaking_since = None
+            elif event.kind == EventKind.REPLY_STARTED:
+                requested[track] = event.at
+            elif event.kind == EventKind.AUDIO_CHUNK:
+                seconds = event.arg / 1_000_000
+                current = segment.get(track)
+                if current is None:
+                    segment[track] = [event.at, event.at, seconds, 0.0]
+                    if track in requested:
+                        self.first_audio.append(event.at - requested.pop(track))
+                    if user_done is not None:
+                        self.turn_latency.append(event.at + lead - user_done)
+                        user_done = None
+                else:
+                    self.frame_gaps.append(event.at - current[1])
+                    current[1] = event.at
+                    current[2] += seconds
+            elif event.kind in (EventKind.AUDIO_FLUSH, EventKind.AUDIO_CLEAR):
+                current = segment.pop(track, None)
+                if current is not None:
+                    self.speech.append(current[2])
+                    ends = max(current[0] + lead + current[2], event.at + lead)
+                    played.setdefault(track, []).append(ends)
+            elif event.kind == EventKind.PLAYBACK_FINISHED:
+                pending = played.get(track)
+                if pending:
+                    self.playback_rpc.append(max(0.0, event.at - pending.pop(0)))
+            elif event.kind == EventKind.PARTICIPANT_JOINED:
+                if event.arg == rtc.ParticipantKind.PARTICIPANT_KIND_AGENT:
+                    self.avatar_starts.append(event.at)
+
+    def profile(self, scale: float) -> SimProfile:
+        defaults = SimProfile()
+        return SimProfile(
+            model_first_audio=Recorded(self.first_audio, default=0.45),
+            speech_duration=Recorded(self.speech, default=2.5),
+            chunk_gap=Recorded(self.frame_gaps, default=0.0) if self.frame_gaps else None,
+            avatar_start=Recorded(self.avatar_starts, default=1.2),
+            avatar_lead=defaults.avatar_lead,
+            playback_rpc=Recorded(self.playback_rpc, default=0.08),
+            api_call=defaults.api_call,
+            time_scale=scale,
+        )
+
+
+async def _replay(module_name: str, timeline: Timeline, scale: float, args: argparse.Namespace) -> Dict[str, list]:
+    module = sys.modules[module_name]
+    rng = random.Random(args.seed)
+    profile = timeline.profile(scale)
+    patch_module(module, profile, rng)
+    ctx = SimJobContext(SimRoom(f"replay-{module_name}"), profile, rng, metadata=ENTRY_POINTS[module_name])
+    user = ScriptedUser(
+        lines=[(pause * scale, text, duration * scale) for pause, text, duration in timeline.lines],
+        # Without delays, the order is kept by letting the hosts finish before each line
+        wait_for_quiet=0.0 if scale else QUIET_WAIT_S,
+    )
+    return await run_room(
+        module, ctx, user, startup_timeout=0.0 if scale else STARTUP_WAIT_S, settle=args.settle * scale
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", help="an EVENT_LOG file")
+    parser.add_argument("entry_point", choices=list(ENTRY_POINTS))
+    parser.add_argument("--speed", default="1", help="replay speed, or 'max' for as fast as possible")
+    parser.add_argument("--settle", type=float, default=5.0, help="show seconds after the last line")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    scale = 0.0 if args.speed == "max" else 1.0 / float(args.speed)
+
+    events = list(read_events(args.log))
+    profile = SimProfile()
+    timeline = Timeline(events, lead=profile.avatar_lead)
+    __import__(args.entry_point)
+    # Some entry modules configure INFO logging when imported
+    logging.getLogger().setLevel(logging.WARNING)
+
+    started = time.perf_counter()
+    run = asyncio.run(_replay(args.entry_point, timeline, scale, args))
+    elapsed = time.perf_counter() - started
+
+    def show_time(values: List[float]) -> List[float]:
+        return [value / scale for value in values] if scale else []
+
+    results = {
+        "recorded events": len(events),
+        "recorded lines": len(timeline.lines),
+        "recorded show (s)": round(timeline.duration, 2),
+        "replay wall time (s)": round(elapsed, 2),
+        "recorded turn latency": summarize(timeline.turn_latency),
+        "replayed startup": summarize(show_time(run["startup"])),
+        "replayed turn latency": summarize(show_time(run["turns"])),
+        "replayed handoff gap": summarize(show_time(run["gaps"])),
+        "replayed segments": sum(run["segments"]),
+        "replayed answers": len(run["turns"]),
+    }
+    speed = "max speed" if args.speed == "max" else f"{args.speed}x"
+    report(f"replay of {args.log} on {args.entry_point} at {speed}", results, as_json=args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,591 @@
+"""In-process stand-ins for a whole room, so the real entry points run without any service.
+
+``fakes.py`` covers the pieces single benchmarks need. This covers everything an entry
+point touches between ``entrypoint(ctx)`` and shutdown:
+
+- ``SimJobContext``: the job (room, metadata, room service API, shutdown callbacks)
+- ``SimRoom``: participants and room events; ``ScriptedUser`` joins and speaks in it
+- ``SimRealtimeModel``: first-audio and speech-length latency distributions
+- ``SimAgentSession``: the ``AgentSession`` surface the workers use. ``generate_reply``
+  streams 20ms frames into whatever audio output chain the worker built, faster than
+  real time and in jittery chunks. Each session hears the user after its own server-side
+  VAD delay and then interrupts its own speech, as a realtime session does. Like the SDK
+  with server-side turn detection, it reports the user's turn through
+  ``user_input_transcribed`` and ``conversation_item_added`` and never calls an agent's
+  ``on_user_turn_completed``; the model answers by itself unless its ``auto_reply`` is off.
+  An agent defining any other ``on_*`` hook fails to start, since the SDK would never call it
+- ``SimAvatarSession`` / ``SimAvatarSink``: joins the room as a participant and
+  timestamps when every segment it receives becomes audible
+
+``patch_module`` swaps them in for a worker module's ``AgentSession``, ``hedra``,
+``openai`` and ``connect_realtime_model``. ``run_in_job`` runs a coroutine with the
+job context ``get_job_context()`` returns. For replaying a recorded show
+(``benchmarks/replay.py``), ``SimProfile`` takes ``Recorded`` values in place of any
+distribution, and ``time_scale`` stretches or shrinks every simulated delay.
+"""
+
+import asyncio
+import inspect
+import itertools
+import os
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from types import ModuleType, SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, Sequence, Tuple
+
+from livekit import rtc
+from livekit.agents import Agent
+from livekit.agents.job import _JobContextVar
+from livekit.agents.llm import ChatMessage
+from livekit.agents.voice import io
+
+from benchmarks.fakes import Latency
+
+# Simulated rooms reuse their names from run to run, so each run keeps its checkpoints to
+# itself instead of resuming the last run's shows
+os.environ.setdefault("CHECKPOINT_DIR", tempfile.mkdtemp(prefix="sim-checkpoints-"))
+
+SAMPLE_RATE = 24000
+FRAME_S = 0.02
+CHUNK_FRAMES = 5  # the model delivers audio in 100ms chunks
+GENERATION_SPEEDUP = 3.0
+
+
+class Sampler(Protocol):
+    def sample(self, rng: random.Random) -> float: ...
+
+
+class Recorded:
+    """Recorded values, handed out in order (and round again) instead of sampled."""
+
+    def __init__(self, values: Sequence[float], *, default: float = 0.0):
+        self._values = list(values) or [default]
+        self._next = 0
+
+    def sample(self, rng: random.Random) -> float:
+        value = self._values[self._next % len(self._values)]
+        self._next += 1
+        return value
+
+
+@dataclass
+class SimProfile:
+    """Latency distributions for the simulated services, in seconds."""
+
+    model_first_audio: Sampler = field(default_factory=lambda: Latency(median=0.45, spread=0.3))
+    speech_duration: Sampler = field(default_factory=lambda: Latency(median=2.5, spread=0.3))
+    chunk_jitter: float = 1.0  # mean of the exponential factor on each chunk's delivery time
+    chunk_gap: Optional[Sampler] = None  # time before each frame, instead of jittery chunks
+    avatar_start: Sampler = field(default_factory=lambda: Latency(median=1.2, spread=0.3))
+    avatar_lead: float = 0.15  # audio in to audible at the avatar
+    playback_rpc: Sampler = field(default_factory=lambda: Latency(median=0.08, spread=0.4))
+    api_call: Sampler = field(default_factory=lambda: Latency(median=0.05, spread=0.3))
+    # The user starting to speak until the model's server-side VAD reports it, per session
+    speech_detected: Sampler = field(default_factory=lambda: Latency(median=0.2, spread=0.5))
+    time_scale: float = 1.0  # multiplies every simulated delay; 0 runs as fast as possible
+
+    def wait(self, seconds: float) -> Awaitable[None]:
+        return asyncio.sleep(seconds * self.time_scale)
+
+
+class SimParticipant:
+    def __init__(self, identity: str, kind: int, name: str = ""):
+        self.identity = identity
+        self.name = name or identity
+        self.kind = kind
+        self.track_publications: Dict[str, Any] = {}
+
+
+class SimLocalParticipant:
+    identity = "agent-sim"
+
+    def __init__(self) -> None:
+        self.published: List[Any] = []
+        self.rpc_methods: Dict[str, Callable] = {}
+
+    async def publish_track(self, track: Any, options: Any = None) -> Any:
+        self.published.append(track)
+        return SimpleNamespace(sid=f"TR_local{len(self.published)}", track=track)
+
+    def register_rpc_method(self, method: str, handler: Callable) -> None:
+        self.rpc_methods[method] = handler
+
+
+class SimRoom(rtc.EventEmitter):
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self.remote_participants: Dict[str, SimParticipant] = {}
+        self.local_participant = SimLocalParticipant()
+        self.sessions: List["SimAgentSession"] = []
+        self.avatar_sinks: List["SimAvatarSink"] = []
+        self.speech_detected: List[float] = []  # loop time each session heard the user start speaking
+        self.reply_instructions: List[Optional[str]] = []  # every generate_reply's, in order
+
+    def isconnected(self) -> bool:
+        return True
+
+    def join(self, participant: SimParticipant) -> None:
+        self.remote_participants[participant.identity] = participant
+        self.emit("participant_connected", participant)
+
+    def leave(self, identity: str) -> None:
+        participant = self.remote_participants.pop(identity, None)
+        if participant is not None:
+            self.emit("participant_disconnected", participant)
+
+    async def quiet(self, timeout: float) -> None:
+        """Wait until no session in the room is speaking, for up to ``timeout`` seconds."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while any(session.speaking for session in self.sessions):
+            if asyncio.get_running_loop().time() >= deadline:
+                return
+            await asyncio.sleep(0.01)
+
+    async def user_said(self, text: str, duration: float) -> None:
+        """The user speaks for ``duration`` seconds; every session with its input on hears it."""
+        await asyncio.gather(*(session.hear(text, duration) for session in list(self.sessions)))
+
+
+class SimRoomService:
+    """``ctx.api.room``: only what the workers call, with a round trip each."""
+
+    def __init__(self, room: SimRoom, profile: SimProfile, rng: random.Random):
+        self._room = room
+        self._profile = profile
+        self._rng = rng
+        self.calls: List[Tuple[str, Any]] = []
+
+    async def remove_participant(self, request: Any) -> None:
+        await self._profile.wait(self._profile.api_call.sample(self._rng))
+        self.calls.append(("remove_participant", request.identity))
+        self._room.leave(request.identity)
+
+    async def update_subscriptions(self, request: Any) -> None:
+        await self._profile.wait(self._profile.api_call.sample(self._rng))
+        self.calls.append(("update_subscriptions", request.identity))
+
+
+class SimJobContext:
+    def __init__(self, room: SimRoom, profile: SimProfile, rng: random.Random, *, metadata: str = ""):
+        self.room = room
+        self.job = SimpleNamespace(id=f"AJ_{room.name}", metadata=metadata, room=SimpleNamespace(name=room.name))
+        self.api = SimpleNamespace(room=SimRoomService(room, profile, rng))
+        self.proc = SimpleNamespace(userdata={})
+        self._shutdown_callbacks: List[Callable[..., Awaitable[None]]] = []
+        self.shutdown_reason: Optional[str] = None
+        self.shut_down = asyncio.Event()
+
+    def add_shutdown_callback(self, callback: Callable[..., Awaitable[None]]) -> None:
+        self._shutdown_callbacks.append(callback)
+
+    def shutdown(self, reason: str = "") -> None:
+        if self.shutdown_reason is None:
+            self.shutdown_reason = reason or "shutdown"
+            self.shut_down.set()
+
+    async def run_shutdown_callbacks(self) -> None:
+        for callback in self._shutdown_callbacks:
+            # Like LiveKit, callbacks that take an argument get the shutdown reason
+            if inspect.signature(callback).parameters:
+                await callback(self.shutdown_reason or "")
+            else:
+                await callback()
+
+    async def connect(self, **kwargs: Any) -> None:
+        return None
+
+
+async def run_in_job(ctx: SimJobContext, coro: Awaitable[Any]) -> Any:
+    """Await ``coro`` with ``ctx`` as the job context (tasks it creates inherit it)."""
+    _JobContextVar.set(ctx)
+    return await coro
+
+
+class SimRealtimeModel:
+    """Stands in for ``RealtimeModel`` and ``persona_models``' ``PrewarmedRealtimeModel``."""
+
+    def __init__(
+        self,
+        *,
+        voice: str = "",
+        auto_reply: bool = True,
+        profile: Optional[SimProfile] = None,
+        rng: Optional[random.Random] = None,
+        **_: Any,
+    ):
+        self.voice = voice
+        self.auto_reply = auto_reply  # False: create_response is off, the worker asks for replies
+        self.profile = profile or SimProfile()
+        self.rng = rng or random.Random(0)
+        self.discarded = False
+
+    async def discard(self) -> None:
+        self.discarded = True
+
+    async def aclose(self) -> None:
+        return None
+
+
+class SimSpeechHandle:
+    _ids = itertools.count(1)
+
+    def __init__(self) -> None:
+        self.id = f"speech_{next(self._ids)}"
+        self.interrupted = False
+        self._done = asyncio.get_running_loop().create_future()
+        self._task: Optional[asyncio.Task] = None
+
+    def done(self) -> bool:
+        return self._done.done()
+
+    def interrupt(self) -> "SimSpeechHandle":
+        if not self.done():
+            self.interrupted = True
+            if self._task is not None:
+                self._task.cancel()
+        return self
+
+    def add_done_callback(self, callback: Callable[["SimSpeechHandle"], None]) -> None:
+        self._done.add_done_callback(lambda _: callback(self))
+
+    async def wait_for_playout(self) -> None:
+        await asyncio.shield(self._done)
+
+    def __await__(self):
+        return self.wait_for_playout().__await__()
+
+    def _finish(self) -> None:
+        if not self._done.done():
+            self._done.set_result(None)
+
+
+class _SimInput:
+    def __init__(self) -> None:
+        self.audio: Any = None
+        self.audio_enabled = True
+
+    def set_audio_enabled(self, enabled: bool) -> None:
+        self.audio_enabled = enabled
+
+
+class _SimOutput:
+    def __init__(self) -> None:
+        self.audio: Optional[io.AudioOutput] = None
+        self.audio_enabled = True
+
+    def set_audio_enabled(self, enabled: bool) -> None:
+        self.audio_enabled = enabled
+
+
+class SimAgentSession(rtc.EventEmitter):
+    """The ``AgentSession`` surface the workers use, on a ``SimRealtimeModel``."""
+
+    def __class_getitem__(cls, item: Any) -> type:
+        return cls
+
+    def __init__(self, *, llm: Optional[SimRealtimeModel] = None, userdata: Any = None, **_: Any):
+        super().__init__()
+        self.llm = llm or SimRealtimeModel()
+        self.userdata = userdata
+        self.input = _SimInput()
+        self.output = _SimOutput()
+        self._agent: Any = None
+        self._room: Optional[SimRoom] = None
+        self._speeches: List[SimSpeechHandle] = []
+        self._closed = False
+        self.replies = 0
+        self.model_items: List[ChatMessage] = []  # the model's context, as last pushed to it
+
+    @property
+    def speaking(self) -> bool:
+        return bool(self._speeches)
+
+    @property
+    def current_agent(self) -> Any:
+        return self._agent
+
+    async def start(self, agent: Any, *, room: Optional[SimRoom] = None, room_input_options: Any = None, **_: Any) -> None:
+        self._room = room
+        if room is not None:
+            room.sessions.append(self)
+        self.update_agent(agent)
+
+    def update_agent(self, agent: Any) -> None:
+        unknown = sorted(name for name in dir(agent) if name.startswith("on_") and not hasattr(Agent, name))
+        if unknown:
+            raise TypeError(f"{type(agent).__name__} defines hooks AgentSession never calls: {', '.join(unknown)}")
+        self._agent = agent
+        agent._activity = SimpleNamespace(session=self, update_chat_ctx=self._update_chat_ctx)
+        on_enter = getattr(agent, "on_enter", None)
+        if on_enter is not None:
+            asyncio.ensure_future(on_enter())
+
+    def generate_reply(self, *, user_input: Optional[str] = None, instructions: Optional[str] = None, **_: Any) -> SimSpeechHandle:
+        if self._room is not None:
+            self._room.reply_instructions.append(instructions)
+        if user_input:
+            self._add_item("user", user_input)
+        return self._speak(None)
+
+    def say(self, text: str, *, audio: Any = None, **_: Any) -> SimSpeechHandle:
+        return self._speak(audio, text=text)
+
+    def interrupt(self) -> "asyncio.Future[None]":
+        if self._closed:
+            raise RuntimeError("AgentSession isn't running")
+        for handle in list(self._speeches):
+            handle.interrupt()
+        done = asyncio.get_running_loop().create_future()
+        done.set_result(None)
+        return done
+
+    async def hear(self, text: str, duration: float) -> None:
+        if self._closed or not self.input.audio_enabled:
+            return
+        profile = self.llm.profile
+        detected = min(duration, profile.speech_detected.sample(self.llm.rng) * profile.time_scale)
+        await asyncio.sleep(detected)
+        if self._room is not None:
+            self._room.speech_detected.append(asyncio.get_running_loop().time())
+        self.emit("user_state_changed", SimpleNamespace(old_state="listening", new_state="speaking"))
+        # Like a session with allow_interruptions, it stops its own speech when it hears the user
+        self.interrupt()
+        await asyncio.sleep(duration - detected)
+        self.emit("user_state_changed", SimpleNamespace(old_state="speaking", new_state="listening"))
+        self.emit("user_input_transcribed", SimpleNamespace(transcript=text, is_final=True, speaker_id=None))
+        self._add_item("user", text)
+        # Server-side turn detection: the session skips on_user_turn_completed, and the
+        # realtime model answers by itself unless it was told not to
+        if self.llm.auto_reply:
+            self._speak(None)
+
+    async def aclose(self) -> None:
+        self._closed = True
+        for handle in list(self._speeches):
+            handle.interrupt()
+        if self._room is not None and self in self._room.sessions:
+            self._room.sessions.remove(self)
+
+    def _speak(self, audio: Any, *, text: Optional[str] = None) -> SimSpeechHandle:
+        handle = SimSpeechHandle()
+        self._speeches.append(handle)
+        self.emit("speech_created", SimpleNamespace(speech_handle=handle, source="generate_reply", user_initiated=True))
+        handle._task = asyncio.ensure_future(self._play(handle, audio, text))
+        handle._task.add_done_callback(lambda _: self._settle(handle))
+        return handle
+
+    def _settle(self, handle: SimSpeechHandle) -> None:
+        if handle in self._speeches:
+            self._speeches.remove(handle)
+        handle._finish()
+        if not self._speeches:
+            self._set_state("listening")
+
+    async def _play(self, handle: SimSpeechHandle, audio: Any, text: Optional[str]) -> None:
+        model = self.llm
+        profile, rng = model.profile, model.rng
+        started = time.time()
+        self._set_state("thinking")
+        output = self.output.audio
+        try:
+            if audio is not None:
+                frames = [frame async for frame in audio]
+                ttft = 0.0
+            else:
+                ttft = profile.model_first_audio.sample(rng)
+                await profile.wait(ttft)
+                count = max(1, int(profile.speech_duration.sample(rng) / FRAME_S))
+                frames = [rtc.AudioFrame.create(SAMPLE_RATE, 1, int(SAMPLE_RATE * FRAME_S)) for _ in range(count)]
+            self._set_state("speaking")
+            self.replies += 1
+            chunk_s = CHUNK_FRAMES * FRAME_S / GENERATION_SPEEDUP
+            for i, frame in enumerate(frames):
+                if audio is None and profile.chunk_gap is not None:
+                    if i:
+                        await profile.wait(profile.chunk_gap.sample(rng))
+                elif audio is None and i and i % CHUNK_FRAMES == 0:
+                    await profile.wait(chunk_s * rng.expovariate(1 / profile.chunk_jitter))
+                if output is not None:
+                    await output.capture_frame(frame)
+            if output is not None:
+                output.flush()
+                await output.wait_for_playout()
+            else:
+                await profile.wait(sum(frame.duration for frame in frames))
+        except asyncio.CancelledError:
+            if output is not None:
+                # As the session's forwarding task does: end the segment, then drop it
+                output.flush()
+                output.clear_buffer()
+            raise
+        self._add_item("assistant", text or f"reply {self.replies} in {model.voice or 'default'}'s voice")
+        self.emit(
+            "metrics_collected",
+            SimpleNamespace(
+                metrics=SimpleNamespace(
+                    type="realtime_model_metrics",
+                    timestamp=started,
+                    ttft=ttft,
+                    input_tokens=0,
+                    input_token_details=None,
+                )
+            ),
+        )
+
+    async def _update_chat_ctx(self, chat_ctx: Any) -> None:
+        # What Agent.update_chat_ctx pushes to a realtime model
+        self._agent._chat_ctx = chat_ctx.copy()
+        self.model_items = [item for item in chat_ctx.items if item.type == "message"]
+
+    def _set_state(self, state: str) -> None:
+        self.emit("agent_state_changed", SimpleNamespace(old_state=None, new_state=state))
+
+    def _add_item(self, role: str, text: str) -> None:
+        item = ChatMessage(role=role, content=[text])
+        chat_ctx = getattr(self._agent, "_chat_ctx", None)
+        if chat_ctx is not None:
+            # As the session does: the agent's own context, not the model's
+            chat_ctx.items.append(item)
+        self.emit("conversation_item_added", SimpleNamespace(item=item))
+
+
+class SimAvatarSink(io.AudioOutput):
+    """An avatar's audio input: plays frames ``lead`` seconds after they arrive, back to back.
+
+    ``segments`` holds (first audible sample, last audible sample) per segment, on the
+    event loop's clock, and ``audio_seconds`` how much audio each one held (the same at any
+    ``time_scale``); ``underruns`` counts frames that arrived after the avatar ran dry.
+    """
+
+    def __init__(self, identity: str, profile: SimProfile, rng: random.Random):
+        super().__init__(next_in_chain=None, sample_rate=SAMPLE_RATE)
+        self.identity = identity
+        self._profile = profile
+        self._rng = rng
+        self._play_end: Optional[float] = None
+        self._finish: Optional[asyncio.TimerHandle] = None
+        self.segments: List[Tuple[float, float]] = []
+        self.audio_seconds: List[float] = []
+        self.underruns = 0
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        now = asyncio.get_running_loop().time()
+        scale = self._profile.time_scale
+        lead = self._profile.avatar_lead * scale
+        if self._play_end is None:
+            self._play_end = now + lead
+            self.segments.append((self._play_end, self._play_end))
+            self.audio_seconds.append(0.0)
+        elif self._play_end < now + lead:
+            self.underruns += 1
+            self._play_end = now + lead
+        self._play_end += frame.duration * scale
+        self.audio_seconds[-1] += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        if self._play_end is None:
+            return
+        end, self._play_end = self._play_end, None
+        self.segments[-1] = (self.segments[-1][0], end)
+        self._finish = asyncio.get_running_loop().call_at(
+            end + self._profile.playback_rpc.sample(self._rng) * self._profile.time_scale,
+            lambda: self.on_playback_finished(playback_position=0.0, interrupted=False),
+        )
+
+    def clear_buffer(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if self._play_end is None:
+            # Flushed, but the avatar may not have played all of it yet
+            if self._finish is None or not self.segments or self.segments[-1][1] <= now:
+                return
+            self._finish.cancel()
+            self._finish = None
+        self._play_end = None
+        self.segments[-1] = (self.segments[-1][0], max(self.segments[-1][0], now))
+        self.on_playback_finished(playback_position=0.0, interrupted=True)
+
+
+class SimAvatarSession:
+    """Stands in for ``hedra.AvatarSession``: joins the room and takes over the audio output."""
+
+    def __init__(
+        self,
+        *,
+        avatar_id: str = "",
+        avatar_participant_identity: str = "hedra-avatar-agent",
+        avatar_participant_name: str = "",
+        profile: Optional[SimProfile] = None,
+        rng: Optional[random.Random] = None,
+        **_: Any,
+    ):
+        self.avatar_id = avatar_id
+        self.identity = avatar_participant_identity
+        self.name = avatar_participant_name or avatar_participant_identity
+        self.profile = profile or SimProfile()
+        self.rng = rng or random.Random(0)
+        self.sink: Optional[SimAvatarSink] = None
+
+    async def start(self, agent_session: SimAgentSession, room: SimRoom) -> None:
+        await self.profile.wait(self.profile.avatar_start.sample(self.rng))
+        room.join(SimParticipant(self.identity, rtc.ParticipantKind.PARTICIPANT_KIND_AGENT, self.name))
+        self.sink = SimAvatarSink(self.identity, self.profile, self.rng)
+        agent_session.output.audio = self.sink
+        room.avatar_sinks.append(self.sink)
+
+
+@dataclass
+class ScriptedUser:
+    """A viewer who joins and says ``lines`` (pause before, text, seconds of speech).
+
+    With ``wait_for_quiet``, each line also waits (up to that many seconds) for the hosts
+    to stop speaking first, which keeps the order of a replay that has no delays.
+    """
+
+    identity: str = "viewer"
+    lines: List[Tuple[float, str, float]] = field(default_factory=list)
+    wait_for_quiet: float = 0.0
+    utterance_starts: List[float] = field(default_factory=list)  # loop time each line was started
+    utterance_ends: List[float] = field(default_factory=list)  # loop time each line was finished
+
+    def join(self, room: SimRoom) -> None:
+        room.join(SimParticipant(self.identity, rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD))
+
+    async def speak(self, room: SimRoom) -> None:
+        loop = asyncio.get_running_loop()
+        for pause, text, duration in self.lines:
+            await asyncio.sleep(pause)
+            if self.wait_for_quiet:
+                await room.quiet(self.wait_for_quiet)
+            self.utterance_starts.append(loop.time())
+            said = asyncio.ensure_future(room.user_said(text, duration))
+            await asyncio.sleep(duration)
+            self.utterance_ends.append(loop.time())
+            await said
+
+
+def patch_module(module: ModuleType, profile: SimProfile, rng: random.Random) -> None:
+    """Point a worker module's service dependencies at the simulation."""
+
+    def avatar_session(**kwargs: Any) -> SimAvatarSession:
+        return SimAvatarSession(profile=profile, rng=rng, **kwargs)
+
+    def realtime_model(**kwargs: Any) -> SimRealtimeModel:
+        return SimRealtimeModel(profile=profile, rng=rng, **kwargs)
+
+    async def connect_realtime_model(key: Any) -> SimRealtimeModel:
+        return realtime_model(voice=key.voice, auto_reply=key.auto_reply)
+
+    replacements = {
+        "AgentSession": SimAgentSession,
+        "hedra": SimpleNamespace(AvatarSession=avatar_session),
+        "openai": SimpleNamespace(realtime=SimpleNamespace(RealtimeModel=realtime_model)),
+        "connect_realtime_model": connect_realtime_model,
+    }
+    for name, value in replacements.items():
+        if hasattr(module, name):
+            setattr(module, name, value)
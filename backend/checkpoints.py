@@ -0,0 +1,276 @@
+"""Crash-safe checkpoints of a room's show, so a restarted job picks it back up mid-show.
+
+A show's state lives in its job process: who holds the floor, whether the show has
+started, the turn count and topic, and the conversation so far. When the worker restarts
+or is redeployed, the next job for the room starts the show over, greeting and all, with
+an empty context.
+
+With ``CHECKPOINTS=1`` (the default), each room appends its state to
+``CHECKPOINT_DIR/<room>.ckpt`` as it changes, one JSON line per record: a turn, plus the
+state fields that changed and the rolling summary if it moved. A turn costs one small
+``write`` on the event loop. Every ``CHECKPOINT_COMPACT_EVERY`` records the file is
+rewritten as a single snapshot (to a temporary file that is renamed over it), so it stays
+bounded however long the show runs. A crash mid-write leaves at most a torn last line,
+which reading skips.
+
+A job that finds a checkpoint younger than ``CHECKPOINT_MAX_AGE_S`` resumes from it. The
+checkpoint is removed when the show ends (the room emptied or was deleted) and kept when
+the job is cut short for any other reason, including the agent's own connection dropping.
+A record survives the process dying, not the machine; ``CHECKPOINT_FSYNC=1`` syncs every
+record to disk as well. ``CHECKPOINT_DIR`` defaults to the system temp dir, which a
+redeploy (e.g. on Railway) starts empty: point it at a persistent volume for checkpoints
+to survive one.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from livekit import rtc
+
+from conversation_memory import ConversationMemory, Turn
+
+logger = logging.getLogger("checkpoints")
+
+CHECKPOINTS = os.getenv("CHECKPOINTS", "1") == "1"
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), "livekit-checkpoints"))
+CHECKPOINT_COMPACT_EVERY = int(os.getenv("CHECKPOINT_COMPACT_EVERY", "64"))
+CHECKPOINT_MAX_AGE_S = float(os.getenv("CHECKPOINT_MAX_AGE_S", "900"))
+CHECKPOINT_FSYNC = os.getenv("CHECKPOINT_FSYNC", "0") == "1"
+
+# Shutdown reasons that mean the show is over, rather than its job being cut short.
+# "room disconnected" isn't one: the job gets it whenever its own connection drops too
+SHOW_ENDED = ("room empty",)
+
+RESUME_INSTRUCTIONS = (
+    "The stream cut out for a moment and you're back on air. Pick the conversation up "
+    "where it left off. Don't greet the audience or introduce yourself again."
+)
+
+
+@dataclass
+class ShowState:
+    """A room's state fields and where its conversation was, as of the last record."""
+
+    fields: Dict[str, Any] = field(default_factory=dict)
+    summary: str = ""
+    turns: List[Turn] = field(default_factory=list)  # the verbatim window
+    next_index: int = 0
+    saved_at: float = 0.0  # wall-clock time of the last record
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        if record.get("snapshot"):
+            self.fields, self.summary, self.turns = {}, "", []
+        self.fields.update(record.get("fields", {}))
+        if "summary" in record:
+            self.summary = record["summary"]
+        if "window" in record:
+            # Turns before the window were folded into the summary
+            self.turns = [turn for turn in self.turns if turn.index >= record["window"]]
+        for index, speaker, text in record.get("turns", ()):
+            self.turns.append(Turn(index, speaker, text))
+            self.next_index = max(self.next_index, index + 1)
+        self.next_index = max(self.next_index, record.get("next", 0))
+        self.saved_at = record.get("at", self.saved_at)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "snapshot": True,
+            "at": round(time.time(), 3),
+            "fields": self.fields,
+            "summary": self.summary,
+            "turns": [[turn.index, turn.speaker, turn.text] for turn in self.turns],
+            "next": self.next_index,
+        }
+
+    def restore(self, userdata: Any, memory: Optional[ConversationMemory] = None) -> None:
+        """Set the fields ``userdata`` has, and hand the conversation to ``memory``."""
+        for name, value in self.fields.items():
+            if hasattr(userdata, name):
+                setattr(userdata, name, value)
+        if memory is not None:
+            memory.restore(self.summary, self.turns, self.next_index)
+
+
+def read_checkpoint(path: str) -> Optional[ShowState]:
+    """The state saved at ``path``, or None if there is none."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.error(f"Can't read checkpoint {path}: {e}")
+        return None
+    state = ShowState()
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            logger.warning(f"Skipping a torn record in checkpoint {path}")
+            continue
+        state.apply(record)
+    return state
+
+
+class RoomCheckpoint:
+    """Appends one room's state to its checkpoint file as the show goes on.
+
+    ``resumed`` is the show a previous job for the room left behind, if any.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        resumed: Optional[ShowState] = None,
+        compact_every: int = CHECKPOINT_COMPACT_EVERY,
+        fsync: bool = CHECKPOINT_FSYNC,
+    ):
+        self.path = path
+        self.resumed = resumed
+        self._compact_every = max(1, compact_every)
+        self._fsync = fsync
+        self._state = ShowState()
+        if resumed is not None:
+            self._state.apply(resumed.snapshot())
+        self._fd: Optional[int] = None
+        self._since_compaction = 0
+        self._memory: Optional[ConversationMemory] = None
+        self._fields: Callable[[], Dict[str, Any]] = dict
+        self.records = 0
+        self.bytes_written = 0
+        self.compactions = 0
+        self.room_deleted = False
+        # Start from a single snapshot, which also drops a torn last line
+        self.compact()
+
+    def track(self, memory: ConversationMemory, fields: Callable[[], Dict[str, Any]]) -> None:
+        """Checkpoint every turn added to ``memory``, with whatever ``fields()`` changed."""
+        self._memory = memory
+        self._fields = fields
+        memory.subscribe(self._on_turn)
+
+    def watch_room(self, room: rtc.Room) -> None:
+        """End the show with the room if it is deleted, whatever reason the job stops with."""
+
+        def on_disconnected(reason: Any = None) -> None:
+            if reason == rtc.DisconnectReason.ROOM_DELETED:
+                self.room_deleted = True
+
+        room.on("disconnected", on_disconnected)
+
+    def save(self) -> None:
+        """Write the fields that changed since the last record (e.g. the floor moved)."""
+        changed = self._changed_fields()
+        if changed:
+            self._append({"fields": changed})
+
+    def compact(self) -> None:
+        """Rewrite the file as one snapshot of the current state."""
+        data = json.dumps(self._state.snapshot(), separators=(",", ":")) + "\n"
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                if self._fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        except OSError as e:
+            logger.error(f"Can't compact checkpoint {self.path}: {e}")
+            return
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = fd
+        self._since_compaction = 0
+        self.compactions += 1
+        self.bytes_written += len(data)
+
+    async def aclose(self, reason: str = "") -> None:
+        """Stop writing; the checkpoint is kept unless the show is over."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if reason in SHOW_ENDED or self.room_deleted:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            logger.info(f"💾 Show ended ({'room deleted' if self.room_deleted else reason}), removed checkpoint {self.path}")
+
+    def _on_turn(self, turn: Turn) -> None:
+        record: Dict[str, Any] = {"turns": [[turn.index, turn.speaker, turn.text]]}
+        changed = self._changed_fields()
+        if changed:
+            record["fields"] = changed
+        memory = self._memory
+        if memory is not None and memory.summary != self._state.summary:
+            recent = memory.recent()
+            record["summary"] = memory.summary
+            record["window"] = recent[0].index if recent else memory.turn_count
+        self._append(record)
+
+    def _changed_fields(self) -> Dict[str, Any]:
+        saved = self._state.fields
+        return {name: value for name, value in self._fields().items() if name not in saved or saved[name] != value}
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        if self._fd is None:
+            return
+        record["at"] = round(time.time(), 3)
+        data = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        try:
+            os.write(self._fd, data)
+            if self._fsync:
+                os.fsync(self._fd)
+        except OSError as e:
+            logger.error(f"Can't write checkpoint {self.path}: {e}")
+            return
+        self._state.apply(record)
+        self.records += 1
+        self.bytes_written += len(data)
+        self._since_compaction += 1
+        if self._since_compaction >= self._compact_every:
+            self.compact()
+
+
+def checkpoint_path(room: str, directory: str = CHECKPOINT_DIR) -> str:
+    return os.path.join(directory, f"{quote(room, safe='')}.ckpt")
+
+
+def open_checkpoint(room: str, directory: str = CHECKPOINT_DIR) -> Optional[RoomCheckpoint]:
+    """A checkpoint for ``room`` when ``CHECKPOINTS`` is on, else None.
+
+    Its ``resumed`` is set when a job for the room was cut short less than
+    ``CHECKPOINT_MAX_AGE_S`` ago, after the show had started.
+    """
+    if not CHECKPOINTS:
+        return None
+    path = checkpoint_path(room, directory)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        logger.error(f"Can't create checkpoint directory {directory}: {e}")
+        return None
+    resumed = read_checkpoint(path)
+    if resumed is not None:
+        age = time.time() - resumed.saved_at
+        if age > CHECKPOINT_MAX_AGE_S:
+            logger.info(f"💾 Ignoring a {age:.0f}s old checkpoint for room {room}")
+            resumed = None
+        elif not resumed.turns and not resumed.summary:
+            resumed = None  # the last job never got past its greeting
+    checkpoint = RoomCheckpoint(path, resumed=resumed)
+    if resumed is not None:
+        logger.info(
+            f"💾 Resuming room {room} at turn {resumed.next_index}, "
+            f"floor: {resumed.fields.get('current_speaker') or 'nobody'}"
+        )
+    return checkpoint
@@ -0,0 +1,168 @@
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Sequence
+
+from livekit.agents import ChatContext
+
+logger = logging.getLogger("conversation-memory")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Turn:
+    index: int
+    speaker: str  # persona name, or "user"
+    text: str
+
+
+@dataclass
+class HandoffPayload:
+    """What a persona needs to catch up: the summary (if it changed) and the turns it missed."""
+
+    summary: Optional[str]
+    turns: List[Turn] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        total = estimate_tokens(self.summary) if self.summary else 0
+        return total + sum(estimate_tokens(t.text) for t in self.turns)
+
+    def render(self) -> str:
+        lines = []
+        if self.summary:
+            lines.append(f"Earlier in the show: {self.summary}")
+        lines.extend(f"{t.speaker.title()}: {t.text}" for t in self.turns)
+        return "\n".join(lines)
+
+
+def extractive_summary(previous: str, folded: Sequence[Turn]) -> str:
+    """Default summarizer: keep the first sentence of each folded turn, append to the old summary."""
+    lines = [previous] if previous else []
+    for turn in folded:
+        first = turn.text.split(". ")[0].strip()
+        if len(first) > 160:
+            first = first[:157] + "..."
+        lines.append(f"{turn.speaker.title()}: {first}")
+    return " | ".join(lines)
+
+
+class ConversationMemory:
+    """Bounded memory of a multi-host conversation.
+
+    The last ``keep_recent`` turns are kept verbatim; older turns are folded into a rolling
+    summary capped at ``summary_budget`` tokens (oldest content is dropped first). Each persona
+    has a cursor, so a handoff only carries what that persona hasn't seen yet, and the payload
+    is bounded by the window plus the budget however long the show runs.
+    """
+
+    def __init__(
+        self,
+        *,
+        keep_recent: int = 8,
+        summary_budget: int = 400,
+        summarizer: Callable[[str, Sequence[Turn]], str] = extractive_summary,
+        fold_batch: int = 4,
+    ):
+        self.keep_recent = keep_recent
+        self.summary_budget = summary_budget
+        self._summarizer = summarizer
+        self._fold_batch = max(1, fold_batch)
+
+        self._recent: Deque[Turn] = deque()
+        self._summary = ""
+        self._summary_version = 0
+        self._next_index = 0
+        # persona -> index of the first turn it hasn't seen
+        self._cursors: Dict[str, int] = {}
+        # persona -> summary version it was last sent
+        self._seen_summary: Dict[str, int] = {}
+        self._listeners: List[Callable[[Turn], None]] = []
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @property
+    def turn_count(self) -> int:
+        return self._next_index
+
+    def recent(self) -> List[Turn]:
+        return list(self._recent)
+
+    def add(self, speaker: str, text: str) -> Turn:
+        turn = Turn(self._next_index, speaker, text)
+        self._next_index += 1
+        self._recent.append(turn)
+        if speaker != "user":
+            # A persona has obviously seen what it said itself
+            self._cursors[speaker] = self._next_index
+
+        # Fold in batches so the summarizer isn't called on every turn
+        if len(self._recent) >= self.keep_recent + self._fold_batch:
+            folded = [self._recent.popleft() for _ in range(len(self._recent) - self.keep_recent)]
+            self._fold(folded)
+        for listener in self._listeners:
+            listener(turn)
+        return turn
+
+    def subscribe(self, listener: Callable[[Turn], None]) -> None:
+        """Call ``listener(turn)`` after every ``add``, once the summary has caught up."""
+        self._listeners.append(listener)
+
+    def restore(self, summary: str, turns: Sequence[Turn], next_index: int) -> None:
+        """Pick up a conversation saved earlier (e.g. by ``checkpoints``).
+
+        No persona has seen any of it yet, so the first handoff payloads carry all of it.
+        """
+        self._summary = summary
+        self._summary_version = 1 if summary else 0
+        self._recent = deque(turns)
+        self._next_index = max(next_index, self._recent[-1].index + 1 if self._recent else 0)
+        self._cursors.clear()
+        self._seen_summary.clear()
+
+    def handoff_payload(self, persona: str) -> HandoffPayload:
+        """Everything ``persona`` missed since it last spoke or was handed the floor."""
+        cursor = self._cursors.get(persona, 0)
+        turns = [t for t in self._recent if t.index >= cursor]
+        summary = None
+        if self._summary and self._seen_summary.get(persona, 0) < self._summary_version:
+            summary = self._summary
+
+        self._cursors[persona] = self._next_index
+        self._seen_summary[persona] = self._summary_version
+        return HandoffPayload(summary, turns)
+
+    def snapshot(self) -> HandoffPayload:
+        """Full bounded context (summary + verbatim window), e.g. for a freshly created agent."""
+        return HandoffPayload(self._summary or None, list(self._recent))
+
+    def _fold(self, folded: Sequence[Turn]) -> None:
+        summary = self._summarizer(self._summary, folded)
+        # Trim from the front (oldest content) until the summary fits its budget
+        while estimate_tokens(summary) > self.summary_budget and " | " in summary:
+            summary = summary.split(" | ", 1)[1]
+        if estimate_tokens(summary) > self.summary_budget:
+            summary = summary[-self.summary_budget * 4 :]
+        self._summary = summary
+        self._summary_version += 1
+        logger.debug(f"Folded {len(folded)} turns into summary ({estimate_tokens(summary)} tokens)")
+
+
+def memory_chat_ctx(memory: ConversationMemory, persona: str) -> ChatContext:
+    """Bounded context for a freshly created agent: the summary plus the verbatim window."""
+    snapshot = memory.snapshot()
+    chat_ctx = ChatContext.empty()
+    if snapshot.summary:
+        chat_ctx.add_message(role="system", content=f"Earlier in the show: {snapshot.summary}")
+    for turn in snapshot.turns:
+        if turn.speaker == persona:
+            chat_ctx.add_message(role="assistant", content=turn.text)
+        else:
+            chat_ctx.add_message(role="user", content=f"{turn.speaker.title()}: {turn.text}")
+    return chat_ctx
@@ -1,5 +1,6 @@
+import json
 import logging
-from typing import Optional
+import os
 
 from dotenv import load_dotenv
 
@@ -12,112 +13,105 @@ from livekit.agents import (
     WorkerOptions,
     cli,
 )
-from livekit.plugins import openai, hedra
+from livekit.agents.job import get_job_context
+from lazy_imports import lazy_import, prewarm
+from line_cache import speak_line
+from persona_models import PersonaKey, connect_realtime_model
+from personas import Persona, get_persona_registry
+from resources import RoomResources, avatar_close, shutdown_when_empty, tracker
+from worker_load import load_options
+
+hedra = lazy_import("livekit.plugins.hedra")
 
 logger = logging.getLogger("dual-agent-dispatch")
 load_dotenv()
 
-class MarthaAgent(Agent):
-    def __init__(self):
-        super().__init__(
-            instructions=(
-                "You are Martha Stewart, the elegant and sophisticated lifestyle expert. "
-                "You're co-hosting with Snoop Dogg. Speak in your characteristic refined, "
-                "articulate style with attention to detail and elegance. Keep responses "
-                "conversational and engaging."
-            )
-        )
-        
-    async def on_enter(self):
-        """When Martha enters, start her avatar"""
-        logger.info("Martha agent entering the room")
-        
-        # Create and start Martha's Hedra avatar
-        self.avatar = hedra.AvatarSession(
-            avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e"  # Martha's avatar ID
-        )
-        
-        await self.avatar.start(self.session, room=self.session.room)
-        
-        # Generate initial greeting
-        await self.session.generate_reply(
-            instructions="Greet the audience warmly and introduce yourself as Martha Stewart. Mention that Snoop will also be joining. Keep it brief and elegant."
-        )
+# One worker serves every persona in personas.json. A LiveKit worker registers a single
+# agent_name, so the persona is picked from the dispatch metadata: either a bare name
+# ("snoop") or JSON ({"persona": "snoop"}). The old per-process agent names still resolve.
+#
+# Dispatches used to target "martha-agent" or "snoop-agent". Until every dispatch call site
+# names "persona-agent" and a persona, run a worker under each old name (the start-martha
+# and start-snoop scripts): it serves that persona when the metadata names none.
+DISPATCH_AGENT_NAME = os.getenv("DISPATCH_AGENT_NAME", "persona-agent")
 
+# Compiled once per worker process, before any job is accepted
+registry = get_persona_registry()
+default_persona = registry.get(DISPATCH_AGENT_NAME) or registry.default
+
+
+class PersonaAgent(Agent):
+    def __init__(self, persona: Persona, resources: RoomResources):
+        super().__init__(instructions=persona.instructions, tools=list(persona.tools))
+        self.persona = persona
+        self.resources = resources
 
-class SnoopAgent(Agent):
-    def __init__(self):
-        super().__init__(
-            instructions=(
-                "You are Snoop Dogg, the laid-back, cool rapper and lifestyle icon. "
-                "You're co-hosting with Martha Stewart. Speak in your characteristic "
-                "relaxed, smooth style with your signature phrases. Keep it real, "
-                "nephew, but keep it family-friendly."
-            )
-        )
-        
     async def on_enter(self):
-        """When Snoop enters, start his avatar"""
-        logger.info("Snoop agent entering the room")
-        
-        # Create and start Snoop's Hedra avatar
+        """Start the persona's avatar and give its greeting"""
+        logger.info(f"{self.persona.name} agent entering the room")
+
+        job_ctx = get_job_context()
         self.avatar = hedra.AvatarSession(
-            avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194"  # Snoop's avatar ID
+            avatar_id=self.persona.avatar_id, avatar_participant_identity=self.persona.name
         )
-        
-        await self.avatar.start(self.session, room=self.session.room)
-        
-        # Generate initial greeting
-        await self.session.generate_reply(
-            instructions="Greet the audience in your laid-back style and introduce yourself as Snoop Dogg. Mention that you're here with Martha. Keep it cool and smooth."
+        await self.avatar.start(self.session, room=job_ctx.room)
+        self.resources.add(
+            "avatar", self.persona.name, avatar_close(job_ctx.api, job_ctx.room.name, self.persona.name)
         )
 
+        await speak_line(self.session, self.persona.name, self.persona.voice, self.persona.greeting)
 
-async def martha_entrypoint(ctx: JobContext):
-    """Entrypoint for Martha agent"""
-    logger.info("Starting Martha agent session")
-    
-    session = AgentSession(
-        llm=openai.realtime.RealtimeModel(voice="ash"),  # Martha's voice
-    )
-    
-    await session.start(
-        room=ctx.room,
-        agent=MarthaAgent(),
-        room_output_options=RoomOutputOptions(audio_enabled=False),  # Avatar handles audio
-        room_input_options=RoomInputOptions(),
-    )
 
+def persona_for_job(ctx: JobContext) -> Persona:
+    metadata = (ctx.job.metadata or "").strip()
+    requested = metadata
+    if metadata.startswith("{"):
+        try:
+            requested = json.loads(metadata).get("persona", "")
+        except (ValueError, AttributeError):
+            logger.warning(f"Invalid dispatch metadata {metadata!r}, defaulting to {default_persona.name}")
+            return default_persona
+
+    if not requested:
+        logger.info(f"No persona in dispatch metadata, defaulting to {default_persona.name}")
+        return default_persona
+
+    persona = registry.get(requested)
+    if persona is None:
+        # A show with the default host beats a room nobody joins
+        logger.warning(f"Unknown persona {requested!r} in dispatch metadata, defaulting to {default_persona.name}")
+        return default_persona
+    return persona
+
+
+async def entrypoint(ctx: JobContext):
+    """Start the session for whichever persona this job was dispatched for"""
+    persona = persona_for_job(ctx)
+    logger.info(f"Starting {persona.name} agent session")
+
+    resources = tracker.open(ctx.room.name)
+    ctx.add_shutdown_callback(resources.aclose)
+    shutdown_when_empty(ctx)
+
+    llm = await connect_realtime_model(PersonaKey(persona.name, voice=persona.voice, avatar_id=persona.avatar_id))
+    resources.add("model", persona.name, llm.discard)
+    session = AgentSession(llm=llm)
+    resources.add("session", persona.name, session.aclose)
 
-async def snoop_entrypoint(ctx: JobContext):
-    """Entrypoint for Snoop agent"""
-    logger.info("Starting Snoop agent session")
-    
-    session = AgentSession(
-        llm=openai.realtime.RealtimeModel(voice="alloy"),  # Snoop's voice
-    )
-    
     await session.start(
         room=ctx.room,
-        agent=SnoopAgent(),
+        agent=PersonaAgent(persona, resources),
         room_output_options=RoomOutputOptions(audio_enabled=False),  # Avatar handles audio
         room_input_options=RoomInputOptions(),
     )
 
 
-# Default entrypoint - we'll configure which agent to use via agent_name
-async def entrypoint(ctx: JobContext):
-    """Main entrypoint that routes to the appropriate agent based on agent_name"""
-    agent_name = getattr(ctx, 'agent_name', 'martha-agent')  # Default to Martha
-    
-    if agent_name == 'martha-agent':
-        await martha_entrypoint(ctx)
-    elif agent_name == 'snoop-agent':
-        await snoop_entrypoint(ctx)
-    else:
-        logger.error(f"Unknown agent name: {agent_name}")
-        raise ValueError(f"Unknown agent name: {agent_name}")
-
-
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=entrypoint,
+            agent_name=DISPATCH_AGENT_NAME,
+            prewarm_fnc=prewarm,
+            **load_options("dual_agent_dispatch"),
+        )
+    )
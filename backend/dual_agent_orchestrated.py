@@ -1,6 +1,9 @@
+import asyncio
+import itertools
 import logging
-from dataclasses import dataclass
-from typing import Optional
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Optional
 
 from dotenv import load_dotenv
 
@@ -15,37 +18,132 @@ from livekit.agents import (
     WorkerOptions,
     cli,
 )
+from livekit.agents.job import get_job_context
 from livekit.agents.llm import function_tool
-from livekit.plugins import openai, hedra
+from checkpoints import RESUME_INSTRUCTIONS, open_checkpoint
+from conversation_memory import ConversationMemory, memory_chat_ctx
+from floor import FloorController
+from handoff import HANDOFF_TRIGGER, TurnEndHandoff
+from lazy_imports import lazy_import, prewarm
+from line_cache import speak_line
+from persona_models import PersonaKey, connect_realtime_model
+from recording import open_room_log
+from resources import RoomResources, avatar_close, shutdown_when_empty, tracker
+from startup import StartupStep, run_startup
+from tracing import get_tracer, trace_model_metrics, traced
+from worker_load import load_options
+
+hedra = lazy_import("livekit.plugins.hedra")
+openai = lazy_import("livekit.plugins.openai")
 
 logger = logging.getLogger("dual-hedra-avatar-orchestrated")
 load_dotenv()
 
+# "persistent": both hosts keep their model and avatar for the whole room and a handoff only
+# moves the speaking floor. "agent-swap": the original behaviour, a new agent every turn.
+HANDOFF_MODE = os.getenv("HANDOFF_MODE", "persistent")
+
+MARTHA_KEY = PersonaKey("martha", voice="ash", avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e")
+SNOOP_KEY = PersonaKey("snoop", voice="alloy", avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194")
+
+# With turn-end handoffs the floor moves on its own, so the hosts aren't asked to call the
+# handoff tool (that would cost a function-call round trip every turn)
+TURN_END_HANDOFFS = HANDOFF_MODE == "persistent" and HANDOFF_TRIGGER == "turn-end"
+
+MARTHA_INSTRUCTIONS = (
+    "You are Martha Stewart, the elegant and sophisticated lifestyle expert. "
+    "You're co-hosting a cooking show with Snoop Dogg. "
+    "Speak in your characteristic refined, articulate style with attention to detail and elegance. "
+    "Keep responses conversational and engaging. "
+    + (
+        "Snoop takes over automatically when you finish; only hand off if the user asks for him right away."
+        if TURN_END_HANDOFFS
+        else "After responding to the user, you should hand off to Snoop for the next response."
+    )
+)
+
+SNOOP_INSTRUCTIONS = (
+    "You are Snoop Dogg, the laid-back, cool rapper and lifestyle icon. "
+    "You're co-hosting a cooking show with Martha Stewart. "
+    "Speak in your characteristic relaxed, smooth style with your signature phrases. "
+    "Keep it real, nephew, but keep it family-friendly. "
+    + (
+        "Martha takes over automatically when you finish; only hand off if the user asks for her right away."
+        if TURN_END_HANDOFFS
+        else "After responding to the user, you should hand off back to Martha for the next response."
+    )
+)
+
+# Bounded handoff context: the last N turns verbatim, older ones in a rolling summary
+MEMORY_KEEP_RECENT = int(os.getenv("MEMORY_KEEP_RECENT", "8"))
+MEMORY_SUMMARY_BUDGET = int(os.getenv("MEMORY_SUMMARY_BUDGET", "400"))
+
+MARTHA_GREETING = (
+    "Greet the audience warmly and introduce yourself and mention that Snoop will join "
+    "the conversation. Keep it brief and elegant."
+)
+
 @dataclass
 class ConversationData:
     """Shared data between Martha and Snoop agents"""
     turn_count: int = 0
     last_speaker: Optional[str] = None
     topic: Optional[str] = None
+    memory: ConversationMemory = field(
+        default_factory=lambda: ConversationMemory(
+            keep_recent=MEMORY_KEEP_RECENT, summary_budget=MEMORY_SUMMARY_BUDGET
+        )
+    )
+    resources: Optional[RoomResources] = None
+
+
+# Every swapped-in host's avatar joins under its own identity, so removing the previous
+# host's avatar can never remove the new one
+_avatar_ids = itertools.count(1)
+
+
+def own_swapped_host(agent: Agent, persona: str, avatar_identity: str) -> None:
+    """The entering host's avatar and model replace the previous host's, which get closed."""
+    resources = agent.session.userdata.resources
+    if resources is None:
+        return
+    job_ctx = get_job_context()
+    resources.add("model", persona, agent.llm.aclose, slot="model")
+    close_avatar = avatar_close(job_ctx.api, job_ctx.room.name, avatar_identity)
+    resources.add("avatar", avatar_identity, close_avatar, slot="avatar")
+
+
+def record_conversation(session: AgentSession, memory: ConversationMemory, speaker: Callable[[], str]) -> None:
+    """Feed the session's user and assistant messages into the shared memory."""
+
+    def on_item_added(ev) -> None:
+        item = ev.item
+        if item.type != "message" or not item.text_content:
+            return
+        if item.role == "user":
+            memory.add("user", item.text_content)
+        elif item.role == "assistant":
+            memory.add(speaker(), item.text_content)
+
+    session.on("conversation_item_added", on_item_added)
 
 
 class MarthaAgent(Agent):
-    def __init__(self, *, chat_ctx: Optional[ChatContext] = None) -> None:
+    persona = "martha"
+
+    def __init__(self, *, chat_ctx: Optional[ChatContext] = None, resuming: bool = False) -> None:
         super().__init__(
-            instructions=(
-                "You are Martha Stewart, the elegant and sophisticated lifestyle expert. "
-                "You're co-hosting a cooking show with Snoop Dogg. "
-                "Speak in your characteristic refined, articulate style with attention to detail and elegance. "
-                "Keep responses conversational and engaging. "
-                "After responding to the user, you should hand off to Snoop for the next response."
-            ),
-            llm=openai.realtime.RealtimeModel(voice="ash"),
+            instructions=MARTHA_INSTRUCTIONS,
+            llm=openai.realtime.RealtimeModel(voice=MARTHA_KEY.voice),
             chat_ctx=chat_ctx,
         )
+        self._resuming = resuming
         
         # Create Martha's Hedra avatar
+        self.avatar_identity = f"martha-{next(_avatar_ids)}"
         self.avatar = hedra.AvatarSession(
-            avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e"  # Martha's avatar ID
+            avatar_id=MARTHA_KEY.avatar_id,  # Martha's avatar ID
+            avatar_participant_identity=self.avatar_identity,
         )
 
     async def on_enter(self):
@@ -53,14 +151,17 @@ class MarthaAgent(Agent):
         logger.info("Martha entering the conversation")
         
         # Start Martha's avatar with the session's room
-        from livekit.agents.job import get_job_context
         job_ctx = get_job_context()
         await self.avatar.start(self.session, room=job_ctx.room)
+        own_swapped_host(self, "martha", self.avatar_identity)
         
+        if self._resuming:
+            # A restarted job: the show is already under way
+            await self.session.generate_reply(instructions=RESUME_INSTRUCTIONS)
+            return
+
         # Generate initial greeting
-        await self.session.generate_reply(
-            instructions="Greet the audience warmly and introduce yourself and mention that Snoop will join the conversation. Keep it brief and elegant."
-        )
+        await speak_line(self.session, "martha", MARTHA_KEY.voice, MARTHA_GREETING)
 
     @function_tool
     async def handoff_to_snoop(
@@ -80,27 +181,27 @@ class MarthaAgent(Agent):
         if topic:
             context.userdata.topic = topic
             
-        snoop_agent = SnoopAgent(chat_ctx=context.session.chat_ctx)
+        with get_tracer().span("handoff_to_snoop", get_job_context().room.name):
+            snoop_agent = SnoopAgent(chat_ctx=memory_chat_ctx(context.userdata.memory, "snoop"))
         return snoop_agent, "Now let me hand this over to my friend Snoop!"
 
 
 class SnoopAgent(Agent):
-    def __init__(self, *, chat_ctx: Optional[ChatContext] = None) -> None:
+    persona = "snoop"
+
+    def __init__(self, *, chat_ctx: Optional[ChatContext] = None, resuming: bool = False) -> None:
         super().__init__(
-            instructions=(
-                "You are Snoop Dogg, the laid-back, cool rapper and lifestyle icon. "
-                "You're co-hosting a cooking show with Martha Stewart. "
-                "Speak in your characteristic relaxed, smooth style with your signature phrases. "
-                "Keep it real, nephew, but keep it family-friendly. "
-                "After responding to the user, you should hand off back to Martha for the next response."
-            ),
-            llm=openai.realtime.RealtimeModel(voice="alloy"),
+            instructions=SNOOP_INSTRUCTIONS,
+            llm=openai.realtime.RealtimeModel(voice=SNOOP_KEY.voice),
             chat_ctx=chat_ctx,
         )
+        self._resuming = resuming
         
         # Create Snoop's Hedra avatar
+        self.avatar_identity = f"snoop-{next(_avatar_ids)}"
         self.avatar = hedra.AvatarSession(
-            avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194"  # Snoop's avatar ID
+            avatar_id=SNOOP_KEY.avatar_id,  # Snoop's avatar ID
+            avatar_participant_identity=self.avatar_identity,
         )
 
     async def on_enter(self):
@@ -108,12 +209,12 @@ class SnoopAgent(Agent):
         logger.info("Snoop entering the conversation")
         
         # Start Snoop's avatar with the session's room
-        from livekit.agents.job import get_job_context
         job_ctx = get_job_context()
         await self.avatar.start(self.session, room=job_ctx.room)
+        own_swapped_host(self, "snoop", self.avatar_identity)
         
         # Generate response based on context
-        await self.session.generate_reply()
+        await self.session.generate_reply(instructions=RESUME_INSTRUCTIONS if self._resuming else None)
 
     @function_tool
     async def handoff_to_martha(
@@ -133,23 +234,282 @@ class SnoopAgent(Agent):
         if topic:
             context.userdata.topic = topic
             
-        martha_agent = MarthaAgent(chat_ctx=context.session.chat_ctx)
+        with get_tracer().span("handoff_to_martha", get_job_context().room.name):
+            martha_agent = MarthaAgent(chat_ctx=memory_chat_ctx(context.userdata.memory, "martha"))
         return martha_agent, "Alright, let me pass this back to Martha, she got the skills!"
 
 
+def handoff_note(memory: ConversationMemory, from_persona: str, to_persona: str, topic: Optional[str]) -> str:
+    # Only what the co-host hasn't heard yet: turns since it last spoke, plus the rolling
+    # summary if it changed
+    payload = memory.handoff_payload(to_persona)
+    note = f"{from_persona.title()} just handed the conversation over to you."
+    if topic:
+        note += f" Topic: {topic}."
+    if payload.turns or payload.summary:
+        note += f"\nSince you last spoke:\n{payload.render()}"
+    return note
+
+
+class FloorAgent(Agent):
+    """A host that stays in the room for the whole show; handing off only moves the floor."""
+
+    def __init__(
+        self,
+        persona: str,
+        *,
+        instructions: str,
+        co_host: str,
+        floor: FloorController,
+        handoff: Optional[TurnEndHandoff] = None,
+        chat_ctx: Optional[ChatContext] = None,
+    ) -> None:
+        super().__init__(instructions=instructions, chat_ctx=chat_ctx)
+        self._persona = persona
+        self._co_host = co_host
+        self._floor = floor
+        self._handoff = handoff
+
+    @function_tool
+    async def hand_off(
+        self,
+        context: RunContext[ConversationData],
+        topic: Optional[str] = None,
+    ):
+        """Hand the conversation over to your co-host
+
+        Args:
+            topic: Optional topic or context to pass to your co-host
+        """
+        logger.info(f"{self._persona} handing the floor to {self._co_host}. Topic: {topic}")
+
+        if topic:
+            context.userdata.topic = topic
+        if self._handoff:
+            # The controller moves the floor when this speech has played out anyway; this
+            # only overrides its chain limit
+            self._handoff.request(self._persona, self._co_host, topic)
+            return None
+        context.userdata.turn_count += 1
+        context.userdata.last_speaker = self._persona
+        room_name = get_job_context().room.name
+
+        def _hand_off(_) -> None:
+            get_tracer().end_turn(room_name, self._persona)
+            with get_tracer().span("hand_off", room_name, from_persona=self._persona, to_persona=self._co_host):
+                note = handoff_note(context.userdata.memory, self._persona, self._co_host, topic)
+            context.userdata.resources.task(self._floor.hand_to(self._co_host, note=note), "hand_off")
+
+        # Move the floor once this host's current speech has played out, instead of
+        # swapping agents (and reconnecting the model and avatar) on every turn
+        context.speech_handle.add_done_callback(_hand_off)
+        # Returning nothing keeps this host from generating a follow-up to the tool call
+        return None
+
+
+async def persistent_entrypoint(ctx: JobContext):
+    """Both hosts get a long-lived session and avatar; handoffs move the speaking floor."""
+    logger.info("Starting persistent dual avatar session with Martha and Snoop")
+
+    floor = FloorController()
+    resources = tracker.open(ctx.room.name)
+    ctx.add_shutdown_callback(resources.aclose)
+    shutdown_when_empty(ctx)
+    userdata = ConversationData(resources=resources)
+    tracer = get_tracer()
+    room_name = ctx.room.name
+    # With EVENT_LOG set, the room's timeline is recorded for replays
+    recorder = open_room_log(room_name)
+    if recorder:
+        resources.add("event_log", room_name, recorder.aclose)
+        recorder.watch_room(ctx.room)
+    # With CHECKPOINTS on, every turn is saved, and a restarted job picks the show back up
+    checkpoint = open_checkpoint(room_name)
+    resumed = checkpoint.resumed if checkpoint else None
+    if checkpoint:
+        ctx.add_shutdown_callback(checkpoint.aclose)
+        checkpoint.watch_room(ctx.room)
+        if resumed:
+            resumed.restore(userdata, userdata.memory)
+        checkpoint.track(
+            userdata.memory,
+            lambda: {
+                "current_speaker": floor.holder,
+                "turn_count": userdata.turn_count,
+                "last_speaker": userdata.last_speaker,
+                "topic": userdata.topic,
+            },
+        )
+
+    async def start_session(persona: str, session: AgentSession, agent: Agent) -> None:
+        if recorder:
+            # The avatar has set the session's output by now; record what goes into it
+            session.output.audio = recorder.audio_output(persona, session.output.audio)
+        await session.start(
+            agent=agent,
+            room=ctx.room,
+            room_input_options=RoomInputOptions(),
+            room_output_options=RoomOutputOptions(audio_enabled=False),  # Avatars handle audio
+        )
+
+    def turn_end_hand_to(from_persona: str, to_persona: str, topic: Optional[str]):
+        userdata.turn_count += 1
+        userdata.last_speaker = from_persona
+        tracer.end_turn(room_name, from_persona)
+        with tracer.span("hand_off", room_name, from_persona=from_persona, to_persona=to_persona):
+            note = handoff_note(userdata.memory, from_persona, to_persona, topic)
+        return floor.hand_to(to_persona, note=note)
+
+    handoff = TurnEndHandoff(["martha", "snoop"], turn_end_hand_to) if TURN_END_HANDOFFS else None
+    martha_llm, snoop_llm = await asyncio.gather(
+        connect_realtime_model(MARTHA_KEY),
+        connect_realtime_model(SNOOP_KEY),
+    )
+
+    hosts = {
+        "martha": (martha_llm, MARTHA_KEY, MARTHA_INSTRUCTIONS, "snoop"),
+        "snoop": (snoop_llm, SNOOP_KEY, SNOOP_INSTRUCTIONS, "martha"),
+    }
+    steps = []
+    releases = []
+    for persona, (llm, key, instructions, co_host) in hosts.items():
+        resources.add("model", persona, llm.discard)
+        session = AgentSession[ConversationData](llm=llm, userdata=userdata)
+        resources.add("avatar", persona, avatar_close(ctx.api, room_name, persona))
+        resources.add("session", persona, session.aclose)
+        avatar = hedra.AvatarSession(
+            avatar_id=key.avatar_id,
+            avatar_participant_identity=persona,
+            avatar_participant_name=persona.title(),
+        )
+        chat_ctx = None
+        if resumed:
+            # Each host starts out knowing the show so far, so the first handoff has
+            # nothing to catch up on
+            chat_ctx = memory_chat_ctx(userdata.memory, persona)
+            userdata.memory.handoff_payload(persona)
+        agent = FloorAgent(
+            persona, instructions=instructions, co_host=co_host, floor=floor, handoff=handoff, chat_ctx=chat_ctx
+        )
+
+        def grant(
+            note: Optional[str],
+            scripted: bool = False,
+            session: AgentSession = session,
+            persona: str = persona,
+            voice: str = key.voice,
+        ) -> None:
+            tracer.start_turn(room_name, persona, stage="reply_requested", handoff=True)
+            session.input.set_audio_enabled(True)
+            if scripted:
+                # The same line every show, so it plays from the line cache
+                speak_line(session, persona, voice, note)
+            else:
+                session.generate_reply(instructions=note)
+            if checkpoint:
+                checkpoint.save()
+
+        def release(session: AgentSession = session) -> None:
+            # Only the floor holder listens to the room, so the idle host never answers
+            session.input.set_audio_enabled(False)
+
+        def on_state_changed(ev, persona: str = persona) -> None:
+            if ev.new_state == "speaking":
+                floor.mark_speaking(persona)
+                tracer.mark(room_name, persona, "audio_first_chunk")
+
+        floor.register(persona, grant=grant, release=release)
+        session.on("agent_state_changed", on_state_changed)
+        if handoff:
+            handoff.watch(persona, session)
+        trace_model_metrics(tracer, room_name, persona, session)
+        if recorder:
+            # Only the floor holder hears the user, so each session records its own turns
+            recorder.watch(persona, session)
+        record_conversation(session, userdata.memory, lambda persona=persona: persona)
+        releases.append(release)
+
+        steps.append(
+            StartupStep(
+                f"{persona}_avatar",
+                traced(
+                    tracer,
+                    "avatar_start",
+                    lambda a=avatar, s=session: a.start(s, room=ctx.room),
+                    room_name,
+                    persona=persona,
+                ),
+                attempts=3,
+            )
+        )
+        steps.append(
+            StartupStep(
+                f"{persona}_session",
+                lambda p=persona, s=session, a=agent: start_session(p, s, a),
+                after=(f"{persona}_avatar",),
+            )
+        )
+
+    await run_startup(steps)
+
+    # Nobody holds the floor until Martha opens the show, or whoever had it picks it back up
+    for release in releases:
+        release()
+    holder = (resumed.fields.get("current_speaker") if resumed else None) or "martha"
+    if handoff:
+        handoff.set_holder(holder)
+    if resumed:
+        await floor.hand_to(holder, note=RESUME_INSTRUCTIONS)
+    else:
+        await floor.hand_to(holder, note=MARTHA_GREETING, scripted=True)
+
+
 async def entrypoint(ctx: JobContext):
     """Main entrypoint that starts the dual avatar session"""
+    if HANDOFF_MODE == "persistent":
+        await persistent_entrypoint(ctx)
+        return
+
     logger.info("Starting orchestrated dual avatar session with Martha and Snoop")
     
     # Create the session with shared conversation data
+    resources = tracker.open(ctx.room.name)
+    ctx.add_shutdown_callback(resources.aclose)
+    shutdown_when_empty(ctx)
+    userdata = ConversationData(resources=resources)
     session = AgentSession[ConversationData](
         llm=openai.realtime.RealtimeModel(voice="ash"),
-        userdata=ConversationData(),
+        userdata=userdata,
     )
+    resources.add("session", "agent-swap", session.aclose)
+    record_conversation(session, userdata.memory, lambda: session.current_agent.persona)
+    checkpoint = open_checkpoint(ctx.room.name)
+    resumed = checkpoint.resumed if checkpoint else None
+    if checkpoint:
+        ctx.add_shutdown_callback(checkpoint.aclose)
+        checkpoint.watch_room(ctx.room)
+        if resumed:
+            resumed.restore(userdata, userdata.memory)
+        checkpoint.track(
+            userdata.memory,
+            lambda: {
+                "current_speaker": session.current_agent.persona,
+                "turn_count": userdata.turn_count,
+                "last_speaker": userdata.last_speaker,
+                "topic": userdata.topic,
+            },
+        )
 
-    # Start with Martha as the initial agent
+    # Start with Martha as the initial agent, or with whichever host was on when the
+    # previous job stopped
+    if resumed and resumed.fields.get("current_speaker") == "snoop":
+        agent = SnoopAgent(chat_ctx=memory_chat_ctx(userdata.memory, "snoop"), resuming=True)
+    elif resumed:
+        agent = MarthaAgent(chat_ctx=memory_chat_ctx(userdata.memory, "martha"), resuming=True)
+    else:
+        agent = MarthaAgent()
     await session.start(
-        agent=MarthaAgent(),
+        agent=agent,
         room=ctx.room,
         room_input_options=RoomInputOptions(),
         room_output_options=RoomOutputOptions(audio_enabled=False),  # Avatars handle audio
@@ -157,4 +517,4 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, **load_options("dual_agent_orchestrated")))
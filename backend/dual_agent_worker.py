@@ -1,55 +1,112 @@
 import logging
 import os
 import asyncio
+import time
 from typing import Dict, Optional
 
 from dotenv import load_dotenv
-from PIL import Image
 
-from livekit.agents import Agent, AgentSession, JobContext, RoomInputOptions, RoomOutputOptions, WorkerOptions, WorkerType, cli
-from livekit.plugins import (
-    hedra,
-    openai,
-)
-from livekit.api import ListParticipantsRequest
+from livekit.agents import Agent, AgentSession, JobContext, JobExecutorType, RoomInputOptions, RoomOutputOptions, WorkerOptions, WorkerType, cli
+from audio_outputs import FirstFrameAudioOutput, HeldAudioOutput, SessionDraft
+from avatar_idle import IDLE_AVATARS, AvatarSuspender, RoomSubscriptions, StillVideo, load_still
+from lazy_imports import lazy_import, preload, prewarm
+from line_cache import speak_line
+from interruptions import BARGE_IN, InterruptionController
+from persona_models import PersonaKey, connect_realtime_model
+from playout import GAPLESS_PLAYOUT, PlayoutScheduler, ScheduledAudioOutput
+from prompts import PromptCacheUsage, PromptLayout
+from recording import open_room_log
+from resources import avatar_close, shutdown_when_empty, tracker
+from rooms import AdmissionController, RoomRegistry
+from speculation import SpeculativeReplies
+from tracing import get_tracer, trace_model_metrics
+from turn_scheduler import TurnScheduler, build_policies
+from worker_load import load_options
+
+hedra = lazy_import("livekit.plugins.hedra")
 
 logger = logging.getLogger("dual-hedra-avatar-example")
 logger.setLevel(logging.INFO)
 
 load_dotenv(".env.local")
 
+MARTHA_KEY = PersonaKey("martha", voice="ash", avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e", auto_reply=False)
+SNOOP_KEY = PersonaKey("snoop", voice="alloy", avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194", auto_reply=False)
+
+# Who answers: the host the user names, otherwise the next one in rotation. While a host is
+# still replying, further utterances for it are coalesced into a single follow-up reply.
+TURN_POLICY = os.getenv("TURN_POLICY", "addressed,round-robin")
+TURN_ON_BUSY = os.getenv("TURN_ON_BUSY", "coalesce")
+PERSONA_ALIASES = {
+    "martha": ("stewart",),
+    "snoop": ("dogg", "snoop dog"),
+}
+
+# Opt-in: both hosts draft a reply to every user turn; the co-host's draft is held back and
+# plays as an immediate follow-up, or is cancelled if the user speaks again first
+SPECULATIVE_REPLIES = os.getenv("SPECULATIVE_REPLIES", "0") == "1"
+SPECULATION_MAX_WASTED_TOKENS = float(os.getenv("SPECULATION_MAX_WASTED_TOKENS", "20000"))
+
+# Host many rooms per process (jobs run on threads instead of forked processes), admitting
+# new rooms only while there is CPU and memory headroom; see rooms.py for the limits
+MULTI_ROOM = os.getenv("WORKER_MULTI_ROOM", "0") == "1"
+
+# Stills shown in place of a host's avatar while it's suspended (IDLE_AVATARS=1)
+IDLE_STILLS = {
+    "martha": os.path.join(os.path.dirname(__file__), "assets", "mary.png"),
+    "snoop": os.path.join(os.path.dirname(__file__), "assets", "fred.png"),
+}
+
+# No per-turn text in here: the user's committed audio is the user turn, so every reply
+# shares the same instruction prefix and the provider's prompt cache can serve it
+REPLY_PROMPTS = PromptLayout({
+    "martha": "You are Martha Stewart. Respond to the user's last message. Stay elegant, sophisticated, and culinary-focused. Keep it brief and classy.",
+    "snoop": "You are Snoop Dogg. Respond to the user's last message. Stay laid-back, cool, and use your signature style. Add some flavor to the conversation, nephew. Keep it brief and smooth.",
+})
+
 class DualAvatarManager:
     def __init__(self):
         self.current_speaker = "martha"  # Start with Martha
-        self.response_count = 0
+        self.scheduler = TurnScheduler(
+            ["martha", "snoop"],
+            policies=build_policies(TURN_POLICY, PERSONA_ALIASES),
+            on_busy=TURN_ON_BUSY,
+            # Speculation keeps both sessions busy, so the hosts share one floor
+            exclusive=SPECULATIVE_REPLIES,
+        )
+        self.speculation: Optional[SpeculativeReplies] = None
+        self.playout: Optional[PlayoutScheduler] = None
+        self.interruptions: Optional[InterruptionController] = None
         self.martha_session: Optional[AgentSession] = None
         self.snoop_session: Optional[AgentSession] = None
         self.martha_avatar: Optional[hedra.AvatarSession] = None
         self.snoop_avatar: Optional[hedra.AvatarSession] = None
+        self.suspender: Optional[AvatarSuspender] = None
+        self.prompt_usage: Optional[PromptCacheUsage] = None
         
-    def get_next_speaker(self) -> str:
-        """Alternate between Martha and Snoop"""
-        self.response_count += 1
-        if self.response_count % 2 == 1:
-            self.current_speaker = "martha"
-        else:
-            self.current_speaker = "snoop"
+    def get_next_speaker(self, text: str = "") -> str:
+        """Pick the next speaker with the turn scheduler's policies"""
+        self.current_speaker = self.scheduler.assign(text)
         return self.current_speaker
     
     def get_current_session(self) -> Optional[AgentSession]:
-        if self.current_speaker == "martha":
+        return self.get_session(self.current_speaker)
+
+    def get_session(self, persona: str) -> Optional[AgentSession]:
+        if persona == "martha":
             return self.martha_session
         else:
             return self.snoop_session
     
-    def get_current_avatar(self) -> Optional[hedra.AvatarSession]:
+    def get_current_avatar(self) -> Optional["hedra.AvatarSession"]:
         if self.current_speaker == "martha":
             return self.martha_avatar
         else:
             return self.snoop_avatar
 
-# Global manager instance
-avatar_manager = DualAvatarManager()
+# Per-room state, so concurrent rooms in one process never share a manager
+rooms: RoomRegistry[DualAvatarManager] = RoomRegistry(lambda name: DualAvatarManager())
+admission = AdmissionController(rooms)
 
 class MarthaAgent(Agent):
     def __init__(self):
@@ -76,59 +133,209 @@ class SnoopAgent(Agent):
         )
 
 async def entrypoint(ctx: JobContext):
-    global avatar_manager
-    
+    avatar_manager = rooms.open(ctx.room.name)
+
+    async def close_room():
+        if avatar_manager.prompt_usage:
+            logger.info(f"📊 Prompt cache: {avatar_manager.prompt_usage.summary()}")
+        if avatar_manager.playout:
+            logger.info(f"📊 Playout: {avatar_manager.playout.summary()}")
+        if avatar_manager.interruptions:
+            stats = avatar_manager.interruptions.stats
+            logger.info(f"📊 Barge-ins: {stats.barge_ins} ({stats.dropped_turns} pending turns dropped)")
+        rooms.close(ctx.room.name)
+
+    ctx.add_shutdown_callback(close_room)
+    # Everything the room opens is closed with it, when the job ends or the room empties
+    resources = tracker.open(ctx.room.name)
+    ctx.add_shutdown_callback(resources.aclose)
+    shutdown_when_empty(ctx)
+
     logger.info("Starting dual live avatar session with Martha and Snoop")
+    tracer = get_tracer()
+    room_name = ctx.room.name
+    # With EVENT_LOG set, the room's timeline is recorded for replays
+    recorder = open_room_log(room_name)
+    if recorder:
+        resources.add("event_log", room_name, recorder.aclose)
+        recorder.watch_room(ctx.room)
     
+    # Realtime models that start connecting now, while the avatars start
+    martha_llm, snoop_llm = await asyncio.gather(
+        connect_realtime_model(MARTHA_KEY),
+        connect_realtime_model(SNOOP_KEY),
+    )
+
+    resources.add("model", "martha", martha_llm.discard)
+    resources.add("model", "snoop", snoop_llm.discard)
+
     # Create Martha's session and avatar
     avatar_manager.martha_session = AgentSession(
-        llm=openai.realtime.RealtimeModel(voice="ash"),  # Martha's voice
+        llm=martha_llm,  # Martha's voice
     )
     
     avatar_manager.martha_avatar = hedra.AvatarSession(
-        avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e",  # Martha's avatar ID
+        avatar_id=MARTHA_KEY.avatar_id,  # Martha's avatar ID
+        avatar_participant_identity="martha",  # distinct identities, so each avatar's video can be told apart
     )
     
-    # Create Snoop's session and avatar (using same ID for now)
+    # Create Snoop's session and avatar
     avatar_manager.snoop_session = AgentSession(
-        llm=openai.realtime.RealtimeModel(voice="alloy"),  # Snoop's voice
+        llm=snoop_llm,  # Snoop's voice
     )
     
     avatar_manager.snoop_avatar = hedra.AvatarSession(
-        avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194",  # Same avatar ID - will create second instance
+        avatar_id=SNOOP_KEY.avatar_id,  # Snoop's avatar ID
+        avatar_participant_identity="snoop",
     )
     
     # Start both avatar sessions simultaneously
     logger.info("Starting Martha's avatar session")
-    await avatar_manager.martha_avatar.start(avatar_manager.martha_session, room=ctx.room)
+    with tracer.span("avatar_start", room_name, persona="martha"):
+        await avatar_manager.martha_avatar.start(avatar_manager.martha_session, room=ctx.room)
+    resources.add("avatar", "martha", avatar_close(ctx.api, room_name, "martha"))
     
     logger.info("Starting Snoop's avatar session")
-    await avatar_manager.snoop_avatar.start(avatar_manager.snoop_session, room=ctx.room)
-    
-    # Custom agent class that handles alternation
+    with tracer.span("avatar_start", room_name, persona="snoop"):
+        await avatar_manager.snoop_avatar.start(avatar_manager.snoop_session, room=ctx.room)
+    resources.add("avatar", "snoop", avatar_close(ctx.api, room_name, "snoop"))
+
+    if IDLE_AVATARS:
+        # Only the speaking host's avatar is streamed to viewers, though Hedra keeps rendering
+        # both; the other's still goes out as a separate track
+        suspender = avatar_manager.suspender = AvatarSuspender(
+            ctx.room,
+            {"martha": "martha", "snoop": "snoop"},
+            RoomSubscriptions(ctx.api, room_name),
+            stills={
+                persona: StillVideo(f"{persona}_idle", load_still(path))
+                for persona, path in IDLE_STILLS.items()
+            },
+        )
+        await suspender.start()
+        resources.add("suspender", room_name, suspender.aclose)
+
+    def tap(session: AgentSession, persona: str, stage: str) -> None:
+        def on_first_frame() -> None:
+            tracer.mark(room_name, persona, stage)
+            if stage == "avatar_first_frame" and avatar_manager.suspender:
+                # Covers replies that didn't go through the scheduler
+                avatar_manager.suspender.speaker_hint(persona)
+
+        session.output.audio = FirstFrameAudioOutput(session.output.audio, on_first_frame)
+
+    # Audio handed to the avatar is what it lip-syncs to, the closest we get to its first frame
+    for persona in ("martha", "snoop"):
+        tap(avatar_manager.get_session(persona), persona, "avatar_first_frame")
+        trace_model_metrics(tracer, room_name, persona, avatar_manager.get_session(persona))
+    avatar_manager.prompt_usage = PromptCacheUsage(tracer=tracer, room=room_name)
+    for persona in ("martha", "snoop"):
+        avatar_manager.prompt_usage.watch(avatar_manager.get_session(persona), persona)
+
+    if SPECULATIVE_REPLIES:
+        # Hold-able outputs in front of each avatar, so a draft can be generated silently.
+        # With GAPLESS_PLAYOUT the follow-up is released to start where the first reply ends,
+        # instead of after the first avatar reports it finished playing.
+        outputs = {}
+        for persona in ("martha", "snoop"):
+            session = avatar_manager.get_session(persona)
+            if GAPLESS_PLAYOUT:
+                outputs[persona] = ScheduledAudioOutput(session.output.audio, persona)
+            else:
+                outputs[persona] = HeldAudioOutput(session.output.audio)
+            session.output.audio = outputs[persona]
+        if GAPLESS_PLAYOUT:
+            avatar_manager.playout = PlayoutScheduler(outputs, tracer=tracer, room=room_name)
+
+        avatar_manager.speculation = SpeculativeReplies(
+            ["martha", "snoop"],
+            lambda persona, text, held: SessionDraft(
+                avatar_manager.get_session(persona),
+                outputs[persona],
+                REPLY_PROMPTS.instructions(avatar_manager.get_session(persona).current_agent.instructions, persona),
+                held=held,
+                scheduler=avatar_manager.playout,
+                persona=persona,
+            ),
+            max_wasted_tokens=SPECULATION_MAX_WASTED_TOKENS,
+            pipelined=avatar_manager.playout is not None,
+        )
+
+    # Outermost, so it sees the model's first chunk even while a speculative draft is held
+    for persona in ("martha", "snoop"):
+        tap(avatar_manager.get_session(persona), persona, "audio_first_chunk")
+
+    if recorder:
+        # Outside the taps too, so chunks are stamped as the model delivers them
+        for persona in ("martha", "snoop"):
+            session = avatar_manager.get_session(persona)
+            recorder.watch(persona, session, user=persona == "martha")  # both hear the same user
+            session.output.audio = recorder.audio_output(persona, session.output.audio)
+
+    if BARGE_IN:
+        # Whichever session hears the user first stops both hosts, and nothing queued
+        # behind the interrupted reply plays after it
+        interruptions = avatar_manager.interruptions = InterruptionController(tracer=tracer, room=room_name)
+        for persona in ("martha", "snoop"):
+            session = avatar_manager.get_session(persona)
+            interruptions.add(persona, session, session.output.audio)
+        interruptions.on_interrupt(avatar_manager.scheduler.drop_pending)
+        if avatar_manager.speculation:
+            interruptions.on_interrupt(avatar_manager.speculation.cancel_warm)
+
     class DualAgent(Agent):
         def __init__(self):
             super().__init__(instructions="You are managing a dual avatar conversation between Martha and Snoop.")
-            
-        async def on_user_speech_committed(self, user_speech):
-            """Handle user speech and route to the appropriate avatar session"""
-            next_speaker = avatar_manager.get_next_speaker()
-            current_session = avatar_manager.get_current_session()
-            
-            logger.info(f"User said: '{user_speech.text}' - Next speaker: {next_speaker}")
-            
-            if user_speech.text and current_session:
-                # Route to the appropriate avatar session
-                if next_speaker == "martha":
-                    await avatar_manager.martha_session.generate_reply(
-                        instructions=f"You are Martha Stewart. Respond to: '{user_speech.text}'. Stay elegant, sophisticated, and culinary-focused. Keep it brief and classy."
+
+    async def route_user_turn(text: str) -> None:
+        """Route a finished user utterance to the host whose turn it is"""
+        scheduler = avatar_manager.scheduler
+        speculation = avatar_manager.speculation
+        if speculation:
+            # Drafts still held back answer an older turn
+            speculation.cancel_warm()
+
+        request = scheduler.submit(text)
+        if request is None:
+            logger.info(f"User said: '{text}' - folded into the reply in flight")
+            return
+
+        # Keep dispatching while utterances piled up behind this reply
+        while request is not None:
+            avatar_manager.current_speaker = request.persona
+            logger.info(f"User said: '{request.text}' - Next speaker: {request.persona}")
+            # submitted_at is on the scheduler's monotonic clock, the tracer uses wall time
+            committed_at = time.time() - (time.monotonic() - request.submitted_at)
+            tracer.start_turn(room_name, request.persona, at=committed_at, utterances=request.utterances)
+            tracer.mark(room_name, request.persona, "reply_requested")
+            try:
+                if avatar_manager.suspender:
+                    await avatar_manager.suspender.set_speaker(request.persona)
+                if speculation:
+                    await speculation.reply(request.persona, request.text)
+                    stats = speculation.stats
+                    logger.info(
+                        f"Speculation hit rate {stats.hit_rate:.0%} "
+                        f"({stats.wasted_tokens:.0f} tokens wasted)"
                     )
                 else:
-                    await avatar_manager.snoop_session.generate_reply(
-                        instructions=f"You are Snoop Dogg. Respond to: '{user_speech.text}'. Stay laid-back, cool, and use your signature style. Add some flavor to the conversation, nephew. Keep it brief and smooth."
+                    await REPLY_PROMPTS.reply(
+                        avatar_manager.get_current_session(), request.persona, request.text
                     )
+            except Exception as e:
+                logger.error(f"Reply from {request.persona} failed: {e}")
+            tracer.end_turn(room_name, request.persona)
+            request = scheduler.complete(request.persona)
+
+    # Neither model answers the user on its own (auto_reply=False); both sessions hear the
+    # same user, and Martha's routes each finished utterance to one of them
+    @avatar_manager.martha_session.on("user_input_transcribed")
+    def _on_user_input_transcribed(ev):
+        if ev.is_final and ev.transcript:
+            resources.task(route_user_turn(ev.transcript), "user_turn")
     
     # Start Martha's session
+    resources.add("session", "martha", avatar_manager.martha_session.aclose)
     await avatar_manager.martha_session.start(
         room=ctx.room,
         agent=DualAgent(),
@@ -137,6 +344,7 @@ async def entrypoint(ctx: JobContext):
     )
     
     # Start Snoop's session
+    resources.add("session", "snoop", avatar_manager.snoop_session.aclose)
     await avatar_manager.snoop_session.start(
         room=ctx.room,
         agent=DualAgent(),
@@ -151,14 +359,38 @@ async def entrypoint(ctx: JobContext):
     # Start with Martha's greeting
     avatar_manager.current_speaker = "martha"
     logger.info("Martha starting with greeting")
-    await avatar_manager.martha_session.generate_reply(
-        instructions="Greet the audience warmly and introduce yourself and Snoop as co-hosts for this cooking session. Mention that you'll be trading off responses. Keep it brief and elegant."
+    tracer.start_turn(room_name, "martha", stage="reply_requested", greeting=True)
+    if avatar_manager.suspender:
+        await avatar_manager.suspender.set_speaker("martha")
+    await speak_line(
+        avatar_manager.martha_session,
+        "martha",
+        MARTHA_KEY.voice,
+        "Greet the audience warmly and introduce yourself and Snoop as co-hosts for this cooking session. Mention that you'll be trading off responses. Keep it brief and elegant.",
     )
-    
-    # Keep the sessions alive
-    await avatar_manager.martha_session.aclose()
-    await avatar_manager.snoop_session.aclose()
+    tracer.end_turn(room_name, "martha")
+    # The sessions stay up until the job shuts down; resources.aclose closes them then
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, worker_type=WorkerType.ROOM))
+    if MULTI_ROOM:
+        # Jobs run on worker threads, and LiveKit only registers plugins on the main thread
+        preload()
+        cli.run_app(
+            WorkerOptions(
+                entrypoint_fnc=entrypoint,
+                worker_type=WorkerType.ROOM,
+                job_executor_type=JobExecutorType.THREAD,
+                request_fnc=admission.request_fnc,
+                load_fnc=admission.load,
+            )
+        )
+    else:
+        cli.run_app(
+            WorkerOptions(
+                entrypoint_fnc=entrypoint,
+                worker_type=WorkerType.ROOM,
+                prewarm_fnc=prewarm,
+                **load_options("dual_agent_worker"),
+            )
+        )
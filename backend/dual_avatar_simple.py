@@ -1,5 +1,5 @@
-import asyncio
 import logging
+import os
 from typing import Optional
 
 from dotenv import load_dotenv
@@ -13,11 +13,41 @@ from livekit.agents import (
     WorkerOptions,
     cli,
 )
-from livekit.plugins import openai, hedra
+from audio_outputs import ActiveSpeakerAudioOutput
+from interruptions import BARGE_IN, InterruptionController
+from lazy_imports import lazy_import, prewarm
+from line_cache import speak_line
+from persona_models import PersonaKey, connect_realtime_model
+from prompts import PromptLayout
+from resources import avatar_close, shutdown_when_empty, tracker
+from turn_scheduler import TurnScheduler, build_policies
+from worker_load import load_options
+
+hedra = lazy_import("livekit.plugins.hedra")
 
 logger = logging.getLogger("dual-avatar-simple")
 load_dotenv()
 
+# Both hosts share one realtime session in this layout
+DUAL_HOST_KEY = PersonaKey("dual-host", voice="ash", auto_reply=False)
+
+TURN_POLICY = os.getenv("TURN_POLICY", "addressed,round-robin")
+TURN_ON_BUSY = os.getenv("TURN_ON_BUSY", "coalesce")
+PERSONA_ALIASES = {
+    "martha": ("stewart",),
+    "snoop": ("dogg", "snoop dog"),
+}
+
+# Both hosts' styles sit in one stable instruction block (the session is shared), and the
+# user's audio item is replaced with a text item tagged with the host who answers
+REPLY_PROMPTS = PromptLayout(
+    {
+        "martha": "You are Martha Stewart. Respond elegantly. Keep it conversational and mention that Snoop will respond next.",
+        "snoop": "You are Snoop Dogg. Respond in your laid-back style. Keep it cool and mention Martha will respond next, nephew.",
+    },
+    shared_session=True,
+)
+
 class SimpleAlternatingAgent(Agent):
     def __init__(self):
         super().__init__(
@@ -26,64 +56,114 @@ class SimpleAlternatingAgent(Agent):
         self.turn_count = 0
         self.martha_avatar = None
         self.snoop_avatar = None
+        self.router: Optional[ActiveSpeakerAudioOutput] = None
+        # Host voicing the next speech the session creates; its avatar gets the audio
+        self.speaking_persona = "martha"
+        # One session voices both hosts, so they share a single floor
+        self.scheduler = TurnScheduler(
+            ["martha", "snoop"],
+            policies=build_policies(TURN_POLICY, PERSONA_ALIASES),
+            on_busy=TURN_ON_BUSY,
+            exclusive=True,
+        )
         
-    async def on_user_speech_committed(self, user_speech):
-        """Handle user speech and alternate between avatars"""
-        if not user_speech.text:
+    async def handle_user_turn(self, text: str):
+        """Handle user speech and pick which avatar responds"""
+        request = self.scheduler.submit(text)
+        if request is None:
+            # Still speaking: this waits behind the current reply, coalesced with anything
+            # else said meanwhile, instead of stacking up replies
             return
-            
-        # Determine which avatar should respond
-        is_martha_turn = (self.turn_count % 2) == 0
+
+        while request is not None:
+            try:
+                await self._reply(request.persona, request.text)
+            except Exception as e:
+                logger.error(f"Reply from {request.persona} failed: {e}")
+            request = self.scheduler.complete(request.persona)
+
+    async def _reply(self, persona: str, text: str) -> None:
         self.turn_count += 1
-        
-        if is_martha_turn:
+        self.speaking_persona = persona
+        if persona == "martha":
             logger.info(f"Martha responding (turn {self.turn_count})")
             # Martha's response
-            await self.session.generate_reply(
-                instructions=f"You are Martha Stewart. Respond elegantly to: '{user_speech.text}'. Keep it conversational and mention that Snoop will respond next."
-            )
+            await REPLY_PROMPTS.reply(self.session, "martha", text)
         else:
             logger.info(f"Snoop responding (turn {self.turn_count})")
-            # Snoop's response  
-            await self.session.generate_reply(
-                instructions=f"You are Snoop Dogg. Respond in your laid-back style to: '{user_speech.text}'. Keep it cool and mention Martha will respond next, nephew."
-            )
+            # Snoop's response
+            await REPLY_PROMPTS.reply(self.session, "snoop", text)
 
 
 async def entrypoint(ctx: JobContext):
     """Main entrypoint - creates both avatars and manages alternation"""
     logger.info("Starting simple dual avatar session")
+    resources = tracker.open(ctx.room.name)
+    ctx.add_shutdown_callback(resources.aclose)
+    shutdown_when_empty(ctx)
     
     # Create Martha's avatar session
     martha_avatar = hedra.AvatarSession(
-        avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e"  # Martha's avatar
+        avatar_id="0396e7f6-252a-4bd8-8f41-e8d1ecd6367e",  # Martha's avatar
+        avatar_participant_identity="martha",
+        avatar_participant_name="Martha Stewart",
     )
     
     # Create Snoop's avatar session  
     snoop_avatar = hedra.AvatarSession(
-        avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194"  # Snoop's avatar
+        avatar_id="cc8558ef-c600-4b4f-b685-7e9f2afec194",  # Snoop's avatar
+        avatar_participant_identity="snoop",
+        avatar_participant_name="Snoop Dogg",
     )
     
     # Create the main agent session
-    session = AgentSession(
-        llm=openai.realtime.RealtimeModel(voice="ash"),
-    )
+    llm = await connect_realtime_model(DUAL_HOST_KEY)
+    resources.add("model", "dual-host", llm.discard)
+    session = AgentSession(llm=llm)
     
-    # Start both avatars simultaneously
+    # Each avatar start replaces the session's audio output with one aimed at that
+    # avatar, so keep both and route between them
     logger.info("Starting Martha's avatar")
     await martha_avatar.start(session, room=ctx.room)
+    resources.add("avatar", "martha", avatar_close(ctx.api, ctx.room.name, "martha"))
+    martha_output = session.output.audio
     
     logger.info("Starting Snoop's avatar") 
     await snoop_avatar.start(session, room=ctx.room)
-    
-    # Wait a moment for both avatars to initialize
-    await asyncio.sleep(2)
+    resources.add("avatar", "snoop", avatar_close(ctx.api, ctx.room.name, "snoop"))
+    snoop_output = session.output.audio
+
+    router = ActiveSpeakerAudioOutput({"martha": martha_output, "snoop": snoop_output}, active="martha")
+    session.output.audio = router
+    resources.add("router", ctx.room.name, router.aclose)
     
     # Create and start the alternating agent
     agent = SimpleAlternatingAgent()
     agent.martha_avatar = martha_avatar
     agent.snoop_avatar = snoop_avatar
+    agent.router = router
+
+    # Only the speaking host's avatar gets a reply's audio; the route switches as the
+    # session creates the speech, before any of its audio reaches the router
+    @session.on("speech_created")
+    def _on_speech_created(ev):
+        router.route(agent.speaking_persona)
+
+    # The model doesn't answer on its own (auto_reply=False): each finished utterance
+    # goes through the scheduler, which picks the host who answers
+    @session.on("user_input_transcribed")
+    def _on_user_input_transcribed(ev):
+        if ev.is_final and ev.transcript:
+            resources.task(agent.handle_user_turn(ev.transcript), "user_turn")
+
+    if BARGE_IN:
+        # The session stops its own speech; this also ends the avatar's segment and drops
+        # turns queued behind it, so the user's next words get the floor
+        interruptions = InterruptionController(room=ctx.room.name)
+        interruptions.add("dual-host", session, router)
+        interruptions.on_interrupt(agent.scheduler.drop_pending)
     
+    resources.add("session", "dual-host", session.aclose)
     await session.start(
         room=ctx.room,
         agent=agent,
@@ -91,12 +171,19 @@ async def entrypoint(ctx: JobContext):
         room_input_options=RoomInputOptions(),
     )
     
+    # Wait for both avatars to join the room instead of sleeping a fixed 2s
+    await router.start(ctx.room)
+
     # Initial greeting from Martha
     logger.info("Martha giving initial greeting")
-    await session.generate_reply(
-        instructions="You are Martha Stewart. Greet the audience warmly and introduce yourself and Snoop as co-hosts. Mention you'll be alternating responses. Keep it brief and elegant."
+    agent.speaking_persona = "martha"
+    await speak_line(
+        session,
+        "martha",
+        DUAL_HOST_KEY.voice,
+        "You are Martha Stewart. Greet the audience warmly and introduce yourself and Snoop as co-hosts. Mention you'll be alternating responses. Keep it brief and elegant.",
     )
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, **load_options("dual_avatar_simple")))
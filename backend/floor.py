@@ -0,0 +1,117 @@
+import inspect
+import logging
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger("speaking-floor")
+
+
+@dataclass
+class HandoffRecord:
+    from_persona: Optional[str]
+    to_persona: str
+    requested_at: float
+    dispatched_at: float = 0.0  # the incoming host's reply has been requested
+    speaking_at: Optional[float] = None  # the incoming host started speaking
+
+    @property
+    def dispatch_latency(self) -> float:
+        return self.dispatched_at - self.requested_at
+
+    @property
+    def speaking_latency(self) -> Optional[float]:
+        if self.speaking_at is None:
+            return None
+        return self.speaking_at - self.requested_at
+
+
+@dataclass
+class _Seat:
+    grant: Callable[..., Any]
+    release: Optional[Callable[[], Any]] = None
+
+
+class FloorController:
+    """Tracks which persona holds the speaking floor when every persona keeps its own
+    long-lived session and avatar for the whole room.
+
+    A handoff only releases the outgoing persona and grants the incoming one; nothing is
+    reconnected. Every handoff is timed and kept in a bounded history.
+    """
+
+    def __init__(self, *, history: int = 256, clock: Callable[[], float] = time.perf_counter):
+        self._seats: Dict[str, _Seat] = {}
+        self._holder: Optional[str] = None
+        self._pending: Dict[str, HandoffRecord] = {}
+        self._clock = clock
+        self.records: Deque[HandoffRecord] = deque(maxlen=history)
+
+    @property
+    def holder(self) -> Optional[str]:
+        return self._holder
+
+    @property
+    def personas(self) -> list:
+        return list(self._seats)
+
+    def register(
+        self,
+        persona: str,
+        *,
+        grant: Callable[..., Any],
+        release: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """``grant(note, scripted=...)`` makes the persona speak; ``release()`` stops it from taking turns.
+
+        ``scripted`` is set when the note is a fixed line, such as the greeting, that may be
+        played from the line cache.
+        """
+        self._seats[persona] = _Seat(grant, release)
+
+    async def hand_to(self, persona: str, note: Optional[str] = None, *, scripted: bool = False) -> HandoffRecord:
+        if persona not in self._seats:
+            raise ValueError(f"unknown persona: {persona}")
+
+        record = HandoffRecord(self._holder, persona, requested_at=self._clock())
+        previous = self._seats.get(self._holder) if self._holder is not None else None
+        if previous is not None and self._holder != persona and previous.release is not None:
+            await _maybe_await(previous.release())
+
+        self._holder = persona
+        await _maybe_await(self._seats[persona].grant(note, scripted=scripted))
+        record.dispatched_at = self._clock()
+
+        self._pending[persona] = record
+        self.records.append(record)
+        return record
+
+    def mark_speaking(self, persona: str) -> None:
+        """Call when ``persona`` starts playing audio, closes the pending handoff to it."""
+        record = self._pending.pop(persona, None)
+        if record is None:
+            return
+        record.speaking_at = self._clock()
+        logger.info(
+            f"🎤 Handoff {record.from_persona or 'start'} -> {persona}: "
+            f"dispatched in {record.dispatch_latency * 1000:.0f}ms, "
+            f"speaking after {record.speaking_latency * 1000:.0f}ms"
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        dispatch = [r.dispatch_latency for r in self.records]
+        speaking = [r.speaking_latency for r in self.records if r.speaking_latency is not None]
+        return {
+            "handoffs": len(self.records),
+            "dispatch_median": statistics.median(dispatch) if dispatch else None,
+            "speaking_median": statistics.median(speaking) if speaking else None,
+            "speaking_max": max(speaking) if speaking else None,
+        }
+
+
+async def _maybe_await(result: Any) -> Any:
+    if inspect.isawaitable(result):
+        return await result
+    return result
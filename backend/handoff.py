@@ -0,0 +1,114 @@
+"""Hand the floor to the next host when the current one's speech has played out.
+
+Handoffs used to wait for the model to call a handoff tool after speaking. That costs
+a function-call round trip on every turn. And when the model forgets the call, the show
+stalls until the user speaks. ``TurnEndHandoff`` instead watches each persona's session.
+Once the floor holder has spoken and all of its speech has played out uninterrupted, the
+floor moves to the next persona in ``order``. The handoff tools stay as an override: a
+tool call hands off at the end of the current speech, even past ``max_chain``.
+
+``max_chain`` bounds how many times the hosts hand the floor to each other without the
+user saying anything (0 = no limit, the hosts keep talking to each other).
+``HANDOFF_TRIGGER=tool`` brings back the old tool-driven handoffs.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+logger = logging.getLogger("handoff")
+
+HANDOFF_TRIGGER = os.getenv("HANDOFF_TRIGGER", "turn-end")
+HANDOFF_MAX_CHAIN = int(os.getenv("HANDOFF_MAX_CHAIN", "1"))
+
+# (from_persona, to_persona, topic)
+HandTo = Callable[[str, str, Optional[str]], Union[Awaitable[Any], Any]]
+
+
+class TurnEndHandoff:
+    def __init__(self, order: List[str], hand_to: HandTo, *, max_chain: int = HANDOFF_MAX_CHAIN):
+        if len(order) < 2:
+            raise ValueError("a handoff needs at least two personas")
+        self._order = order
+        self._hand_to = hand_to
+        self._max_chain = max_chain
+        self._holder: Optional[str] = None
+        self._speeches: Dict[str, Set[Any]] = {persona: set() for persona in order}
+        self._spoke = {persona: False for persona in order}
+        self._requested: Optional[tuple] = None  # (to_persona, topic) from a tool call
+        self._chain = 0
+        self._tasks: Set[asyncio.Future] = set()  # handoffs still running
+        self.handoffs = 0
+        self.overrides = 0
+
+    @property
+    def holder(self) -> Optional[str]:
+        return self._holder
+
+    def set_holder(self, persona: str) -> None:
+        """Who holds the floor now, for floor changes made outside the controller."""
+        if persona not in self._speeches:
+            raise ValueError(f"unknown persona: {persona}")
+        self._holder = persona
+
+    def next_after(self, persona: str) -> str:
+        return self._order[(self._order.index(persona) + 1) % len(self._order)]
+
+    def watch(self, persona: str, session: Any) -> None:
+        session.on("speech_created", lambda ev: self._on_speech_created(persona, ev.speech_handle))
+        session.on("agent_state_changed", lambda ev: self._on_agent_state(persona, ev.new_state))
+        session.on("user_state_changed", lambda ev: self._on_user_state(ev.new_state))
+
+    def request(self, persona: str, to_persona: Optional[str] = None, topic: Optional[str] = None) -> None:
+        """Tool override: hand off once ``persona``'s current speech has played out."""
+        if persona != self._holder:
+            return
+        self._requested = (to_persona or self.next_after(persona), topic)
+        if not self._speeches[persona]:
+            self._hand_off(persona)
+
+    def _on_speech_created(self, persona: str, handle: Any) -> None:
+        self._speeches[persona].add(handle)
+        handle.add_done_callback(lambda handle: self._on_speech_done(persona, handle))
+
+    def _on_agent_state(self, persona: str, state: str) -> None:
+        if state == "speaking":
+            self._spoke[persona] = True
+
+    def _on_user_state(self, state: str) -> None:
+        if state == "speaking":
+            self._chain = 0
+
+    def _on_speech_done(self, persona: str, handle: Any) -> None:
+        self._speeches[persona].discard(handle)
+        if persona != self._holder or self._speeches[persona]:
+            return
+        if handle.interrupted:
+            # The user cut in; the holder answers them and keeps the floor
+            self._spoke[persona] = False
+            return
+        chain_left = not self._max_chain or self._chain < self._max_chain
+        if self._requested is not None or (self._spoke[persona] and chain_left):
+            self._hand_off(persona)
+
+    def _hand_off(self, persona: str) -> None:
+        to_persona, topic = self._requested or (self.next_after(persona), None)
+        if self._requested is not None:
+            self.overrides += 1
+        self._requested = None
+        self._spoke[persona] = False
+        self._chain += 1
+        self._holder = to_persona
+        self.handoffs += 1
+        result = self._hand_to(persona, to_persona, topic)
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._tasks.add(task)
+            task.add_done_callback(lambda task: self._on_hand_off_done(persona, to_persona, task))
+
+    def _on_hand_off_done(self, from_persona: str, to_persona: str, task: "asyncio.Future") -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Handoff {from_persona} -> {to_persona} failed: {task.exception()!r}")
@@ -0,0 +1,107 @@
+"""Room-wide barge-in: when the user talks over the hosts, every host stops at once.
+
+Each persona session only stops its own speech, and only when its own realtime
+connection reports that the user started speaking. With two sessions in a room, the
+host whose connection reports later keeps talking over the user for that long.
+Replies waiting behind the interrupted one also still play after it:
+
+- utterances the turn scheduler coalesced into a follow-up
+- a co-host's held speculative draft
+
+And the avatars keep lip-syncing whatever audio they already had queued.
+
+``InterruptionController`` watches every session in the room. When any of them first
+reports the user speaking, it runs the following in that same event-loop callback, so
+there's no await between the signal and the avatars being told to stop:
+
+- clear the audio output chain of every host that is thinking or speaking. This drops
+  held drafts and has each avatar drop what it has queued.
+- interrupt every session's current and queued speech
+- run the room's hooks, which drop pending turns and cancel warm drafts
+
+Nothing stale is left ahead of what the user is saying, so the floor goes to whichever
+host the turn scheduler picks for it.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from livekit.agents.voice import io
+
+from tracing import Tracer
+
+logger = logging.getLogger("interruptions")
+
+BARGE_IN = os.getenv("BARGE_IN", "1") == "1"
+
+
+@dataclass
+class BargeInStats:
+    barge_ins: int = 0  # the user started speaking while a host was thinking or speaking
+    dropped_turns: int = 0  # pending replies the hooks dropped
+
+
+class InterruptionController:
+    """Stops every host in a room as soon as any session hears the user start speaking.
+
+    ``add`` each host's session with its outermost audio output (several hosts may share
+    one session). ``on_interrupt`` registers anything else that holds replies for later;
+    a hook may return how many turns it dropped.
+    """
+
+    def __init__(self, *, tracer: Optional[Tracer] = None, room: str = ""):
+        self._tracer = tracer
+        self._room = room
+        self._hosts: Dict[str, Tuple[Any, Optional[io.AudioOutput]]] = {}
+        self._states: Dict[str, str] = {}
+        self._hooks: List[Callable[[], Optional[int]]] = []
+        self._user_speaking = False
+        self.stats = BargeInStats()
+
+    def add(self, persona: str, session: Any, output: Optional[io.AudioOutput] = None) -> None:
+        self._hosts[persona] = (session, output)
+        session.on("user_state_changed", self._on_user_state)
+        session.on("agent_state_changed", lambda ev: self._states.__setitem__(persona, ev.new_state))
+
+    def on_interrupt(self, hook: Callable[[], Optional[int]]) -> None:
+        self._hooks.append(hook)
+
+    @property
+    def active(self) -> List[str]:
+        """Hosts that are generating or playing a reply."""
+        return [persona for persona, state in self._states.items() if state in ("thinking", "speaking")]
+
+    def _on_user_state(self, ev: Any) -> None:
+        if ev.new_state != "speaking":
+            self._user_speaking = False
+        elif not self._user_speaking:
+            # Every session hearing the user reports the same speech; the first one counts
+            self._user_speaking = True
+            self.interrupt()
+
+    def interrupt(self) -> List[str]:
+        """Stop every host now; returns the ones that were thinking or speaking."""
+        active = self.active
+        sessions = []
+        for persona, (session, output) in self._hosts.items():
+            if output is not None and persona in active:
+                output.clear_buffer()
+            if all(session is not other for other in sessions):
+                sessions.append(session)
+        for session in sessions:
+            try:
+                session.interrupt()
+            except RuntimeError:
+                pass  # not started yet, or already closed
+        dropped = sum(hook() or 0 for hook in self._hooks)
+
+        self.stats.dropped_turns += dropped
+        if active:
+            self.stats.barge_ins += 1
+            for persona in active:
+                if self._tracer is not None:
+                    self._tracer.annotate(self._room, persona, barged_in=True)
+            logger.info(f"✋ User barged in on {', '.join(active)} ({dropped} pending turns dropped)")
+        return active
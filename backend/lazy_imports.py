@@ -0,0 +1,147 @@
+"""Deferred plugin imports and import-time reports for the worker entry points.
+
+With ``LAZY_IMPORTS=1`` the worker's main process only imports what it needs to register
+with LiveKit. ``lazy_import`` hands out placeholders for the heavy plugin modules. Job
+processes import them for real in ``prewarm``, which LiveKit runs while they sit idle
+waiting for a job. LiveKit only accepts plugin registration on the main thread, so the
+thread job executor has to ``preload`` on the main thread before the worker starts.
+
+Per-module import times, parsed from ``python -X importtime``:
+
+    python lazy_imports.py agent_worker --top 20
+    python lazy_imports.py agent_worker --json
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import types
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("lazy-imports")
+
+LAZY_IMPORTS = os.getenv("LAZY_IMPORTS", "0") == "1"
+
+
+class LazyModule(types.ModuleType):
+    """Placeholder that imports the real module the first time one of its attributes is read."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = importlib.import_module(self.__name__)
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+
+_deferred: Dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str, *, optional: bool = False) -> Optional[types.ModuleType]:
+    """Import ``name`` now, or only when first used in lazy mode.
+
+    With ``optional=True`` a module that isn't installed gives None instead of an error.
+    """
+    if optional and importlib.util.find_spec(name) is None:
+        return None
+    if not LAZY_IMPORTS:
+        return importlib.import_module(name)
+    return _deferred.setdefault(name, LazyModule(name))
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int = 0
+
+
+def preload() -> List[ImportRecord]:
+    """Import every deferred module now and report how long each one took."""
+    records = []
+    for name, module in _deferred.items():
+        if module.loaded:
+            continue
+        started = time.perf_counter()
+        module._load()
+        elapsed = int((time.perf_counter() - started) * 1e6)
+        records.append(ImportRecord(name, self_us=elapsed, cumulative_us=elapsed))
+    if records:
+        total = sum(r.cumulative_us for r in records) / 1e6
+        logger.info(f"📦 Pre-imported {len(records)} deferred modules in {total:.2f}s")
+        logger.info(json.dumps({"event": "preload", "imports": [asdict(r) for r in records]}))
+    return records
+
+
+def prewarm(proc: Any) -> None:
+    """``WorkerOptions.prewarm_fnc``: runs in each job process before it is handed a job."""
+    preload()
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse the ``import time: self [us] | cumulative | imported package`` lines."""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append(ImportRecord(name.strip(), int(fields[0]), int(fields[1]), depth))
+    return records
+
+
+def profile_imports(module: str, *, env: Optional[Dict[str, str]] = None) -> List[ImportRecord]:
+    """Import ``module`` in a fresh interpreter under ``-X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-module import time of a worker entry point")
+    parser.add_argument("module", help="module to import, e.g. agent_worker")
+    parser.add_argument("--top", type=int, default=25, help="show the N slowest modules by cumulative time")
+    parser.add_argument("--json", action="store_true", help="print every record as one JSON document")
+    args = parser.parse_args()
+
+    records = profile_imports(args.module)
+    total = next((r.cumulative_us for r in records if r.module == args.module and r.depth == 0), 0)
+    if args.json:
+        json.dump({"module": args.module, "total_us": total, "imports": [asdict(r) for r in records]}, sys.stdout)
+        sys.stdout.write("\n")
+        return
+
+    print(f"== import {args.module}: {total / 1e6:.2f}s ({len(records)} modules)")
+    for record in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[: args.top]:
+        print(f"  {record.cumulative_us / 1e3:9.1f} ms  {record.self_us / 1e3:8.1f} ms self  {record.module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Rendered audio for scripted lines (greetings, intros), cached on disk and memory-mapped.
+
+Every room used to open with the same ``generate_reply(instructions="Greet the audience
+...")``. That is a realtime round trip, and tokens spent on nearly the same audio each
+time. ``speak_line`` looks the line up by persona, voice and instructions. On
+a hit it plays the cached PCM with ``session.say``: the frames are sliced straight out
+of a memory map, so the first one is a page-cache read. Once it has played, the line is
+pushed into the model's context, which ``say`` alone doesn't reach. On a miss it generates the line
+live as before, and a rendition is rendered in the background on a separate realtime
+connection for next time.
+
+Each line keeps up to ``LINE_CACHE_VARIANTS`` renditions, and the least-played one is
+played next. A rendition played ``LINE_CACHE_MAX_PLAYS`` times is replaced by a fresh
+one, rendered in the background, so regulars don't hear the same greeting every time.
+The least recently played renditions are evicted once the cache outgrows
+``LINE_CACHE_MAX_MB``.
+
+Layout: ``<LINE_CACHE_DIR>/<key>/<variant>.pcm`` (raw int16) next to ``<variant>.json``
+(sample rate, channels, transcript). The JSON is written last, so a rendition without
+one is incomplete and ignored.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from livekit import rtc
+from livekit.agents import Agent, AgentSession
+from livekit.agents.voice import SpeechHandle
+
+from lazy_imports import lazy_import
+
+openai = lazy_import("livekit.plugins.openai")
+
+logger = logging.getLogger("line-cache")
+
+LINE_CACHE = os.getenv("LINE_CACHE", "0") == "1"
+LINE_CACHE_DIR = os.getenv("LINE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "livekit-meet-lines"))
+LINE_CACHE_MAX_MB = float(os.getenv("LINE_CACHE_MAX_MB", "256"))
+LINE_CACHE_VARIANTS = int(os.getenv("LINE_CACHE_VARIANTS", "3"))
+LINE_CACHE_MAX_PLAYS = int(os.getenv("LINE_CACHE_MAX_PLAYS", "5"))
+LINE_CACHE_MAPPED = 32  # memory maps kept open
+
+FRAME_MS = 20
+
+# (voice, agent instructions, line instructions) -> (pcm, sample_rate, num_channels, transcript)
+Renderer = Callable[[str, str, str], Awaitable[Tuple[bytes, int, int, str]]]
+
+
+def line_key(persona: str, voice: str, instructions: str, agent_instructions: str = "") -> str:
+    # The agent's instructions shape the line as much as the line's own do
+    payload = json.dumps([persona, voice, agent_instructions, instructions])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+@dataclass
+class CachedLine:
+    key: str
+    variant: str
+    path: str
+    sample_rate: int
+    num_channels: int
+    transcript: str
+    size: int
+
+
+async def render_with_realtime_model(voice: str, agent_instructions: str, instructions: str) -> Tuple[bytes, int, int, str]:
+    """Generate a line on its own realtime connection, outside any room."""
+    model = openai.realtime.RealtimeModel(voice=voice)
+    session = model.session()
+    try:
+        if agent_instructions:
+            await session.update_instructions(agent_instructions)
+        generation = await session.generate_reply(instructions=instructions)
+        pcm = bytearray()
+        text: List[str] = []
+        sample_rate, num_channels = 24000, 1
+
+        async def read_audio(stream: AsyncIterator[rtc.AudioFrame]) -> None:
+            nonlocal sample_rate, num_channels
+            async for frame in stream:
+                sample_rate, num_channels = frame.sample_rate, frame.num_channels
+                pcm.extend(frame.data.cast("B"))
+
+        async def read_text(stream: AsyncIterator[str]) -> None:
+            async for delta in stream:
+                text.append(delta)
+
+        async for message in generation.message_stream:
+            await asyncio.gather(read_audio(message.audio_stream), read_text(message.text_stream))
+        return bytes(pcm), sample_rate, num_channels, "".join(text)
+    finally:
+        await session.aclose()
+        await model.aclose()
+
+
+class LineCache:
+    def __init__(
+        self,
+        directory: str = LINE_CACHE_DIR,
+        *,
+        max_bytes: int = int(LINE_CACHE_MAX_MB * 1024 * 1024),
+        variants: int = LINE_CACHE_VARIANTS,
+        max_plays: int = LINE_CACHE_MAX_PLAYS,
+        renderer: Renderer = render_with_realtime_model,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.variants = variants
+        self.max_plays = max_plays
+        self._renderer = renderer
+        self._lock = threading.Lock()  # rooms on worker threads share the cache
+        self._lines: Dict[str, List[CachedLine]] = {}
+        self._plays: Dict[str, int] = {}
+        self._mapped: "OrderedDict[str, mmap.mmap]" = OrderedDict()
+        self._rendering: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def lookup(self, persona: str, voice: str, instructions: str, agent_instructions: str = "") -> Optional[CachedLine]:
+        """The rendition to play next (the least played one), or None."""
+        key = line_key(persona, voice, instructions, agent_instructions)
+        with self._lock:
+            lines = self._lines.get(key)
+            if not lines:
+                self.misses += 1
+                return None
+            self.hits += 1
+            line = min(lines, key=lambda line: self._plays.get(line.variant, 0))
+            self._plays[line.variant] = self._plays.get(line.variant, 0) + 1
+        os.utime(line.path)  # recently played, last to be evicted
+        return line
+
+    async def frames(self, line: CachedLine, frame_ms: int = FRAME_MS) -> AsyncIterator[rtc.AudioFrame]:
+        """The cached PCM as audio frames, read through a memory map."""
+        data = self._map(line)
+        samples = line.sample_rate * frame_ms // 1000
+        step = samples * line.num_channels * 2
+        for offset in range(0, len(data) - step + 1, step):
+            yield rtc.AudioFrame(data[offset : offset + step], line.sample_rate, line.num_channels, samples)
+        tail = (len(data) % step) // (2 * line.num_channels)
+        if tail:
+            yield rtc.AudioFrame(data[len(data) - len(data) % step :], line.sample_rate, line.num_channels, tail)
+
+    def store(
+        self,
+        persona: str,
+        voice: str,
+        instructions: str,
+        pcm: bytes,
+        sample_rate: int,
+        num_channels: int,
+        transcript: str,
+        *,
+        agent_instructions: str = "",
+    ) -> CachedLine:
+        key = line_key(persona, voice, instructions, agent_instructions)
+        variant = uuid.uuid4().hex[:12]
+        directory = os.path.join(self.directory, key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{variant}.pcm")
+        _write_atomic(path, pcm)
+        meta = {"sample_rate": sample_rate, "num_channels": num_channels, "transcript": transcript, "created_at": time.time()}
+        _write_atomic(os.path.join(directory, f"{variant}.json"), json.dumps(meta).encode())
+        line = CachedLine(key, variant, path, sample_rate, num_channels, transcript, len(pcm))
+        with self._lock:
+            self._lines.setdefault(key, []).append(line)
+        self._retire(key)
+        self._evict()
+        return line
+
+    def refresh(self, persona: str, voice: str, instructions: str, *, agent_instructions: str = "") -> None:
+        """Render another rendition in the background if the line needs one."""
+        key = line_key(persona, voice, instructions, agent_instructions)
+        with self._lock:
+            lines = self._lines.get(key, [])
+            fresh = [line for line in lines if self._plays.get(line.variant, 0) < self.max_plays]
+            if len(fresh) >= self.variants or key in self._rendering:
+                return
+            self._rendering.add(key)
+        task = asyncio.create_task(self._render(key, persona, voice, instructions, agent_instructions))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(line.size for lines in self._lines.values() for line in lines)
+
+    def _map(self, line: CachedLine) -> memoryview:
+        with self._lock:
+            mapped = self._mapped.get(line.path)
+            if mapped is None:
+                with open(line.path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if line.size else b""
+                self._mapped[line.path] = mapped
+                # Evicted maps close once the last reader lets go of them
+                while len(self._mapped) > LINE_CACHE_MAPPED:
+                    self._mapped.popitem(last=False)
+            self._mapped.move_to_end(line.path)
+        return memoryview(mapped)
+
+    async def _render(self, key: str, persona: str, voice: str, instructions: str, agent_instructions: str) -> None:
+        try:
+            started = time.perf_counter()
+            pcm, sample_rate, num_channels, transcript = await self._renderer(voice, agent_instructions, instructions)
+            if pcm:
+                self.store(
+                    persona,
+                    voice,
+                    instructions,
+                    pcm,
+                    sample_rate,
+                    num_channels,
+                    transcript,
+                    agent_instructions=agent_instructions,
+                )
+                logger.info(f"💾 Cached a rendition of {persona}'s line in {time.perf_counter() - started:.1f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Rendering {persona}'s line failed: {e}")
+        finally:
+            with self._lock:
+                self._rendering.discard(key)
+
+    def _retire(self, key: str) -> None:
+        # Worn-out renditions go once enough fresh ones are there to replace them
+        with self._lock:
+            lines = self._lines.get(key, [])
+            worn = [line for line in lines if self._plays.get(line.variant, 0) >= self.max_plays]
+            keep = len(lines) - len(worn)
+            retired = worn if keep >= self.variants else worn[: max(0, len(lines) - self.variants)]
+        for line in retired:
+            self._remove(line)
+
+    def _evict(self) -> None:
+        with self._lock:
+            lines = [line for lines in self._lines.values() for line in lines]
+        total = sum(line.size for line in lines)
+        if total <= self.max_bytes:
+            return
+        for line in sorted(lines, key=lambda line: _mtime(line.path)):
+            if total <= self.max_bytes:
+                break
+            self._remove(line)
+            total -= line.size
+
+    def _remove(self, line: CachedLine) -> None:
+        with self._lock:
+            lines = self._lines.get(line.key, [])
+            if line in lines:
+                lines.remove(line)
+            if not lines:
+                self._lines.pop(line.key, None)
+            self._plays.pop(line.variant, None)
+            self._mapped.pop(line.path, None)
+        for path in (line.path[: -len(".pcm")] + ".json", line.path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _load(self) -> None:
+        for key_dir in os.scandir(self.directory):
+            if not key_dir.is_dir():
+                continue
+            for entry in os.scandir(key_dir.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                variant = entry.name[: -len(".json")]
+                path = os.path.join(key_dir.path, f"{variant}.pcm")
+                try:
+                    with open(entry.path) as f:
+                        meta = json.load(f)
+                    size = os.path.getsize(path)
+                except (OSError, ValueError):
+                    continue
+                line = CachedLine(
+                    key_dir.name, variant, path, meta["sample_rate"], meta["num_channels"], meta["transcript"], size
+                )
+                self._lines.setdefault(key_dir.name, []).append(line)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+_cache: Optional[LineCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_line_cache() -> LineCache:
+    """The process-wide cache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LineCache()
+        return _cache
+
+
+def speak_line(session: AgentSession, persona: str, voice: str, instructions: str) -> SpeechHandle:
+    """``session.generate_reply(instructions=...)`` for a scripted line, from the cache when possible."""
+    if not LINE_CACHE:
+        return session.generate_reply(instructions=instructions)
+    cache = get_line_cache()
+    agent_instructions = session.current_agent.instructions
+    line = cache.lookup(persona, voice, instructions, agent_instructions)
+    cache.refresh(persona, voice, instructions, agent_instructions=agent_instructions)
+    if line is None:
+        return session.generate_reply(instructions=instructions)
+    logger.info(f"🔁 Playing {persona}'s line from the cache")
+    agent = session.current_agent
+    handle = session.say(line.transcript, audio=cache.frames(line))
+    # say() only adds the line to the agent's own context. A realtime model never hears
+    # it, and would greet again on its next reply, so the line is pushed to it as well
+    handle.add_done_callback(lambda _: _sync_chat_ctx(agent))
+    return handle
+
+
+_syncs: Set["asyncio.Task[None]"] = set()
+
+
+def _sync_chat_ctx(agent: Agent) -> None:
+    task = asyncio.ensure_future(agent.update_chat_ctx(agent.chat_ctx))
+    _syncs.add(task)
+    task.add_done_callback(_on_synced)
+
+
+def _on_synced(task: "asyncio.Task[None]") -> None:
+    _syncs.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Couldn't add a cached line to the model's context: {task.exception()!r}")
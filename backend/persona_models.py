@@ -0,0 +1,35 @@
+"""Realtime models for the hosts, connected as soon as a job asks for them.
+
+A Hedra avatar session is bound to the room it joins, so it can't be opened ahead of time,
+and neither can the OpenAI realtime websocket: a job process (or, in multi-room mode, a job
+thread) runs one job on a loop of its own, and ``prewarm_fnc`` runs before that loop exists.
+So a job's models aren't pooled. Each one opens its websocket the moment it is created,
+alongside the avatar start, instead of when the ``AgentSession`` starts after the avatar.
+Models use the job's HTTP session and are closed with the room's resources.
+"""
+
+import logging
+from typing import NamedTuple
+
+from lazy_imports import lazy_import
+
+# Subclasses the OpenAI plugin's RealtimeModel, so it loads with the plugin
+prewarmed_model = lazy_import("prewarmed_model")
+
+logger = logging.getLogger("persona-models")
+
+
+class PersonaKey(NamedTuple):
+    persona: str
+    voice: str
+    avatar_id: str = ""
+    # False: the model hears and transcribes the user but doesn't answer on its own
+    auto_reply: bool = True
+
+
+async def connect_realtime_model(key: PersonaKey) -> "prewarmed_model.PrewarmedRealtimeModel":
+    """A realtime model for ``key`` whose websocket is already connecting."""
+    model = prewarmed_model.PrewarmedRealtimeModel(voice=key.voice, auto_reply=key.auto_reply)
+    model.prewarm()
+    logger.info(f"🔌 Connecting {key.persona}'s realtime model")
+    return model
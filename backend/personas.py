@@ -0,0 +1,109 @@
+"""Declarative persona registry, loaded from ``personas.json`` once per worker process.
+
+Each persona entry holds everything a host needs: instructions, realtime voice, Hedra
+avatar, greeting and tools. Tools are ``"module:attribute"`` references to function tools,
+imported when the registry is compiled so a bad reference fails at startup, not mid-show.
+"""
+
+import importlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("personas")
+
+PERSONAS_CONFIG = os.getenv(
+    "PERSONAS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "personas.json")
+)
+
+_REQUIRED_FIELDS = ("name", "voice", "avatar_id", "instructions", "greeting")
+
+
+@dataclass(frozen=True)
+class Persona:
+    name: str
+    voice: str
+    avatar_id: str
+    instructions: str
+    greeting: str
+    agent_name: str = ""  # the agent_name the persona used to be dispatched under on its own
+    tool_refs: Tuple[str, ...] = ()
+    tools: Tuple[Any, ...] = ()
+
+
+def _resolve_tool(ref: str) -> Any:
+    module_name, _, attribute = ref.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(f"tool reference {ref!r} must look like 'module:attribute'")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class PersonaRegistry:
+    def __init__(self, personas: List[Persona]):
+        if not personas:
+            raise ValueError("the persona registry is empty")
+        self._personas: Dict[str, Persona] = {}
+        self._aliases: Dict[str, str] = {}
+        for persona in personas:
+            for name in filter(None, (persona.name, persona.agent_name)):
+                if name in self._aliases:
+                    raise ValueError(f"persona name {name!r} is defined twice")
+                self._aliases[name] = persona.name
+            self._personas[persona.name] = persona
+
+    def __iter__(self) -> Iterator[Persona]:
+        return iter(self._personas.values())
+
+    def __len__(self) -> int:
+        return len(self._personas)
+
+    @property
+    def default(self) -> Persona:
+        return next(iter(self._personas.values()))
+
+    def get(self, name: str) -> Optional[Persona]:
+        """Look a persona up by its name or its standalone ``agent_name``."""
+        key = self._aliases.get(name.strip().lower())
+        return self._personas[key] if key else None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PersonaRegistry":
+        personas = []
+        for entry in config.get("personas", []):
+            missing = [field for field in _REQUIRED_FIELDS if not entry.get(field)]
+            if missing:
+                raise ValueError(f"persona {entry.get('name', '?')!r} is missing {', '.join(missing)}")
+            tool_refs = tuple(entry.get("tools", ()))
+            personas.append(
+                Persona(
+                    name=entry["name"].lower(),
+                    voice=entry["voice"],
+                    avatar_id=entry["avatar_id"],
+                    instructions=entry["instructions"],
+                    greeting=entry["greeting"],
+                    agent_name=entry.get("agent_name", "").lower(),
+                    tool_refs=tool_refs,
+                    tools=tuple(_resolve_tool(ref) for ref in tool_refs),
+                )
+            )
+        return cls(personas)
+
+    @classmethod
+    def load(cls, path: str = PERSONAS_CONFIG) -> "PersonaRegistry":
+        with open(path, encoding="utf-8") as f:
+            registry = cls.from_config(json.load(f))
+        logger.info(f"🎭 Loaded {len(registry)} personas from {path}: {', '.join(p.name for p in registry)}")
+        return registry
+
+
+_registry: Optional[PersonaRegistry] = None
+
+
+def get_persona_registry() -> PersonaRegistry:
+    """The process's registry, compiled from ``PERSONAS_CONFIG`` on first use."""
+    global _registry
+    if _registry is None:
+        _registry = PersonaRegistry.load()
+    return _registry
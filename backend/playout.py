@@ -0,0 +1,252 @@
+"""Back-to-back playout of one host after another, on the avatars' audio outputs.
+
+With speculative replies the co-host's follow-up is already generated and held while the
+first host speaks. It was still only released once the first avatar had reported
+playback finished. That adds the RPC round trip, plus the second avatar's own lead
+before its first sample is audible, as dead air between the hosts.
+
+``ScheduledAudioOutput`` keeps a playout clock for its avatar. Each sample it forwards is
+due at ``lead`` seconds after it was sent, or right after the previous sample if the
+avatar still has audio queued. When a segment is flushed, its last sample's end time is
+known. ``PlayoutScheduler`` releases the next host's held audio ``lead`` seconds before
+that, so its first sample lands on the end of the previous host's last one. With
+``PLAYOUT_OVERLAP_S`` the next host starts that much earlier and fades in over the
+overlap. The outgoing host's tail has already been sent by then, so it can't fade out.
+
+``PLAYOUT_LEAD_S`` is the avatar's delay from receiving audio to playing it. Hedra
+doesn't report it, so it is configured rather than measured. Gaps are planned gaps
+on that clock.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional
+
+import numpy as np
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+from audio_outputs import HeldAudioOutput
+from tracing import Tracer
+
+logger = logging.getLogger("playout")
+
+GAPLESS_PLAYOUT = os.getenv("GAPLESS_PLAYOUT", "1") == "1"
+PLAYOUT_LEAD_S = float(os.getenv("PLAYOUT_LEAD_S", "0.15"))
+PLAYOUT_OVERLAP_S = float(os.getenv("PLAYOUT_OVERLAP_S", "0"))
+
+
+@dataclass
+class SegmentStats:
+    """One segment's audio on its way to the avatar, on the playout clock."""
+
+    persona: str
+    started_at: float  # when its first sample is due at the avatar
+    ended_at: float = math.nan  # when its last sample has played (nan until flushed)
+    gap: Optional[float] = None  # silence after the previous host's last sample (negative = overlap)
+    underruns: int = 0  # times the avatar ran out of audio mid-segment
+    underrun_s: float = 0.0
+    jitter: float = 0.0  # std dev of the model's frame inter-arrival times, in seconds
+
+
+class ScheduledAudioOutput(HeldAudioOutput):
+    """A ``HeldAudioOutput`` that knows when the audio it forwarded will have played."""
+
+    def __init__(
+        self,
+        next_in_chain: io.AudioOutput,
+        persona: str,
+        *,
+        lead: float = PLAYOUT_LEAD_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__(next_in_chain)
+        self.persona = persona
+        self.lead = lead
+        self._clock = clock
+        self._playhead: Optional[float] = None  # when the last forwarded sample will have played
+        self._segment: Optional[SegmentStats] = None
+        self._ended: Optional[asyncio.Future] = None
+        self._follows: Optional[float] = None  # end of the previous host's audio, for the gap
+        self.on_segment_end: Optional[Callable[[SegmentStats], None]] = None
+        # Inter-arrival times of the model's frames (Welford), for the segment's jitter
+        self._last_arrival: Optional[float] = None
+        self._arrivals = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def expect_segment(self, *, follows: Optional[float] = None) -> None:
+        """A segment is on its way, right after audio that ends at ``follows`` if given."""
+        if self._ended is None or self._ended.done():
+            self._ended = asyncio.get_running_loop().create_future()
+        self._follows = follows
+
+    def segment_pending(self) -> bool:
+        return self._ended is not None and not self._ended.done()
+
+    async def segment_ended(self) -> float:
+        """When the pending segment's last sample will have played."""
+        return await asyncio.shield(self._ended) if self._ended is not None else self._clock()
+
+    def end_segment(self) -> None:
+        """Stop waiting for a segment that won't be flushed (interrupted, or never came)."""
+        now = self._clock()
+        if self._segment is not None:
+            self._finish(min(now, self._playhead))
+        if self._ended is not None and not self._ended.done():
+            self._ended.set_result(now)
+        self._follows = None
+
+    def fade_in(self, seconds: float) -> None:
+        """Ramp the held audio up from silence over its first ``seconds``."""
+        remaining = None
+        offset = 0
+        for frame in self._buffer:
+            if remaining is None:
+                remaining = int(seconds * frame.sample_rate)
+            if offset >= remaining:
+                break
+            samples = np.frombuffer(frame.data, dtype=np.int16).reshape(-1, frame.num_channels)
+            count = min(len(samples), remaining - offset)
+            ramp = (np.arange(offset, offset + count, dtype=np.float32) / remaining)[:, None]
+            samples[:count] = (samples[:count] * ramp).astype(np.int16)
+            offset += count
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        now = self._clock()
+        if self._last_arrival is not None:
+            delta = now - self._last_arrival
+            self._arrivals += 1
+            diff = delta - self._mean
+            self._mean += diff / self._arrivals
+            self._m2 += diff * (delta - self._mean)
+        self._last_arrival = now
+        await super().capture_frame(frame)
+
+    def clear_buffer(self) -> None:
+        super().clear_buffer()
+        self.end_segment()
+
+    def discard(self, *, keep_holding: bool = True) -> float:
+        discarded = super().discard(keep_holding=keep_holding)
+        self.end_segment()
+        return discarded
+
+    async def _forward(self, frame: rtc.AudioFrame) -> None:
+        now = self._clock()
+        if self._segment is None:
+            self._playhead = now + self.lead
+            self._segment = SegmentStats(self.persona, started_at=self._playhead)
+            if self._follows is not None:
+                self._segment.gap = self._playhead - self._follows
+                self._follows = None
+            if not self.segment_pending():
+                self.expect_segment()
+        elif self._playhead < now + self.lead:
+            # The avatar played everything it had before this frame got there
+            self._segment.underruns += 1
+            self._segment.underrun_s += now + self.lead - self._playhead
+            self._playhead = now + self.lead
+        self._playhead += frame.duration
+        await super()._forward(frame)
+
+    def _forward_flush(self) -> None:
+        if self._segment is not None:
+            self._finish(self._playhead)
+        super()._forward_flush()
+
+    def _finish(self, ended_at: float) -> None:
+        segment, self._segment = self._segment, None
+        self._playhead = None
+        segment.ended_at = ended_at
+        if self._arrivals > 1:
+            segment.jitter = math.sqrt(self._m2 / (self._arrivals - 1))
+        self._last_arrival = None
+        self._arrivals = 0
+        self._mean = self._m2 = 0.0
+        if self._ended is not None and not self._ended.done():
+            self._ended.set_result(ended_at)
+        if self.on_segment_end is not None:
+            self.on_segment_end(segment)
+
+
+class PlayoutScheduler:
+    """Starts each host's audio where the previous host's ends, instead of after it is heard.
+
+    ``play(persona)`` is called in speaking order. A host whose predecessor still has a
+    segment pending is released ``lead`` seconds before that segment's last sample
+    (minus ``overlap``); otherwise its audio goes out right away.
+    """
+
+    def __init__(
+        self,
+        outputs: Dict[str, ScheduledAudioOutput],
+        *,
+        overlap: float = PLAYOUT_OVERLAP_S,
+        tracer: Optional[Tracer] = None,
+        room: str = "",
+        history: int = 500,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._outputs = outputs
+        self._overlap = overlap
+        self._tracer = tracer
+        self._room = room
+        self._clock = clock
+        self._last: Optional[str] = None
+        self.segments: Deque[SegmentStats] = deque(maxlen=history)
+        for output in outputs.values():
+            output.on_segment_end = self._on_segment_end
+
+    async def play(self, persona: str) -> None:
+        """Let ``persona``'s audio out as soon as it can follow the previous host's."""
+        output = self._outputs[persona]
+        previous, self._last = self._last, persona
+        before = self._outputs[previous] if previous not in (None, persona) else None
+        if before is None or not before.segment_pending():
+            output.expect_segment()
+            if output.held:
+                await output.release()
+            return
+
+        output.expect_segment()
+        end = await before.segment_ended()
+        output.expect_segment(follows=end)
+        start = end - self._overlap
+        await asyncio.sleep(max(0.0, start - output.lead - self._clock()))
+        if self._overlap > 0:
+            output.fade_in(self._overlap)
+        await output.release()
+
+    def finished(self, persona: str) -> None:
+        """``persona``'s reply is over; stop anyone waiting on a segment it never flushed."""
+        self._outputs[persona].end_segment()
+
+    def summary(self) -> Dict[str, float]:
+        gaps = [segment.gap for segment in self.segments if segment.gap is not None]
+        return {
+            "segments": len(self.segments),
+            "handoffs": len(gaps),
+            "mean_gap_ms": 1000 * sum(gaps) / len(gaps) if gaps else 0.0,
+            "max_gap_ms": 1000 * max(gaps) if gaps else 0.0,
+            "underruns": sum(segment.underruns for segment in self.segments),
+            "max_jitter_ms": 1000 * max((segment.jitter for segment in self.segments), default=0.0),
+        }
+
+    def _on_segment_end(self, segment: SegmentStats) -> None:
+        self.segments.append(segment)
+        if self._tracer is None:
+            return
+        attrs = {
+            "playout_jitter_ms": round(1000 * segment.jitter, 2),
+            "playout_underruns": segment.underruns,
+        }
+        if segment.gap is not None:
+            attrs["playout_gap_ms"] = round(1000 * segment.gap, 2)
+        self._tracer.annotate(self._room, segment.persona, **attrs)
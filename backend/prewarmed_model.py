@@ -0,0 +1,46 @@
+from typing import Optional
+
+import aiohttp
+
+from livekit.plugins import openai
+from livekit.plugins.openai.realtime.realtime_model import DEFAULT_TURN_DETECTION
+
+# Server VAD still detects the user's turns (and interrupts on them), but doesn't answer:
+# the worker decides which host replies and asks that session for it
+ROUTED_TURN_DETECTION = DEFAULT_TURN_DETECTION.model_copy(update={"create_response": False})
+
+
+class PrewarmedRealtimeModel(openai.realtime.RealtimeModel):
+    """RealtimeModel that opens its first RealtimeSession before the AgentSession asks for it.
+
+    ``AgentSession.start`` calls ``session()``; the already-connecting session is handed over
+    and the agent's instructions, tools and chat context are pushed onto it as usual.
+    """
+
+    def __init__(
+        self, *, voice: str, http_session: Optional[aiohttp.ClientSession] = None, auto_reply: bool = True
+    ) -> None:
+        if auto_reply:
+            super().__init__(voice=voice, http_session=http_session)
+        else:
+            super().__init__(voice=voice, http_session=http_session, turn_detection=ROUTED_TURN_DETECTION)
+        self._warm_session: Optional[openai.realtime.RealtimeSession] = None
+
+    def prewarm(self) -> None:
+        if self._warm_session is None:
+            self._warm_session = super().session()
+
+    @property
+    def is_warm(self) -> bool:
+        return self._warm_session is not None and not self._warm_session._main_atask.done()
+
+    def session(self) -> openai.realtime.RealtimeSession:
+        if self.is_warm:
+            warm, self._warm_session = self._warm_session, None
+            return warm
+        return super().session()
+
+    async def discard(self) -> None:
+        if self._warm_session is not None:
+            warm, self._warm_session = self._warm_session, None
+            await warm.aclose()
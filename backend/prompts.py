@@ -0,0 +1,148 @@
+"""Reply instructions laid out for provider-side prompt caching.
+
+The realtime model caches a prompt by its prefix: instructions first, then the
+conversation. Once the user's words went into the reply instructions
+(``"Respond to: '{text}'"``), no two turns shared a prefix, so no turn could hit the
+cache. ``PromptLayout`` keeps the instructions byte-stable for each persona: the agent's
+``instructions``, then the persona's reply style, assembled once and reused. The user
+turn is the audio item server-side turn detection already committed to the conversation,
+so each turn only appends to the prompt. Passing the words again as ``user_input`` would
+put the turn in twice.
+
+In a shared session (one session voices both hosts), switching instructions between
+personas would break the prefix on every handoff. In that mode all personas' styles go
+into one instruction block, and the user's audio items are replaced with text items that
+name the host who answers.
+
+``PromptCacheUsage`` reads the usage the model reports after each response. It records
+cached and uncached input tokens per turn and puts them on the turn's trace.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from livekit.agents import AgentSession
+from livekit.agents.llm import ChatMessage
+from livekit.agents.utils import shortuuid
+
+from tracing import Tracer
+
+logger = logging.getLogger("prompts")
+
+SHARED_SESSION_NOTE = (
+    "Each user message starts with the name of the host who answers it, in brackets. "
+    "Answer as that host only."
+)
+# Ids of the text items that replaced the user's audio items in a shared session
+TAGGED_ITEM_PREFIX = "host_item_"
+
+
+class PromptLayout:
+    """Per-persona reply instructions with a prefix that never changes between turns.
+
+    ``styles`` maps persona to how that persona replies. It is appended to the agent's own
+    instructions, and must not contain anything that changes per turn.
+    """
+
+    def __init__(self, styles: Dict[str, str], *, shared_session: bool = False):
+        self._styles = styles
+        self._shared_session = shared_session
+        self._assembled: Dict[tuple, str] = {}
+
+    def instructions(self, base: str, persona: str) -> str:
+        """The reply instructions for ``persona``; the same string object every turn."""
+        if persona not in self._styles:
+            raise ValueError(f"unknown persona: {persona}")
+        key = (base, None if self._shared_session else persona)
+        assembled = self._assembled.get(key)
+        if assembled is None:
+            if self._shared_session:
+                sections = [base, *(f"[{name}] {style}" for name, style in self._styles.items()), SHARED_SESSION_NOTE]
+            else:
+                sections = [base, self._styles[persona]]
+            assembled = self._assembled[key] = "\n\n".join(section for section in sections if section)
+        return assembled
+
+    def user_item(self, persona: str, text: str) -> str:
+        return f"[{persona}] {text}" if self._shared_session else text
+
+    async def reply(self, session: AgentSession, persona: str, text: str) -> None:
+        """``generate_reply`` for ``persona`` answering the user's turn; waits for its playout.
+
+        ``text`` is the user's turn as transcribed. The model already has it as audio, so it
+        is only sent in a shared session, in place of the audio.
+        """
+        agent = session.current_agent
+        if self._shared_session:
+            await self._tag_user_items(agent, persona)
+        await session.generate_reply(instructions=self.instructions(agent.instructions, persona))
+
+    async def _tag_user_items(self, agent: Any, persona: str) -> None:
+        """Replace the user's audio items not yet answered with text items naming ``persona``.
+
+        Utterances coalesced into one reply each have their own item, so each is replaced.
+        """
+        chat_ctx = agent.chat_ctx.copy()
+        tagged = 0
+        for index, item in enumerate(chat_ctx.items):
+            if item.type == "message" and item.role == "user" and not item.id.startswith(TAGGED_ITEM_PREFIX):
+                chat_ctx.items[index] = ChatMessage(
+                    id=shortuuid(TAGGED_ITEM_PREFIX),
+                    role="user",
+                    content=[self.user_item(persona, item.text_content or "")],
+                    created_at=item.created_at,
+                )
+                tagged += 1
+        if tagged:
+            await agent.update_chat_ctx(chat_ctx)
+        else:
+            logger.warning(f"No user turn in the conversation for {persona} to answer")
+
+
+@dataclass
+class TurnUsage:
+    persona: str
+    input_tokens: int
+    cached_tokens: int
+
+    @property
+    def uncached_tokens(self) -> int:
+        return self.input_tokens - self.cached_tokens
+
+
+@dataclass
+class PromptCacheUsage:
+    """Cached vs. uncached input tokens of every response on the sessions it watches."""
+
+    turns: List[TurnUsage] = field(default_factory=list)
+    tracer: Optional[Tracer] = None
+    room: str = ""
+
+    def watch(self, session: Any, persona: str) -> None:
+        session.on("metrics_collected", lambda ev: self.record(persona, ev.metrics))
+
+    def record(self, persona: str, metrics: Any) -> None:
+        if getattr(metrics, "type", None) != "realtime_model_metrics":
+            return
+        details = metrics.input_token_details
+        turn = TurnUsage(persona, metrics.input_tokens, details.cached_tokens if details else 0)
+        self.turns.append(turn)
+        if self.tracer is not None:
+            self.tracer.annotate(
+                self.room, persona, input_tokens=turn.input_tokens, cached_tokens=turn.cached_tokens
+            )
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of input tokens served from the provider's cache."""
+        total = sum(turn.input_tokens for turn in self.turns)
+        return sum(turn.cached_tokens for turn in self.turns) / total if total else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "turns": len(self.turns),
+            "input_tokens": sum(turn.input_tokens for turn in self.turns),
+            "cached_tokens": sum(turn.cached_tokens for turn in self.turns),
+            "hit_ratio": self.hit_ratio,
+        }
@@ -0,0 +1,284 @@
+"""Timestamped event log of a room, for replaying real shows against the simulation.
+
+Synthetic latency distributions miss how real shows behave: the user barging in, long
+pauses from the model, avatars stalling. With ``EVENT_LOG`` set (a path template, e.g.
+``/var/log/shows/{room}.lkev``), each room appends what happened in it to a compact
+binary log:
+
+- the user starting and stopping to speak, and each committed utterance
+- every reply the sessions start, agent state changes and tool calls
+- every audio chunk on its way to an avatar, segment flushes and clears
+- avatars reporting playback finished, and participants joining or leaving
+
+A record is 11 bytes: microseconds since the previous record, the event kind, a track
+(persona or participant) and one integer argument. Strings (track names, utterances,
+tool names) are written once and referenced by id after that. Every time a log is
+opened, a header with the wall-clock time is appended, so one file can hold several
+runs of the same room.
+
+Recording appends to an in-memory buffer under an uncontended lock. A background thread
+writes the buffers of all open logs to disk every ``EVENT_LOG_FLUSH_S``.
+``read_events`` turns a log back into ``Event`` tuples; ``benchmarks/replay.py``
+replays one.
+"""
+
+import enum
+import logging
+import os
+import struct
+import threading
+import time
+import weakref
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from livekit import rtc
+from livekit.agents.voice import io
+
+logger = logging.getLogger("recording")
+
+EVENT_LOG = os.getenv("EVENT_LOG", "")
+EVENT_LOG_FLUSH_S = float(os.getenv("EVENT_LOG_FLUSH_S", "1.0"))
+
+MAGIC = b"LKEVLOG1"
+_HEADER = struct.Struct("<8sd")  # magic, wall-clock time the log was opened
+_RECORD = struct.Struct("<IBHI")  # delta_us, kind, track id, argument
+_MAX_DELTA_US = 2**32 - 1
+
+
+class EventKind(enum.IntEnum):
+    STRING = 0  # argument: byte length; the UTF-8 bytes follow, the string's id is the next one
+    USER_STATE = 1  # argument: 1 speaking, 0 listening
+    USER_SPEECH = 2  # argument: the utterance
+    REPLY_STARTED = 3  # a speech handle was created on the track's session
+    AGENT_STATE = 4  # argument: the new state
+    TOOL_CALL = 5  # argument: the tool's name
+    AUDIO_CHUNK = 6  # argument: the chunk's duration in microseconds
+    AUDIO_FLUSH = 7
+    AUDIO_CLEAR = 8
+    PLAYBACK_FINISHED = 9  # argument: 1 if interrupted
+    PARTICIPANT_JOINED = 10  # track: the participant's identity; argument: its kind
+    PARTICIPANT_LEFT = 11
+    ASSISTANT_LINE = 12  # argument: the transcript
+
+
+# Kinds whose argument is a string id
+_TEXT_KINDS = {EventKind.USER_SPEECH, EventKind.AGENT_STATE, EventKind.TOOL_CALL, EventKind.ASSISTANT_LINE}
+
+
+class Event(NamedTuple):
+    at: float  # seconds since the first header in the file
+    kind: EventKind
+    track: str
+    arg: int
+    text: Optional[str] = None
+
+
+class EventLog:
+    """An append-only event log; ``record`` only touches memory."""
+
+    def __init__(self, path: str, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.path = path
+        self._clock = clock
+        self._file: Optional[BinaryIO] = open(path, "ab")
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # the flush thread and close both write
+        self._buffer = bytearray(_HEADER.pack(MAGIC, time.time()))
+        self._strings: Dict[str, int] = {"": 0}
+        self._last = clock()
+        self.records = 0  # events, not counting the strings they reference
+        _open_logs.add(self)
+
+    def intern(self, text: str) -> int:
+        """The id of ``text``, writing it to the log the first time."""
+        string_id = self._strings.get(text)
+        if string_id is None:
+            string_id = self._strings[text] = len(self._strings)
+            data = text.encode()
+            self._append(EventKind.STRING, 0, len(data), data)
+        return string_id
+
+    def record(self, kind: EventKind, track: str = "", arg: int = 0) -> None:
+        track_id = self._strings.get(track)
+        if track_id is None:
+            track_id = self.intern(track)
+        self._append(kind, track_id, arg)
+        self.records += 1
+
+    def record_text(self, kind: EventKind, track: str, text: str) -> None:
+        self.record(kind, track, self.intern(text))
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+            if data and self._file is not None:
+                self._file.write(data)
+                self._file.flush()
+
+    def close(self) -> None:
+        _open_logs.discard(self)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _append(self, kind: EventKind, track_id: int, arg: int, data: bytes = b"") -> None:
+        now = self._clock()
+        with self._lock:
+            delta = min(_MAX_DELTA_US, max(0, int((now - self._last) * 1_000_000)))
+            self._last = now
+            self._buffer += _RECORD.pack(delta, kind, track_id, arg)
+            if data:
+                self._buffer += data
+
+
+_open_logs: "weakref.WeakSet[EventLog]" = weakref.WeakSet()
+_flush_thread: Optional[threading.Thread] = None
+_flush_lock = threading.Lock()
+
+
+def _start_flush_thread(interval: float) -> None:
+    """Write every open log's buffer to disk every ``interval`` seconds, off the event loop."""
+    global _flush_thread
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            for log in list(_open_logs):
+                try:
+                    log.flush()
+                except Exception as e:
+                    logger.error(f"Writing event log {log.path} failed: {e}")
+
+    with _flush_lock:
+        if _flush_thread is None:
+            _flush_thread = threading.Thread(target=run, name="event-log-flush", daemon=True)
+            _flush_thread.start()
+
+
+def read_events(path: str) -> Iterator[Event]:
+    """The events in a log, with string ids resolved."""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    first_wall: Optional[float] = None
+    at = 0.0
+    strings: List[str] = []
+    while offset < len(data):
+        if data.startswith(MAGIC, offset):
+            _, wall = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            if first_wall is None:
+                first_wall = wall
+            # A new run of the room: its own clock and string table
+            at = wall - first_wall
+            strings = [""]
+            continue
+        if offset + _RECORD.size > len(data):
+            break  # cut off mid-record (the process died between flushes)
+        delta, kind, track_id, arg = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        at += delta / 1_000_000
+        if kind == EventKind.STRING:
+            strings.append(data[offset:offset + arg].decode(errors="replace"))
+            offset += arg
+            continue
+        kind = EventKind(kind)
+        text = strings[arg] if kind in _TEXT_KINDS and arg < len(strings) else None
+        yield Event(at, kind, strings[track_id] if track_id < len(strings) else "", arg, text)
+
+
+class RecordingAudioOutput(io.AudioOutput):
+    """Pass-through that records every chunk, flush and clear, and the avatar's playback reports."""
+
+    def __init__(self, next_in_chain: io.AudioOutput, log: EventLog, persona: str) -> None:
+        super().__init__(next_in_chain=next_in_chain, sample_rate=next_in_chain.sample_rate)
+        self._log = log
+        self._persona = persona
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        self._log.record(EventKind.AUDIO_CHUNK, self._persona, int(frame.duration * 1_000_000))
+        await self._next_in_chain.capture_frame(frame)
+
+    def flush(self) -> None:
+        super().flush()
+        self._log.record(EventKind.AUDIO_FLUSH, self._persona)
+        self._next_in_chain.flush()
+
+    def clear_buffer(self) -> None:
+        self._log.record(EventKind.AUDIO_CLEAR, self._persona)
+        self._next_in_chain.clear_buffer()
+
+    def on_playback_finished(self, **kwargs: Any) -> None:
+        self._log.record(EventKind.PLAYBACK_FINISHED, self._persona, int(kwargs.get("interrupted", False)))
+        super().on_playback_finished(**kwargs)
+
+
+class RoomRecorder:
+    """Records one room's sessions, audio outputs and participants into its event log."""
+
+    def __init__(self, log: EventLog) -> None:
+        self.log = log
+
+    def watch_room(self, room: rtc.Room) -> None:
+        log = self.log
+        for participant in room.remote_participants.values():
+            log.record(EventKind.PARTICIPANT_JOINED, participant.identity, int(participant.kind))
+        room.on("participant_connected", lambda p: log.record(EventKind.PARTICIPANT_JOINED, p.identity, int(p.kind)))
+        room.on("participant_disconnected", lambda p: log.record(EventKind.PARTICIPANT_LEFT, p.identity))
+
+    def watch(self, persona: str, session: Any, *, user: bool = True) -> None:
+        """Record ``session``'s replies, states and tool calls as ``persona``'s.
+
+        With ``user``, also what the user says; sessions that all hear the same user should
+        leave that to one of them.
+        """
+        log = self.log
+
+        def on_user_state(ev: Any) -> None:
+            log.record(EventKind.USER_STATE, persona, int(ev.new_state == "speaking"))
+
+        def on_item_added(ev: Any) -> None:
+            item = ev.item
+            if getattr(item, "type", "message") != "message" or not item.text_content:
+                return
+            if item.role == "user":
+                if user:
+                    log.record_text(EventKind.USER_SPEECH, persona, item.text_content)
+            elif item.role == "assistant":
+                log.record_text(EventKind.ASSISTANT_LINE, persona, item.text_content)
+
+        def on_tools(ev: Any) -> None:
+            for call in ev.function_calls:
+                log.record_text(EventKind.TOOL_CALL, persona, call.name)
+
+        if user:
+            session.on("user_state_changed", on_user_state)
+        session.on("conversation_item_added", on_item_added)
+        session.on("speech_created", lambda ev: log.record(EventKind.REPLY_STARTED, persona))
+        session.on("agent_state_changed", lambda ev: log.record_text(EventKind.AGENT_STATE, persona, ev.new_state))
+        session.on("function_tools_executed", on_tools)
+
+    def audio_output(self, persona: str, next_in_chain: io.AudioOutput) -> RecordingAudioOutput:
+        return RecordingAudioOutput(next_in_chain, self.log, persona)
+
+    async def aclose(self) -> None:
+        self.log.close()
+
+
+def open_room_log(room: str) -> Optional[RoomRecorder]:
+    """A recorder for ``room`` when ``EVENT_LOG`` is set, else None."""
+    if not EVENT_LOG:
+        return None
+    path = EVENT_LOG.format(room=room)
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        recorder = RoomRecorder(EventLog(path))
+    except OSError as e:
+        logger.error(f"Can't open event log {path}: {e}")
+        return None
+    _start_flush_thread(EVENT_LOG_FLUSH_S)
+    logger.info(f"📼 Recording room {room} to {path}")
+    return recorder
@@ -0,0 +1,186 @@
+"""Per-room ownership of avatars, model connections, sessions and background tasks.
+
+The workers used to open these and let them go wherever they happened to be. The agent
+swap in ``dual_agent_orchestrated.py`` started a new Hedra avatar and realtime model on
+every handoff and never closed the old ones. ``dual_agent_worker.py`` closed both
+sessions right after the greeting instead of when the room ended.
+
+``RoomResources`` owns everything a room opens. Adding a resource under a ``slot`` closes
+whatever held that slot before, so a superseded avatar or model is closed when its
+replacement is up. ``aclose`` closes the rest in reverse order when the job shuts down.
+``shutdown_when_empty`` shuts the job down once the last viewer has been gone for
+``ROOM_EMPTY_GRACE_S``.
+
+``tracker`` keeps every room's resources until they are closed. Anything still open after
+its room closed (a close that failed or timed out, or a resource added too late) is
+reported by ``tracker.leaks()`` and logged.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Union
+
+from livekit import api, rtc
+
+logger = logging.getLogger("resources")
+
+ROOM_EMPTY_GRACE_S = float(os.getenv("ROOM_EMPTY_GRACE_S", "10"))
+RESOURCE_CLOSE_TIMEOUT_S = float(os.getenv("RESOURCE_CLOSE_TIMEOUT_S", "5"))
+
+Close = Callable[[], Union[Awaitable[Any], Any]]
+
+_VIEWER_KINDS = (
+    rtc.ParticipantKind.PARTICIPANT_KIND_STANDARD,
+    rtc.ParticipantKind.PARTICIPANT_KIND_SIP,
+)
+
+
+@dataclass(eq=False)
+class Resource:
+    room: str
+    kind: str  # "avatar", "model", "session", "task", ...
+    name: str
+    close: Close
+    slot: Optional[str] = None
+    opened_at: float = field(default_factory=time.monotonic)
+    closed: bool = False
+
+    def describe(self) -> str:
+        return f"{self.kind} {self.name} in {self.room} (open {time.monotonic() - self.opened_at:.0f}s)"
+
+
+class RoomResources:
+    """Everything one room has open, closed when superseded or when the room ends."""
+
+    def __init__(self, room: str, *, close_timeout: float = RESOURCE_CLOSE_TIMEOUT_S):
+        self.room = room
+        self._close_timeout = close_timeout
+        self._open: List[Resource] = []
+        self._slots: Dict[str, Resource] = {}
+        self._closing = False
+        self.closed = False
+        self.superseded = 0
+
+    def open_counts(self) -> Dict[str, int]:
+        return dict(Counter(resource.kind for resource in self._open))
+
+    def add(self, kind: str, name: str, close: Close, *, slot: Optional[str] = None) -> Resource:
+        """Own a resource; with ``slot``, the one that held the slot before is closed."""
+        resource = Resource(self.room, kind, name, close, slot=slot)
+        if self.closed:
+            # The room is gone; close it right away, and report it if that fails
+            logger.warning(f"♻️ {resource.describe()} added after its room closed")
+            self._open.append(resource)
+            asyncio.ensure_future(self.release(resource))
+            return resource
+        self._open.append(resource)
+        if slot is not None:
+            previous = self._slots.get(slot)
+            self._slots[slot] = resource
+            if previous is not None:
+                self.superseded += 1
+                asyncio.ensure_future(self.release(previous))
+        return resource
+
+    def task(self, coro: Coroutine, name: str) -> asyncio.Task:
+        """A background task that is cancelled with the room (and forgotten once done)."""
+        task = asyncio.ensure_future(coro)
+        resource = self.add("task", name, task.cancel)
+        task.add_done_callback(lambda _: self._forget(resource))
+        return task
+
+    async def release(self, resource: Resource) -> None:
+        """Close one resource now; a failed or timed-out close keeps it on the open list."""
+        if resource.closed:
+            return
+        try:
+            result = resource.close()
+            if inspect.isawaitable(result):
+                await asyncio.wait_for(result, self._close_timeout)
+        except Exception as e:
+            logger.warning(f"♻️ Closing {resource.describe()} failed: {e!r}")
+            return
+        self._forget(resource)
+
+    async def aclose(self) -> None:
+        """Close everything, most recently opened first."""
+        if self._closing:
+            return
+        self._closing = True
+        for resource in reversed(list(self._open)):
+            await self.release(resource)
+        self.closed = True
+        for resource in self._open:
+            logger.warning(f"♻️ Leaked {resource.describe()}")
+
+    def _forget(self, resource: Resource) -> None:
+        resource.closed = True
+        if resource in self._open:
+            self._open.remove(resource)
+        if resource.slot is not None and self._slots.get(resource.slot) is resource:
+            del self._slots[resource.slot]
+
+
+class ResourceTracker:
+    """Every room's ``RoomResources`` in this process, kept until nothing in them is open."""
+
+    def __init__(self) -> None:
+        self._rooms: List[RoomResources] = []
+        self._lock = threading.Lock()
+
+    def open(self, room: str) -> RoomResources:
+        resources = RoomResources(room)
+        with self._lock:
+            self._rooms = [r for r in self._rooms if not (r.closed and not r.open_counts())]
+            self._rooms.append(resources)
+        return resources
+
+    def open_counts(self) -> Dict[str, int]:
+        totals: Counter = Counter()
+        with self._lock:
+            for resources in self._rooms:
+                totals.update(resources.open_counts())
+        return dict(totals)
+
+    def leaks(self) -> List[Resource]:
+        """Resources still open although their room has closed."""
+        with self._lock:
+            return [resource for r in self._rooms if r.closed for resource in r._open]
+
+
+tracker = ResourceTracker()
+
+
+def avatar_close(lkapi: api.LiveKitAPI, room: str, identity: str) -> Close:
+    """Closing a Hedra avatar: the plugin has no close, so the participant is removed."""
+
+    async def close() -> None:
+        await lkapi.room.remove_participant(api.RoomParticipantIdentity(room=room, identity=identity))
+
+    return close
+
+
+def shutdown_when_empty(ctx: Any, *, grace: float = ROOM_EMPTY_GRACE_S) -> None:
+    """Shut the job down once no viewer has been in the room for ``grace`` seconds."""
+    pending: Dict[str, asyncio.TimerHandle] = {}
+
+    def viewers() -> int:
+        return sum(1 for p in ctx.room.remote_participants.values() if p.kind in _VIEWER_KINDS)
+
+    def check() -> None:
+        pending.pop("timer", None)
+        if not viewers():
+            logger.info(f"🏁 Room {ctx.room.name} has been empty for {grace:.0f}s, shutting down")
+            ctx.shutdown(reason="room empty")
+
+    def on_disconnected(participant: rtc.RemoteParticipant) -> None:
+        if participant.kind in _VIEWER_KINDS and not viewers() and "timer" not in pending:
+            pending["timer"] = asyncio.get_running_loop().call_later(grace, check)
+
+    ctx.room.on("participant_disconnected", on_disconnected)
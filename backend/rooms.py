@@ -0,0 +1,175 @@
+"""Per-room state and admission control for a worker process that hosts many rooms.
+
+Nothing here imports LiveKit: job requests are duck-typed (``room.name``, ``accept()``,
+``reject()``) so the load test can drive the same code against local stand-ins.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, TypeVar
+
+import psutil
+
+logger = logging.getLogger("rooms")
+
+T = TypeVar("T")
+
+MAX_ROOMS = int(os.getenv("WORKER_MAX_ROOMS", "50"))
+MAX_CPU_PERCENT = float(os.getenv("WORKER_MAX_CPU_PERCENT", "80"))
+# Memory that must stay free after admitting one more room
+MIN_AVAILABLE_MB = float(os.getenv("WORKER_MIN_AVAILABLE_MB", "512"))
+ROOM_MEMORY_MB = float(os.getenv("WORKER_ROOM_MEMORY_MB", "150"))
+
+
+class RoomRegistry(Generic[T]):
+    """Room name -> that room's state, so concurrent rooms in one process never share it.
+
+    Jobs may run on separate threads (LiveKit's thread executor), hence the lock.
+    """
+
+    def __init__(self, factory: Callable[[str], T]):
+        self._factory = factory
+        self._rooms: Dict[str, T] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rooms
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._rooms)
+
+    def open(self, name: str) -> T:
+        """Create the state for room ``name``; a room can only be open once per process."""
+        with self._lock:
+            if name in self._rooms:
+                raise RuntimeError(f"room {name!r} is already open in this worker")
+            state = self._rooms[name] = self._factory(name)
+        logger.info(f"🏠 Opened room {name} ({len(self._rooms)} open)")
+        return state
+
+    def get(self, name: str) -> Optional[T]:
+        return self._rooms.get(name)
+
+    def close(self, name: str) -> Optional[T]:
+        with self._lock:
+            state = self._rooms.pop(name, None)
+        if state is not None:
+            logger.info(f"🏠 Closed room {name} ({len(self._rooms)} open)")
+        return state
+
+    @contextmanager
+    def room(self, name: str) -> Iterator[T]:
+        state = self.open(name)
+        try:
+            yield state
+        finally:
+            self.close(name)
+
+
+@dataclass
+class Headroom:
+    rooms: int
+    cpu_percent: float
+    memory_available_mb: float
+
+
+class CpuSampler:
+    """System CPU %, re-measured at most every ``min_interval`` seconds.
+
+    ``psutil.cpu_percent(interval=None)`` never blocks the loop but reports usage since the
+    previous call, which is noise when a burst of job requests calls it back to back.
+    """
+
+    def __init__(self, min_interval: float = 1.0, *, clock: Callable[[], float] = time.monotonic):
+        self._min_interval = min_interval
+        self._clock = clock
+        psutil.cpu_percent(interval=None)  # the first reading only sets the baseline
+        self._last = 0.0
+        self._sampled_at = clock()
+
+    def __call__(self) -> float:
+        now = self._clock()
+        if now - self._sampled_at >= self._min_interval:
+            self._last = psutil.cpu_percent(interval=None)
+            self._sampled_at = now
+        return self._last
+
+
+_cpu_sampler: Optional[CpuSampler] = None
+
+
+def sample_headroom(rooms: int) -> Headroom:
+    global _cpu_sampler
+    if _cpu_sampler is None:
+        _cpu_sampler = CpuSampler()
+    return Headroom(
+        rooms=rooms,
+        cpu_percent=_cpu_sampler(),
+        memory_available_mb=psutil.virtual_memory().available / 2**20,
+    )
+
+
+class AdmissionController:
+    """Accepts a new room only while the process has CPU and memory headroom for it."""
+
+    def __init__(
+        self,
+        registry: RoomRegistry,
+        *,
+        max_rooms: int = MAX_ROOMS,
+        max_cpu_percent: float = MAX_CPU_PERCENT,
+        min_available_mb: float = MIN_AVAILABLE_MB,
+        room_memory_mb: float = ROOM_MEMORY_MB,
+        sample: Callable[[int], Headroom] = sample_headroom,
+    ):
+        self._registry = registry
+        self.max_rooms = max_rooms
+        self.max_cpu_percent = max_cpu_percent
+        self.min_available_mb = min_available_mb
+        self.room_memory_mb = room_memory_mb
+        self._sample = sample
+        self.accepted = 0
+        self.rejected = 0
+
+    def rejection_reason(self) -> Optional[str]:
+        """Why one more room can't be admitted right now, or None if it can."""
+        headroom = self._sample(len(self._registry))
+        if headroom.rooms >= self.max_rooms:
+            return f"{headroom.rooms} rooms open (max {self.max_rooms})"
+        if headroom.cpu_percent >= self.max_cpu_percent:
+            return f"CPU at {headroom.cpu_percent:.0f}% (max {self.max_cpu_percent:.0f}%)"
+        if headroom.memory_available_mb - self.room_memory_mb < self.min_available_mb:
+            return f"only {headroom.memory_available_mb:.0f} MB available"
+        return None
+
+    def load(self, *_: Any) -> float:
+        """Worker load in [0, 1] for ``WorkerOptions.load_fnc``: the tightest of the three limits."""
+        headroom = self._sample(len(self._registry))
+        memory_budget = max(self.room_memory_mb, headroom.memory_available_mb - self.min_available_mb)
+        return min(
+            1.0,
+            max(
+                headroom.rooms / self.max_rooms,
+                headroom.cpu_percent / self.max_cpu_percent,
+                self.room_memory_mb / memory_budget,
+            ),
+        )
+
+    async def request_fnc(self, request: Any) -> None:
+        """``WorkerOptions.request_fnc``: accept the job or hand it to another worker."""
+        reason = self.rejection_reason()
+        if reason is not None:
+            self.rejected += 1
+            logger.warning(f"🚫 Rejecting room {request.room.name}: {reason}")
+            await request.reject()
+            return
+        self.accepted += 1
+        await request.accept()
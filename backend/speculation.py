@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Protocol, Sequence
+
+logger = logging.getLogger("speculative-replies")
+
+
+class Draft(Protocol):
+    """A reply that is being generated but isn't audible until ``play`` is called."""
+
+    async def play(self) -> None:
+        """Let the draft's audio through and wait until it has played out."""
+        ...
+
+    def cancel(self) -> float:
+        """Stop generating and drop buffered audio; returns the tokens spent on it."""
+        ...
+
+
+@dataclass
+class SpeculationStats:
+    drafts: int = 0  # speculative drafts started (the chosen speaker's reply isn't counted)
+    hits: int = 0  # drafts that were played as the follow-up
+    misses: int = 0  # drafts cancelled because the conversation moved on
+    wasted_tokens: float = 0.0
+    suppressed: int = 0  # turns where the wasted-token cap stopped speculation
+
+    @property
+    def hit_rate(self) -> float:
+        settled = self.hits + self.misses
+        return self.hits / settled if settled else 0.0
+
+
+class SpeculativeReplies:
+    """Drafts every host's reply to a user turn at once.
+
+    The chosen host's draft plays straight away; the others stay warm (generated, audio held
+    back) as the likely follow-up, so the next host starts the moment the first one is done
+    instead of only then starting to think. Warm drafts are cancelled when a new user turn
+    makes them stale, and speculation stops once ``max_wasted_tokens`` have been thrown away.
+
+    With ``pipelined``, the follow-up's ``play`` is called while the first reply is still
+    playing; the drafts must then order their own playout (``playout.PlayoutScheduler``).
+    """
+
+    def __init__(
+        self,
+        personas: Sequence[str],
+        start_draft: Callable[[str, str, bool], Draft],
+        *,
+        max_wasted_tokens: float = 20_000,
+        follow_up: bool = True,
+        pipelined: bool = False,
+    ):
+        """``start_draft(persona, text, held)`` starts generating; ``held`` drafts stay silent."""
+        self.personas = list(personas)
+        self._start_draft = start_draft
+        self._max_wasted_tokens = max_wasted_tokens
+        self._follow_up = follow_up
+        self._pipelined = pipelined
+        self._warm: Dict[str, Draft] = {}
+        self.stats = SpeculationStats()
+
+    @property
+    def speculating(self) -> bool:
+        return self.stats.wasted_tokens < self._max_wasted_tokens
+
+    async def reply(self, persona: str, text: str) -> Optional[str]:
+        """Play ``persona``'s reply to ``text``, then a warm co-host follow-up if there is one.
+
+        Returns the persona that followed up, if any.
+        """
+        self.cancel_warm()
+
+        if self.speculating:
+            for other in self.personas:
+                if other != persona:
+                    self._warm[other] = self._start_draft(other, text, True)
+                    self.stats.drafts += 1
+        else:
+            self.stats.suppressed += 1
+
+        chosen = self._start_draft(persona, text, False)
+        if self._pipelined and self._follow_up and self._warm:
+            return await self._play_pipelined(chosen)
+
+        await chosen.play()
+
+        if not self._follow_up or not self._warm:
+            return None
+        follower = next(p for p in self.personas if p in self._warm)
+        draft = self._warm.pop(follower)
+        self.stats.hits += 1
+        await draft.play()
+        return follower
+
+    async def _play_pipelined(self, chosen: Draft) -> Optional[str]:
+        follower = next(p for p in self.personas if p in self._warm)
+        queued = asyncio.ensure_future(self._warm[follower].play())
+        try:
+            await chosen.play()
+        except BaseException:
+            queued.cancel()
+            raise
+        if follower not in self._warm:
+            # Cancelled by a new user turn while the first reply played
+            queued.cancel()
+            return None
+        del self._warm[follower]
+        self.stats.hits += 1
+        await queued
+        return follower
+
+    def cancel_warm(self) -> None:
+        """Drop drafts that no longer answer the latest user turn."""
+        was_speculating = self.speculating
+        for persona, draft in list(self._warm.items()):
+            wasted = draft.cancel()
+            self.stats.misses += 1
+            self.stats.wasted_tokens += wasted
+            logger.debug(f"Cancelled {persona}'s speculative draft ({wasted:.0f} tokens wasted)")
+        self._warm.clear()
+        if was_speculating and not self.speculating:
+            logger.info(f"Speculation paused: {self.stats.wasted_tokens:.0f} tokens wasted")
+
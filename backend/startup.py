@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("avatar-startup")
+
+
+class TokenBucket:
+    """Async token bucket used to pace calls to rate-limited APIs (e.g. Hedra session start).
+
+    ``capacity`` tokens are available immediately, then tokens refill at ``rate`` per second.
+    """
+
+    def __init__(self, rate: float, capacity: float, *, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Wait until ``tokens`` are available and take them. Returns the time spent waiting."""
+        if tokens > self.capacity:
+            raise ValueError("cannot acquire more tokens than the bucket capacity")
+        waited = 0.0
+        # The lock keeps waiters FIFO so a burst of rooms is served in arrival order
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                delay = (tokens - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= tokens
+        return waited
+
+
+async def retry_with_backoff(
+    fn: Callable[[], Awaitable[Any]],
+    *,
+    attempts: int = 3,
+    base_delay: float = 0.5,
+    max_delay: float = 4.0,
+    label: str = "operation",
+    on_attempt: Optional[Callable[[int], Awaitable[None]]] = None,
+) -> Any:
+    """Run ``fn`` until it succeeds, sleeping with jittered exponential backoff between failures."""
+    for attempt in range(1, attempts + 1):
+        if on_attempt is not None:
+            await on_attempt(attempt)
+        try:
+            return await fn()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(f"⚠️ {label} failed (attempt {attempt}/{attempts}): {e} - retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+@dataclass
+class PhaseTiming:
+    name: str
+    started_at: float = 0.0  # seconds since the timeline began
+    duration: float = 0.0
+    waited: float = 0.0  # time spent blocked on the rate limiter
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class StartupTimeline:
+    """Per-phase timing breakdown of a room's start-up."""
+
+    started: float = field(default_factory=time.perf_counter)
+    phases: Dict[str, PhaseTiming] = field(default_factory=dict)
+    total: float = 0.0
+
+    def summary(self) -> str:
+        parts = [
+            f"{p.name}={p.duration * 1000:.0f}ms"
+            + (f" (+{p.waited * 1000:.0f}ms rate-limited)" if p.waited else "")
+            + (f" x{p.attempts}" if p.attempts > 1 else "")
+            for p in sorted(self.phases.values(), key=lambda p: p.started_at)
+        ]
+        return f"total={self.total * 1000:.0f}ms " + " ".join(parts)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "phases": {
+                name: {
+                    "started_at": p.started_at,
+                    "duration": p.duration,
+                    "waited": p.waited,
+                    "attempts": p.attempts,
+                    "error": p.error,
+                }
+                for name, p in self.phases.items()
+            },
+        }
+
+
+@dataclass
+class StartupStep:
+    """One unit of start-up work, e.g. starting an avatar or an AgentSession."""
+
+    name: str
+    start: Callable[[], Awaitable[Any]]
+    after: Sequence[str] = ()  # names of steps that must finish first
+    rate_limited: bool = False  # take a token from the bucket before every attempt
+    attempts: int = 1
+
+
+async def run_startup(
+    steps: Sequence[StartupStep],
+    *,
+    bucket: Optional[TokenBucket] = None,
+    base_delay: float = 0.5,
+) -> StartupTimeline:
+    """Start every step as soon as its dependencies are done, all on the current loop.
+
+    Independent steps (the two personas) run concurrently, so the room is ready after the
+    slowest dependency chain instead of the sum of every handshake.
+    """
+    names = {step.name for step in steps}
+    for step in steps:
+        missing = [dep for dep in step.after if dep not in names]
+        if missing:
+            raise ValueError(f"step {step.name!r} depends on unknown steps: {missing}")
+
+    timeline = StartupTimeline()
+    tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+    async def _run(step: StartupStep) -> Any:
+        for dep in step.after:
+            await tasks[dep]
+
+        phase = PhaseTiming(step.name, started_at=time.perf_counter() - timeline.started)
+        timeline.phases[step.name] = phase
+
+        async def _on_attempt(attempt: int) -> None:
+            phase.attempts = attempt
+            if step.rate_limited and bucket is not None:
+                phase.waited += await bucket.acquire()
+
+        t0 = time.perf_counter()
+        try:
+            return await retry_with_backoff(
+                step.start,
+                attempts=step.attempts,
+                base_delay=base_delay,
+                label=step.name,
+                on_attempt=_on_attempt,
+            )
+        except Exception as e:
+            phase.error = str(e)
+            raise
+        finally:
+            phase.duration = time.perf_counter() - t0
+
+    for step in steps:
+        tasks[step.name] = asyncio.create_task(_run(step), name=f"startup:{step.name}")
+
+    results: List[Any] = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    timeline.total = time.perf_counter() - timeline.started
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        logger.error(f"Startup failed: {timeline.summary()}")
+        raise errors[0]
+
+    logger.info(f"⏱️ Startup complete: {timeline.summary()}")
+    return timeline
@@ -0,0 +1,334 @@
+"""Per-turn latency tracing, from the user's committed speech to the end of the reply.
+
+A turn collects timestamped stage marks::
+
+    speech_committed -> reply_requested -> llm_first_token -> audio_first_chunk
+                     -> avatar_first_frame -> turn_end
+
+Standalone operations, such as an avatar start or a handoff tool call, are recorded as
+spans. Finished turns and spans go into an in-process ring buffer. A background thread
+hands them to the exporters, so the hot path only pays for a clock read and a dict
+write. Configure exporters with ``TRACE_EXPORT``, e.g.
+``jsonl:/tmp/turns.jsonl,openmetrics:9464``.
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+logger = logging.getLogger("tracing")
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_RING_SIZE = int(os.getenv("TRACE_RING_SIZE", "1024"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2.0"))
+
+STAGES = (
+    "speech_committed",
+    "reply_requested",
+    "llm_first_token",
+    "audio_first_chunk",
+    "avatar_first_frame",
+    "turn_end",
+)
+
+
+@dataclass
+class TurnTrace:
+    turn_id: int
+    room: str
+    track: str  # the persona (session) producing the reply
+    marks: Dict[str, float] = field(default_factory=dict)
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def mark(self, stage: str, at: float) -> None:
+        # The first occurrence wins: later audio chunks don't move "audio_first_chunk"
+        self.marks.setdefault(stage, at)
+
+    @property
+    def started_at(self) -> float:
+        return min(self.marks.values())
+
+    def offsets_ms(self) -> Dict[str, float]:
+        """Milliseconds from the start of the turn to each stage that was reached."""
+        start = self.started_at
+        return {stage: (at - start) * 1000 for stage, at in sorted(self.marks.items(), key=lambda m: m[1])}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"kind": "turn", **asdict(self), "offsets_ms": self.offsets_ms()}
+
+
+@dataclass
+class Span:
+    name: str
+    room: str
+    started_at: float
+    duration: float = 0.0
+    error: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"kind": "span", **asdict(self)}
+
+
+Record = Any  # TurnTrace or Span
+
+
+class Tracer:
+    def __init__(self, *, ring_size: int = TRACE_RING_SIZE, clock: Callable[[], float] = time.time):
+        # Wall-clock time, so marks line up with timestamps reported by the model plugins
+        self._clock = clock
+        self._ids = itertools.count(1)
+        self._active: Dict[Tuple[str, str], TurnTrace] = {}
+        self._recent: Dict[Tuple[str, str], TurnTrace] = {}
+        self._ring: Deque[Record] = deque(maxlen=ring_size)
+        self._unexported: Deque[Record] = deque(maxlen=ring_size)
+
+    def start_turn(
+        self, room: str, track: str, stage: str = "speech_committed", at: Optional[float] = None, **attrs: Any
+    ) -> TurnTrace:
+        """Open a turn on ``track``; a turn still open there is closed as interrupted."""
+        key = (room, track)
+        if key in self._active:
+            self.end_turn(room, track, interrupted=True)
+        turn = TurnTrace(next(self._ids), room, track, attrs=attrs)
+        turn.mark(stage, self._clock() if at is None else at)
+        self._active[key] = turn
+        return turn
+
+    def mark(self, room: str, track: str, stage: str, at: Optional[float] = None) -> None:
+        """Record ``stage`` on the open turn for ``track``.
+
+        Some stages are reported after the fact (the model's first-token time arrives with
+        its usage metrics), so a mark with an explicit ``at`` may also land on the turn
+        that just ended.
+        """
+        key = (room, track)
+        turn = self._active.get(key)
+        if at is not None and (turn is None or at < turn.started_at):
+            turn = self._recent.get(key)
+        if turn is not None:
+            turn.mark(stage, self._clock() if at is None else at)
+
+    def annotate(self, room: str, track: str, **attrs: Any) -> None:
+        """Add ``attrs`` to the open turn on ``track``, or to the one that just ended."""
+        key = (room, track)
+        turn = self._active.get(key) or self._recent.get(key)
+        if turn is not None:
+            turn.attrs.update(attrs)
+
+    def end_turn(self, room: str, track: str, **attrs: Any) -> Optional[TurnTrace]:
+        key = (room, track)
+        turn = self._active.pop(key, None)
+        if turn is None:
+            return None
+        turn.mark("turn_end", self._clock())
+        turn.attrs.update(attrs)
+        self._recent.pop(key, None)
+        self._recent[key] = turn
+        if len(self._recent) > self._ring.maxlen:
+            del self._recent[next(iter(self._recent))]
+        self._record(turn)
+        return turn
+
+    @contextmanager
+    def span(self, name: str, room: str = "", **attrs: Any) -> Iterator[Span]:
+        span = Span(name, room, started_at=self._clock(), attrs=attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration = self._clock() - span.started_at
+            self._record(span)
+
+    def _record(self, record: Record) -> None:
+        self._ring.append(record)
+        self._unexported.append(record)
+
+    def records(self) -> List[Record]:
+        """Snapshot of the ring buffer, oldest first."""
+        return list(self._ring)
+
+    def drain(self) -> List[Record]:
+        """Records finished since the previous drain."""
+        drained = []
+        while self._unexported:
+            drained.append(self._unexported.popleft())
+        return drained
+
+
+class TraceExporter(Protocol):
+    def export(self, records: Sequence[Record]) -> None: ...
+
+
+class JsonlExporter:
+    """Appends one JSON object per finished turn or span."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, records: Sequence[Record]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record.as_dict()) + "\n")
+
+
+_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * len(_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class OpenMetricsExporter:
+    """Histograms of stage offsets and span durations, served in the OpenMetrics text format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: Dict[str, _Histogram] = {}
+        self._spans: Dict[str, _Histogram] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def export(self, records: Sequence[Record]) -> None:
+        with self._lock:
+            for record in records:
+                if isinstance(record, TurnTrace):
+                    for stage, offset_ms in record.offsets_ms().items():
+                        self._stages.setdefault(stage, _Histogram()).observe(offset_ms / 1000)
+                else:
+                    self._spans.setdefault(record.name, _Histogram()).observe(record.duration)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for metric, label, histograms, help_text in (
+                ("turn_stage_seconds", "stage", self._stages, "Seconds from the start of a turn to each stage"),
+                ("span_seconds", "name", self._spans, "Duration of traced operations"),
+            ):
+                lines += [f"# TYPE {metric} histogram", f"# HELP {metric} {help_text}"]
+                for value, histogram in sorted(histograms.items()):
+                    for bound, count in zip(_BUCKETS, histogram.counts):
+                        lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{{label}="{value}"}} {histogram.total}')
+                    lines.append(f'{metric}_count{{{label}="{value}"}} {histogram.count}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> None:
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # With the process job executor every job process tries the same port
+            logger.warning(f"OpenMetrics endpoint not started on :{port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name="openmetrics", daemon=True).start()
+        logger.info(f"📈 Serving turn metrics on :{port}")
+
+
+def exporters_from_spec(spec: str) -> List[TraceExporter]:
+    """Parse ``TRACE_EXPORT``: comma separated ``jsonl:<path>`` / ``openmetrics:<port>``."""
+    exporters: List[TraceExporter] = []
+    for part in (p.strip() for p in spec.split(",") if p.strip()):
+        kind, _, arg = part.partition(":")
+        if kind == "jsonl":
+            exporters.append(JsonlExporter(arg or "turn_traces.jsonl"))
+        elif kind == "openmetrics":
+            exporter = OpenMetricsExporter()
+            exporter.serve(int(arg or "9464"))
+            exporters.append(exporter)
+        else:
+            raise ValueError(f"unknown trace exporter {kind!r}, expected jsonl or openmetrics")
+    return exporters
+
+
+def start_export_thread(tracer: Tracer, exporters: Sequence[TraceExporter], interval: float) -> threading.Thread:
+    """Drain ``tracer`` into ``exporters`` every ``interval`` seconds, off the event loop."""
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            records = tracer.drain()
+            if not records:
+                continue
+            for exporter in exporters:
+                try:
+                    exporter.export(records)
+                except Exception as e:
+                    logger.error(f"Trace export to {type(exporter).__name__} failed: {e}")
+
+    thread = threading.Thread(target=run, name="trace-export", daemon=True)
+    thread.start()
+    return thread
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """The process's tracer; exporting starts on first use when ``TRACE_EXPORT`` is set."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            exporters = exporters_from_spec(TRACE_EXPORT)
+            if exporters:
+                start_export_thread(_tracer, exporters, TRACE_EXPORT_INTERVAL)
+    return _tracer
+
+
+def traced(
+    tracer: Tracer, name: str, fn: Callable[[], Awaitable[Any]], room: str = "", **attrs: Any
+) -> Callable[[], Awaitable[Any]]:
+    """Wrap an async callable so every call (each retry, too) is recorded as a span."""
+
+    async def run() -> Any:
+        with tracer.span(name, room, **attrs):
+            return await fn()
+
+    return run
+
+
+def trace_model_metrics(tracer: Tracer, room: str, track: str, session: Any) -> None:
+    """Mark ``llm_first_token`` from the realtime model's metrics on ``session``."""
+
+    def on_metrics(ev: Any) -> None:
+        metrics = ev.metrics
+        if getattr(metrics, "type", None) == "realtime_model_metrics" and metrics.ttft >= 0:
+            tracer.mark(room, track, "llm_first_token", at=metrics.timestamp + metrics.ttft)
+
+    session.on("metrics_collected", on_metrics)
@@ -0,0 +1,228 @@
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Mapping, Optional, Protocol, Sequence
+
+logger = logging.getLogger("turn-scheduler")
+
+
+@dataclass
+class TurnRequest:
+    """A reply to dispatch: which persona speaks and the user text it responds to."""
+
+    persona: str
+    text: str
+    submitted_at: float  # arrival time of the oldest utterance folded into this request
+    utterances: int = 1
+
+
+@dataclass
+class SchedulerStats:
+    submitted: int = 0
+    dispatched: int = 0
+    coalesced: int = 0  # utterances merged into a pending reply instead of getting their own
+    dropped: int = 0  # utterances discarded because a reply was in flight or they went stale
+
+
+class TurnPolicy(Protocol):
+    def choose(self, scheduler: "TurnScheduler", text: str) -> Optional[str]:
+        """Return the persona that should answer, or None to let the next policy decide."""
+        ...
+
+
+class RoundRobinPolicy:
+    """The persona after whoever was assigned last (the original strict alternation)."""
+
+    def choose(self, scheduler: "TurnScheduler", text: str) -> Optional[str]:
+        personas = scheduler.personas
+        if scheduler.last_assigned is None:
+            return personas[0]
+        return personas[(personas.index(scheduler.last_assigned) + 1) % len(personas)]
+
+
+class AddressedNamePolicy:
+    """Route to the persona the user addresses by name ("Snoop, what do you think?")."""
+
+    def __init__(self, aliases: Optional[Mapping[str, Sequence[str]]] = None):
+        self._aliases = dict(aliases or {})
+        self._patterns: Dict[str, "re.Pattern[str]"] = {}
+
+    def _pattern(self, persona: str) -> "re.Pattern[str]":
+        if persona not in self._patterns:
+            names = [persona, *self._aliases.get(persona, ())]
+            alternation = "|".join(re.escape(name) for name in names)
+            self._patterns[persona] = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+        return self._patterns[persona]
+
+    def choose(self, scheduler: "TurnScheduler", text: str) -> Optional[str]:
+        # The earliest mention wins when several hosts are named
+        best, best_pos = None, None
+        for persona in scheduler.personas:
+            match = self._pattern(persona).search(text)
+            if match and (best_pos is None or match.start() < best_pos):
+                best, best_pos = persona, match.start()
+        return best
+
+
+class LeastRecentlySpokenPolicy:
+    def choose(self, scheduler: "TurnScheduler", text: str) -> Optional[str]:
+        return min(scheduler.personas, key=lambda p: scheduler.last_spoke.get(p, float("-inf")))
+
+
+class LowestQueueDepthPolicy:
+    def choose(self, scheduler: "TurnScheduler", text: str) -> Optional[str]:
+        # Stable on ties, so an idle room still starts with the first persona
+        return min(scheduler.personas, key=scheduler.queue_depth)
+
+
+POLICIES: Dict[str, Callable[[], TurnPolicy]] = {
+    "round-robin": RoundRobinPolicy,
+    "addressed": AddressedNamePolicy,
+    "least-recent": LeastRecentlySpokenPolicy,
+    "lowest-queue": LowestQueueDepthPolicy,
+}
+
+
+def build_policies(spec: str, aliases: Optional[Mapping[str, Sequence[str]]] = None) -> list:
+    """Parse a comma separated policy chain, e.g. ``"addressed,round-robin"``."""
+    policies = []
+    for name in (part.strip() for part in spec.split(",") if part.strip()):
+        if name not in POLICIES:
+            raise ValueError(f"unknown turn policy {name!r}, expected one of {sorted(POLICIES)}")
+        policies.append(AddressedNamePolicy(aliases) if name == "addressed" else POLICIES[name]())
+    return policies
+
+
+@dataclass
+class _PersonaQueue:
+    busy: bool = False
+    pending: Deque[TurnRequest] = field(default_factory=deque)
+
+
+class TurnScheduler:
+    """Decides which of N personas answers each user utterance.
+
+    Policies are tried in order until one picks a persona (round-robin is always appended as
+    the final fallback). While a persona has a reply in flight, new utterances for it are
+    coalesced into one pending reply (``on_busy="coalesce"``), dropped (``"drop"``) or queued
+    one reply each (``"queue"``, the old behaviour); pending utterances older than
+    ``max_pending_age`` are dropped when the persona frees up.
+
+    With ``exclusive=True`` all personas share one floor (e.g. a single session voicing every
+    host): any reply in flight makes new utterances wait, whichever persona they go to.
+    """
+
+    def __init__(
+        self,
+        personas: Sequence[str],
+        *,
+        policies: Optional[Sequence[TurnPolicy]] = None,
+        on_busy: str = "coalesce",
+        max_pending_age: float = 8.0,
+        exclusive: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not personas:
+            raise ValueError("at least one persona is required")
+        if on_busy not in ("coalesce", "drop", "queue"):
+            raise ValueError(f"unknown on_busy mode: {on_busy}")
+        self.personas = list(personas)
+        self._policies = list(policies or [AddressedNamePolicy()])
+        if not any(isinstance(p, RoundRobinPolicy) for p in self._policies):
+            self._policies.append(RoundRobinPolicy())
+        self._on_busy = on_busy
+        self._max_pending_age = max_pending_age
+        self._clock = clock
+
+        if exclusive:
+            shared = _PersonaQueue()
+            self._queues = {persona: shared for persona in self.personas}
+        else:
+            self._queues = {persona: _PersonaQueue() for persona in self.personas}
+        self.last_assigned: Optional[str] = None
+        self.last_spoke: Dict[str, float] = {}
+        self.stats = SchedulerStats()
+
+    def queue_depth(self, persona: str) -> int:
+        queue = self._queues[persona]
+        return int(queue.busy) + len(queue.pending)
+
+    def assign(self, text: str = "") -> str:
+        """Pick the persona for ``text`` without dispatching anything."""
+        persona = self._choose(text)
+        self.last_assigned = persona
+        return persona
+
+    def submit(self, text: str) -> Optional[TurnRequest]:
+        """Route a committed user utterance.
+
+        Returns a request to dispatch right away, or None if it was folded into (or dropped
+        behind) a reply that is already in flight; that reply is returned by ``complete``.
+        """
+        now = self._clock()
+        self.stats.submitted += 1
+        # The rotation only moves on for turns that get a reply of their own
+        persona = self._choose(text)
+        queue = self._queues[persona]
+        request = TurnRequest(persona, text, submitted_at=now)
+
+        if not queue.busy:
+            self.last_assigned = persona
+            return self._dispatch(request)
+
+        if self._on_busy == "drop":
+            self.stats.dropped += 1
+        elif self._on_busy == "coalesce" and queue.pending and queue.pending[-1].persona == persona:
+            # With a shared floor the last pending reply may be another persona's; the
+            # utterance then waits for its own
+            pending = queue.pending[-1]
+            pending.text = f"{pending.text} {text}"
+            pending.utterances += 1
+            self.stats.coalesced += 1
+        else:
+            self.last_assigned = persona
+            queue.pending.append(request)
+        return None
+
+    def complete(self, persona: str) -> Optional[TurnRequest]:
+        """Mark ``persona``'s reply as finished; returns its next pending request, if any."""
+        now = self._clock()
+        queue = self._queues[persona]
+        queue.busy = False
+        self.last_spoke[persona] = now
+
+        while queue.pending:
+            request = queue.pending.popleft()
+            if now - request.submitted_at > self._max_pending_age:
+                self.stats.dropped += request.utterances
+                logger.info(f"Dropping stale utterance for {persona}: {request.text!r}")
+                continue
+            return self._dispatch(request)
+        return None
+
+    def drop_pending(self) -> int:
+        """Discard every pending request (the user talked over the replies in flight).
+
+        Replies in flight still call ``complete``; it just has nothing left to return.
+        Returns how many utterances were dropped.
+        """
+        dropped = 0
+        for queue in {id(queue): queue for queue in self._queues.values()}.values():
+            dropped += sum(request.utterances for request in queue.pending)
+            queue.pending.clear()
+        self.stats.dropped += dropped
+        return dropped
+
+    def _choose(self, text: str) -> str:
+        for policy in self._policies:
+            persona = policy.choose(self, text)
+            if persona is not None:
+                return persona
+        raise RuntimeError("no turn policy chose a persona")  # unreachable, round-robin always does
+
+    def _dispatch(self, request: TurnRequest) -> TurnRequest:
+        self._queues[request.persona].busy = True
+        self.stats.dispatched += 1
+        return request
@@ -0,0 +1,290 @@
+"""Load reporting from what each room type actually costs, for the LiveKit dispatcher.
+
+LiveKit's default ``load_fnc`` reports the node's CPU, averaged over 2.5s. It can't
+see memory, realtime connections or avatars. It also can't tell a dual-avatar
+``agent_worker`` room (two realtime connections, two avatars) from a single-persona
+``agent.py`` one. And a room's CPU shows up only after the room has started, so a burst
+of job requests lands on a node that still looks idle.
+
+``ROOM_COSTS`` gives each room type a cost in CPU, memory, realtime connections and
+avatars. The defaults are made up of components: the job process (about 107 MB RSS in
+``bench_personas``), each realtime session, each avatar, and extras such as noise
+cancellation. Set measured numbers for your nodes with ``ROOM_COSTS``, as JSON that
+overrides fields per type, e.g. ``{"agent_worker": {"cpu_percent": 30}}``.
+
+``CostLoad`` turns the rooms open on the node into a load for ``WorkerOptions``:
+
+- load: the fullest of the node's CPU, memory, connection and avatar budgets. Every
+  worker process on the node publishes its room counts to ``WORKER_LOAD_DIR``, so each
+  one counts the others' rooms too. The measured CPU and memory act as a floor, for
+  when a room costs more than its estimate.
+- drain threshold: the load at which one more room of this type would no longer fit
+  (``WORKER_LOAD_THRESHOLD`` caps it). At or above it, the dispatcher stops sending
+  rooms.
+- ``request_fnc``: rejects a room that wouldn't fit, by the node's current counts. This
+  covers requests that arrive before the next load report.
+
+The estimates are guesses until they're measured, so cost reporting is only on by
+default once ``ROOM_COSTS`` is set. Until then LiveKit's CPU-only reporting is kept
+(``WORKER_LOAD_REPORTING=default``). ``WORKER_LOAD_REPORTING=cost`` turns it on with the
+estimates.
+``benchmarks/bench_placement.py`` compares the two on a simulated cluster.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, fields, replace
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import psutil
+
+from rooms import MAX_CPU_PERCENT, MIN_AVAILABLE_MB, CpuSampler
+
+logger = logging.getLogger("worker-load")
+
+# Admission by the estimated costs alone would place rooms on guesses
+WORKER_LOAD_REPORTING = os.getenv("WORKER_LOAD_REPORTING", "cost" if os.getenv("ROOM_COSTS") else "default")
+WORKER_LOAD_THRESHOLD = float(os.getenv("WORKER_LOAD_THRESHOLD", "0.9"))
+WORKER_LOAD_DIR = os.getenv("WORKER_LOAD_DIR", os.path.join(tempfile.gettempdir(), "livekit-worker-load"))
+WORKER_MAX_CONNECTIONS = int(os.getenv("WORKER_MAX_CONNECTIONS", "200"))
+WORKER_MAX_AVATARS = int(os.getenv("WORKER_MAX_AVATARS", "0"))  # 0: no limit
+# A room counts from the moment it's accepted; its job shows up in active_jobs a little later
+LAUNCH_GRACE_S = 3.0
+
+
+@dataclass(frozen=True)
+class RoomCost:
+    cpu_percent: float = 0.0  # of one core, while the show runs
+    memory_mb: float = 0.0
+    connections: int = 0  # realtime model websockets and the job's own room connection
+    avatars: int = 0
+
+    def __add__(self, other: "RoomCost") -> "RoomCost":
+        return RoomCost(
+            self.cpu_percent + other.cpu_percent,
+            self.memory_mb + other.memory_mb,
+            self.connections + other.connections,
+            self.avatars + other.avatars,
+        )
+
+    def __mul__(self, n: float) -> "RoomCost":
+        return RoomCost(self.cpu_percent * n, self.memory_mb * n, int(self.connections * n), int(self.avatars * n))
+
+
+JOB = RoomCost(cpu_percent=3.0, memory_mb=110.0, connections=1)
+REALTIME_SESSION = RoomCost(cpu_percent=5.0, memory_mb=25.0, connections=1)
+AVATAR = RoomCost(cpu_percent=2.0, memory_mb=5.0, avatars=1)
+NOISE_CANCELLATION = RoomCost(cpu_percent=8.0, memory_mb=20.0)
+SHARED_INGEST = RoomCost(cpu_percent=1.0, memory_mb=5.0)  # the NumPy front end, once per room
+COMPOSITOR = RoomCost(cpu_percent=60.0, memory_mb=40.0)  # 720p compositing
+
+ROOM_COSTS: Dict[str, RoomCost] = {
+    "agent": JOB + REALTIME_SESSION + AVATAR + NOISE_CANCELLATION,
+    "agent_worker": JOB + REALTIME_SESSION * 2 + AVATAR * 2 + SHARED_INGEST,
+    "agent_worker+compositor": JOB + REALTIME_SESSION * 2 + AVATAR * 2 + SHARED_INGEST + COMPOSITOR,
+    "dual_agent_worker": JOB + REALTIME_SESSION * 2 + AVATAR * 2,
+    "dual_agent_orchestrated": JOB + REALTIME_SESSION * 2 + AVATAR * 2,
+    "dual_avatar_simple": JOB + REALTIME_SESSION + AVATAR * 2,
+    "dual_agent_dispatch": JOB + REALTIME_SESSION + AVATAR,
+}
+
+
+def load_room_costs(spec: str = os.getenv("ROOM_COSTS", "")) -> Dict[str, RoomCost]:
+    """``ROOM_COSTS`` with the JSON overrides in ``spec`` applied."""
+    costs = dict(ROOM_COSTS)
+    if not spec:
+        return costs
+    names = {f.name for f in fields(RoomCost)}
+    try:
+        for room_type, overrides in json.loads(spec).items():
+            unknown = set(overrides) - names
+            if unknown:
+                raise ValueError(f"unknown fields for {room_type}: {', '.join(sorted(unknown))}")
+            costs[room_type] = replace(costs.get(room_type, RoomCost()), **overrides)
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"Ignoring ROOM_COSTS: {e}")
+        return dict(ROOM_COSTS)
+    return costs
+
+
+@dataclass(frozen=True)
+class NodeCapacity:
+    cpu_percent: float
+    memory_mb: float
+    connections: int
+    avatars: int  # 0: no limit
+
+    def share(self, cost: RoomCost) -> float:
+        """How full ``cost`` makes the node, by its fullest budget."""
+        shares = [
+            cost.cpu_percent / self.cpu_percent,
+            cost.memory_mb / self.memory_mb,
+            cost.connections / self.connections,
+        ]
+        if self.avatars:
+            shares.append(cost.avatars / self.avatars)
+        return max(shares)
+
+
+def node_capacity() -> NodeCapacity:
+    """This node's budgets: the admission CPU limit on every core, memory less the reserve."""
+    return NodeCapacity(
+        cpu_percent=(psutil.cpu_count() or 1) * MAX_CPU_PERCENT,
+        memory_mb=psutil.virtual_memory().total / 2**20 - MIN_AVAILABLE_MB,
+        connections=WORKER_MAX_CONNECTIONS,
+        avatars=WORKER_MAX_AVATARS,
+    )
+
+
+class NodeLedger:
+    """Open rooms per worker process on this node, one small JSON file each.
+
+    Files not rewritten for ``ttl`` seconds belong to a worker that's gone and are ignored.
+    """
+
+    def __init__(self, directory: str = WORKER_LOAD_DIR, *, ttl: float = 5.0):
+        self._directory = directory
+        self._ttl = ttl
+        self._path = os.path.join(directory, f"{os.getpid()}.json")
+        os.makedirs(directory, exist_ok=True)
+
+    def publish(self, room_type: str, rooms: int) -> None:
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({room_type: rooms}, f)
+        os.replace(tmp, self._path)
+
+    def others(self) -> Dict[str, int]:
+        """Rooms per type open in the node's other worker processes."""
+        counts: Dict[str, int] = {}
+        now = time.time()
+        for entry in os.scandir(self._directory):
+            if entry.path == self._path or not entry.name.endswith(".json"):
+                continue
+            try:
+                if now - entry.stat().st_mtime > self._ttl:
+                    continue
+                with open(entry.path) as f:
+                    for room_type, rooms in json.load(f).items():
+                        counts[room_type] = counts.get(room_type, 0) + int(rooms)
+            except (OSError, ValueError):
+                continue  # being replaced, or the worker just exited
+        return counts
+
+
+_cpu_sampler: Optional[CpuSampler] = None
+
+
+def measure_usage(capacity: NodeCapacity) -> float:
+    """The node's measured CPU or memory use, as a share of its budget, whichever is higher."""
+    global _cpu_sampler
+    if _cpu_sampler is None:
+        _cpu_sampler = CpuSampler()
+    memory = psutil.virtual_memory()
+    used_mb = (memory.total - memory.available) / 2**20
+    cpu_percent = _cpu_sampler() * (psutil.cpu_count() or 1)  # psutil reports the node's average core
+    return max(cpu_percent / capacity.cpu_percent, used_mb / capacity.memory_mb)
+
+
+class CostLoad:
+    """``load_fnc``, ``load_threshold`` and ``request_fnc`` for one room type's worker."""
+
+    def __init__(
+        self,
+        room_type: str,
+        *,
+        costs: Optional[Dict[str, RoomCost]] = None,
+        capacity: Optional[NodeCapacity] = None,
+        ledger: Optional[Any] = None,
+        measure: Optional[Callable[[NodeCapacity], float]] = None,
+        max_threshold: float = WORKER_LOAD_THRESHOLD,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.costs = costs if costs is not None else load_room_costs()
+        if room_type not in self.costs:
+            raise ValueError(f"no cost for room type {room_type!r}")
+        self.room_type = room_type
+        self.capacity = capacity or node_capacity()
+        self._ledger = ledger
+        self._measure = measure or measure_usage
+        self._clock = clock
+        self._worker: Any = None
+        self._accepted: Deque[Tuple[float, int]] = deque()  # (accepted at, rooms expected then)
+        self.accepted = 0
+        self.rejected = 0
+        # Stop taking rooms once one more of this type wouldn't fit
+        self.threshold = max(0.0, min(max_threshold, 1.0 - self.capacity.share(self.costs[room_type])))
+
+    def rooms(self) -> int:
+        """Rooms open in this worker, counting ones accepted but not started yet."""
+        now = self._clock()
+        while self._accepted and now - self._accepted[0][0] > LAUNCH_GRACE_S:
+            self._accepted.popleft()
+        active = len(self._worker.active_jobs) if self._worker is not None else 0
+        expected = self._accepted[-1][1] if self._accepted else 0
+        return max(active, expected)
+
+    def node_cost(self, extra: int = 0) -> Tuple[RoomCost, Dict[str, int]]:
+        """What every room open on the node costs, with ``extra`` more of this type."""
+        counts = dict(self._ledger.others()) if self._ledger is not None else {}
+        counts[self.room_type] = counts.get(self.room_type, 0) + self.rooms() + extra
+        total = RoomCost()
+        for room_type, rooms in counts.items():
+            total = total + self.costs.get(room_type, self.costs[self.room_type]) * rooms
+        return total, counts
+
+    def load(self, worker: Any = None) -> float:
+        """``WorkerOptions.load_fnc``: 0 when idle, at ``threshold`` when the next room wouldn't fit."""
+        if worker is not None:
+            self._worker = worker
+        if self._ledger is not None:
+            try:
+                self._ledger.publish(self.room_type, self.rooms())
+            except OSError as e:
+                logger.warning(f"Can't publish room counts: {e}")
+        total, _ = self.node_cost()
+        return min(1.0, max(self.capacity.share(total), self._measure(self.capacity)))
+
+    def rejection_reason(self) -> Optional[str]:
+        total, counts = self.node_cost(extra=1)
+        share = self.capacity.share(total)
+        if share > 1.0:
+            rooms = ", ".join(f"{rooms} {room_type}" for room_type, rooms in counts.items() if rooms)
+            return f"would be at {share:.0%} of capacity ({rooms})"
+        return None
+
+    async def request_fnc(self, request: Any) -> None:
+        """``WorkerOptions.request_fnc``: accept the room only if it fits on this node."""
+        reason = self.rejection_reason()
+        if reason is not None:
+            self.rejected += 1
+            logger.warning(f"🚫 Rejecting room {request.room.name}: {reason}")
+            await request.reject()
+            return
+        self.accepted += 1
+        self._accepted.append((self._clock(), self.rooms() + 1))
+        await request.accept()
+
+    def worker_options(self) -> Dict[str, Any]:
+        return {"load_fnc": self.load, "load_threshold": self.threshold, "request_fnc": self.request_fnc}
+
+
+def load_options(room_type: str) -> Dict[str, Any]:
+    """``WorkerOptions`` keyword arguments for ``room_type``'s load reporting."""
+    if WORKER_LOAD_REPORTING != "cost":
+        return {}
+    try:
+        ledger: Optional[NodeLedger] = NodeLedger() if WORKER_LOAD_DIR else None
+    except OSError as e:
+        logger.warning(f"Can't share room counts through {WORKER_LOAD_DIR}: {e}")
+        ledger = None
+    load = CostLoad(room_type, ledger=ledger)
+    logger.info(
+        f"⚖️ {room_type} rooms cost {load.capacity.share(load.costs[room_type]):.1%} of this node; "
+        f"draining at load {load.threshold:.2f}"
+    )
+    return load.worker_options()